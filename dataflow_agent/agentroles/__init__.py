@@ -1,7 +1,4 @@
 # dataflow_agent/agentroles/__init__.py
-import importlib
-import pkgutil
-from pathlib import Path
 from typing import Optional
 
 from dataflow_agent.toolkits.tool_manager import get_tool_manager, ToolManager
@@ -9,26 +6,8 @@ from dataflow_agent.logger import get_logger
 
 log = get_logger(__name__)
 
-_pkg_path = Path(__file__).resolve().parent
-for py in _pkg_path.glob("*.py"):
-    if py.stem not in {"__init__", "registry", "base_agent", "configs", "strategies"}:
-        importlib.import_module(f"{__name__}.{py.stem}")
-
-
-def _auto_import_all_submodules():
-    """
-    递归导入 agentroles 包下所有子模块（排除部分内部实现模块），
-    以触发其中的 @register 装饰器。
-    """
-    prefix = __name__ + "."
-    for finder, name, ispkg in pkgutil.walk_packages(__path__, prefix):
-        if any(skip in name for skip in (".cores", ".configs", ".strategies")):
-            continue
-        try:
-            importlib.import_module(name)
-        except Exception as e:
-            # 不让单个模块导入失败影响整体初始化
-            log.warning(f"自动导入子模块失败: {name}: {e}")
+# 1) Agent 模块按需加载：各 Agent 在 manifest.AGENT_MANIFEST 中登记 注册名 -> 模块路径，
+#    AgentRegistry.get 首次查询时才导入对应模块，避免导入本包时加载全部 Agent 及其依赖。
 
 # 2) 导入 cores 子包中核心类型
 from .cores import (
@@ -45,9 +24,6 @@ from .cores import (
     strategies,
     register,
 )
-_auto_import_all_submodules()
-
-from . import common_agents, infra_agents, paper2any_agents
 
 # ==================== 核心函数（增强版） ====================
 
@@ -372,7 +348,6 @@ def create_parallel_agent(
 # ==================== 导出 ====================
 
 list_agents = AgentRegistry.all
-log.critical(f'已经注册了的agent有：{list_agents().keys()}')
 
 __all__ = [
     # 核心函数
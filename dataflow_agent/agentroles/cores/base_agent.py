@@ -40,7 +40,7 @@ import datetime
 import pickle
 from abc import ABC, abstractmethod
 from pathlib import Path
-from typing import Any, Dict, List, Optional, Type, Callable, Tuple
+from typing import Any, AsyncIterator, Dict, List, Optional, Type, Callable, Tuple
 
 # =============================================================================
 # 第三方库导入
@@ -1483,6 +1483,79 @@ class BaseAgent(ABC):
             
         return state
     
+    async def astream(self, state: MainState, **kwargs) -> AsyncIterator[str]:
+        """
+        流式执行入口 - 逐段产出 LLM 文本增量
+
+        与 execute 共用前置工具、消息构建和结果解析逻辑，区别在于简单模式下
+        通过 llm.astream 边生成边产出文本片段。迭代结束后，完整输出会像 execute
+        一样解析并写入 state.agent_results，调用方可继续按原方式读取结果。
+
+        策略模式、VLM 模式和 ReAct 模式需要完整输出才能校验/调用，
+        这些情况下回退到 execute，并把最终文本一次性产出。
+
+        Args:
+            state (MainState): 当前状态对象
+            **kwargs: 额外参数，会被合并到前置工具结果中
+
+        Yields:
+            str: LLM 输出的文本增量
+
+        Example:
+            >>> async for delta in agent.astream(state, prompt=prompt):
+            ...     print(delta, end="")
+            >>> result = state.agent_results[agent.role_name]["results"]
+        """
+        self.state = state
+
+        if self._execution_strategy or getattr(self, "use_vlm", False) or self.react_mode:
+            await self.execute(state, **kwargs)
+            result = state.agent_results.get(self.role_name, {}).get("results", {})
+            if isinstance(result, dict):
+                text = result.get("text") or result.get("raw") or ""
+            else:
+                text = result if isinstance(result, str) else ""
+            if text:
+                yield text
+            return
+
+        log.info(f"开始流式执行 {self.role_name}")
+        pre_tool_results: Dict[str, Any] = {}
+        chunks: List[str] = []
+        try:
+            pre_tool_results = await self.execute_pre_tools(state)
+            try:
+                if not hasattr(state, 'temp_data') or state.temp_data is None:
+                    state.temp_data = {}
+                state.temp_data['pre_tool_results'] = pre_tool_results
+            except Exception:
+                pass
+            pre_tool_results.update(kwargs)
+
+            messages = self.build_messages(state, pre_tool_results)
+            if not self.ignore_history:
+                history_messages = self.message_history.get_messages()
+                if history_messages:
+                    messages = self.message_history.merge_histories(history_messages, messages)
+
+            llm = self.create_llm(state, bind_post_tools=False)
+            async for chunk in llm.astream(messages):
+                delta = chunk.content if isinstance(chunk.content, str) else ""
+                if delta:
+                    chunks.append(delta)
+                    yield delta
+        except Exception as e:
+            log.exception(f"{self.role_name} 流式执行失败: {e}")
+            self.update_state_result(state, {"error": str(e)}, pre_tool_results)
+            return
+
+        answer_text = "".join(chunks)
+        log.info(f'LLM原始输出（流式）：{answer_text}')
+        if not self.ignore_history:
+            self.message_history.add_messages([AIMessage(content=answer_text)])
+        self.update_state_result(state, self.parse_result(answer_text), pre_tool_results)
+        log.info(f"{self.role_name} 流式执行完成")
+
     async def _execute_vlm(self, state: MainState, **kwargs) -> Dict[str, Any]:
         """
         Vision-LLM 专用执行流程
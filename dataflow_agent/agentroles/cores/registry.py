@@ -19,6 +19,11 @@ class AgentRegistry:
 
     @classmethod
     def get(cls, name: str) -> Type["BaseAgent"]:
+        if name not in cls._agents:
+            # 按清单延迟导入；清单里没有的名字退化为全量扫描
+            from dataflow_agent.agentroles.manifest import import_agent_module, import_all_agent_modules
+            if not import_agent_module(name):
+                import_all_agent_modules()
         try:
             return cls._agents[name]
         except KeyError:
@@ -26,6 +31,8 @@ class AgentRegistry:
 
     @classmethod
     def all(cls) -> Dict[str, Type["BaseAgent"]]:
+        from dataflow_agent.agentroles.manifest import import_all_agent_modules
+        import_all_agent_modules()
         return dict(cls._agents)
 
 
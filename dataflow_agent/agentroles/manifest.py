@@ -0,0 +1,87 @@
+# dataflow_agent/agentroles/manifest.py
+"""
+Agent 清单：注册名 -> 定义该 Agent 的模块。
+
+dataflow_agent.agentroles 不再在导入时遍历并导入全部 Agent 模块，
+AgentRegistry.get 首次查询某个名字时才按清单导入对应模块（@register / __init_subclass__ 完成注册）。
+新增 Agent 时请在此登记；未登记的名字查询时会退化为扫描全部子模块。
+"""
+import importlib
+import pkgutil
+from typing import Dict
+
+from dataflow_agent.logger import get_logger
+
+log = get_logger(__name__)
+
+_PKG = "dataflow_agent.agentroles"
+
+# __init_subclass__ 以 role_name.lower() 注册，因此含大写的名字同时登记其小写形式
+AGENT_MANIFEST: Dict[str, str] = {
+    "ImageTextBBoxAgent": f"{_PKG}.common_agents.imagetextbboxagent_agent",
+    "imagetextbboxagent": f"{_PKG}.common_agents.imagetextbboxagent_agent",
+    "test_graph": f"{_PKG}.common_agents.test_graph_agent",
+    "chart_code_generator": f"{_PKG}.paper2any_agents.chart_code_generator",
+    "chart_type_recommender": f"{_PKG}.paper2any_agents.chart_type_recommender",
+    "content_expander": f"{_PKG}.paper2any_agents.content_expander_agent",
+    "deep_research_agent": f"{_PKG}.paper2any_agents.deep_research_agent",
+    "diagram_editor": f"{_PKG}.paper2any_agents.diagram_editor",
+    "diagram_planner": f"{_PKG}.paper2any_agents.diagram_planner",
+    "diagram_vlm_validator": f"{_PKG}.paper2any_agents.diagram_vlm_validator",
+    "drawio_xml_generator": f"{_PKG}.paper2any_agents.drawio_xml_generator",
+    "figure_desc_generator": f"{_PKG}.paper2any_agents.fig_desc_generator",
+    "icon_editor": f"{_PKG}.paper2any_agents.icon_editor",
+    "icon_generator": f"{_PKG}.paper2any_agents.icon_generator",
+    "icon_prompt_generator": f"{_PKG}.paper2any_agents.icon_prompt_generator",
+    "image_filter_agent": f"{_PKG}.paper2any_agents.image_filter_agent",
+    "kb_image_insert_agent": f"{_PKG}.paper2any_agents.kb_image_insert_agent",
+    "kb_outline_agent": f"{_PKG}.paper2any_agents.kb_outline_agent",
+    "kb_prompt_agent": f"{_PKG}.paper2any_agents.kb_prompt_agents",
+    "kb_vlm_prompt_agent": f"{_PKG}.paper2any_agents.kb_prompt_agents",
+    "long_paper_outline_agent": f"{_PKG}.paper2any_agents.long_paper_outline_agent",
+    "outline_agent": f"{_PKG}.paper2any_agents.outline_agent",
+    "outline_refine_agent": f"{_PKG}.paper2any_agents.outline_refine_agent",
+    "p2v_beamer_code_debug": f"{_PKG}.paper2any_agents.p2v_beamer_code_debug_agent",
+    "p2v_extract_pdf": f"{_PKG}.paper2any_agents.p2v_extract_pdf_agent",
+    "p2v_pdf2ppt": f"{_PKG}.paper2any_agents.p2v_pdf2ppt_agent",
+    "p2v_subtitle_and_cursor": f"{_PKG}.paper2any_agents.p2v_subtitle_and_cursor_agent",
+    "paper_idea_extractor": f"{_PKG}.paper2any_agents.paper_idea_extractor",
+    "qa_agent": f"{_PKG}.paper2any_agents.qa_agent",
+    "svg_bg_cleaner": f"{_PKG}.paper2any_agents.svg_bg_cleaner_agent",
+    "table_extractor": f"{_PKG}.paper2any_agents.table_extractor_agent",
+    "table_text_renderer": f"{_PKG}.paper2any_agents.table_text_renderer",
+    "table_splitter": f"{_PKG}.paper2any_agents.table_text_renderer",
+    "tech_route_reference_analyzer": f"{_PKG}.paper2any_agents.tech_route_reference_analyzer",
+    "technical_route_bw_svg_generator": f"{_PKG}.paper2any_agents.technical_route_bw_svg_generator",
+    "technical_route_colorize_svg": f"{_PKG}.paper2any_agents.technical_route_colorize_svg_agent",
+    "technical_route_desc_generator": f"{_PKG}.paper2any_agents.technical_route_desc_generator_agent",
+    "topic_writer": f"{_PKG}.paper2any_agents.topic_writer_agent",
+}
+
+# 不包含 Agent 定义的内部子包，全量扫描时跳过
+_SKIP_SUBPACKAGES = (".cores", ".configs", ".strategies")
+
+
+def import_agent_module(name: str) -> bool:
+    """按清单导入 name 对应的模块；清单中没有该名字时返回 False。"""
+    module = AGENT_MANIFEST.get(name)
+    if not module:
+        return False
+    importlib.import_module(module)
+    return True
+
+
+def import_all_agent_modules() -> None:
+    """
+    递归导入 agentroles 包下所有子模块（排除部分内部实现模块），
+    以触发其中的 @register 装饰器。
+    """
+    package = importlib.import_module(_PKG)
+    for finder, name, ispkg in pkgutil.walk_packages(package.__path__, _PKG + "."):
+        if any(skip in name for skip in _SKIP_SUBPACKAGES) or name.endswith(".manifest"):
+            continue
+        try:
+            importlib.import_module(name)
+        except Exception as e:
+            # 不让单个模块导入失败影响整体初始化
+            log.warning(f"自动导入子模块失败: {name}: {e}")
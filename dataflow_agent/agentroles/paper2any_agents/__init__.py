@@ -1,19 +1,30 @@
 # dataflow_agent/agentroles/paper2any_agents/__init__.py
+#
+# 导出项按需加载（PEP 562）：导入本包下任意一个 Agent 模块时，
+# 不再连带导入其余 Agent 模块。
 
-from .paper_idea_extractor import PaperIdeaExtractor, create_paper_idea_extractor
-from .chart_type_recommender import ChartTypeRecommender, create_chart_type_recommender
-from .chart_code_generator import ChartCodeGenerator, create_chart_code_generator
-from .fig_desc_generator import FigureDescGenerator
-from .deep_research_agent import DeepResearchAgent, create_deep_research_agent
+import importlib
 
-__all__ = [
-    "PaperIdeaExtractor",
-    "create_paper_idea_extractor",
-    "ChartTypeRecommender",
-    "create_chart_type_recommender",
-    "ChartCodeGenerator",
-    "create_chart_code_generator",
-    "FigureDescGenerator",
-    "DeepResearchAgent",
-    "create_deep_research_agent",
-]
+_EXPORTS = {
+    "PaperIdeaExtractor": ".paper_idea_extractor",
+    "create_paper_idea_extractor": ".paper_idea_extractor",
+    "ChartTypeRecommender": ".chart_type_recommender",
+    "create_chart_type_recommender": ".chart_type_recommender",
+    "ChartCodeGenerator": ".chart_code_generator",
+    "create_chart_code_generator": ".chart_code_generator",
+    "FigureDescGenerator": ".fig_desc_generator",
+    "DeepResearchAgent": ".deep_research_agent",
+    "create_deep_research_agent": ".deep_research_agent",
+}
+
+
+def __getattr__(name):
+    module = _EXPORTS.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(module, __name__), name)
+    globals()[name] = value
+    return value
+
+
+__all__ = list(_EXPORTS)
@@ -0,0 +1,157 @@
+# graphbuilder/checkpoint.py
+"""
+工作流断点续跑。
+
+两层粒度：
+1. 节点级：open_checkpointer() 提供基于本地 SQLite 的 LangGraph checkpointer，
+   run_workflow 以 thread_id 运行开启了 checkpoint 的工作流（GenericGraphBuilder.enable_checkpoint）。
+   同一 thread_id 再次运行时，若上次在某个节点失败/进程中断，则从最后一个已完成节点之后继续。
+2. 页级：扇出节点（并发生成多页/多张图）内部失败时 LangGraph 不会保存该节点的部分结果，
+   PageResultLedger 把每页成功的结果写到 result_path 下，节点重跑时复用，只重新生成失败的页。
+
+未安装 langgraph-checkpoint-sqlite 时退化为进程内的 MemorySaver（仅当前进程内可续跑）。
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import threading
+from contextlib import asynccontextmanager
+from dataclasses import asdict, is_dataclass
+from pathlib import Path
+from typing import Any, AsyncIterator, Dict, Optional
+
+from langgraph.checkpoint.base import BaseCheckpointSaver
+from langgraph.checkpoint.memory import MemorySaver
+
+from dataflow_agent.logger import get_logger
+
+log = get_logger(__name__)
+
+# 默认的 checkpoint 数据库位置，可通过环境变量 DF_CHECKPOINT_DB 覆盖
+DEFAULT_CHECKPOINT_DB = Path(__file__).resolve().parents[2] / "outputs" / "checkpoints" / "checkpoints.db"
+
+_memory_saver: Optional[MemorySaver] = None
+
+
+def get_checkpoint_db_path() -> Path:
+    return Path(os.getenv("DF_CHECKPOINT_DB") or DEFAULT_CHECKPOINT_DB)
+
+
+def _fallback_saver() -> MemorySaver:
+    global _memory_saver
+    if _memory_saver is None:
+        _memory_saver = MemorySaver()
+    return _memory_saver
+
+
+def _make_serde():
+    """状态里可能带有 JSON 以外的对象（Path、嵌套 dataclass 等），允许 pickle 兜底。"""
+    from langgraph.checkpoint.serde.jsonplus import JsonPlusSerializer
+
+    try:
+        return JsonPlusSerializer(pickle_fallback=True)
+    except TypeError:
+        return JsonPlusSerializer()
+
+
+@asynccontextmanager
+async def open_checkpointer() -> AsyncIterator[BaseCheckpointSaver]:
+    """
+    打开一个 SQLite checkpointer，退出上下文时关闭连接。
+
+    每次运行独立连接；数据库使用 WAL，多个工作流并发读写互不阻塞。
+    """
+    try:
+        import aiosqlite
+        from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
+    except ImportError:
+        log.warning("[checkpoint] 未安装 langgraph-checkpoint-sqlite，退化为 MemorySaver，断点仅在当前进程内有效")
+        yield _fallback_saver()
+        return
+
+    db_path = get_checkpoint_db_path()
+    db_path.parent.mkdir(parents=True, exist_ok=True)
+    async with aiosqlite.connect(str(db_path)) as conn:
+        await conn.execute("PRAGMA journal_mode=WAL")
+        yield AsyncSqliteSaver(conn, serde=_make_serde())
+
+
+async def discard_thread(checkpointer: BaseCheckpointSaver, thread_id: str) -> None:
+    """工作流成功结束后删除该 thread 的 checkpoint，避免数据库无限增长。"""
+    try:
+        await checkpointer.adelete_thread(thread_id)
+    except Exception as e:  # noqa: BLE001
+        log.warning(f"[checkpoint] 删除 thread={thread_id} 的 checkpoint 失败: {e}")
+
+
+def _digest(obj: Any) -> str:
+    payload = json.dumps(obj, ensure_ascii=False, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def default_thread_id(workflow_name: str, state: Any) -> Optional[str]:
+    """
+    为一次运行生成默认 thread_id：工作流名 + result_path + 初始状态摘要。
+
+    只有输入完全相同的重跑（同一输出目录、同一请求）才会续跑上次的断点；
+    输入变化（例如换了要编辑的页）会得到新的 thread，从头执行。
+    没有 result_path 或状态无法序列化时返回 None（不启用 checkpoint）。
+    """
+    result_path = getattr(state, "result_path", None)
+    if not result_path:
+        return None
+    try:
+        snapshot = asdict(state) if is_dataclass(state) else dict(state)
+    except Exception as e:  # noqa: BLE001
+        log.warning(f"[checkpoint] 初始状态无法序列化，不启用 checkpoint: {e}")
+        return None
+    return f"{workflow_name}:{Path(result_path).resolve()}:{_digest(snapshot)[:16]}"
+
+
+def page_fingerprint(*parts: Any) -> str:
+    """单页输入的指纹：页面内容、风格、模型等任一变化都会使已缓存的结果失效。"""
+    return _digest(list(parts))
+
+
+class PageResultLedger:
+    """
+    扇出节点的逐页结果台账，存放在 <result_path>/.checkpoints/<name>.json：
+        {page_key: {"fingerprint": str, "result": Any}}
+
+    每页成功后立即原子写入，节点中途失败或进程中断后重跑时，
+    指纹一致的页直接复用上次的结果。
+    """
+
+    def __init__(self, result_path: str, name: str):
+        self.path = Path(result_path) / ".checkpoints" / f"{name}.json"
+        self._lock = threading.Lock()
+        self._entries: Dict[str, Dict[str, Any]] = self._load()
+
+    def _load(self) -> Dict[str, Dict[str, Any]]:
+        if not self.path.exists():
+            return {}
+        try:
+            data = json.loads(self.path.read_text(encoding="utf-8"))
+            return data if isinstance(data, dict) else {}
+        except Exception as e:  # noqa: BLE001
+            log.warning(f"[checkpoint] 读取逐页结果失败，忽略: {self.path}: {e}")
+            return {}
+
+    def get(self, key: Any, fingerprint: str) -> Optional[Any]:
+        entry = self._entries.get(str(key))
+        if not entry or entry.get("fingerprint") != fingerprint:
+            return None
+        return entry.get("result")
+
+    def put(self, key: Any, fingerprint: str, result: Any) -> None:
+        with self._lock:
+            self._entries[str(key)] = {"fingerprint": fingerprint, "result": result}
+            try:
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                tmp = self.path.with_suffix(f".{os.getpid()}.tmp")
+                tmp.write_text(json.dumps(self._entries, ensure_ascii=False, default=str), encoding="utf-8")
+                os.replace(tmp, self.path)
+            except Exception as e:  # noqa: BLE001
+                log.warning(f"[checkpoint] 写入逐页结果失败: {self.path}: {e}")
@@ -6,6 +6,8 @@ from typing import Callable, Dict, List, Tuple, Any
 from pydantic import BaseModel
 from langgraph.graph import StateGraph
 
+from dataflow_agent.graphbuilder.progress import report_progress
+
 
 class GenericGraphBuilder:
     """
@@ -29,6 +31,9 @@ class GenericGraphBuilder:
         # 延迟导入 tool_manager 避免循环导入
         self.tool_manager = None
 
+        # 是否在 run_workflow 中启用节点级 checkpoint（见 graphbuilder/checkpoint.py）
+        self.checkpoint_enabled = False
+
     def _get_tool_manager(self):
         """延迟导入 tool_manager"""
         if self.tool_manager is None:
@@ -114,27 +119,38 @@ class GenericGraphBuilder:
             for tool_func in self.post_tool_registry[role]:
                 tm.register_post_tool(tool_func, role=role)
 
-    def _wrap_node_with_tools(self, node_func: Callable, role: str):
-        """为节点包装自动工具注册逻辑"""
+    def _wrap_node_with_tools(self, node_func: Callable, role: str, name: str = None):
+        """为节点包装自动工具注册逻辑，并在节点开始/结束时上报进度"""
+        node_name = name or role
+
         async def wrapped_node(state):
             # 执行前自动注册该角色的工具
             self._register_tools_for_role(role, state)
-            
+            report_progress("node_start", node=node_name)
+
             # 执行原始节点函数
             if asyncio.iscoroutinefunction(node_func):
-                return await node_func(state)
+                result = await node_func(state)
             else:
-                return node_func(state)
-        
+                result = node_func(state)
+
+            report_progress("node_end", node=node_name)
+            return result
+
         return wrapped_node
 
-    def build(self):
-        """构建并返回编译后的图"""
+    def enable_checkpoint(self) -> "GenericGraphBuilder":
+        """声明该工作流支持断点续跑：run_workflow 会为其挂上 SQLite checkpointer。"""
+        self.checkpoint_enabled = True
+        return self
+
+    def build(self, checkpointer=None):
+        """构建并返回编译后的图；传入 checkpointer 时每个节点完成后保存一次状态"""
         sg = StateGraph(self.state_model)
         
         # 添加节点（自动包装工具注册逻辑）
         for name, (func, role) in self.nodes.items():
-            wrapped_func = self._wrap_node_with_tools(func, role)
+            wrapped_func = self._wrap_node_with_tools(func, role, name)
             sg.add_node(name, wrapped_func)
         
         # 添加普通边
@@ -146,4 +162,4 @@ class GenericGraphBuilder:
             sg.add_conditional_edges(src, cond_func)
         
         sg.set_entry_point(self.entry_point)
-        return sg.compile()
\ No newline at end of file
+        return sg.compile(checkpointer=checkpointer)
\ No newline at end of file
@@ -0,0 +1,51 @@
+# graphbuilder/progress.py
+"""
+工作流进度上报。
+
+调用方（例如后台任务队列）通过 progress_sink 为当前协程上下文设置一个回调，
+GenericGraphBuilder 包装的每个节点在开始/结束时调用 report_progress，
+节点内部也可以自行上报更细粒度的进度（例如已完成的页数）。
+
+回调存放在 ContextVar 中：asyncio.create_task / asyncio.gather / asyncio.to_thread
+都会复制上下文，因此并发子任务与线程中的上报也会到达同一个回调；
+未设置回调时 report_progress 为空操作。
+"""
+from __future__ import annotations
+
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Iterator, Optional
+
+from dataflow_agent.logger import get_logger
+
+log = get_logger(__name__)
+
+ProgressSink = Callable[[Dict[str, Any]], None]
+
+_progress_sink: ContextVar[Optional[ProgressSink]] = ContextVar("dataflow_progress_sink", default=None)
+
+
+@contextmanager
+def progress_sink(sink: ProgressSink) -> Iterator[None]:
+    """在当前上下文内安装进度回调，退出时恢复。"""
+    token = _progress_sink.set(sink)
+    try:
+        yield
+    finally:
+        _progress_sink.reset(token)
+
+
+def report_progress(event_type: str, **data: Any) -> None:
+    """
+    上报一条进度事件：{"type": event_type, "ts": <unix time>, **data}。
+    回调抛出的异常只记录日志，不影响工作流本身。
+    """
+    sink = _progress_sink.get()
+    if sink is None:
+        return
+    event = {"type": event_type, "ts": time.time(), **data}
+    try:
+        sink(event)
+    except Exception as e:
+        log.warning(f"[progress] 进度回调失败: {e}")
@@ -0,0 +1,856 @@
+"""
+draw.io 渲染服务：常驻渲染进程 + 批量渲染 + 按 XML 哈希缓存 PNG。
+
+用法：
+    from dataflow_agent.toolkits.drawio_renderer import render_drawio_pngs, warm_drawio_renderer
+
+    warm_drawio_renderer()                          # 可选：提前在后台拉起无头浏览器
+    results = render_drawio_pngs([xml_a, xml_b])    # 接受 mxCell 片段或完整 .drawio XML
+    # [RenderResult(png=bytes | None, backend="browser" | "cli" | "python", error=str, cached=bool), ...]
+
+后端（DF_DRAWIO_RENDERER=auto 时按顺序尝试，前一个失败的图交给下一个）：
+- browser: Playwright 常驻一个无头 Chromium 页面并加载 draw.io viewer（viewer-static.min.js），
+  每张图只是一次 page.evaluate + 截图，不再每张图启动一次 Electron；
+- cli:     draw.io 桌面版 CLI，一批图写进同一个临时目录、只调用一次 --export（一批只启动一次 Electron），
+  目录导出缺失的图再逐张导出；
+- python:  纯 Python（Pillow）栅格化，支持矩形 / 圆角矩形 / 椭圆 / 菱形 / 三角形 / 六边形 / 泳道 /
+  文本和带箭头的连线，没有安装任何渲染器时预览仍可用（效果只求"看得出结构"）。
+
+缓存：PNG 按 sha256(后端 + 缩放 + XML) 存放在 <root>/<key[:2]>/<key>.png；
+计算哈希前去掉 mxfile 的 modified 时间戳，wrap_xml 每次重新包装同一份图也能命中。
+
+配置：
+- DF_DRAWIO_RENDERER:      auto（默认）/ browser / cli / python
+- DF_DRAWIO_RENDER_CACHE:  缓存目录（默认 <项目根>/outputs/cache/drawio_png；"off" 关闭）
+- DF_DRAWIO_RENDER_SCALE:  输出缩放（默认 1）
+- DF_DRAWIO_VIEWER_JS:     viewer-static.min.js 的本地路径或 URL（默认 https://viewer.diagrams.net/js/viewer-static.min.js）
+- DRAWIO_EXPORT_BIN / DRAWIO_BIN / DRAWIO_CLI: draw.io CLI 路径（同 drawio_tools.export_drawio_png）
+"""
+from __future__ import annotations
+
+import atexit
+import base64
+import hashlib
+import html
+import io
+import math
+import os
+import queue
+import re
+import shutil
+import subprocess
+import tempfile
+import threading
+import xml.etree.ElementTree as ET
+import zlib
+from concurrent.futures import Future
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+from urllib.parse import unquote
+
+from dataflow_agent.logger import get_logger
+
+log = get_logger(__name__)
+
+DEFAULT_CACHE_DIR = Path(__file__).resolve().parents[2] / "outputs" / "cache" / "drawio_png"
+DEFAULT_VIEWER_JS = "https://viewer.diagrams.net/js/viewer-static.min.js"
+BACKENDS = ("browser", "cli", "python")
+
+_RENDERER: Optional["DrawioRenderer"] = None
+_RENDERER_LOCK = threading.Lock()
+
+
+@dataclass
+class RenderResult:
+    png: Optional[bytes] = None
+    backend: str = ""
+    error: str = ""
+    cached: bool = False
+
+    @property
+    def ok(self) -> bool:
+        return self.png is not None
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name, str(default)))
+    except ValueError:
+        return default
+
+
+def _cache_root() -> Optional[Path]:
+    value = os.getenv("DF_DRAWIO_RENDER_CACHE")
+    if value and value.lower() == "off":
+        return None
+    return Path(value) if value else DEFAULT_CACHE_DIR
+
+
+def _write_atomic(path: Path, data: bytes) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    tmp.write_bytes(data)
+    os.replace(tmp, path)
+
+
+def _full_xml(xml: str) -> str:
+    if "<mxfile" in xml or "<mxGraphModel" in xml:
+        return xml
+    from dataflow_agent.toolkits.drawio_tools import wrap_xml
+
+    return wrap_xml(xml, modified="-")
+
+
+def _cache_key(backend: str, scale: float, full_xml: str) -> str:
+    # modified 时间戳不影响渲染结果
+    stable = re.sub(r'(<mxfile\b[^>]*?)\s+modified="[^"]*"', r"\1", full_xml, count=1)
+    return hashlib.sha256(f"{backend}\0{scale:g}\0{stable}".encode("utf-8")).hexdigest()
+
+
+def find_drawio_cli(drawio_bin: Optional[str] = None) -> Optional[str]:
+    candidates = [
+        drawio_bin,
+        os.getenv("DRAWIO_EXPORT_BIN"),
+        os.getenv("DRAWIO_BIN"),
+        os.getenv("DRAWIO_CLI"),
+        "drawio",
+        "draw.io",
+    ]
+    return next((b for b in candidates if b and shutil.which(b)), None)
+
+
+# ----------------------------------------------------------------------
+# browser 后端：常驻无头 Chromium + draw.io viewer
+# ----------------------------------------------------------------------
+_VIEWER_PAGE = "<!DOCTYPE html><html><head><meta charset='utf-8'></head><body style='margin:0;background:#fff'><div id='c'></div></body></html>"
+
+_RENDER_TIMEOUT_MSG = "draw.io render timed out"
+
+# page.evaluate 不受 set_default_timeout 约束：viewer 回调不触发时用 Promise.race 自行超时
+_RENDER_JS = """
+async ([xml, border, timeoutMs]) => {
+    const c = document.getElementById('c');
+    c.innerHTML = '';
+    const el = document.createElement('div');
+    el.className = 'mxgraph';
+    el.style.display = 'inline-block';
+    el.style.background = '#fff';
+    el.setAttribute('data-mxgraph', JSON.stringify({
+        xml: xml, border: border, toolbar: null, lightbox: false, nav: false,
+        resize: false, highlight: 'none', 'auto-fit': false,
+    }));
+    c.appendChild(el);
+    let timer;
+    const timeout = new Promise((_, reject) => {
+        timer = setTimeout(() => reject(new Error('%s')), timeoutMs);
+    });
+    try {
+        await Promise.race([
+            (async () => {
+                await new Promise((resolve) => GraphViewer.createViewerForElement(el, resolve));
+                await document.fonts.ready;
+            })(),
+            timeout,
+        ]);
+    } finally {
+        clearTimeout(timer);
+    }
+    if (!el.querySelector('svg')) throw new Error('draw.io viewer produced no svg');
+}
+""" % _RENDER_TIMEOUT_MSG
+
+
+class _BrowserWorker:
+    """在专用线程里持有 Playwright / Chromium（sync API 只能在创建它的线程里使用）。"""
+
+    def __init__(self, scale: float, timeout: float):
+        self.scale = scale
+        self.timeout = timeout
+        self.failed = ""  # 启动失败原因；非空后本进程不再尝试 browser 后端
+        self._jobs: "queue.Queue[Optional[Tuple[str, Future]]]" = queue.Queue()
+        self._ready: Future = Future()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def start(self) -> Future:
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="drawio-renderer", daemon=True)
+                self._thread.start()
+        return self._ready
+
+    def available(self) -> bool:
+        if self.failed:
+            return False
+        try:
+            self.start().result(timeout=self.timeout * 2)
+            return True
+        except Exception as e:
+            self.failed = self.failed or repr(e)
+            return False
+
+    def submit(self, xml: str) -> Future:
+        fut: Future = Future()
+        self._jobs.put((xml, fut))
+        return fut
+
+    def close(self) -> None:
+        self._jobs.put(None)
+
+    # -- 渲染线程 --------------------------------------------------------
+    def _launch(self, p):
+        browser = p.chromium.launch(args=["--no-sandbox"])
+        page = browser.new_page(device_scale_factor=self.scale, viewport={"width": 1600, "height": 1200})
+        page.set_default_timeout(self.timeout * 1000)
+        page.set_content(_VIEWER_PAGE)
+        viewer = os.getenv("DF_DRAWIO_VIEWER_JS") or DEFAULT_VIEWER_JS
+        if re.match(r"^https?://", viewer):
+            page.add_script_tag(url=viewer)
+        else:
+            page.add_script_tag(path=viewer)
+        page.wait_for_function("typeof GraphViewer !== 'undefined'")
+        return browser, page
+
+    def _render(self, page, xml: str) -> bytes:
+        page.evaluate(_RENDER_JS, [xml, 10, int(self.timeout * 1000)])
+        return page.locator("#c > .mxgraph").screenshot(type="png")
+
+    def _run(self) -> None:
+        try:
+            from playwright.sync_api import sync_playwright
+        except ImportError:
+            self.failed = "playwright 未安装"
+            self._ready.set_exception(RuntimeError(self.failed))
+            return self._drain()
+
+        p = browser = page = None
+        try:
+            p = sync_playwright().start()
+            browser, page = self._launch(p)
+        except Exception as e:
+            self.failed = f"无头浏览器启动失败: {e!r}"
+            self._ready.set_exception(RuntimeError(self.failed))
+            if p is not None:
+                try:
+                    p.stop()
+                except Exception:
+                    pass
+            return self._drain()
+        self._ready.set_result(True)
+        log.info("[drawio_renderer] 无头浏览器已就绪")
+
+        try:
+            while True:
+                job = self._jobs.get()
+                if job is None:
+                    break
+                xml, fut = job
+                if not fut.set_running_or_notify_cancel():
+                    continue
+                try:
+                    fut.set_result(self._render(page, xml))
+                except Exception as e:
+                    fut.set_exception(e)
+                    # 超时后页面里可能还挂着未完成的 viewer，换一个干净的页面再继续
+                    timed_out = _RENDER_TIMEOUT_MSG in str(e)
+                    if timed_out or page.is_closed() or not browser.is_connected():
+                        if timed_out:
+                            log.warning("[drawio_renderer] 渲染超时，重启无头浏览器页面")
+                        try:
+                            browser.close()
+                        except Exception:
+                            pass
+                        try:
+                            browser, page = self._launch(p)
+                        except Exception as e2:
+                            self.failed = f"无头浏览器重启失败: {e2!r}"
+                            break
+        finally:
+            for closer in (browser.close, p.stop):
+                try:
+                    closer()
+                except Exception:
+                    pass
+            self._drain()
+
+    def _drain(self) -> None:
+        while True:
+            try:
+                job = self._jobs.get_nowait()
+            except queue.Empty:
+                return
+            if job is not None:
+                job[1].set_exception(RuntimeError(self.failed or "renderer closed"))
+
+
+# ----------------------------------------------------------------------
+# cli 后端：draw.io CLI 按目录批量导出
+# ----------------------------------------------------------------------
+def _cli_export(cli: str, src: Path, out: Path, scale: float, timeout: float) -> Tuple[bool, str]:
+    cmd = [cli, "--export", "--format", "png", "--output", str(out)]
+    if scale != 1:
+        cmd += ["--scale", f"{scale:g}"]
+    cmd.append(str(src))
+    try:
+        proc = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, timeout=timeout)
+    except Exception as e:
+        return False, f"export exception: {e}"
+    if proc.returncode != 0:
+        return False, (proc.stderr or proc.stdout or "export failed")
+    return True, ""
+
+
+def _render_cli(cli: str, xmls: Sequence[str], scale: float, timeout: float) -> List[RenderResult]:
+    results = [RenderResult(backend="cli") for _ in xmls]
+    with tempfile.TemporaryDirectory() as tmp:
+        src, out = Path(tmp) / "in", Path(tmp) / "out"
+        src.mkdir()
+        out.mkdir()
+        for i, xml in enumerate(xmls):
+            (src / f"d{i}.drawio").write_text(xml, encoding="utf-8")
+        ok, msg = (True, "") if len(xmls) == 1 else _cli_export(cli, src, out, scale, timeout * len(xmls))
+        for i in range(len(xmls)):
+            png = out / f"d{i}.png"
+            if not png.exists():
+                # 单张图，或者目录导出漏掉的图：逐张导出
+                ok, msg = _cli_export(cli, src / f"d{i}.drawio", png, scale, timeout)
+            if png.exists():
+                results[i].png = png.read_bytes()
+            else:
+                results[i].error = msg if not ok else "export finished but output file missing"
+    return results
+
+
+# ----------------------------------------------------------------------
+# python 后端：Pillow 栅格化常见 mxGraph 图形
+# ----------------------------------------------------------------------
+def _parse_style(style: str) -> Dict[str, str]:
+    out: Dict[str, str] = {}
+    for token in (style or "").split(";"):
+        token = token.strip()
+        if not token:
+            continue
+        if "=" in token:
+            k, v = token.split("=", 1)
+            out[k.strip()] = v.strip()
+        else:
+            out.setdefault("shape", token)
+    return out
+
+
+def _decode_diagram(diagram: ET.Element) -> Optional[ET.Element]:
+    model = diagram.find("mxGraphModel")
+    if model is not None:
+        return model
+    text = (diagram.text or "").strip()
+    if not text:
+        return None
+    # 压缩格式：base64 -> raw deflate -> URL 编码的 XML
+    raw = zlib.decompress(base64.b64decode(text), -15)
+    return ET.fromstring(unquote(raw.decode("utf-8")))
+
+
+def _graph_cells(full_xml: str) -> List[ET.Element]:
+    root = ET.fromstring(full_xml)
+    if root.tag == "mxfile":
+        diagram = root.find("diagram")
+        model = _decode_diagram(diagram) if diagram is not None else None
+    elif root.tag == "mxGraphModel":
+        model = root
+    else:
+        model = None
+    if model is None:
+        raise ValueError("no mxGraphModel in xml")
+    return list(model.iter("mxCell"))
+
+
+def _color(value: Optional[str], default: Optional[str]) -> Optional[str]:
+    if value is None:
+        return default
+    value = value.strip()
+    if not value or value.lower() in ("none", "default"):
+        return None if value.lower() == "none" else default
+    if re.fullmatch(r"#[0-9a-fA-F]{3}|#[0-9a-fA-F]{6}", value):
+        return value
+    return default
+
+
+def _label_text(value: str, is_html: bool) -> str:
+    if not value:
+        return ""
+    if is_html:
+        value = re.sub(r"(?i)<br\s*/?>|</(div|p|li|tr|h\d)>", "\n", value)
+        value = re.sub(r"<[^>]+>", "", value)
+        value = html.unescape(value)
+    return "\n".join(line.strip() for line in value.replace("\xa0", " ").splitlines()).strip()
+
+
+_FONT_CACHE: Dict[int, object] = {}
+
+
+def _font(size: int):
+    from PIL import ImageFont
+
+    size = max(6, size)
+    font = _FONT_CACHE.get(size)
+    if font is None:
+        for name in ("DejaVuSans.ttf", "Arial.ttf", "LiberationSans-Regular.ttf"):
+            try:
+                font = ImageFont.truetype(name, size)
+                break
+            except OSError:
+                continue
+        else:
+            try:
+                font = ImageFont.load_default(size=size)
+            except TypeError:  # Pillow < 10.1
+                font = ImageFont.load_default()
+        _FONT_CACHE[size] = font
+    return font
+
+
+def _wrap_lines(draw, text: str, font, max_width: float) -> List[str]:
+    lines: List[str] = []
+    for para in text.split("\n"):
+        words = para.split(" ")
+        current = ""
+        for word in words:
+            trial = f"{current} {word}" if current else word
+            if current and max_width > 0 and draw.textlength(trial, font=font) > max_width:
+                lines.append(current)
+                current = word
+            else:
+                current = trial
+        lines.append(current)
+    return lines
+
+
+class _Rasterizer:
+    MAX_SIDE = 8000
+
+    def __init__(self, full_xml: str, scale: float, border: float = 10):
+        self.cells = _graph_cells(full_xml)
+        self.by_id = {c.get("id"): c for c in self.cells if c.get("id")}
+        self.styles = {id(c): _parse_style(c.get("style", "")) for c in self.cells}
+        self.scale = scale
+        self.border = border
+        self._abs: Dict[str, Optional[Tuple[float, float, float, float]]] = {}
+
+    # -- 几何 --------------------------------------------------------------
+    def _is_vertex_parent(self, cell: Optional[ET.Element]) -> bool:
+        return cell is not None and cell.get("vertex") == "1"
+
+    def box(self, cell: ET.Element) -> Optional[Tuple[float, float, float, float]]:
+        """顶点的绝对坐标 (x, y, w, h)；子节点坐标相对于父顶点。"""
+        cid = cell.get("id") or str(id(cell))
+        if cid in self._abs:
+            return self._abs[cid]
+        self._abs[cid] = None  # 防止 parent 成环
+        geom = cell.find("mxGeometry")
+        if geom is None or cell.get("vertex") != "1":
+            return None
+        try:
+            x, y = float(geom.get("x", 0)), float(geom.get("y", 0))
+            w, h = float(geom.get("width", 0)), float(geom.get("height", 0))
+        except ValueError:
+            return None
+        if not all(math.isfinite(v) for v in (x, y, w, h)):
+            return None
+        parent = self.by_id.get(cell.get("parent") or "")
+        if parent is not None and parent.get("edge") == "1":
+            # 连线上的标签：相对坐标，放在连线中点附近（加上 offset）
+            pts = self.edge_points(parent)
+            if not pts:
+                return None
+            mx, my = pts[len(pts) // 2 - 1] if len(pts) > 1 else pts[0]
+            nx, ny = pts[len(pts) // 2]
+            offset = self._point(geom.find("mxPoint[@as='offset']"), (0.0, 0.0)) or (0.0, 0.0)
+            x, y = (mx + nx) / 2 + offset[0] - w / 2, (my + ny) / 2 + offset[1] - h / 2
+        elif self._is_vertex_parent(parent):
+            pbox = self.box(parent)
+            if pbox is not None:
+                x, y = x + pbox[0], y + pbox[1]
+        self._abs[cid] = (x, y, w, h)
+        return self._abs[cid]
+
+    def _parent_offset(self, cell: ET.Element) -> Tuple[float, float]:
+        parent = self.by_id.get(cell.get("parent") or "")
+        if self._is_vertex_parent(parent):
+            pbox = self.box(parent)
+            if pbox is not None:
+                return pbox[0], pbox[1]
+        return 0.0, 0.0
+
+    def _point(self, el: Optional[ET.Element], offset: Tuple[float, float]) -> Optional[Tuple[float, float]]:
+        if el is None:
+            return None
+        try:
+            return float(el.get("x", 0)) + offset[0], float(el.get("y", 0)) + offset[1]
+        except ValueError:
+            return None
+
+    @staticmethod
+    def _clip(box: Tuple[float, float, float, float], toward: Tuple[float, float]) -> Tuple[float, float]:
+        """从 box 中心指向 toward 的射线与 box 边界的交点。"""
+        x, y, w, h = box
+        cx, cy = x + w / 2, y + h / 2
+        dx, dy = toward[0] - cx, toward[1] - cy
+        if dx == 0 and dy == 0:
+            return cx, cy
+        t = min(
+            (w / 2) / abs(dx) if dx else math.inf,
+            (h / 2) / abs(dy) if dy else math.inf,
+        )
+        return cx + dx * t, cy + dy * t
+
+    def edge_points(self, cell: ET.Element) -> List[Tuple[float, float]]:
+        geom = cell.find("mxGeometry")
+        offset = self._parent_offset(cell)
+        waypoints: List[Tuple[float, float]] = []
+        source_pt = target_pt = None
+        if geom is not None:
+            arr = geom.find("Array")
+            if arr is not None:
+                waypoints = [p for p in (self._point(el, offset) for el in arr.findall("mxPoint")) if p]
+            for el in geom.findall("mxPoint"):
+                if el.get("as") == "sourcePoint":
+                    source_pt = self._point(el, offset)
+                elif el.get("as") == "targetPoint":
+                    target_pt = self._point(el, offset)
+        src = self.by_id.get(cell.get("source") or "")
+        dst = self.by_id.get(cell.get("target") or "")
+        sbox = self.box(src) if src is not None else None
+        tbox = self.box(dst) if dst is not None else None
+        center = lambda b: (b[0] + b[2] / 2, b[1] + b[3] / 2)  # noqa: E731
+        start = center(sbox) if sbox else source_pt
+        end = center(tbox) if tbox else target_pt
+        if start is None or end is None:
+            return []
+
+        style = self.styles[id(cell)]
+        if not waypoints and style.get("edgeStyle") in ("orthogonalEdgeStyle", "elbowEdgeStyle"):
+            # 没有拐点时用一条简单的 Z 形折线近似正交连线
+            if abs(end[0] - start[0]) >= abs(end[1] - start[1]):
+                mx = (start[0] + end[0]) / 2
+                waypoints = [(mx, start[1]), (mx, end[1])]
+            else:
+                my = (start[1] + end[1]) / 2
+                waypoints = [(start[0], my), (end[0], my)]
+        if sbox:
+            start = self._clip(sbox, waypoints[0] if waypoints else end)
+        if tbox:
+            end = self._clip(tbox, waypoints[-1] if waypoints else start)
+        return [start] + waypoints + [end]
+
+    # -- 绘制 --------------------------------------------------------------
+    def render(self) -> bytes:
+        from PIL import Image, ImageDraw
+
+        vertices = [c for c in self.cells if c.get("vertex") == "1"]
+        edges = [c for c in self.cells if c.get("edge") == "1"]
+        boxes = [b for b in (self.box(c) for c in vertices) if b]
+        points = [p for e in edges for p in self.edge_points(e)]
+        xs = [b[0] for b in boxes] + [b[0] + b[2] for b in boxes] + [p[0] for p in points]
+        ys = [b[1] for b in boxes] + [b[1] + b[3] for b in boxes] + [p[1] for p in points]
+        if not xs:
+            xs, ys = [0.0, 1.0], [0.0, 1.0]
+        min_x, min_y = min(xs) - self.border, min(ys) - self.border
+        width, height = max(xs) - min_x + self.border, max(ys) - min_y + self.border
+        scale = min(self.scale, self.MAX_SIDE / max(width, height, 1))
+        self.origin, self.k = (min_x, min_y), scale
+
+        img = Image.new("RGB", (max(1, int(math.ceil(width * scale))), max(1, int(math.ceil(height * scale)))), "white")
+        draw = ImageDraw.Draw(img)
+        # draw.io 按文档顺序绘制：父节点在前，连线默认在同层顶点之上
+        for cell in self.cells:
+            if cell.get("vertex") == "1":
+                self._draw_vertex(draw, cell)
+            elif cell.get("edge") == "1":
+                self._draw_edge(draw, cell)
+        buf = io.BytesIO()
+        img.save(buf, format="PNG")
+        return buf.getvalue()
+
+    def _xy(self, x: float, y: float) -> Tuple[float, float]:
+        return (x - self.origin[0]) * self.k, (y - self.origin[1]) * self.k
+
+    def _draw_vertex(self, draw, cell: ET.Element) -> None:
+        box = self.box(cell)
+        if box is None:
+            return
+        style = self.styles[id(cell)]
+        shape = style.get("shape", "")
+        x0, y0 = self._xy(box[0], box[1])
+        x1, y1 = self._xy(box[0] + box[2], box[1] + box[3])
+        x0, x1 = sorted((x0, x1))
+        y0, y1 = sorted((y0, y1))
+        is_text = shape in ("text", "label", "edgeLabel") or style.get("text") == "1"
+        fill = _color(style.get("fillColor"), None if is_text else "#ffffff")
+        stroke = _color(style.get("strokeColor"), None if is_text else "#000000")
+        sw = max(1, int(round(float(style.get("strokeWidth", 1) or 1) * self.k)))
+        rect = [x0, y0, x1, y1]
+        if shape != "image" and (fill or stroke):
+            if shape in ("ellipse", "doubleEllipse"):
+                draw.ellipse(rect, fill=fill, outline=stroke, width=sw)
+            elif shape == "rhombus":
+                cx, cy = (x0 + x1) / 2, (y0 + y1) / 2
+                draw.polygon([(cx, y0), (x1, cy), (cx, y1), (x0, cy)], fill=fill, outline=stroke, width=sw)
+            elif shape == "triangle":
+                draw.polygon([(x0, y0), (x1, (y0 + y1) / 2), (x0, y1)], fill=fill, outline=stroke, width=sw)
+            elif shape == "hexagon":
+                dx = (x1 - x0) / 4
+                cy = (y0 + y1) / 2
+                draw.polygon([(x0 + dx, y0), (x1 - dx, y0), (x1, cy), (x1 - dx, y1), (x0 + dx, y1), (x0, cy)],
+                             fill=fill, outline=stroke, width=sw)
+            elif style.get("rounded") == "1" and x1 - x0 > 2 and y1 - y0 > 2:
+                radius = min(x1 - x0, y1 - y0) * 0.15
+                draw.rounded_rectangle(rect, radius=radius, fill=fill, outline=stroke, width=sw)
+            else:
+                draw.rectangle(rect, fill=fill, outline=stroke, width=sw)
+        label_rect = rect
+        if shape == "swimlane":
+            header = float(style.get("startSize", 23) or 23) * self.k
+            header_y = min(y1, y0 + header)
+            if stroke:
+                draw.line([(x0, header_y), (x1, header_y)], fill=stroke, width=sw)
+            label_rect = [x0, y0, x1, header_y]
+        if shape == "edgeLabel" and x1 - x0 < 1:
+            cx, cy = (x0 + x1) / 2, (y0 + y1) / 2
+            label_rect = [cx - 60 * self.k, cy - 10 * self.k, cx + 60 * self.k, cy + 10 * self.k]
+        self._draw_label(draw, cell, style, label_rect, background=shape == "edgeLabel")
+
+    def _draw_edge(self, draw, cell: ET.Element) -> None:
+        pts = [self._xy(*p) for p in self.edge_points(cell)]
+        if len(pts) < 2:
+            return
+        style = self.styles[id(cell)]
+        stroke = _color(style.get("strokeColor"), "#000000")
+        if stroke is None:
+            return
+        sw = max(1, int(round(float(style.get("strokeWidth", 1) or 1) * self.k)))
+        draw.line(pts, fill=stroke, width=sw, joint="curve")
+        if style.get("endArrow", "classic") != "none":
+            self._arrow(draw, pts[-2], pts[-1], stroke, sw)
+        if style.get("startArrow", "none") != "none":
+            self._arrow(draw, pts[1], pts[0], stroke, sw)
+        mid = len(pts) // 2
+        (ax, ay), (bx, by) = pts[mid - 1], pts[mid]
+        cx, cy = (ax + bx) / 2, (ay + by) / 2
+        self._draw_label(draw, cell, style, [cx - 60 * self.k, cy - 10 * self.k, cx + 60 * self.k, cy + 10 * self.k],
+                         background=True)
+
+    def _arrow(self, draw, a: Tuple[float, float], b: Tuple[float, float], color: str, sw: int) -> None:
+        dx, dy = b[0] - a[0], b[1] - a[1]
+        length = math.hypot(dx, dy)
+        if length == 0:
+            return
+        ux, uy = dx / length, dy / length
+        size = (6 + sw) * self.k
+        base = (b[0] - ux * size, b[1] - uy * size)
+        half = size * 0.45
+        draw.polygon([b, (base[0] - uy * half, base[1] + ux * half), (base[0] + uy * half, base[1] - ux * half)], fill=color)
+
+    def _draw_label(self, draw, cell: ET.Element, style: Dict[str, str], rect: List[float], background: bool = False) -> None:
+        text = _label_text(cell.get("value", ""), style.get("html") == "1")
+        if not text:
+            return
+        try:
+            size = float(style.get("fontSize", 11) or 11)
+        except ValueError:
+            size = 11.0
+        font = _font(int(round(size * self.k)))
+        color = _color(style.get("fontColor"), "#000000") or "#000000"
+        x0, y0, x1, y1 = rect
+        wrap = style.get("whiteSpace") == "wrap"
+        lines = _wrap_lines(draw, text, font, (x1 - x0) - 4 * self.k) if wrap else text.split("\n")
+        line_h = size * 1.2 * self.k
+        total_h = line_h * len(lines)
+        valign = style.get("verticalAlign", "middle")
+        if valign == "top":
+            y = y0 + 2 * self.k
+        elif valign == "bottom":
+            y = y1 - total_h - 2 * self.k
+        else:
+            y = (y0 + y1) / 2 - total_h / 2
+        align = style.get("align", "center")
+        for line in lines:
+            tw = draw.textlength(line, font=font)
+            if align == "left":
+                x = x0 + 2 * self.k
+            elif align == "right":
+                x = x1 - tw - 2 * self.k
+            else:
+                x = (x0 + x1) / 2 - tw / 2
+            if background and line:
+                draw.rectangle([x - 1, y, x + tw + 1, y + line_h], fill="#ffffff")
+            draw.text((x, y), line, fill=color, font=font)
+            y += line_h
+
+
+def rasterize_drawio(xml: str, scale: float = 1.0) -> bytes:
+    """纯 Python 渲染一张 draw.io 图（mxCell 片段或完整 XML），返回 PNG 字节。"""
+    return _Rasterizer(_full_xml(xml), scale).render()
+
+
+# ----------------------------------------------------------------------
+# 渲染服务
+# ----------------------------------------------------------------------
+class DrawioRenderer:
+    """批量渲染入口（线程安全）：先查缓存，再按后端顺序渲染未命中的图。"""
+
+    def __init__(self, backend: str = "auto", scale: float = 1.0, cache_dir: Optional[Path] = None, timeout: float = 60):
+        backend = (backend or "auto").lower()
+        if backend != "auto" and backend not in BACKENDS:
+            raise ValueError(f"unknown draw.io renderer backend: {backend}")
+        self.backend = backend
+        self.scale = scale if scale > 0 else 1.0
+        self.cache_dir = cache_dir
+        self.timeout = timeout
+        self._browser = _BrowserWorker(self.scale, timeout)
+        self._browser_warned = False
+
+    def _backends(self) -> Tuple[str, ...]:
+        return BACKENDS if self.backend == "auto" else (self.backend,)
+
+    def warm(self) -> None:
+        """在后台启动无头浏览器（仅 auto / browser 模式）。"""
+        if "browser" in self._backends() and not self._browser.failed:
+            self._browser.start()
+
+    def close(self) -> None:
+        self._browser.close()
+
+    # -- 缓存 --------------------------------------------------------------
+    def _cache_path(self, key: str) -> Optional[Path]:
+        return self.cache_dir / key[:2] / f"{key}.png" if self.cache_dir else None
+
+    def _cache_get(self, key: str) -> Optional[bytes]:
+        path = self._cache_path(key)
+        if path is None:
+            return None
+        try:
+            return path.read_bytes()
+        except OSError:
+            return None
+
+    def _cache_put(self, key: str, png: bytes) -> None:
+        path = self._cache_path(key)
+        if path is None:
+            return
+        try:
+            _write_atomic(path, png)
+        except OSError as e:
+            log.warning(f"[drawio_renderer] 写缓存失败: {e}")
+
+    # -- 渲染 --------------------------------------------------------------
+    def _run_backend(self, backend: str, xmls: List[str], drawio_bin: Optional[str], timeout: float) -> List[RenderResult]:
+        if backend == "browser":
+            if not self._browser.available():
+                if not self._browser_warned:
+                    self._browser_warned = True
+                    log.info(f"[drawio_renderer] browser 后端不可用: {self._browser.failed}")
+                return [RenderResult(backend=backend, error=self._browser.failed) for _ in xmls]
+            futures = [self._browser.submit(x) for x in xmls]
+            results = []
+            for fut in futures:
+                try:
+                    results.append(RenderResult(png=fut.result(timeout=timeout), backend=backend))
+                except Exception as e:
+                    fut.cancel()
+                    results.append(RenderResult(backend=backend, error=f"browser render failed: {e!r}"))
+            return results
+        if backend == "cli":
+            cli = find_drawio_cli(drawio_bin)
+            if not cli:
+                msg = "draw.io CLI not found (set DRAWIO_EXPORT_BIN or install draw.io CLI)"
+                return [RenderResult(backend=backend, error=msg) for _ in xmls]
+            return _render_cli(cli, xmls, self.scale, timeout)
+        results = []
+        for xml in xmls:
+            try:
+                results.append(RenderResult(png=rasterize_drawio(xml, self.scale), backend=backend))
+            except Exception as e:
+                results.append(RenderResult(backend=backend, error=f"python render failed: {e!r}"))
+        return results
+
+    def render_many(
+        self,
+        xmls: Sequence[str],
+        drawio_bin: Optional[str] = None,
+        timeout: Optional[float] = None,
+    ) -> List[RenderResult]:
+        """渲染多张图，结果顺序与 xmls 一致；失败的图 png 为 None、error 为最后一个后端的错误。"""
+        timeout = self.timeout if timeout is None else timeout
+        full = [_full_xml(x) if x else "" for x in xmls]
+        results: List[RenderResult] = [RenderResult(error="empty xml") for _ in full]
+        pending = [i for i, x in enumerate(full) if x]
+        for backend in self._backends():
+            if not pending:
+                break
+            keys = {i: _cache_key(backend, self.scale, full[i]) for i in pending}
+            misses = []
+            for i in pending:
+                png = self._cache_get(keys[i])
+                if png is not None:
+                    results[i] = RenderResult(png=png, backend=backend, cached=True)
+                else:
+                    misses.append(i)
+            if not misses:
+                pending = []
+                break
+            # 同一批里重复的图只渲染一次
+            unique: Dict[str, int] = {}
+            for i in misses:
+                unique.setdefault(keys[i], i)
+            order = list(unique.values())
+            rendered = dict(zip(order, self._run_backend(backend, [full[i] for i in order], drawio_bin, timeout)))
+            still = []
+            for i in misses:
+                res = rendered[unique[keys[i]]]
+                results[i] = RenderResult(png=res.png, backend=backend, error=res.error)
+                if res.png is None:
+                    still.append(i)
+            for i, res in rendered.items():
+                if res.png is not None:
+                    self._cache_put(keys[i], res.png)
+            pending = still
+        return results
+
+    def render(self, xml: str, drawio_bin: Optional[str] = None, timeout: Optional[float] = None) -> RenderResult:
+        return self.render_many([xml], drawio_bin=drawio_bin, timeout=timeout)[0]
+
+
+def get_drawio_renderer() -> DrawioRenderer:
+    global _RENDERER
+    with _RENDERER_LOCK:
+        if _RENDERER is None:
+            _RENDERER = DrawioRenderer(
+                backend=os.getenv("DF_DRAWIO_RENDERER") or "auto",
+                scale=_env_float("DF_DRAWIO_RENDER_SCALE", 1.0),
+                cache_dir=_cache_root(),
+            )
+            atexit.register(shutdown_drawio_renderer)
+        return _RENDERER
+
+
+def shutdown_drawio_renderer() -> None:
+    global _RENDERER
+    with _RENDERER_LOCK:
+        renderer, _RENDERER = _RENDERER, None
+    if renderer is not None:
+        renderer.close()
+
+
+def warm_drawio_renderer() -> None:
+    """提前在后台拉起无头浏览器（browser 后端不可用时不做任何事）。"""
+    get_drawio_renderer().warm()
+
+
+def render_drawio_pngs(
+    xmls: Sequence[str],
+    drawio_bin: Optional[str] = None,
+    timeout: Optional[float] = None,
+) -> List[RenderResult]:
+    """批量渲染 draw.io 图为 PNG（见模块说明）。"""
+    return get_drawio_renderer().render_many(xmls, drawio_bin=drawio_bin, timeout=timeout)
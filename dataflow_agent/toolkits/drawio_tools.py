@@ -2,11 +2,10 @@
 Draw.io XML 工具函数
 提供 XML 包装、提取、验证和编辑功能
 """
+import bisect
+import math
 import os
 import re
-import shutil
-import subprocess
-import tempfile
 import xml.etree.ElementTree as ET
 from pathlib import Path
 from typing import List, Dict, Any, Optional, Tuple, Iterable
@@ -350,6 +349,138 @@ def _add_edge_waypoints(root: ET.Element, cell_by_id: Dict[str, ET.Element]) ->
         p2.set('y', f"{ty:.0f}")
 
 
+class _PlacedBoxes:
+    """Uniform-grid index of the boxes placed by the overlap pass."""
+
+    def __init__(self, cell_size: float):
+        self.cell_size = cell_size
+        self.boxes: List[Tuple[float, float, float, float]] = []
+        self._cells: Dict[Tuple[int, int], List[int]] = {}
+
+    def _span(self, a: float, b: float) -> range:
+        # Negative widths / heights are kept as-is (like _cluster_blocks), so index min..max
+        lo, hi = (a, b) if a <= b else (b, a)
+        return range(int(math.floor(lo / self.cell_size)), int(math.floor(hi / self.cell_size)) + 1)
+
+    def add(self, box: Tuple[float, float, float, float]) -> None:
+        idx = len(self.boxes)
+        self.boxes.append(box)
+        x, y, w, h = box
+        for gx in self._span(x, x + w):
+            for gy in self._span(y, y + h):
+                self._cells.setdefault((gx, gy), []).append(idx)
+
+    def blocking_edge(self, x: float, y: float, w: float, h: float, pad: float) -> Optional[float]:
+        """Furthest ``right edge + pad`` of the placed boxes overlapping (x, y, w, h), or None."""
+        cells = self._cells
+        found = set()
+        for gy in self._span(y - pad, y + h + pad):
+            for gx in self._span(x - pad, x + w + pad):
+                hit = cells.get((gx, gy))
+                if hit:
+                    found.update(hit)
+        reach = None
+        boxes = self.boxes
+        for i in found:
+            bx, by, bw, bh = boxes[i]
+            # same test as _overlaps()
+            if not (x + w + pad <= bx or bx + bw + pad <= x or y + h + pad <= by or by + bh + pad <= y):
+                edge = bx + bw + pad
+                if reach is None or edge > reach:
+                    reach = edge
+        return reach
+
+
+def _row_positions(start: float, w: float, step: float, limit: float, count: int) -> List[float]:
+    """x positions visited on one row: start, then start + step, ... while the box still fits.
+
+    The running sum is kept (not start + k * step) so positions match the original
+    step-by-step probing exactly.
+    """
+    xs = [start]
+    x = start
+    while len(xs) < count:
+        x += step
+        if x + w > limit:
+            break
+        xs.append(x)
+    return xs
+
+
+def _first_free_slot(
+    placed: _PlacedBoxes,
+    margin_row: List[float],
+    x: float,
+    y: float,
+    w: float,
+    h: float,
+    step: float,
+    margin: float,
+    limit: float,
+    max_attempts: int,
+) -> Tuple[float, float]:
+    """Same slot as probing x += step (wrapping to the next row at ``limit``), found row by row.
+
+    A blocked probe jumps straight past the furthest right edge of the boxes it hits
+    (interval search) instead of stepping; the positions skipped overlap that box too.
+    The slot reached after ``max_attempts`` moves is accepted even if it still
+    overlaps, like the original loop.
+    """
+    pad = step
+    budget = max(1, max_attempts)  # position index taken unconditionally
+    if len(margin_row) < 2 or margin_row[0] != margin:
+        margin_row[:] = _row_positions(margin, 0.0, step, limit, budget + 1)
+    index = 0  # probe positions consumed so far
+    row = _row_positions(x, w, step, limit, budget + 1)
+    while True:
+        j = 0
+        while j < len(row) and index + j < budget:
+            px = row[j]
+            reach = placed.blocking_edge(px, y, w, h, pad)
+            if reach is None:
+                return px, y
+            # every position before the furthest right edge overlaps that same box
+            j = max(j + 1, bisect.bisect_left(row, reach, j + 1))
+        if index + j >= budget:
+            k = budget - index
+            return (row[k], y) if k < len(row) else (margin, y + step)
+        index += len(row)
+        y += step
+        # width-dependent length of the shared margin row
+        lo, hi = 1, len(margin_row)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if margin_row[mid] + w > limit:
+                hi = mid
+            else:
+                lo = mid + 1
+        row = margin_row[:lo]
+
+
+def _probe_slot(
+    placed: _PlacedBoxes,
+    x: float,
+    y: float,
+    w: float,
+    h: float,
+    step: float,
+    margin: float,
+    limit: float,
+    max_attempts: int,
+) -> Tuple[float, float]:
+    """Fixed-step probing (only used when the step is not positive)."""
+    attempts = 0
+    while placed.blocking_edge(x, y, w, h, step) is not None:
+        attempts += 1
+        x += step
+        if x + w > limit:
+            x = margin
+            y += step
+        if attempts >= max_attempts:
+            break
+    return x, y
+
+
 def resolve_overlaps(
     cells_xml: str,
     diagram_type: str = "auto",
@@ -399,20 +530,17 @@ def resolve_overlaps(
     _layout_top_level(diagram_type, top_level, margin, canvas_width, canvas_height, gap)
 
     # Final overlap pass (conservative)
-    placed: List[Tuple[float, float, float, float]] = []
+    step = gap / 2
+    placed = _PlacedBoxes(cell_size=max(64.0, gap * 2))
+    margin_row: List[float] = []
     for cell in vertices:
         geom, x, y, w, h = _get_geometry(cell)
-        attempts = 0
-        while any(_overlaps((x, y, w, h), other, gap / 2) for other in placed):
-            attempts += 1
-            x += gap / 2
-            if x + w > canvas_width - margin:
-                x = margin
-                y += gap / 2
-            if attempts >= max_attempts:
-                break
+        if step > 0:
+            x, y = _first_free_slot(placed, margin_row, x, y, w, h, step, margin, canvas_width - margin, max_attempts)
+        else:
+            x, y = _probe_slot(placed, x, y, w, h, step, margin, canvas_width - margin, max_attempts)
         _set_geometry(geom, x, y, w, h)
-        placed.append((x, y, w, h))
+        placed.add((x, y, w, h))
 
     _add_edge_waypoints(root, cell_by_id)
 
@@ -425,11 +553,18 @@ def export_drawio_png(
     output_path: str,
     drawio_bin: Optional[str] = None,
     timeout: int = 60,
+    allow_fallback: bool = True,
 ) -> Tuple[bool, str]:
     """
-    Render draw.io XML to PNG using draw.io CLI (server-side renderer).
+    Render draw.io XML to PNG through the shared renderer service.
 
-    Requires draw.io/diagrams.net CLI installed and available in PATH.
+    The service (dataflow_agent.toolkits.drawio_renderer) keeps a headless
+    browser alive, falls back to the draw.io CLI and then to a pure-Python
+    rasterizer, and caches PNGs by XML hash.
+
+    With allow_fallback=False a PNG produced only by the pure-Python
+    rasterizer counts as a failure (nothing is written). Use this when the
+    image is judged for fidelity, e.g. VLM validation.
 
     Returns:
         (ok, message) - ok True if PNG created, else False with error message.
@@ -437,51 +572,20 @@ def export_drawio_png(
     if not cells_xml:
         return False, "empty xml"
 
+    from dataflow_agent.toolkits.drawio_renderer import render_drawio_pngs
+
     output_file = Path(output_path).resolve()
     output_file.parent.mkdir(parents=True, exist_ok=True)
 
-    full_xml = cells_xml if "<mxfile" in cells_xml else wrap_xml(cells_xml)
-
-    # Detect CLI binary
-    bin_candidates = [
-        drawio_bin,
-        os.getenv("DRAWIO_EXPORT_BIN"),
-        os.getenv("DRAWIO_BIN"),
-        os.getenv("DRAWIO_CLI"),
-        "drawio",
-        "draw.io",
-    ]
-    cli = next((b for b in bin_candidates if b and shutil.which(b)), None)
-    if not cli:
-        return False, "draw.io CLI not found (set DRAWIO_EXPORT_BIN or install draw.io CLI)"
-
+    result = render_drawio_pngs([cells_xml], drawio_bin=drawio_bin, timeout=timeout)[0]
+    if result.png is None:
+        return False, result.error or "export failed"
+    if not allow_fallback and result.backend == "python":
+        return False, "only the approximate Python rasterizer is available (no browser or draw.io CLI)"
     try:
-        with tempfile.TemporaryDirectory() as tmp_dir:
-            tmp_path = Path(tmp_dir) / "diagram.drawio"
-            tmp_path.write_text(full_xml, encoding="utf-8")
-
-            cmd = [
-                cli,
-                "--export",
-                "--format",
-                "png",
-                "--output",
-                str(output_file),
-                str(tmp_path),
-            ]
-
-            proc = subprocess.run(
-                cmd,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                text=True,
-                timeout=timeout,
-            )
-            if proc.returncode != 0:
-                return False, (proc.stderr or proc.stdout or "export failed")
-
-            if not output_file.exists():
-                return False, "export finished but output file missing"
+        tmp_path = output_file.with_name(f".{output_file.name}.{os.getpid()}.tmp")
+        tmp_path.write_bytes(result.png)
+        os.replace(tmp_path, output_file)
     except Exception as e:
         return False, f"export exception: {e}"
 
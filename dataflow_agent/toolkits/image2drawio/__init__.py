@@ -3,19 +3,23 @@
 from .utils import (
     classify_shape,
     extract_text_color,
+    mask_roi,
     mask_to_bbox,
     normalize_mask,
     sample_fill_stroke,
     save_masked_rgba,
     bbox_iou_px,
+    window_bbox,
 )
 
 __all__ = [
     "classify_shape",
     "extract_text_color",
+    "mask_roi",
     "mask_to_bbox",
     "normalize_mask",
     "sample_fill_stroke",
     "save_masked_rgba",
     "bbox_iou_px",
+    "window_bbox",
 ]
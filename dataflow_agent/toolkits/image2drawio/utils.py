@@ -1,6 +1,6 @@
 from __future__ import annotations
 
-from typing import List, Tuple, Optional
+from typing import List, Tuple, Optional, Sequence
 import os
 import math
 
@@ -22,6 +22,85 @@ def normalize_mask(mask: np.ndarray, target_shape: Tuple[int, int]) -> np.ndarra
     return mask
 
 
+# Padding (px) kept around an element when working on its bbox crop; must cover the
+# largest morphology kernel used below so cropped results match full-frame ones.
+ROI_PAD = 8
+
+Window = Tuple[int, int, int, int]  # x0, y0, x1, y1 (exclusive) in image pixels
+
+
+def _nearest_index(dst: int, src: int) -> np.ndarray:
+    """Source index for each destination index, as cv2.resize(INTER_NEAREST) picks them."""
+    ifx = 1.0 / (dst / src)
+    return np.minimum(np.floor(np.arange(dst) * ifx).astype(np.int64), src - 1)
+
+
+def mask_roi(
+    mask: np.ndarray,
+    target_shape: Tuple[int, int],
+    offset: Optional[Sequence[int]] = None,
+    pad: int = ROI_PAD,
+) -> Optional[Tuple[np.ndarray, Window]]:
+    """
+    Crop a mask to its bounding box (plus ``pad``) in target (H, W) pixel coordinates.
+
+    ``mask`` is either a full-frame mask at any resolution (resampled exactly like
+    ``normalize_mask``), or, when ``offset`` (x, y) is given, a local mask already in
+    target pixels whose top-left corner sits at ``offset`` (tiled SAM items).
+
+    Returns (roi, window) with ``roi == normalize_mask(mask, target_shape)[y0:y1, x0:x1]``,
+    or None for an empty mask. Only element-sized arrays are allocated for resized masks.
+    """
+    if mask is None:
+        raise ValueError("mask is None")
+    h, w = target_shape
+    m = np.asarray(mask)
+    if m.dtype != np.bool_:
+        m = m.astype(bool)
+
+    if offset is not None:
+        ox, oy = int(offset[0]), int(offset[1])
+        rows = np.flatnonzero(m.any(axis=1))
+        if rows.size == 0:
+            return None
+        cols = np.flatnonzero(m.any(axis=0))
+        by0, by1 = oy + int(rows[0]), oy + int(rows[-1]) + 1
+        bx0, bx1 = ox + int(cols[0]), ox + int(cols[-1]) + 1
+        x0, y0 = max(0, bx0 - pad), max(0, by0 - pad)
+        x1, y1 = min(w, bx1 + pad), min(h, by1 + pad)
+        if x1 <= x0 or y1 <= y0:
+            return None
+        roi = np.zeros((y1 - y0, x1 - x0), dtype=bool)
+        ix0, iy0 = max(x0, ox), max(y0, oy)
+        ix1, iy1 = min(x1, ox + m.shape[1]), min(y1, oy + m.shape[0])
+        roi[iy0 - y0:iy1 - y0, ix0 - x0:ix1 - x0] = m[iy0 - oy:iy1 - oy, ix0 - ox:ix1 - ox]
+        return roi, (x0, y0, x1, y1)
+
+    same = m.shape[0] == h and m.shape[1] == w
+    ymap = None if same else _nearest_index(h, m.shape[0])
+    xmap = None if same else _nearest_index(w, m.shape[1])
+    rows_any = m.any(axis=1) if same else m.any(axis=1)[ymap]
+    rows = np.flatnonzero(rows_any)
+    if rows.size == 0:
+        return None
+    cols = np.flatnonzero(m.any(axis=0) if same else m.any(axis=0)[xmap])
+    x0, y0 = max(0, int(cols[0]) - pad), max(0, int(rows[0]) - pad)
+    x1, y1 = min(w, int(cols[-1]) + 1 + pad), min(h, int(rows[-1]) + 1 + pad)
+    if same:
+        roi = m[y0:y1, x0:x1].copy()
+    else:
+        roi = m[np.ix_(ymap[y0:y1], xmap[x0:x1])]
+    return roi, (x0, y0, x1, y1)
+
+
+def window_bbox(mask: np.ndarray, window: Optional[Window] = None) -> Optional[List[int]]:
+    """``mask_to_bbox`` for a cropped mask, shifted back to image coordinates."""
+    bbox = mask_to_bbox(mask)
+    if bbox is None or window is None:
+        return bbox
+    return [bbox[0] + window[0], bbox[1] + window[1], bbox[2] + window[0], bbox[3] + window[1]]
+
+
 def mask_to_bbox(mask: np.ndarray) -> Optional[List[int]]:
     ys, xs = np.where(mask)
     if xs.size == 0 or ys.size == 0:
@@ -87,13 +166,26 @@ def _to_hex(color_bgr: Tuple[int, int, int]) -> str:
     return f"#{r:02x}{g:02x}{b:02x}"
 
 
-def sample_fill_stroke(image_bgr: np.ndarray, mask: np.ndarray) -> Tuple[str, str]:
+def sample_fill_stroke(
+    image_bgr: np.ndarray,
+    mask: np.ndarray,
+    window: Optional[Window] = None,
+) -> Tuple[str, str]:
     """
     Sample fill & stroke colors from original image using the mask.
     Returns (fill_hex, stroke_hex).
+
+    With ``window`` (from ``mask_roi``) the mask covers only ``image[y0:y1, x0:x1]``
+    and all work happens on that crop; kernel sizes still follow the full image size,
+    so the colours match the full-frame call.
     """
     h, w = image_bgr.shape[:2]
-    mask = normalize_mask(mask, (h, w))
+    if window is None:
+        mask = normalize_mask(mask, (h, w))
+    else:
+        x0, y0, x1, y1 = window
+        image_bgr = image_bgr[y0:y1, x0:x1]
+        mask = mask.astype(bool, copy=False)
 
     # Edge (stroke): dilate - erode
     k = max(1, int(min(h, w) * 0.002))
@@ -161,25 +253,43 @@ def extract_text_color(image_bgr: np.ndarray, bbox_px: List[int]) -> str:
     return f"#{r:02x}{g:02x}{b:02x}"
 
 
-def save_masked_rgba(image_bgr: np.ndarray, mask: np.ndarray, out_path: str) -> str:
-    """Save masked region as RGBA PNG with alpha channel."""
+def save_masked_rgba(
+    image_bgr: np.ndarray,
+    mask: np.ndarray,
+    out_path: str,
+    window: Optional[Window] = None,
+    dilate_px: int = 0,
+) -> str:
+    """
+    Save masked region as RGBA PNG with alpha channel, cropped to the mask bbox.
+
+    ``window`` works as in ``sample_fill_stroke``; ``dilate_px`` grows the alpha
+    mask by that many pixels (keep it below ``ROI_PAD`` when using a window).
+    """
     h, w = image_bgr.shape[:2]
-    mask = normalize_mask(mask, (h, w))
-    rgba = cv2.cvtColor(image_bgr, cv2.COLOR_BGR2BGRA)
-    alpha = (mask.astype(np.uint8) * 255)
-    rgba[:, :, 3] = alpha
+    if window is None:
+        mask = normalize_mask(mask, (h, w))
+        region = image_bgr
+    else:
+        x0, y0, x1, y1 = window
+        region = image_bgr[y0:y1, x0:x1]
+        mask = mask.astype(bool, copy=False)
+    if dilate_px > 0:
+        k = 2 * int(dilate_px) + 1
+        mask = cv2.dilate(mask.astype(np.uint8), np.ones((k, k), np.uint8), iterations=1) > 0
 
     bbox = mask_to_bbox(mask)
     if bbox:
         x1, y1, x2, y2 = bbox
-        x2 = min(w, x2 + 1)
-        y2 = min(h, y2 + 1)
-        crop = rgba[y1:y2, x1:x2]
-    else:
-        crop = rgba
+        x2 = min(region.shape[1], x2 + 1)
+        y2 = min(region.shape[0], y2 + 1)
+        region = region[y1:y2, x1:x2]
+        mask = mask[y1:y2, x1:x2]
+    rgba = cv2.cvtColor(region, cv2.COLOR_BGR2BGRA)
+    rgba[:, :, 3] = mask.astype(np.uint8) * 255
 
     os.makedirs(os.path.dirname(out_path), exist_ok=True)
-    cv2.imwrite(out_path, crop)
+    cv2.imwrite(out_path, rgba)
     return out_path
 
 
@@ -0,0 +1,259 @@
+"""
+异步网页正文抓取：全局 / 单主机并发上限 + 共享连接池 + 条件请求缓存 + 流式大小上限。
+
+用法：
+    from dataflow_agent.toolkits.link_crawler import fetch_page_text_async, fetch_pages_text_async
+
+    text = await fetch_page_text_async(url, max_chars=50000)   # 返回值约定与 research_tools.fetch_page_text 一致
+    texts = await fetch_pages_text_async(urls)                 # 并发抓取，顺序与 urls 一致
+
+- 同时最多 DF_CRAWL_CONCURRENCY 个请求，同一主机最多 DF_CRAWL_PER_HOST 个；
+- 每个事件循环共享一个 httpx.AsyncClient（连接池 / keep-alive），不再每个 URL 新建客户端；
+- 按 URL 缓存 ETag / Last-Modified、正文 sha256 和抽取出的文本：DF_CRAWL_FRESH_SECONDS 内直接用缓存，
+  之后带 If-None-Match / If-Modified-Since 重新验证，304 或正文哈希不变时不重新解析；
+  抓取失败但有旧缓存时返回旧文本；
+- 响应按流读取，超过 DF_CRAWL_MAX_BYTES 就停止读取、只解析已读部分；非 HTML 响应不读正文。
+
+缓存目录结构：
+    <root>/<key[:2]>/<key>.json      # url / etag / last_modified / body_sha256 / fetched_at
+    <root>/<key[:2]>/<key>.txt.gz    # 抽取出的正文（未截断）
+
+配置：
+- DF_CRAWL_CACHE:          缓存目录（默认 <项目根>/outputs/cache/crawl；"off" 关闭）
+- DF_CRAWL_CONCURRENCY:    全局并发（默认 8）
+- DF_CRAWL_PER_HOST:       单主机并发（默认 2）
+- DF_CRAWL_MAX_BYTES:      单个响应最多读取的字节数（默认 5 MB）
+- DF_CRAWL_TIMEOUT:        单个请求超时秒数（默认 20）
+- DF_CRAWL_FRESH_SECONDS:  缓存免验证时长（默认 300；0 表示每次都重新验证）
+"""
+from __future__ import annotations
+
+import asyncio
+import gzip
+import hashlib
+import json
+import os
+import threading
+import time
+import weakref
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+from urllib.parse import urlparse
+
+import httpx
+
+from dataflow_agent.logger import get_logger
+from dataflow_agent.toolkits.research_tools import _strip_html
+
+log = get_logger(__name__)
+
+DEFAULT_CACHE_DIR = Path(__file__).resolve().parents[2] / "outputs" / "cache" / "crawl"
+
+USER_AGENT = "Mozilla/5.0 (compatible; OpenNotebook/1.0; +https://opennotebook.ai)"
+NON_HTML = "[非 HTML 页面，无法解析正文]"
+EMPTY_PAGE = "[页面无正文内容]"
+
+_CRAWLERS: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, LinkCrawler]" = weakref.WeakKeyDictionary()
+_CRAWLERS_LOCK = threading.Lock()
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, str(default)))
+    except ValueError:
+        return default
+
+
+def _cache_root() -> Optional[Path]:
+    value = os.getenv("DF_CRAWL_CACHE")
+    if value and value.lower() == "off":
+        return None
+    return Path(value) if value else DEFAULT_CACHE_DIR
+
+
+def _write_atomic(path: Path, data: bytes) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    tmp.write_bytes(data)
+    os.replace(tmp, path)
+
+
+def _truncate(text: str, max_chars: int) -> str:
+    if max_chars and len(text) > max_chars:
+        return text[:max_chars] + "\n\n... (已截断)"
+    return text
+
+
+class _PageCache:
+    """按 URL 的条件请求缓存。"""
+
+    def __init__(self, root: Path):
+        self.root = root
+
+    def _paths(self, url: str):
+        key = hashlib.sha256(url.encode("utf-8")).hexdigest()
+        d = self.root / key[:2]
+        return d / f"{key}.json", d / f"{key}.txt.gz"
+
+    def load(self, url: str) -> Optional[dict]:
+        meta_path, text_path = self._paths(url)
+        try:
+            meta = json.loads(meta_path.read_text(encoding="utf-8"))
+            if not text_path.exists():
+                return None
+            return meta
+        except Exception:
+            return None
+
+    def text(self, url: str) -> Optional[str]:
+        try:
+            with gzip.open(self._paths(url)[1], "rt", encoding="utf-8") as f:
+                return f.read()
+        except Exception:
+            return None
+
+    def save(self, url: str, meta: dict, text: Optional[str]) -> None:
+        meta_path, text_path = self._paths(url)
+        if text is not None:
+            _write_atomic(text_path, gzip.compress(text.encode("utf-8"), compresslevel=6))
+        _write_atomic(meta_path, json.dumps(meta, ensure_ascii=False).encode("utf-8"))
+
+
+class LinkCrawler:
+    """绑定到一个事件循环的抓取器（共享客户端与并发信号量）。"""
+
+    def __init__(
+        self,
+        concurrency: int = 8,
+        per_host: int = 2,
+        max_bytes: int = 5 << 20,
+        timeout: float = 20.0,
+        fresh_seconds: float = 300.0,
+        cache_root: Optional[Path] = None,
+    ):
+        self.max_bytes = max(1, int(max_bytes))
+        self.fresh_seconds = float(fresh_seconds)
+        self.per_host = max(1, int(per_host))
+        self._global = asyncio.Semaphore(max(1, int(concurrency)))
+        self._hosts: Dict[str, asyncio.Semaphore] = {}
+        self._cache = _PageCache(cache_root) if cache_root is not None else None
+        self._client = httpx.AsyncClient(
+            timeout=timeout,
+            headers={"User-Agent": USER_AGENT},
+            follow_redirects=True,
+            limits=httpx.Limits(max_connections=max(1, int(concurrency)), max_keepalive_connections=max(1, int(concurrency))),
+        )
+
+    async def aclose(self) -> None:
+        await self._client.aclose()
+
+    def _host_sem(self, url: str) -> asyncio.Semaphore:
+        host = (urlparse(url).netloc or "").lower()
+        sem = self._hosts.get(host)
+        if sem is None:
+            sem = self._hosts[host] = asyncio.Semaphore(self.per_host)
+        return sem
+
+    async def _read_capped(self, resp: httpx.Response) -> bytes:
+        length = resp.headers.get("content-length")
+        if length and length.isdigit() and int(length) > self.max_bytes:
+            log.info(f"[link_crawler] {resp.url}: {length} bytes, reading first {self.max_bytes}")
+        buf = bytearray()
+        async for chunk in resp.aiter_bytes():
+            buf.extend(chunk)
+            if len(buf) >= self.max_bytes:
+                del buf[self.max_bytes:]
+                break
+        return bytes(buf)
+
+    async def fetch_text(self, url: str) -> str:
+        """抓取单个 URL 的完整正文（不截断）；失败时返回 "[抓取失败: ...]"。"""
+        entry = self._cache.load(url) if self._cache is not None else None
+        if entry and time.time() - entry.get("fetched_at", 0) < self.fresh_seconds:
+            cached = self._cache.text(url)
+            if cached is not None:
+                return cached
+
+        headers = {}
+        if entry:
+            if entry.get("etag"):
+                headers["If-None-Match"] = entry["etag"]
+            if entry.get("last_modified"):
+                headers["If-Modified-Since"] = entry["last_modified"]
+
+        try:
+            # 先占主机名额再占全局名额，避免同一主机的排队请求占满全局并发
+            async with self._host_sem(url), self._global:
+                async with self._client.stream("GET", url, headers=headers) as resp:
+                    if resp.status_code == 304 and entry:
+                        cached = self._cache.text(url)
+                        if cached is not None:
+                            entry["fetched_at"] = time.time()
+                            self._cache.save(url, entry, None)
+                            return cached
+                    resp.raise_for_status()
+                    content_type = (resp.headers.get("content-type") or "").lower()
+                    if "text/html" not in content_type:
+                        return NON_HTML
+                    body = await self._read_capped(resp)
+                    encoding = resp.encoding or "utf-8"
+                    validators = {
+                        "etag": resp.headers.get("etag"),
+                        "last_modified": resp.headers.get("last-modified"),
+                    }
+        except Exception as e:
+            stale = self._cache.text(url) if entry else None
+            if stale is not None:
+                log.warning(f"[link_crawler] {url[:80]} failed ({e}), using cached copy")
+                return stale
+            return f"[抓取失败: {e}]"
+
+        digest = hashlib.sha256(body).hexdigest()
+        text = None
+        if entry and entry.get("body_sha256") == digest:
+            text = self._cache.text(url)
+        changed = text is None
+        if changed:
+            try:
+                html = body.decode(encoding, errors="replace")
+            except LookupError:
+                html = body.decode("utf-8", errors="replace")
+            text = await asyncio.to_thread(_strip_html, html)
+        if self._cache is not None:
+            meta = {"url": url, "body_sha256": digest, "fetched_at": time.time(), **validators}
+            self._cache.save(url, meta, text if changed else None)
+        return text
+
+
+def get_link_crawler() -> LinkCrawler:
+    """当前事件循环共享的抓取器（配置取自环境变量）。"""
+    loop = asyncio.get_running_loop()
+    with _CRAWLERS_LOCK:
+        crawler = _CRAWLERS.get(loop)
+        if crawler is None:
+            crawler = _CRAWLERS[loop] = LinkCrawler(
+                concurrency=_env_int("DF_CRAWL_CONCURRENCY", 8),
+                per_host=_env_int("DF_CRAWL_PER_HOST", 2),
+                max_bytes=_env_int("DF_CRAWL_MAX_BYTES", 5 << 20),
+                timeout=_env_int("DF_CRAWL_TIMEOUT", 20),
+                fresh_seconds=_env_int("DF_CRAWL_FRESH_SECONDS", 300),
+                cache_root=_cache_root(),
+            )
+        return crawler
+
+
+async def fetch_page_text_async(url: str, max_chars: int = 50000) -> str:
+    """
+    抓取 URL 对应页面的 HTML 并提取正文文本（research_tools.fetch_page_text 的异步版本）。
+    """
+    if not url or not url.strip().startswith(("http://", "https://")):
+        return ""
+    text = await get_link_crawler().fetch_text(url.strip())
+    if text.startswith("[抓取失败") or text == NON_HTML:
+        return text
+    return _truncate(text, max_chars) or EMPTY_PAGE
+
+
+async def fetch_pages_text_async(urls: Sequence[str], max_chars: int = 50000) -> List[str]:
+    """并发抓取多个 URL，返回顺序与 urls 一致。"""
+    return list(await asyncio.gather(*(fetch_page_text_async(u, max_chars=max_chars) for u in urls)))
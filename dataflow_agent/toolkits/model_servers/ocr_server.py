@@ -1,6 +1,7 @@
 from fastapi import FastAPI, HTTPException
 from pydantic import BaseModel
 from typing import Optional, List, Any, Tuple, Union
+import asyncio
 import os
 import sys
 
@@ -11,9 +12,16 @@ if project_root not in sys.path:
     sys.path.insert(0, project_root)
 
 from dataflow_agent.toolkits.multimodaltool.ppt_tool import paddle_ocr_page_with_layout
+from dataflow_agent.toolkits.multimodaltool.ocr_engine import get_ocr_pool
 
 app = FastAPI(title="OCR Model Server")
 
+
+@app.on_event("startup")
+def _warmup_ocr():
+    # 常驻服务在启动时加载满引擎池（DF_OCR_POOL_SIZE），避免首个请求承担模型加载耗时
+    get_ocr_pool().warmup()
+
 class OCRRequest(BaseModel):
     image_path: str
 
@@ -38,8 +46,8 @@ async def predict(req: OCRRequest):
 
     try:
         # 调用本地 ppt_tool 函数
-        # 注意：PADDLE_OCR 是全局初始化的，所以服务启动时加载一次
-        result = paddle_ocr_page_with_layout(req.image_path)
+        # 放到线程中执行：并发请求各自从 OCR 引擎池借用引擎，不阻塞事件循环
+        result = await asyncio.to_thread(paddle_ocr_page_with_layout, req.image_path)
         
         # result structure:
         # {
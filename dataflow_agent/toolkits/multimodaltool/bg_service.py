@@ -0,0 +1,245 @@
+"""
+RMBG-2.0 背景抠图服务：模型常驻进程，跨页面 / 跨任务合批推理。
+
+用法：
+    from dataflow_agent.toolkits.multimodaltool.bg_service import get_bg_remove_service
+
+    service = get_bg_remove_service(model_path)
+    rid = service.submit(png_path, output_dir, output_name="page_001_x_bg_removed.png")
+    fg_path = service.result(rid)                      # 按 request id 取结果
+
+    paths = service.remove_many([{"image_path": ..., "output_dir": ...}, ...])
+
+- 所有调用方（多页、多个并发任务）的请求进入同一个队列，后台线程在
+  max_wait_ms 窗口内凑满 max_batch 张后以 (B, 3, 1024, 1024) 张量一次前向；
+- 模型在首次请求时加载并常驻，空闲超过 idle_timeout 秒后自动释放显存，
+  下次请求再重新加载（替代每个任务结束时调用 free_bg_rm_model）。
+
+配置（get_bg_remove_service 参数优先，其次环境变量，最后默认值）：
+- DF_BG_RM_BATCH:         单批最大图片数（默认 8）
+- DF_BG_RM_MAX_WAIT_MS:   凑批等待窗口（默认 20ms）
+- DF_BG_RM_IDLE_TIMEOUT:  空闲多少秒后释放模型（默认 300；<=0 表示常驻不释放）
+"""
+from __future__ import annotations
+
+import os
+import queue
+import threading
+import time
+import uuid
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from dataflow_agent.logger import get_logger
+
+log = get_logger(__name__)
+
+
+@dataclass
+class _BgRequest:
+    request_id: str
+    image_path: str
+    output_dir: str
+    output_name: Optional[str] = None
+    future: Future = field(default_factory=Future)
+
+
+class BgRemoveService:
+    """
+    进程内的批量抠图服务，单个后台线程独占模型，调用方线程只负责提交与等待。
+    """
+
+    def __init__(
+        self,
+        model_path: Optional[str] = None,
+        max_batch: int = 8,
+        max_wait_ms: float = 20.0,
+        idle_timeout: float = 300.0,
+    ):
+        self.model_path = model_path
+        self.max_batch = max(1, int(max_batch))
+        self.max_wait = max(0.0, float(max_wait_ms)) / 1000.0
+        self.idle_timeout = float(idle_timeout)
+        self._queue: "queue.Queue[_BgRequest]" = queue.Queue()
+        self._pending: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._loaded = False
+        self.batches = 0
+        self.images = 0
+
+    # ------------------------------------------------------------------
+    # 调用方接口
+    # ------------------------------------------------------------------
+    def submit(
+        self,
+        image_path: str,
+        output_dir: str,
+        output_name: Optional[str] = None,
+        request_id: Optional[str] = None,
+    ) -> str:
+        """提交一张图，返回 request id；结果通过 result(request_id) 获取。"""
+        req = _BgRequest(
+            request_id=request_id or uuid.uuid4().hex,
+            image_path=str(image_path),
+            output_dir=str(output_dir),
+            output_name=output_name,
+        )
+        with self._lock:
+            if req.request_id in self._pending:
+                raise ValueError(f"duplicate request id: {req.request_id}")
+            self._pending[req.request_id] = req.future
+            self._ensure_worker()
+        self._queue.put(req)
+        return req.request_id
+
+    def result(self, request_id: str, timeout: Optional[float] = None) -> str:
+        """阻塞等待并返回抠图结果路径；推理失败时抛出对应异常。"""
+        with self._lock:
+            fut = self._pending.get(request_id)
+        if fut is None:
+            raise KeyError(f"unknown request id: {request_id}")
+        try:
+            return fut.result(timeout=timeout)
+        finally:
+            if fut.done():
+                with self._lock:
+                    self._pending.pop(request_id, None)
+
+    def remove_many(self, items: List[Dict[str, Any]], timeout: Optional[float] = None) -> Dict[str, Optional[str]]:
+        """
+        一次提交多张图并等待全部完成。
+
+        items 中每项包含 image_path / output_dir，可选 output_name / request_id；
+        返回 {request_id: 输出路径}，单张失败时值为 None（错误写日志）。
+        """
+        ids = [
+            self.submit(
+                it["image_path"],
+                it["output_dir"],
+                output_name=it.get("output_name"),
+                request_id=it.get("request_id"),
+            )
+            for it in items
+        ]
+        out: Dict[str, Optional[str]] = {}
+        for rid in ids:
+            try:
+                out[rid] = self.result(rid, timeout=timeout)
+            except Exception as e:
+                log.error(f"[bg_service] request {rid} failed: {e}")
+                out[rid] = None
+        return out
+
+    def evict(self) -> None:
+        """立即释放常驻模型（下一次请求会重新加载）。"""
+        from dataflow_agent.toolkits.multimodaltool.bg_tool import MODEL_PATH, free_bg_rm_model
+
+        if self._loaded:
+            # 只释放本服务的模型；model_path=None 会清空全部缓存，这里显式传默认路径
+            free_bg_rm_model(model_path=self.model_path or str(MODEL_PATH))
+            self._loaded = False
+            log.info(f"[bg_service] 已释放 RMBG-2.0 模型: {self.model_path or 'default'}")
+
+    # ------------------------------------------------------------------
+    # 后台线程
+    # ------------------------------------------------------------------
+    def _ensure_worker(self) -> None:
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._worker, name="bg-remove-service", daemon=True)
+            self._thread.start()
+
+    def _next_batch(self) -> List[_BgRequest]:
+        timeout = self.idle_timeout if (self._loaded and self.idle_timeout > 0) else None
+        try:
+            first = self._queue.get(timeout=timeout)
+        except queue.Empty:
+            return []
+        batch = [first]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            try:
+                batch.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _worker(self) -> None:
+        while True:
+            batch = self._next_batch()
+            if not batch:
+                try:
+                    self.evict()
+                except Exception as e:
+                    log.error(f"[bg_service] evict failed: {e}")
+                continue
+            self._run_batch(batch)
+
+    def _run_batch(self, batch: List[_BgRequest]) -> None:
+        from PIL import Image
+
+        from dataflow_agent.toolkits.multimodaltool.bg_tool import get_bg_rm_remover
+
+        images, ready = [], []
+        for req in batch:
+            try:
+                images.append(Image.open(req.image_path).convert("RGB"))
+                ready.append(req)
+            except Exception as e:
+                req.future.set_exception(e)
+        if not ready:
+            return
+
+        t0 = time.perf_counter()
+        try:
+            remover = get_bg_rm_remover(model_path=self.model_path)
+            self._loaded = True
+            masks = remover.predict_masks(images, batch_size=self.max_batch)
+        except Exception as e:
+            for req in ready:
+                req.future.set_exception(e)
+            return
+
+        for req, image, mask in zip(ready, images, masks):
+            try:
+                out_dir = Path(req.output_dir)
+                out_dir.mkdir(parents=True, exist_ok=True)
+                out_path = out_dir / (req.output_name or f"{Path(req.image_path).stem}_bg_removed.png")
+                out = image.copy()
+                out.putalpha(mask)
+                out.save(out_path)
+                req.future.set_result(str(out_path))
+            except Exception as e:
+                req.future.set_exception(e)
+
+        self.batches += 1
+        self.images += len(ready)
+        log.info(f"[bg_service] batch of {len(ready)} done in {time.perf_counter() - t0:.2f}s")
+
+
+_SERVICES: Dict[str, BgRemoveService] = {}
+_SERVICES_LOCK = threading.Lock()
+
+
+def get_bg_remove_service(
+    model_path: Optional[str] = None,
+    max_batch: Optional[int] = None,
+    max_wait_ms: Optional[float] = None,
+    idle_timeout: Optional[float] = None,
+) -> BgRemoveService:
+    """返回进程内按 model_path 共享的抠图服务（首次调用时创建，模型在首个请求时加载）。"""
+    key = str(model_path) if model_path else ""
+    with _SERVICES_LOCK:
+        service = _SERVICES.get(key)
+        if service is None:
+            service = BgRemoveService(
+                model_path=model_path,
+                max_batch=max_batch or int(os.getenv("DF_BG_RM_BATCH", "8")),
+                max_wait_ms=max_wait_ms if max_wait_ms is not None else float(os.getenv("DF_BG_RM_MAX_WAIT_MS", "20")),
+                idle_timeout=idle_timeout if idle_timeout is not None else float(os.getenv("DF_BG_RM_IDLE_TIMEOUT", "300")),
+            )
+            _SERVICES[key] = service
+        return service
@@ -174,42 +174,69 @@ class BriaRMBG2Remover:
         print(f"抠图完成: {out_path}")
         return str(out_path)
 
-    def remove_background_batch(self, image_paths: list[str]) -> list[str]:
+    def predict_masks(self, images: list[Image.Image], batch_size: int = 8) -> list[Image.Image]:
         """
-        批量背景去除（一次加载模型，逐张处理）
-        返回输出文件路径列表
-        """
-        results = []
-
-        for image_path in image_paths:
-            image_path = Path(image_path)
-            print(f"[Batch] 开始抠图: {image_path}")
+        批量预测前景 mask。
 
-            # Load image
-            image = Image.open(image_path).convert("RGB")
-            input_tensor = self.transform_image(image).unsqueeze(0).to(self.device)
+        每张图经 ``transform_image`` 统一缩放为 1024×1024，按 ``batch_size``
+        堆叠成 (B, 3, 1024, 1024) 张量一次前向，mask 再缩放回各自原始尺寸。
+        预处理与 ``remove_background`` 完全一致，批量与逐张结果相同。
 
-            # Predict mask
+        返回
+        ----
+        list[Image.Image]
+            与 ``images`` 一一对应的 L 模式 mask。
+        """
+        masks: list[Image.Image] = []
+        to_pil = transforms.ToPILImage()
+        for start in range(0, len(images), max(1, batch_size)):
+            chunk = images[start:start + max(1, batch_size)]
+            batch = torch.stack([self.transform_image(img) for img in chunk]).to(self.device)
             with torch.no_grad():
-                preds = self.model(input_tensor)[-1].sigmoid().cpu()
+                preds = self.model(batch)[-1].sigmoid().cpu()
+            for img, pred in zip(chunk, preds):
+                masks.append(to_pil(pred.squeeze()).resize(img.size))
+        return masks
+
+    def remove_background_batch(
+        self,
+        image_paths: list[str],
+        batch_size: int = 8,
+        output_names: list[str] | None = None,
+    ) -> list[str]:
+        """
+        批量背景去除：按 ``batch_size`` 组成张量批次推理。
 
-            pred = preds[0].squeeze()
-            pred_pil = transforms.ToPILImage()(pred)
+        参数
+        ----
+        image_paths:
+            输入图片路径列表。
+        batch_size:
+            单次前向的图片数量。
+        output_names:
+            可选，与 ``image_paths`` 对应的输出文件名；默认 ``<stem>_bg_removed.png``。
 
-            # Resize mask back to original size
-            mask = pred_pil.resize(image.size)
+        返回
+        ----
+        list[str]
+            输出文件路径列表（与输入顺序一致）。
+        """
+        paths = [Path(p) for p in image_paths]
+        images = [Image.open(p).convert("RGB") for p in paths]
+        print(f"[Batch] 开始抠图: {len(images)} 张, batch_size={batch_size}")
+
+        masks = self.predict_masks(images, batch_size=batch_size)
 
-            # Apply alpha mask
+        results = []
+        for i, (image_path, image, mask) in enumerate(zip(paths, images, masks)):
             out = image.copy()
             out.putalpha(mask)
-
-            # Save output
-            out_path = self.output_dir / f"{image_path.stem}_bg_removed.png"
+            name = output_names[i] if output_names else f"{image_path.stem}_bg_removed.png"
+            out_path = self.output_dir / name
             out.save(out_path)
-
-            print(f"[Batch] 抠图完成: {out_path}")
             results.append(str(out_path))
 
+        print(f"[Batch] 抠图完成: {len(results)} 张 -> {self.output_dir}")
         return results
 
 
@@ -341,11 +368,13 @@ def local_tool_for_bg_remove(req: dict) -> str:
 
 
 def local_tool_for_bg_remove_batch(req: dict) -> list[str]:
-    """使用进程级单例模型进行批量抠图"""
+    """使用进程级单例模型进行批量抠图（``batch_size`` 可选，默认 8）"""
     remover = get_bg_rm_remover(
         model_path=req.get("model_path"), output_dir=req.get("output_dir")
     )
-    return remover.remove_background_batch(req["image_path_list"])
+    return remover.remove_background_batch(
+        req["image_path_list"], batch_size=req.get("batch_size", 8)
+    )
 
 
 def get_bg_remove_desc(lang: str = "zh") -> str:
@@ -0,0 +1,371 @@
+"""
+全局 MinerU 结果缓存：按 (PDF 内容 sha256, backend, MinerU 版本) 内容寻址，跨笔记本 / 跨工作流复用。
+
+用法（mineru_tool.run_mineru_pdf_extract 已默认走缓存，一般无需直接调用）：
+    from dataflow_agent.toolkits.multimodaltool.mineru_cache import extract_with_cache, lookup
+
+    stem_dir = extract_with_cache(pdf_path, output_dir, backend, runner)   # -> output_dir/<pdf_stem>
+    cached = lookup(pdf_path, backend)                                     # 只查不跑，返回缓存中的 <stem> 目录或 None
+
+缓存目录结构：
+    <root>/<key>/meta.json          # sha256 / backend / version / stem / size
+    <root>/<key>/out/<stem>/...     # MinerU 原始输出（auto/、hybrid_auto/ ...）
+
+- 原子填充：同一 key 由进程内锁 + 文件锁（fcntl.flock）串行化，并发请求同一文档时
+  只有一个真正运行 MinerU，其余等待后直接命中；结果先写临时目录，完成后 rename 进缓存；
+- 物化：按文件硬链接到调用方目录（不支持时尝试 reflink，再退回复制），文件名中的
+  原始 stem 会替换为调用方 PDF 的 stem，保持 {output_dir}/{pdf_stem}/auto/{pdf_stem}.md 的约定；
+  硬链接与缓存共享 inode，下游不应原地改写这些文件；
+  目标目录内写入标记文件 .mineru_source（内容为缓存 key，含 PDF sha256），标记缺失或不一致
+  （同名的另一份 PDF、崩溃残留的半成品）时重新物化：旧目录先改名挪开，再 os.replace 换入；
+- 容量上限：超过 DF_MINERU_CACHE_MAX_GB 时按最近使用时间淘汰（已物化的硬链接不受影响）；
+  物化期间持有该 key 的锁，淘汰只删除能拿到锁的条目，不会删掉正在被复制 / 链接的条目。
+
+配置：
+- DF_MINERU_CACHE:         缓存目录（默认 <项目根>/outputs/cache/mineru；"off" 关闭）
+- DF_MINERU_CACHE_MAX_GB:  容量上限（默认 20）
+"""
+from __future__ import annotations
+
+import json
+import os
+import shutil
+import subprocess
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable, Dict, Iterator, Optional
+
+from dataflow_agent.logger import get_logger
+from dataflow_agent.toolkits.multimodaltool.pdf_raster import pdf_sha256
+
+log = get_logger(__name__)
+
+DEFAULT_CACHE_DIR = Path(__file__).resolve().parents[3] / "outputs" / "cache" / "mineru"
+MARKER_NAME = ".mineru_source"
+
+_KEY_LOCKS: Dict[str, threading.Lock] = {}
+_KEY_LOCKS_GUARD = threading.Lock()
+_VERSION: Optional[str] = None
+
+FICLONE = 0x40049409  # linux/fs.h
+
+
+def cache_root() -> Optional[Path]:
+    value = os.getenv("DF_MINERU_CACHE")
+    if value and value.lower() == "off":
+        return None
+    return Path(value) if value else DEFAULT_CACHE_DIR
+
+
+def _max_bytes() -> int:
+    try:
+        return int(float(os.getenv("DF_MINERU_CACHE_MAX_GB", "20")) * (1 << 30))
+    except ValueError:
+        return 20 << 30
+
+
+def mineru_version(mineru_executable: Optional[str] = None) -> str:
+    """当前 MinerU 版本（包元数据优先，其次 `mineru --version`），进程内只探测一次。"""
+    global _VERSION
+    if _VERSION is not None:
+        return _VERSION
+    version = None
+    try:
+        from importlib.metadata import version as pkg_version
+
+        version = pkg_version("mineru")
+    except Exception:
+        exe = mineru_executable or os.environ.get("MINERU_CMD") or shutil.which("mineru")
+        if exe:
+            try:
+                res = subprocess.run([exe, "--version"], capture_output=True, text=True, timeout=60)
+                version = (res.stdout or res.stderr).strip().split()[-1] if (res.stdout or res.stderr) else None
+            except Exception:
+                version = None
+    _VERSION = version or "unknown"
+    return _VERSION
+
+
+def cache_key(pdf_path: str, backend: Optional[str], version: Optional[str] = None) -> str:
+    return f"{pdf_sha256(pdf_path)}-{backend or 'default'}-{version or mineru_version()}"
+
+
+# ----------------------------------------------------------------------
+# 加锁
+# ----------------------------------------------------------------------
+@contextmanager
+def _key_lock(root: Path, key: str, blocking: bool = True) -> Iterator[bool]:
+    """
+    进程内线程锁 + 跨进程文件锁，保证同一 key 只有一个填充者 / 物化者。
+
+    blocking=False 时拿不到锁立即返回，yield False（淘汰时用，避免两个填充者互相等待）。
+    """
+    with _KEY_LOCKS_GUARD:
+        lock = _KEY_LOCKS.setdefault(key, threading.Lock())
+    if not lock.acquire(blocking):
+        yield False
+        return
+    try:
+        root.mkdir(parents=True, exist_ok=True)
+        lock_path = root / f".{key}.lock"
+        with open(lock_path, "a+") as fh:
+            try:
+                import fcntl
+
+                try:
+                    fcntl.flock(fh, fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    yield False
+                    return
+            except ImportError:  # Windows：只有进程内锁
+                fcntl = None
+            try:
+                yield True
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(fh, fcntl.LOCK_UN)
+    finally:
+        lock.release()
+
+
+# ----------------------------------------------------------------------
+# 物化
+# ----------------------------------------------------------------------
+def _clone_file(src: Path, dst: Path) -> None:
+    """硬链接 → reflink → 复制，依次降级。"""
+    try:
+        os.link(src, dst)
+        return
+    except OSError:
+        pass
+    try:
+        import fcntl
+
+        with open(src, "rb") as fs, open(dst, "wb") as fd:
+            fcntl.ioctl(fd.fileno(), FICLONE, fs.fileno())
+        return
+    except Exception:
+        pass
+    shutil.copyfile(src, dst)
+
+
+def _rename_stem(name: str, cached_stem: str, stem: str) -> str:
+    """MinerU 输出文件名形如 <stem>.md / <stem>_content_list.json，只替换这种前缀。"""
+    if name.startswith((cached_stem + ".", cached_stem + "_")):
+        return stem + name[len(cached_stem):]
+    return name
+
+
+def _read_marker(target: Path) -> Optional[str]:
+    try:
+        return (target / MARKER_NAME).read_text(encoding="utf-8").strip()
+    except OSError:
+        return None
+
+
+def _remove_path(path: Path) -> None:
+    if path.is_dir() and not path.is_symlink():
+        shutil.rmtree(path, ignore_errors=True)
+    else:
+        try:
+            path.unlink()
+        except OSError:
+            pass
+
+
+def _materialize(cached_stem_dir: Path, cached_stem: str, output_dir: Path, stem: str, key: str) -> Path:
+    """调用方需持有 key 的锁。目标标记与 key 一致时直接复用，否则重新物化并原子换入。"""
+    target = output_dir / stem
+    if _read_marker(target) == key:
+        return target
+    tmp = output_dir / f".{stem}.{uuid.uuid4().hex[:8]}.tmp"
+    for src in cached_stem_dir.rglob("*"):
+        rel = src.relative_to(cached_stem_dir)
+        # 只改 <stem>/auto/ 这一层的文件名；images/ 下的图片名与 stem 无关
+        renamed = src.is_file() and len(rel.parts) == 2
+        dst = tmp / rel.parent / (_rename_stem(rel.name, cached_stem, stem) if renamed else rel.name)
+        if src.is_dir():
+            dst.mkdir(parents=True, exist_ok=True)
+        else:
+            dst.parent.mkdir(parents=True, exist_ok=True)
+            _clone_file(src, dst)
+    tmp.mkdir(parents=True, exist_ok=True)
+    # 标记最后写入：有标记即说明内容完整
+    (tmp / MARKER_NAME).write_text(key, encoding="utf-8")
+    try:
+        for _ in range(3):
+            old = None
+            if target.exists() or target.is_symlink():
+                # 旧结果（另一份同名 PDF / 半成品 / 旧版 CLI 输出）先挪开，再换入新目录
+                old = output_dir / f".{stem}.{uuid.uuid4().hex[:8]}.old"
+                os.rename(target, old)
+            try:
+                os.replace(tmp, target)
+            except OSError:
+                # 挪开与换入之间目标又被其他写入者（不同 key 的同名 PDF）创建，重试
+                if old is not None:
+                    _remove_path(old)
+                continue
+            if old is not None:
+                _remove_path(old)
+            return target
+        raise RuntimeError(f"failed to materialize MinerU output into {target}")
+    finally:
+        if tmp.exists():
+            shutil.rmtree(tmp, ignore_errors=True)
+
+
+def _touch(entry: Path) -> None:
+    try:
+        os.utime(entry / "meta.json")
+    except OSError:
+        pass
+
+
+def _read_meta(entry: Path) -> Optional[dict]:
+    try:
+        return json.loads((entry / "meta.json").read_text(encoding="utf-8"))
+    except Exception:
+        return None
+
+
+def _dir_size(path: Path) -> int:
+    return sum(f.stat().st_size for f in path.rglob("*") if f.is_file())
+
+
+def _evict(root: Path, keep: str) -> None:
+    """按 meta.json 的 mtime（最近使用时间）淘汰，直到总量低于上限。"""
+    limit = _max_bytes()
+    entries = []
+    total = 0
+    for entry in root.iterdir():
+        if not entry.is_dir() or entry.name.startswith("."):
+            continue
+        meta = _read_meta(entry)
+        if meta is None:
+            continue
+        size = int(meta.get("size", 0))
+        total += size
+        entries.append(((entry / "meta.json").stat().st_mtime, size, entry))
+    if total <= limit:
+        return
+    for _, size, entry in sorted(entries):
+        if total <= limit:
+            break
+        if entry.name == keep:
+            continue
+        # 正在填充 / 物化的条目拿不到锁，跳过（不阻塞，避免与持锁的填充者互等）
+        with _key_lock(root, entry.name, blocking=False) as acquired:
+            if not acquired:
+                continue
+            shutil.rmtree(entry, ignore_errors=True)
+        total -= size
+        log.info(f"[mineru_cache] evicted {entry.name} ({size / (1 << 20):.1f} MB)")
+
+
+# ----------------------------------------------------------------------
+# 对外接口
+# ----------------------------------------------------------------------
+def _cached_stem_dir(entry: Path) -> Optional[Path]:
+    meta = _read_meta(entry)
+    if meta is None:
+        return None
+    stem_dir = entry / "out" / meta["stem"]
+    return stem_dir if stem_dir.is_dir() else None
+
+
+def lookup(pdf_path: str, backend: Optional[str] = None) -> Optional[Path]:
+    """只查询缓存：命中时返回缓存中的 <stem> 目录（只读使用），否则 None。"""
+    root = cache_root()
+    if root is None or not Path(pdf_path).is_file():
+        return None
+    entry = root / cache_key(pdf_path, backend)
+    stem_dir = _cached_stem_dir(entry)
+    if stem_dir is not None:
+        _touch(entry)
+    return stem_dir
+
+
+def materialize_cached(pdf_path: str, output_dir: str, backend: Optional[str] = None) -> Optional[Path]:
+    """命中缓存时把结果物化到 output_dir/<pdf_stem> 并返回该目录，否则 None（不运行 MinerU）。"""
+    root = cache_root()
+    if root is None or not Path(pdf_path).is_file():
+        return None
+    key = cache_key(pdf_path, backend)
+    entry = root / key
+    if _cached_stem_dir(entry) is None:
+        return None
+    out = Path(output_dir)
+    out.mkdir(parents=True, exist_ok=True)
+    with _key_lock(root, key):
+        stem_dir = _cached_stem_dir(entry)  # 等锁期间可能已被淘汰
+        if stem_dir is None:
+            return None
+        _touch(entry)
+        return _materialize(stem_dir, stem_dir.name, out, Path(pdf_path).stem, key)
+
+
+def extract_with_cache(
+    pdf_path: str,
+    output_dir: str,
+    backend: Optional[str],
+    runner: Callable[[str, str], None],
+) -> Path:
+    """
+    返回 output_dir/<pdf_stem>（与直接运行 MinerU 的目录结构一致）。
+
+    runner(pdf_path, out_dir) 负责真正运行 MinerU，把结果写到 out_dir/<pdf_stem>/。
+    缓存关闭时直接调用 runner。
+    """
+    stem = Path(pdf_path).stem
+    out = Path(output_dir)
+    out.mkdir(parents=True, exist_ok=True)
+
+    root = cache_root()
+    if root is None:
+        runner(pdf_path, str(out))
+        return out / stem
+
+    key = cache_key(pdf_path, backend)
+    entry = root / key
+    with _key_lock(root, key):
+        stem_dir = _cached_stem_dir(entry)  # 等锁期间可能已被其他请求填充
+        if stem_dir is None:
+            t0 = time.time()
+            staging = root / f".staging-{key}-{uuid.uuid4().hex[:8]}"
+            try:
+                runner(pdf_path, str(staging / "out"))
+                if not (staging / "out" / stem).is_dir():
+                    raise RuntimeError(f"MinerU produced no output for {pdf_path}")
+                meta = {
+                    "sha256": key.split("-", 1)[0],
+                    "backend": backend or "default",
+                    "version": mineru_version(),
+                    "stem": stem,
+                    "source": str(pdf_path),
+                    "size": _dir_size(staging / "out"),
+                    "created": time.time(),
+                }
+                (staging / "meta.json").write_text(json.dumps(meta, ensure_ascii=False, indent=2), encoding="utf-8")
+                if entry.exists():
+                    shutil.rmtree(entry, ignore_errors=True)  # 缺 meta 的残缺条目
+                os.replace(staging, entry)
+            finally:
+                shutil.rmtree(staging, ignore_errors=True)
+            log.info(f"[mineru_cache] cached {Path(pdf_path).name} as {key} in {time.time() - t0:.1f}s")
+            try:
+                _evict(root, keep=key)
+            except Exception as e:
+                log.warning(f"[mineru_cache] eviction failed: {e}")
+            stem_dir = _cached_stem_dir(entry)
+            if stem_dir is None:
+                raise RuntimeError(f"MinerU cache entry missing after population: {entry}")
+        else:
+            log.info(f"[mineru_cache] hit: {Path(pdf_path).name} ({key})")
+
+        # 物化期间持锁：淘汰不会删掉正在被链接 / 复制的条目
+        _touch(entry)
+        return _materialize(stem_dir, stem_dir.name, out, stem, key)
@@ -19,25 +19,124 @@
 
 from pathlib import Path
 from typing import Any, Dict, List, Sequence, Union, Optional
+import asyncio
 import os
 import shutil
 import subprocess
 import re
 import random
+import threading
+from contextlib import contextmanager
 from PIL import Image
 from mineru_vl_utils import MinerUClient
 
 
+# ---------------------------------------
+# 0. MinerUClient 复用 + 多端口负载均衡
+# ---------------------------------------
+# MinerUClient 构造时会同步请求一次服务端模型名，且内部按事件循环缓存 httpx 连接，
+# 因此每个端口只建一个 client，在所有调用（含不同线程 / 事件循环）间复用。
+#
+# 配置：
+# - DF_MINERU_PORTS:            逗号分隔的 MinerU 服务端口（如 "8010,8011"），设置后请求在这些端口间按
+#                               在途请求数分摊；未设置时只用调用方传入的 port
+# - DF_MINERU_MAX_CONCURRENCY:  单次批量调用的最大并发 HTTP 请求数（默认 16）
+_CLIENTS: Dict[int, MinerUClient] = {}
+_CLIENTS_LOCK = threading.Lock()
+_INFLIGHT: Dict[int, int] = {}
+_INFLIGHT_LOCK = threading.Lock()
+
+
+def _get_mineru_client(port: int) -> MinerUClient:
+    """返回该端口共享的 http-client 版 MinerUClient（首次调用时创建）。"""
+    port = int(port)
+    with _CLIENTS_LOCK:
+        client = _CLIENTS.get(port)
+        if client is None:
+            client = MinerUClient(
+                backend="http-client",
+                server_url=f"http://127.0.0.1:{port}"
+            )
+            _CLIENTS[port] = client
+        return client
+
+
+def mineru_ports(port: Union[int, Sequence[int]]) -> List[int]:
+    """解析可用端口：DF_MINERU_PORTS 优先，否则使用调用方传入的端口（单个或列表）。"""
+    env_ports = [p.strip() for p in os.environ.get("DF_MINERU_PORTS", "").split(",") if p.strip()]
+    if env_ports:
+        return [int(p) for p in env_ports]
+    if isinstance(port, (list, tuple)):
+        return [int(p) for p in port]
+    return [int(port)]
+
+
+def _max_concurrency() -> int:
+    try:
+        return max(1, int(os.environ.get("DF_MINERU_MAX_CONCURRENCY", "16")))
+    except ValueError:
+        return 16
+
+
+@contextmanager
+def _lease_port(ports: Sequence[int], n: int = 1):
+    """选当前在途请求最少的端口，并在请求期间把 n 计入该端口的负载。"""
+    with _INFLIGHT_LOCK:
+        port = min(ports, key=lambda p: _INFLIGHT.get(p, 0))
+        _INFLIGHT[port] = _INFLIGHT.get(port, 0) + n
+    try:
+        yield port
+    finally:
+        with _INFLIGHT_LOCK:
+            _INFLIGHT[port] -= n
+
+
+async def aio_batch_extract_images(
+    images: List[Image.Image],
+    port: Union[int, Sequence[int]],
+    max_concurrency: Optional[int] = None,
+) -> List[Any]:
+    """
+    对一批内存中的图片执行 two_step_extract，按各端口在途请求数分片后并发调用
+    aio_batch_two_step_extract，并用同一个信号量限制总并发；返回顺序与 images 一致。
+    """
+    if not images:
+        return []
+    ports = mineru_ports(port)
+    semaphore = asyncio.Semaphore(max_concurrency or _max_concurrency())
+
+    # 每个端口一片，图片逐张分给当前（在途 + 已分配）最少的端口
+    shares: Dict[int, List[int]] = {p: [] for p in ports}
+    with _INFLIGHT_LOCK:
+        load = {p: _INFLIGHT.get(p, 0) for p in ports}
+    for i in range(len(images)):
+        p = min(ports, key=lambda q: load[q])
+        shares[p].append(i)
+        load[p] += 1
+
+    async def _run_share(share_port: int, indices: List[int]):
+        with _lease_port([share_port], len(indices)):
+            client = _get_mineru_client(share_port)
+            return await client.aio_batch_two_step_extract(
+                [images[i] for i in indices], semaphore=semaphore
+            )
+
+    active = [(p, idx) for p, idx in shares.items() if idx]
+    outputs = await asyncio.gather(*[_run_share(p, idx) for p, idx in active])
+    results: List[Any] = [None] * len(images)
+    for (_, indices), out in zip(active, outputs):
+        for i, blocks in zip(indices, out):
+            results[i] = blocks
+    return results
+
+
 # ---------------------------------------
 # 1. two_step_extract (sync)
 # ---------------------------------------
 def run_two_step_extract(image_path: str, port: int):
     """同步调用 MinerU two_step_extract，处理单张图片并返回结构化结果。"""
     image = Image.open(image_path)
-    client = MinerUClient(
-        backend="http-client",
-        server_url=f"http://127.0.0.1:{port}"
-    )
+    client = _get_mineru_client(port)
     return client.two_step_extract(image)
 
 
@@ -47,10 +146,7 @@ def run_two_step_extract(image_path: str, port: int):
 def run_batch_two_step_extract(image_paths: list[str], port: int):
     """同步批量调用 MinerU two_step_extract，处理多张图片并返回结果列表。"""
     images = [Image.open(p) for p in image_paths]
-    client = MinerUClient(
-        backend="http-client",
-        server_url=f"http://127.0.0.1:{port}"
-    )
+    client = _get_mineru_client(port)
     return client.batch_two_step_extract(images)
 
 
@@ -60,10 +156,7 @@ def run_batch_two_step_extract(image_paths: list[str], port: int):
 async def run_aio_two_step_extract(image_path: str, port: int):
     """异步调用 MinerU two_step_extract，处理单张图片并返回结构化结果。"""
     image = Image.open(image_path)
-    client = MinerUClient(
-        backend="http-client",
-        server_url=f"http://127.0.0.1:{port}"
-    )
+    client = _get_mineru_client(port)
     return await client.aio_two_step_extract(image)
 
 
@@ -73,10 +166,7 @@ async def run_aio_two_step_extract(image_path: str, port: int):
 async def run_aio_batch_two_step_extract(image_paths: list[str], port: int):
     """异步批量调用 MinerU two_step_extract，处理多张图片并返回结果列表。"""
     images = [Image.open(p) for p in image_paths]
-    client = MinerUClient(
-        backend="http-client",
-        server_url=f"http://127.0.0.1:{port}"
-    )
+    client = _get_mineru_client(port)
     return await client.aio_batch_two_step_extract(images)
 
 
@@ -160,10 +250,15 @@ def run_mineru_pdf_extract(
     source: str = "modelscope",
     mineru_executable: Optional[str] = None,
     backend: Optional[str] = None,
+    use_cache: bool = True,
 ):
     """
     使用 MinerU 命令行方式提取 PDF 中的结构化内容。
 
+    默认经过全局 MinerU 缓存（见 mineru_cache）：同一份 PDF（按内容 sha256）在相同
+    backend / MinerU 版本下只解析一次，结果硬链接到 output_dir/<pdf_stem>，目录结构不变。
+    use_cache=False 或 DF_MINERU_CACHE=off 时直接运行 MinerU。
+
     参数:
         pdf_path: PDF 文件路径
         output_dir: 输出目录路径，不存在会自动创建
@@ -179,6 +274,29 @@ def run_mineru_pdf_extract(
     返回:
         解析的所有图片、markdown格式的内容
     """
+    backend = backend or os.environ.get("MINERU_BACKEND", "").strip() or None
+    if not use_cache or not output_dir:
+        _run_mineru_cli(pdf_path, output_dir, source, mineru_executable, backend)
+        return
+
+    from dataflow_agent.toolkits.multimodaltool.mineru_cache import extract_with_cache
+
+    extract_with_cache(
+        str(pdf_path),
+        str(output_dir),
+        backend,
+        lambda pdf, out: _run_mineru_cli(pdf, out, source, mineru_executable, backend),
+    )
+
+
+def _run_mineru_cli(
+    pdf_path: str,
+    output_dir: str,
+    source: str,
+    mineru_executable: Optional[str],
+    backend: Optional[str],
+):
+    """实际运行 mineru 命令行，输出写到 output_dir/<pdf_stem>/。"""
     # 1. 解析 mineru 可执行路径
     if mineru_executable is None:
         mineru_executable = (
@@ -193,8 +311,6 @@ def run_mineru_pdf_extract(
                 "3) 调用 run_mineru_pdf_extract 时显式传入 mineru_executable 参数。"
             )
 
-    backend = backend or os.environ.get("MINERU_BACKEND", "").strip() or None
-
     mineru_cmd = [
         str(mineru_executable),
         "-p",
@@ -383,53 +499,48 @@ def svg_to_emf(svg_path: str, emf_path: str, dpi: int = 600) -> str:
 # ---------------------------------------
 # 6. 递归 MinerU 拆图 + 坐标映射 (HTTP 版)
 # ---------------------------------------
-def _crop_image_by_norm_bbox(
-    image_path: str,
-    bbox: Sequence[float],
-    output_dir: Union[str, Path],
-    prefix: str = "",
-    index: int = 0,
-) -> str:
-    """
-    按归一化 bbox [x1,y1,x2,y2] 从 image_path 裁剪出子图并保存，返回绝对路径。
-    """
-    img = Image.open(image_path)
+def _crop_norm_bbox(img: Image.Image, bbox: Sequence[float]) -> Image.Image:
+    """按归一化 bbox 在内存中裁剪子图（不落盘），无效区域抛 ValueError。"""
     width, height = img.size
-
     x1_norm, y1_norm, x2_norm, y2_norm = bbox
     left = max(0, min(width, int(round(x1_norm * width))))
     top = max(0, min(height, int(round(y1_norm * height))))
     right = max(0, min(width, int(round(x2_norm * width))))
     bottom = max(0, min(height, int(round(y2_norm * height))))
-
     if right <= left or bottom <= top:
         raise ValueError(f"Invalid bbox after clamp: {bbox}")
+    return img.crop((left, top, right, bottom))
 
-    cropped = img.crop((left, top, right, bottom))
-
-    out_dir = Path(output_dir)
-    out_dir.mkdir(parents=True, exist_ok=True)
-
-    stem = Path(image_path).stem
-    filename = f"{prefix}{stem}_{index}.png"
-    out_path = out_dir / filename
-    cropped.save(out_path)
 
-    return str(out_path.resolve())
+def _flatten_layout(items: List[Any]) -> List[Dict[str, Any]]:
+    """按原始块顺序展开：子图占位（list）替换为其递归得到的叶子块。"""
+    out: List[Dict[str, Any]] = []
+    for it in items:
+        if isinstance(it, list):
+            out.extend(_flatten_layout(it))
+        else:
+            out.append(it)
+    return out
 
 
 async def recursive_mineru_layout(
     image_path: str,
-    port: int,
+    port: Union[int, Sequence[int]],
     max_depth: int = 2,
     current_depth: int = 0,
     output_dir: Optional[Union[str, Path]] = None,
     block_types_for_subimage: Optional[Sequence[str]] = None,
+    max_concurrency: Optional[int] = None,
 ) -> List[Dict[str, Any]]:
     """
     使用 MinerU HTTP two_step_extract，递归拆图并将所有最底层块映射到
     最顶层图的归一化坐标系。
 
+    按深度逐层展开：同一层的所有子图在内存中裁剪后，一次 aio_batch_two_step_extract
+    批量提交（并发上限 max_concurrency / DF_MINERU_MAX_CONCURRENCY），port 可以是
+    端口列表或通过 DF_MINERU_PORTS 配置多个端口做负载均衡。
+    output_dir 仅为兼容保留（会被创建），子图不再写入磁盘。
+
     返回的每个元素形如:
         {
             "type": str,
@@ -446,94 +557,74 @@ async def recursive_mineru_layout(
     if output_dir is None:
         base = Path(image_path).with_suffix("")
         output_dir = base.parent / f"{base.stem}_mineru_recursive"
-    out_dir = Path(output_dir)
-    out_dir.mkdir(parents=True, exist_ok=True)
+    Path(output_dir).mkdir(parents=True, exist_ok=True)
 
     # 默认哪些类型会继续拆成子图
     if block_types_for_subimage is None:
         block_types_for_subimage = ["image", "img", "table", "figure"]
 
-    # 1. 当前层 MinerU 调用
-    blocks = await run_aio_two_step_extract(image_path=image_path, port=port)
+    root_items: List[Any] = []
+    # 当前层待识别的图：(图片, 在顶层图中的归一化 [x0, y0, w, h], 结果写入的列表)
+    level = [(Image.open(image_path), (0.0, 0.0, 1.0, 1.0), root_items)]
+    depth = current_depth
 
-    leaf_items: List[Dict[str, Any]] = []
+    while level:
+        # 1. 当前层所有图一次批量调用 MinerU
+        batch_blocks = await aio_batch_extract_images(
+            [img for img, _, _ in level], port=port, max_concurrency=max_concurrency
+        )
 
-    # blocks 结构假定为 List[Dict]，包含 type / bbox / text 等
-    for idx, blk in enumerate(blocks):
-        blk_type = blk.get("type")
-        bbox = blk.get("bbox")
-        if not bbox or len(bbox) != 4:
-            continue
+        next_level = []
+        for (img, (ox, oy, ow, oh), items), blocks in zip(level, batch_blocks):
+            # blocks 结构假定为 List[Dict]，包含 type / bbox / text 等
+            for blk in blocks or []:
+                blk_type = blk.get("type")
+                bbox = blk.get("bbox")
+                if not bbox or len(bbox) != 4:
+                    continue
 
-        # 保证归一化 bbox 在 [0,1] 内，大致裁剪
-        x1, y1, x2, y2 = bbox
-        x1 = max(0.0, min(1.0, float(x1)))
-        y1 = max(0.0, min(1.0, float(y1)))
-        x2 = max(0.0, min(1.0, float(x2)))
-        y2 = max(0.0, min(1.0, float(y2)))
-        if x2 <= x1 or y2 <= y1:
-            continue
-        norm_bbox = [x1, y1, x2, y2]
-
-        # 如果是需要继续拆的图块类型，裁剪子图并递归
-        if blk_type in block_types_for_subimage and current_depth < max_depth:
-            try:
-                sub_img_path = _crop_image_by_norm_bbox(
-                    image_path=image_path,
-                    bbox=norm_bbox,
-                    output_dir=out_dir / "sub_images",
-                    prefix=f"depth{current_depth}_blk{idx}_",
-                    index=idx,
-                )
-            except Exception:
-                # 裁剪失败则当成叶子块处理
-                leaf_items.append(
+                # 保证归一化 bbox 在 [0,1] 内，大致裁剪
+                x1, y1, x2, y2 = bbox
+                x1 = max(0.0, min(1.0, float(x1)))
+                y1 = max(0.0, min(1.0, float(y1)))
+                x2 = max(0.0, min(1.0, float(x2)))
+                y2 = max(0.0, min(1.0, float(y2)))
+                if x2 <= x1 or y2 <= y1:
+                    continue
+                norm_bbox = [x1, y1, x2, y2]
+                # 子图内部是完整的 [0,1] 坐标系，这里直接映射回顶层图
+                top_bbox = [ox + x1 * ow, oy + y1 * oh, ox + x2 * ow, oy + y2 * oh]
+
+                # 如果是需要继续拆的图块类型，裁剪子图放入下一层
+                if blk_type in block_types_for_subimage and depth < max_depth:
+                    try:
+                        sub_img = _crop_norm_bbox(img, norm_bbox)
+                    except Exception:
+                        sub_img = None
+                    if sub_img is not None:
+                        sub_items: List[Any] = []
+                        items.append(sub_items)  # 占位，保持原始块顺序
+                        next_level.append(
+                            (sub_img, (top_bbox[0], top_bbox[1], top_bbox[2] - top_bbox[0], top_bbox[3] - top_bbox[1]), sub_items)
+                        )
+                        continue
+                    # 裁剪失败则当成叶子块处理
+
+                # 文本或其他不再下钻的类型，直接当作叶子
+                items.append(
                     {
                         "type": blk_type,
-                        "bbox": norm_bbox,
+                        "bbox": top_bbox,
                         "png_path": None,
                         "text": blk.get("text") or blk.get("content"),
-                        "depth": current_depth,
+                        "depth": depth,
                     }
                 )
-                continue
-
-            # 子图内部是完整的 [0,1] 坐标系，需要映射回当前图的 norm_bbox
-            sub_items = await recursive_mineru_layout(
-                image_path=sub_img_path,
-                port=port,
-                max_depth=max_depth,
-                current_depth=current_depth + 1,
-                output_dir=out_dir,
-                block_types_for_subimage=block_types_for_subimage,
-            )
 
-            pw = norm_bbox[2] - norm_bbox[0]
-            ph = norm_bbox[3] - norm_bbox[1]
-            for si in sub_items:
-                sb = si.get("bbox")
-                if not sb or len(sb) != 4:
-                    continue
-                sx1, sy1, sx2, sy2 = sb
-                nx1 = norm_bbox[0] + sx1 * pw
-                ny1 = norm_bbox[1] + sy1 * ph
-                nx2 = norm_bbox[0] + sx2 * pw
-                ny2 = norm_bbox[1] + sy2 * ph
-                si["bbox"] = [nx1, ny1, nx2, ny2]
-                leaf_items.append(si)
-        else:
-            # 文本或其他不再下钻的类型，直接当作叶子
-            leaf_items.append(
-                {
-                    "type": blk_type,
-                    "bbox": norm_bbox,
-                    "png_path": None,
-                    "text": blk.get("text") or blk.get("content"),
-                    "depth": current_depth,
-                }
-            )
+        level = next_level
+        depth += 1
 
-    return leaf_items
+    return _flatten_layout(root_items)
 
 
 def _shrink_markdown(md: str, max_h1: int = 6, max_chars: int = 10_000) -> str:
@@ -0,0 +1,285 @@
+"""
+本地模型常驻管理：按空闲时间和内存压力淘汰，替代“每个任务结束就释放模型”。
+
+用法：
+    from dataflow_agent.toolkits.multimodaltool.model_residency import get_model_residency
+
+    residency = get_model_residency()
+    with residency.use(("sam", ckpt), loader=lambda: SAM(ckpt), unloader=_unload) as model:
+        results = model(images)          # 使用期间不会被淘汰
+
+    model = residency.acquire(key, loader)   # 与 release 配对使用，等价于 use()
+    residency.release(key, model)            # 只标记空闲，是否释放由管理器决定
+    residency.evict(("sam", ckpt))           # 显式立即释放（free_sam_model 等）
+
+- 每个模型记录最近使用时间和在用计数；在用中的模型永远不会被淘汰；
+- evict(force=True) 遇到在用中的模型时只把它移出常驻表（之后的 acquire 会重新加载），
+  真正的 unloader 推迟到最后一个使用者 release 时执行，不会把正在推理的权重挪走；
+- 后台线程定期检查：空闲超过 idle_timeout 的模型释放；GPU 剩余显存或主机可用内存
+  低于阈值时，按最近最少使用顺序释放空闲模型，直到压力解除；
+- 加载新模型前也会做一次压力检查，给新模型腾出空间。
+
+配置：
+- DF_MODEL_IDLE_TIMEOUT:     空闲多少秒后释放（默认 300；<=0 表示只在内存压力或显式 evict 时释放）
+- DF_MODEL_MIN_FREE_GPU:     GPU 剩余显存比例下限（默认 0.1）
+- DF_MODEL_MIN_FREE_RAM:     主机可用内存比例下限（默认 0.1，需要 psutil）
+- DF_MODEL_REAP_INTERVAL:    后台检查间隔秒数（默认 30）
+"""
+from __future__ import annotations
+
+import gc
+import os
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Hashable, Iterator, List, Optional
+
+from dataflow_agent.logger import get_logger
+
+log = get_logger(__name__)
+
+try:  # pragma: no cover - optional dependency
+    import torch
+except Exception:  # pragma: no cover
+    torch = None  # type: ignore
+
+try:  # pragma: no cover - optional dependency
+    import psutil
+except Exception:  # pragma: no cover
+    psutil = None  # type: ignore
+
+
+@dataclass
+class _Resident:
+    model: Any
+    unloader: Optional[Callable[[Any], None]] = None
+    last_used: float = field(default_factory=time.monotonic)
+    in_use: int = 0
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name, str(default)))
+    except ValueError:
+        return default
+
+
+def _empty_cuda_cache() -> None:
+    if torch is not None and torch.cuda.is_available():
+        try:
+            torch.cuda.empty_cache()
+        except Exception:
+            pass
+
+
+class ModelResidency:
+    """进程内的模型常驻表，键由调用方决定（如 ("sam", checkpoint)）。"""
+
+    def __init__(
+        self,
+        idle_timeout: float = 300.0,
+        min_free_gpu: float = 0.1,
+        min_free_ram: float = 0.1,
+        reap_interval: float = 30.0,
+    ):
+        self.idle_timeout = float(idle_timeout)
+        self.min_free_gpu = float(min_free_gpu)
+        self.min_free_ram = float(min_free_ram)
+        self.reap_interval = max(1.0, float(reap_interval))
+        self._models: Dict[Hashable, _Resident] = {}
+        # 被强制移出常驻表但仍在用的模型，最后一个使用者 release 时再卸载
+        self._retired: Dict[Hashable, List[_Resident]] = {}
+        self._lock = threading.RLock()
+        self._loading: Dict[Hashable, threading.Lock] = {}
+        self._thread: Optional[threading.Thread] = None
+
+    # ------------------------------------------------------------------
+    # 调用方接口
+    # ------------------------------------------------------------------
+    def acquire(
+        self,
+        key: Hashable,
+        loader: Callable[[], Any],
+        unloader: Optional[Callable[[Any], None]] = None,
+    ) -> Any:
+        """取出（必要时加载）模型并把在用计数 +1；用完必须调用 release。"""
+        with self._lock:
+            entry = self._models.get(key)
+            if entry is not None:
+                entry.in_use += 1
+                entry.last_used = time.monotonic()
+                return entry.model
+            load_lock = self._loading.setdefault(key, threading.Lock())
+
+        # 同一个模型只加载一次；不同模型可以并行加载
+        with load_lock:
+            with self._lock:
+                entry = self._models.get(key)
+                if entry is not None:
+                    entry.in_use += 1
+                    entry.last_used = time.monotonic()
+                    return entry.model
+            self.relieve_pressure()
+            t0 = time.perf_counter()
+            model = loader()
+            log.info(f"[model_residency] loaded {key} in {time.perf_counter() - t0:.1f}s")
+            with self._lock:
+                self._models[key] = _Resident(model=model, unloader=unloader, in_use=1)
+                self._ensure_reaper()
+            return model
+
+    def release(self, key: Hashable, model: Any = None) -> None:
+        """
+        在用计数 -1 并刷新最近使用时间；模型继续常驻，由淘汰策略决定何时释放。
+        model 为 acquire 返回的对象，用于在模型被强制移出后找到对应的那一份。
+        """
+        with self._lock:
+            entry = self._models.get(key)
+            retired = self._retired.get(key, [])
+            if model is not None:
+                if entry is None or entry.model is not model:
+                    entry = next((e for e in retired if e.model is model), entry)
+            elif entry is None or not entry.in_use:
+                entry = next((e for e in retired if e.in_use), entry)
+            if entry is None:
+                return
+            entry.in_use = max(0, entry.in_use - 1)
+            entry.last_used = time.monotonic()
+            if entry.in_use or not any(e is entry for e in retired):
+                return
+            retired[:] = [e for e in retired if e is not entry]
+            if not retired:
+                self._retired.pop(key, None)
+        self._unload(key, entry)
+
+    @contextmanager
+    def use(
+        self,
+        key: Hashable,
+        loader: Callable[[], Any],
+        unloader: Optional[Callable[[Any], None]] = None,
+    ) -> Iterator[Any]:
+        model = self.acquire(key, loader, unloader)
+        try:
+            yield model
+        finally:
+            self.release(key, model)
+
+    def peek(self, key: Hashable) -> Optional[Any]:
+        """已常驻时返回模型（不改变计数），否则 None。"""
+        with self._lock:
+            entry = self._models.get(key)
+            return entry.model if entry is not None else None
+
+    def evict(self, key: Hashable, force: bool = False) -> bool:
+        """
+        释放指定模型，返回是否已移出常驻表。在用中时：未 force 不释放；
+        force 时立即移出常驻表，unloader 推迟到最后一个使用者 release 时执行。
+        """
+        with self._lock:
+            entry = self._models.get(key)
+            if entry is None or (entry.in_use and not force):
+                return False
+            self._models.pop(key, None)
+            if entry.in_use:
+                self._retired.setdefault(key, []).append(entry)
+                log.info(f"[model_residency] {key} evicted while in use; unloading after {entry.in_use} user(s) finish")
+                return True
+        self._unload(key, entry)
+        return True
+
+    def keys(self) -> List[Hashable]:
+        with self._lock:
+            return list(self._models)
+
+    # ------------------------------------------------------------------
+    # 淘汰策略
+    # ------------------------------------------------------------------
+    def evict_idle(self) -> int:
+        """释放空闲超过 idle_timeout 的模型，返回释放数量。"""
+        if self.idle_timeout <= 0:
+            return 0
+        now = time.monotonic()
+        with self._lock:
+            stale = [k for k, e in self._models.items() if not e.in_use and now - e.last_used >= self.idle_timeout]
+        return sum(self.evict(k) for k in stale)
+
+    def under_pressure(self) -> bool:
+        if torch is not None and torch.cuda.is_available() and self.min_free_gpu > 0:
+            try:
+                free, total = torch.cuda.mem_get_info()
+                if total and free / total < self.min_free_gpu:
+                    return True
+            except Exception:
+                pass
+        if psutil is not None and self.min_free_ram > 0:
+            try:
+                vm = psutil.virtual_memory()
+                if vm.total and vm.available / vm.total < self.min_free_ram:
+                    return True
+            except Exception:
+                pass
+        return False
+
+    def relieve_pressure(self) -> int:
+        """内存紧张时按 LRU 释放空闲模型，直到压力解除或没有可释放的模型。"""
+        evicted = 0
+        while self.under_pressure():
+            with self._lock:
+                idle = sorted(
+                    ((e.last_used, k) for k, e in self._models.items() if not e.in_use),
+                    key=lambda x: x[0],
+                )
+            if not idle:
+                break
+            if self.evict(idle[0][1]):
+                evicted += 1
+                log.info(f"[model_residency] memory pressure: evicted {idle[0][1]}")
+        return evicted
+
+    def _unload(self, key: Hashable, entry: _Resident) -> None:
+        try:
+            if entry.unloader is not None:
+                entry.unloader(entry.model)
+        except Exception as e:
+            log.warning(f"[model_residency] unloader for {key} failed: {e}")
+        entry.model = None
+        gc.collect()
+        _empty_cuda_cache()
+        log.info(f"[model_residency] released {key}")
+
+    # ------------------------------------------------------------------
+    # 后台线程
+    # ------------------------------------------------------------------
+    def _ensure_reaper(self) -> None:
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._reaper, name="model-residency", daemon=True)
+            self._thread.start()
+
+    def _reaper(self) -> None:
+        while True:
+            time.sleep(self.reap_interval)
+            try:
+                self.evict_idle()
+                self.relieve_pressure()
+            except Exception as e:
+                log.error(f"[model_residency] reaper failed: {e}")
+
+
+_RESIDENCY: Optional[ModelResidency] = None
+_RESIDENCY_LOCK = threading.Lock()
+
+
+def get_model_residency() -> ModelResidency:
+    """进程内共享的模型常驻管理器（配置取自环境变量）。"""
+    global _RESIDENCY
+    with _RESIDENCY_LOCK:
+        if _RESIDENCY is None:
+            _RESIDENCY = ModelResidency(
+                idle_timeout=_env_float("DF_MODEL_IDLE_TIMEOUT", 300.0),
+                min_free_gpu=_env_float("DF_MODEL_MIN_FREE_GPU", 0.1),
+                min_free_ram=_env_float("DF_MODEL_MIN_FREE_RAM", 0.1),
+                reap_interval=_env_float("DF_MODEL_REAP_INTERVAL", 30.0),
+            )
+        return _RESIDENCY
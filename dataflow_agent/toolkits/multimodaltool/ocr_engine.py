@@ -0,0 +1,172 @@
+"""
+PaddleOCR 引擎管理：首次使用时才加载模型，支持少量引擎组成的池做多线程并发 OCR。
+
+用法：
+    from dataflow_agent.toolkits.multimodaltool.ocr_engine import ocr_engine, free_ocr_model
+
+    with ocr_engine() as engine:          # 从池中借一个引擎，用完自动归还
+        result = engine.ocr(bgr, cls=True)
+
+    free_ocr_model()                       # 显式释放当前进程持有的全部 OCR 引擎
+
+配置（configure_ocr 参数优先，其次环境变量，最后默认值）：
+- DF_OCR_POOL_SIZE:      引擎池大小（默认 1）；每个引擎独立持有一份模型
+- DF_OCR_DET_MODEL_DIR:  检测模型目录（det_model_dir）
+- DF_OCR_REC_MODEL_DIR:  识别模型目录（rec_model_dir）
+- DF_OCR_CPU_THREADS:    每个引擎的 CPU 推理线程数（cpu_threads）
+- DF_OCR_ENABLE_MKLDNN:  是否启用 MKLDNN 加速（1/0）
+
+PaddleOCR 实例不是线程安全的，同一时刻一个引擎只借给一个线程。
+"""
+from __future__ import annotations
+
+import os
+import queue
+import threading
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+
+from dataflow_agent.logger import get_logger
+
+log = get_logger(__name__)
+
+# 与原 ppt_tool 中全局 PaddleOCR 相同的默认参数
+DEFAULT_OCR_KWARGS: Dict[str, Any] = {
+    "use_angle_cls": True,  # 角度分类，处理横竖混排
+    "lang": "ch",  # 中文 + 英文
+    "det_db_unclip_ratio": 1.2,
+    "det_db_box_thresh": 0.5,
+}
+
+
+def _env_ocr_kwargs() -> Dict[str, Any]:
+    kwargs: Dict[str, Any] = {}
+    if os.getenv("DF_OCR_DET_MODEL_DIR"):
+        kwargs["det_model_dir"] = os.getenv("DF_OCR_DET_MODEL_DIR")
+    if os.getenv("DF_OCR_REC_MODEL_DIR"):
+        kwargs["rec_model_dir"] = os.getenv("DF_OCR_REC_MODEL_DIR")
+    if os.getenv("DF_OCR_CPU_THREADS"):
+        kwargs["cpu_threads"] = int(os.getenv("DF_OCR_CPU_THREADS"))
+    if os.getenv("DF_OCR_ENABLE_MKLDNN"):
+        kwargs["enable_mkldnn"] = os.getenv("DF_OCR_ENABLE_MKLDNN").lower() in ("1", "true", "yes")
+    return kwargs
+
+
+class OCREnginePool:
+    """
+    懒加载的 PaddleOCR 引擎池：最多创建 size 个引擎，借出时优先复用空闲引擎，
+    全部借出且未达上限时新建，达到上限则阻塞等待归还。
+    """
+
+    def __init__(self, size: int = 1, **ocr_kwargs: Any):
+        self.size = max(1, int(size))
+        self.ocr_kwargs = ocr_kwargs
+        self._idle: "queue.LifoQueue[Any]" = queue.LifoQueue()
+        self._engines: List[Any] = []
+        self._lock = threading.Lock()
+
+    def _create_engine(self) -> Any:
+        try:
+            from paddleocr import PaddleOCR
+        except ImportError as e:
+            raise ImportError(
+                "paddleocr is not available. Please install `paddlepaddle` and `paddleocr`."
+            ) from e
+        log.info(f"[ocr_engine] 加载 PaddleOCR 引擎 #{len(self._engines) + 1}/{self.size}: {self.ocr_kwargs}")
+        return PaddleOCR(**self.ocr_kwargs)
+
+    def _borrow(self, timeout: Optional[float]) -> Any:
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            if len(self._engines) < self.size:
+                engine = self._create_engine()
+                self._engines.append(engine)
+                return engine
+        return self._idle.get(timeout=timeout)
+
+    @contextmanager
+    def acquire(self, timeout: Optional[float] = None) -> Iterator[Any]:
+        """借出一个引擎，退出上下文时归还。"""
+        engine = self._borrow(timeout)
+        try:
+            yield engine
+        finally:
+            self._idle.put(engine)
+
+    def warmup(self, n: Optional[int] = None) -> None:
+        """预先加载 n 个引擎（默认加载满池），用于常驻的 OCR 服务启动阶段。"""
+        target = min(self.size, n or self.size)
+        with self._lock:
+            while len(self._engines) < target:
+                engine = self._create_engine()
+                self._engines.append(engine)
+                self._idle.put(engine)
+
+    @property
+    def loaded(self) -> int:
+        return len(self._engines)
+
+    def free(self) -> None:
+        """释放池中全部引擎的引用（正在借出的引擎在归还后随池对象一起回收）。"""
+        with self._lock:
+            self._engines.clear()
+            while True:
+                try:
+                    self._idle.get_nowait()
+                except queue.Empty:
+                    break
+
+
+_POOL: Optional[OCREnginePool] = None
+_POOL_LOCK = threading.Lock()
+_OVERRIDES: Dict[str, Any] = {}
+_POOL_SIZE_OVERRIDE: Optional[int] = None
+
+
+def configure_ocr(pool_size: Optional[int] = None, **ocr_kwargs: Any) -> None:
+    """
+    修改 OCR 引擎配置（例如 det_model_dir / rec_model_dir / cpu_threads / enable_mkldnn）。
+    已加载的引擎会被释放，下次使用时按新配置重新加载。
+    """
+    global _POOL_SIZE_OVERRIDE
+    with _POOL_LOCK:
+        if pool_size is not None:
+            _POOL_SIZE_OVERRIDE = pool_size
+        _OVERRIDES.update(ocr_kwargs)
+    free_ocr_model()
+
+
+def get_ocr_pool() -> OCREnginePool:
+    """返回进程内共享的 OCR 引擎池（首次调用时创建，引擎本身在借出时才加载）。"""
+    global _POOL
+    with _POOL_LOCK:
+        if _POOL is None:
+            size = _POOL_SIZE_OVERRIDE or int(os.getenv("DF_OCR_POOL_SIZE", "1"))
+            kwargs = {**DEFAULT_OCR_KWARGS, **_env_ocr_kwargs(), **_OVERRIDES}
+            _POOL = OCREnginePool(size=size, **kwargs)
+        return _POOL
+
+
+@contextmanager
+def ocr_engine(timeout: Optional[float] = None) -> Iterator[Any]:
+    """从共享池借出一个 PaddleOCR 引擎。"""
+    with get_ocr_pool().acquire(timeout=timeout) as engine:
+        yield engine
+
+
+def free_ocr_model() -> None:
+    """
+    显式释放当前进程持有的 OCR 引擎（与 sam_tool.free_sam_model 对应）。
+    之后再次调用 OCR 会重新加载模型。
+    """
+    global _POOL
+    with _POOL_LOCK:
+        pool, _POOL = _POOL, None
+    if pool is not None:
+        n = pool.loaded
+        pool.free()
+        if n:
+            log.info(f"[ocr_engine] 已释放 {n} 个 PaddleOCR 引擎")
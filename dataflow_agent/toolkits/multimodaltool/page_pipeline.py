@@ -0,0 +1,413 @@
+"""
+逐页流水线引擎：pdf2ppt 系列工作流（pdf2ppt_parallel / pdf2ppt_optimized /
+pdf2ppt_qwenvl / pdf2ppt_with_sam_ocr_mineru）共用。
+
+每一页独立地流经：
+    渲染 → 分析阶段（OCR / SAM / MinerU / VLM，按依赖关系并发）→ 抠图 / 背景修复 → 组装
+
+- 渲染是生产者：第 1 页渲染完就进入分析，不必等整份 PDF 渲染完；
+- 每个阶段有独立的并发上限（跨页共享的 asyncio.Semaphore），例如 SAM 服务
+  有 3 个实例就限 3，本地抠图模型不适合多线程就限 1；
+- 某个阶段失败只记录在该页的 errors 中，依赖它的阶段跳过，其余阶段与其他页照常进行；
+- 组装按页码顺序进行：页面全部阶段完成后交给 on_page 回调，前面的页未完成时先缓存。
+
+各工作流只需声明自己的阶段（PageStage）、并发上限和组装回调，即为引擎的一个配置。
+并发上限可用环境变量 DF_PDF2PPT_WORKERS 覆盖，例如 "ocr=2,sam=3,mineru=4,bg_remove=4"。
+
+本模块后半部分是这几个工作流共用的逐页阶段实现（OCR / SAM / MinerU / 抠图）。
+"""
+from __future__ import annotations
+
+import asyncio
+import inspect
+import os
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Sequence, Tuple, Union
+
+from PIL import Image
+
+from dataflow_agent.graphbuilder.progress import report_progress
+from dataflow_agent.logger import get_logger
+
+log = get_logger(__name__)
+
+WORKERS_ENV = "DF_PDF2PPT_WORKERS"
+
+_END = object()
+
+
+@dataclass
+class PageContext:
+    """单页在流水线中的上下文：各阶段的结果按阶段名存放在 results 中。"""
+
+    page_idx: int
+    img_path: str
+    results: Dict[str, Any] = field(default_factory=dict)
+    errors: Dict[str, str] = field(default_factory=dict)
+
+    def get(self, stage: str, default: Any = None) -> Any:
+        return self.results.get(stage, default)
+
+
+@dataclass
+class PageStage:
+    """
+    流水线中的一个阶段。
+
+    - fn:       接收 PageContext，返回值写入 ctx.results[name]；
+    - workers:  该阶段跨页的最大并发数；
+    - after:    依赖的阶段名，依赖全部完成后才开始；
+    - blocking: fn 为同步函数时置 True，在线程池中执行，不阻塞事件循环。
+    """
+
+    name: str
+    fn: Callable[[PageContext], Union[Any, Awaitable[Any]]]
+    workers: int = 1
+    after: Tuple[str, ...] = ()
+    blocking: bool = False
+
+
+def workers_from_env(defaults: Dict[str, int], env: str = WORKERS_ENV) -> Dict[str, int]:
+    """解析 "stage=n,stage=n" 形式的环境变量，覆盖默认并发上限。"""
+    workers = dict(defaults)
+    raw = os.getenv(env, "")
+    for part in raw.split(","):
+        name, sep, value = part.partition("=")
+        if not sep:
+            continue
+        try:
+            workers[name.strip()] = max(1, int(value))
+        except ValueError:
+            log.warning(f"[page_pipeline] 忽略无效的并发配置 {env}: {part!r}")
+    return workers
+
+
+class PagePipeline:
+    """按页流式执行一组阶段，并按页码顺序交付结果。"""
+
+    def __init__(
+        self,
+        stages: Sequence[PageStage],
+        workers: Optional[Dict[str, int]] = None,
+        name: str = "page_pipeline",
+    ):
+        self.name = name
+        self.stages = self._topo_sort(stages)
+        workers = workers or {}
+        self.limits = {s.name: max(1, int(workers.get(s.name, s.workers))) for s in self.stages}
+        self.timings: Dict[str, float] = {s.name: 0.0 for s in self.stages}
+
+    @staticmethod
+    def _topo_sort(stages: Sequence[PageStage]) -> List[PageStage]:
+        by_name = {s.name: s for s in stages}
+        if len(by_name) != len(stages):
+            raise ValueError("PagePipeline 阶段名重复")
+        for s in stages:
+            missing = [d for d in s.after if d not in by_name]
+            if missing:
+                raise ValueError(f"阶段 {s.name} 依赖不存在的阶段: {missing}")
+
+        ordered: List[PageStage] = []
+        visiting: set = set()
+        done: set = set()
+
+        def _visit(s: PageStage) -> None:
+            if s.name in done:
+                return
+            if s.name in visiting:
+                raise ValueError(f"PagePipeline 阶段存在循环依赖: {s.name}")
+            visiting.add(s.name)
+            for d in s.after:
+                _visit(by_name[d])
+            visiting.discard(s.name)
+            done.add(s.name)
+            ordered.append(s)
+
+        for s in stages:
+            _visit(s)
+        return ordered
+
+    async def _run_stage(
+        self,
+        stage: PageStage,
+        ctx: PageContext,
+        deps: List["asyncio.Task[None]"],
+        sem: asyncio.Semaphore,
+    ) -> None:
+        if deps:
+            await asyncio.gather(*deps)
+        failed = [d for d in stage.after if d in ctx.errors]
+        if failed:
+            ctx.errors[stage.name] = f"skipped: upstream {failed} failed"
+            return
+
+        async with sem:
+            t0 = time.perf_counter()
+            try:
+                if stage.blocking:
+                    result = await asyncio.to_thread(stage.fn, ctx)
+                else:
+                    result = stage.fn(ctx)
+                    if inspect.isawaitable(result):
+                        result = await result
+                ctx.results[stage.name] = result
+            except Exception as e:  # noqa: BLE001
+                log.error(f"[{self.name}][page#{ctx.page_idx + 1}] 阶段 {stage.name} 失败: {e}")
+                ctx.errors[stage.name] = str(e)
+            finally:
+                self.timings[stage.name] += time.perf_counter() - t0
+
+    async def _run_page(self, ctx: PageContext, sems: Dict[str, asyncio.Semaphore]) -> PageContext:
+        tasks: Dict[str, "asyncio.Task[None]"] = {}
+        for stage in self.stages:
+            deps = [tasks[d] for d in stage.after]
+            tasks[stage.name] = asyncio.create_task(self._run_stage(stage, ctx, deps, sems[stage.name]))
+        await asyncio.gather(*tasks.values())
+        return ctx
+
+    async def run(
+        self,
+        pages: Iterable[str],
+        on_page: Optional[Callable[[PageContext], Union[None, Awaitable[None]]]] = None,
+    ) -> List[PageContext]:
+        """
+        执行流水线。
+
+        pages 为页面图片路径的可迭代对象，可以是边渲染边产出的生成器
+        （如 ppt_tool.iter_pdf_pages），每取一页都在线程池中进行。
+        on_page 按页码顺序被调用；返回按页码排序的全部 PageContext。
+        """
+        sems = {name: asyncio.Semaphore(n) for name, n in self.limits.items()}
+        log.info(f"[{self.name}] 启动逐页流水线，阶段并发上限: {self.limits}")
+        start = time.perf_counter()
+
+        ready: Dict[int, PageContext] = {}
+        delivered: List[PageContext] = []
+        page_tasks: List["asyncio.Task[PageContext]"] = []
+        # on_page 可能是协程，加锁保证交付严格按页码顺序、不交错
+        deliver_lock = asyncio.Lock()
+
+        async def _deliver_ready() -> None:
+            async with deliver_lock:
+                while len(delivered) in ready:
+                    ctx = ready.pop(len(delivered))
+                    delivered.append(ctx)
+                    if on_page is not None:
+                        try:
+                            ret = on_page(ctx)
+                            if inspect.isawaitable(ret):
+                                await ret
+                        except Exception as e:  # noqa: BLE001
+                            log.error(f"[{self.name}][page#{ctx.page_idx + 1}] 组装失败: {e}")
+                    report_progress("page_done", pipeline=self.name, page=ctx.page_idx + 1, done=len(delivered))
+
+        async def _track(ctx: PageContext) -> PageContext:
+            await self._run_page(ctx, sems)
+            ready[ctx.page_idx] = ctx
+            await _deliver_ready()
+            return ctx
+
+        it = iter(pages)
+        page_idx = 0
+        while True:
+            img_path = await asyncio.to_thread(next, it, _END)
+            if img_path is _END:
+                break
+            ctx = PageContext(page_idx=page_idx, img_path=str(img_path))
+            page_tasks.append(asyncio.create_task(_track(ctx)))
+            page_idx += 1
+
+        await asyncio.gather(*page_tasks)
+        stage_cost = ", ".join(f"{k}={v:.1f}s" for k, v in self.timings.items())
+        log.info(
+            f"[{self.name}] 完成 {len(delivered)} 页，总耗时 {time.perf_counter() - start:.2f}s"
+            f"（各阶段累计: {stage_cost}）"
+        )
+        return delivered
+
+
+# ======================================================================
+# pdf2ppt 系列共用的逐页阶段
+# ======================================================================
+
+def _normalized_to_px(layout_items: List[Dict[str, Any]], img_path: str, tag: str, page_idx: int) -> None:
+    """把 SAM 输出的归一化 bbox 映射为整页像素坐标，写入 bbox_px。"""
+    try:
+        with Image.open(img_path) as pil_img:
+            w, h = pil_img.size
+    except Exception as e:
+        log.error(f"[{tag}][page#{page_idx+1}] open image failed: {e}")
+        w, h = 1024, 768
+
+    for it in layout_items:
+        bbox = it.get("bbox")
+        if bbox and len(bbox) == 4:
+            x1n, y1n, x2n, y2n = bbox
+            x1 = int(round(x1n * w))
+            y1 = int(round(y1n * h))
+            x2 = int(round(x2n * w))
+            y2 = int(round(y2n * h))
+            if x2 > x1 and y2 > y1:
+                it["bbox_px"] = [x1, y1, x2, y2]
+
+
+def ocr_page(img_path: str, page_idx: int, server_urls: List[str], tag: str = "pdf2ppt") -> Dict[str, Any]:
+    """单页 OCR：优先远程 OCR 服务，失败回退本地 PaddleOCR；全部失败时返回空结果。"""
+    from dataflow_agent.toolkits.multimodaltool import ppt_tool
+
+    try:
+        try:
+            result = ppt_tool.paddle_ocr_page_with_layout_server(img_path, server_urls=server_urls)
+        except Exception as e:
+            log.warning(f"[{tag}][OCR] remote failed: {e}. Fallback to local.")
+            result = ppt_tool.paddle_ocr_page_with_layout(img_path)
+    except Exception as e:
+        log.error(f"[{tag}][OCR] page#{page_idx+1} failed: {e}")
+        result = {
+            "image_size": None,
+            "lines": [],
+            "body_h_px": None,
+            "bg_color": None,
+        }
+    result["page_idx"] = page_idx
+    result["path"] = img_path
+    return result
+
+
+def sam_page(
+    img_path: str,
+    page_idx: int,
+    base_dir: str,
+    server_urls: List[str],
+    checkpoint: str,
+    top_k: int = 15,
+    tag: str = "pdf2ppt",
+) -> Dict[str, Any]:
+    """单页 SAM 图块分割：优先远程 SAM 服务，失败回退本地模型；结果带像素坐标 bbox_px。"""
+    from dataflow_agent.toolkits.multimodaltool.sam_tool import segment_layout_boxes, segment_layout_boxes_server
+
+    if not Path(img_path).exists():
+        log.warning(f"[{tag}] image not found for SAM: {img_path}")
+        return {"page_idx": page_idx, "layout_items": []}
+
+    out_dir = Path(base_dir) / "layout_items" / f"page_{page_idx+1:03d}"
+    out_dir.mkdir(parents=True, exist_ok=True)
+
+    sam_kwargs = dict(
+        image_path=str(img_path),
+        output_dir=str(out_dir),
+        checkpoint=checkpoint,
+        min_area=200,
+        min_score=0.0,
+        iou_threshold=0.4,
+        top_k=top_k,
+        nms_by="mask",
+    )
+    try:
+        layout_items = segment_layout_boxes_server(server_urls=server_urls, **sam_kwargs)
+    except Exception as e:
+        log.error(f"[{tag}][page#{page_idx+1}] Remote SAM failed: {e}. Fallback to local.")
+        layout_items = segment_layout_boxes(**sam_kwargs)
+
+    log.info(f"[{tag}][page#{page_idx+1}] SAM found {len(layout_items)} items")
+    _normalized_to_px(layout_items, img_path, tag, page_idx)
+    return {"page_idx": page_idx, "layout_items": layout_items}
+
+
+async def mineru_page(
+    img_path: str,
+    page_idx: int,
+    base_dir: str,
+    port: int,
+    max_depth: int = 3,
+    timeout: Optional[float] = None,
+    tag: str = "pdf2ppt",
+) -> Dict[str, Any]:
+    """单页 MinerU 版面分析；失败（或超时）时返回空 blocks。"""
+    from dataflow_agent.toolkits.multimodaltool.mineru_tool import recursive_mineru_layout
+
+    out_dir = Path(base_dir) / "mineru_pages" / f"page_{page_idx+1:03d}"
+    try:
+        out_dir.mkdir(parents=True, exist_ok=True)
+        coro = recursive_mineru_layout(
+            image_path=str(img_path),
+            port=port,
+            max_depth=max_depth,
+            output_dir=str(out_dir),
+        )
+        mineru_items = await (asyncio.wait_for(coro, timeout=timeout) if timeout else coro)
+    except asyncio.TimeoutError:
+        log.error(f"[{tag}][MinerU] page#{page_idx+1} MinerU timeout (>{timeout}s)")
+        return {"page_idx": page_idx, "blocks": [], "path": img_path}
+    except Exception as e:
+        log.error(f"[{tag}][MinerU] page#{page_idx+1} failed: {e}")
+        return {"page_idx": page_idx, "blocks": [], "path": img_path}
+
+    log.info(f"[{tag}][MinerU] page#{page_idx+1} got {len(mineru_items)} blocks")
+    return {
+        "page_idx": page_idx,
+        "blocks": mineru_items,
+        "path": img_path,
+        "mineru_output_dir": str(out_dir),
+    }
+
+
+def bg_remove_page(
+    sam_result: Dict[str, Any],
+    base_dir: str,
+    model_path: Optional[str] = None,
+    tag: str = "pdf2ppt",
+) -> Dict[str, Any]:
+    """
+    对单页 SAM 图块做背景抠图，为每个 layout_item 写入 fg_png_path
+    （page_XXX_<stem>_bg_removed.png，加页码前缀避免不同页的文件名冲突）。
+
+    抠图请求提交给进程内共享的 bg_service，与其它页面 / 并发任务的图块合批推理，
+    因此本阶段可以开多个 worker；模型常驻，空闲超时后由服务自行释放。
+    """
+    from dataflow_agent.toolkits.multimodaltool.bg_service import get_bg_remove_service
+
+    page_idx = sam_result.get("page_idx", 0)
+    icons_dir = Path(base_dir) / "sam_icons"
+    icons_dir.mkdir(parents=True, exist_ok=True)
+
+    service = get_bg_remove_service(model_path)
+    submitted = []
+    for it in sam_result.get("layout_items", []):
+        png_path = it.get("png_path")
+        if not png_path or not os.path.exists(png_path):
+            continue
+        output_filename = f"page_{page_idx+1:03d}_{Path(png_path).stem}_bg_removed.png"
+        try:
+            submitted.append((it, service.submit(png_path, str(icons_dir), output_name=output_filename)))
+        except Exception as e:
+            log.error(f"[{tag}][bg_rm] submit failed for {png_path}: {e}")
+            it["fg_png_path"] = png_path
+
+    for it, rid in submitted:
+        try:
+            fg_path = service.result(rid)
+            it["fg_png_path"] = fg_path if fg_path and os.path.exists(fg_path) else it["png_path"]
+        except Exception as e:
+            log.error(f"[{tag}][bg_rm] failed for {it.get('png_path')}: {e}")
+            it["fg_png_path"] = it["png_path"]
+    return sam_result
+
+
+def release_models(sam_checkpoint: Optional[str] = None, tag: str = "pdf2ppt") -> None:
+    """
+    流水线结束时的模型清理（失败只记日志）。
+
+    本地 SAM 模型由 model_residency 常驻，按空闲时间 / 内存压力淘汰，下一个任务直接复用，
+    这里只在内存紧张时触发一次淘汰；抠图模型由 bg_service 按空闲超时释放。
+    需要立即释放时调用 sam_tool.free_sam_model(sam_checkpoint)。
+    """
+    if sam_checkpoint:
+        try:
+            from dataflow_agent.toolkits.multimodaltool.model_residency import get_model_residency
+
+            get_model_residency().relieve_pressure()
+        except Exception as e:
+            log.error(f"[{tag}] model residency check failed: {e}")
@@ -0,0 +1,390 @@
+"""
+PDF 页面栅格化服务：进程池并行渲染 + 按内容寻址的页面缓存 + 逐页流式输出。
+
+用法：
+    from dataflow_agent.toolkits.multimodaltool.pdf_raster import iter_rendered_pages, render_pdf
+
+    for png in iter_rendered_pages(pdf_path, dpi=220, out_dir=slides_dir):   # 每页渲染完就拿到
+        ...
+    paths = render_pdf(pdf_path, dpi=150, out_dir=images_dir, name_fmt="page_{n}.png")
+
+- 缓存键为 (PDF 内容 sha256, 页码, dpi)，同一份 PDF 被 paper2ppt / pdf2ppt / paper2drawio
+  等多个工作流重复渲染时直接命中缓存；
+- 未命中的页面提交到常驻进程池，每个 worker 对同一 PDF 只打开一次 fitz.Document；
+- 缓存文件先写临时文件再 os.replace，并发渲染同一页不会读到半截 PNG；
+- 指定 out_dir 时把缓存页复制到 out_dir，保持各工作流原有的目录结构；
+- 容量上限：超过 DF_PDF_RASTER_CACHE_MAX_GB 时按 PDF 最近使用时间淘汰整份 PDF 的页面
+  （正在使用或最近 10 分钟内用过的不淘汰；已复制到 out_dir 的页面不受影响）。
+
+输出统一为 RGB PNG（灰度 / CMYK 页面会先转换为 RGB）。
+
+配置：
+- DF_PDF_RASTER_CACHE:    缓存目录（默认 <项目根>/outputs/cache/pdf_pages；设为 "off" 关闭缓存）
+- DF_PDF_RASTER_CACHE_MAX_GB: 缓存容量上限（默认 10）
+- DF_PDF_RASTER_WORKERS:  渲染进程数（默认 min(4, CPU 数)；1 表示在当前进程内串行渲染）
+"""
+from __future__ import annotations
+
+import atexit
+import hashlib
+import multiprocessing
+import os
+import shutil
+import tempfile
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+from dataflow_agent.logger import get_logger
+
+log = get_logger(__name__)
+
+DEFAULT_CACHE_DIR = Path(__file__).resolve().parents[3] / "outputs" / "cache" / "pdf_pages"
+
+_HASH_MEMO: Dict[Tuple[str, int, int], str] = {}
+_HASH_LOCK = threading.Lock()
+
+# 正在被本进程迭代的 PDF（哈希 -> 引用数），淘汰时跳过
+_ACTIVE: Dict[str, int] = {}
+_LAST_EVICT = 0.0
+# 两次淘汰扫描的最小间隔 / 最近使用过的条目的保护期（秒）
+_EVICT_INTERVAL = 60.0
+_EVICT_GRACE = 600.0
+
+_EXECUTOR: Optional[ProcessPoolExecutor] = None
+_EXECUTOR_LOCK = threading.Lock()
+
+# worker 进程内：每个 PDF 只打开一次
+_WORKER_DOCS: Dict[str, object] = {}
+
+
+# ----------------------------------------------------------------------
+# worker 端
+# ----------------------------------------------------------------------
+def _open_doc(pdf_path: str, doc_key: str):
+    import fitz  # PyMuPDF
+
+    doc = _WORKER_DOCS.get(doc_key)
+    if doc is None:
+        if len(_WORKER_DOCS) >= 8:
+            for old in list(_WORKER_DOCS.values()):
+                old.close()
+            _WORKER_DOCS.clear()
+        doc = fitz.open(pdf_path)
+        _WORKER_DOCS[doc_key] = doc
+    return doc
+
+
+def _render_page(pdf_path: str, page_index: int, dpi: int, out_path: str, doc_key: str) -> str:
+    """渲染单页到 out_path（原子写入），在 worker 进程或当前进程中执行。"""
+    import fitz  # PyMuPDF
+
+    doc = _open_doc(pdf_path, doc_key)
+    zoom = dpi / 72.0
+    pix = doc.load_page(page_index).get_pixmap(matrix=fitz.Matrix(zoom, zoom), alpha=False)
+    if pix.n != 3:
+        pix = fitz.Pixmap(fitz.csRGB, pix)
+
+    out = Path(out_path)
+    out.parent.mkdir(parents=True, exist_ok=True)
+    tmp = out.with_name(f".{out.stem}.{os.getpid()}.{threading.get_ident()}.tmp.png")
+    pix.save(str(tmp))
+    os.replace(tmp, out)
+    return str(out)
+
+
+# ----------------------------------------------------------------------
+# 调用方
+# ----------------------------------------------------------------------
+def _cache_root() -> Optional[Path]:
+    value = os.getenv("DF_PDF_RASTER_CACHE")
+    if value and value.lower() == "off":
+        return None
+    return Path(value) if value else DEFAULT_CACHE_DIR
+
+
+def _max_bytes() -> int:
+    try:
+        return int(float(os.getenv("DF_PDF_RASTER_CACHE_MAX_GB", "10")) * (1 << 30))
+    except ValueError:
+        return 10 << 30
+
+
+def _num_workers() -> int:
+    value = os.getenv("DF_PDF_RASTER_WORKERS")
+    if value:
+        try:
+            return max(1, int(value))
+        except ValueError:
+            log.warning(f"[pdf_raster] invalid DF_PDF_RASTER_WORKERS={value!r}, using default")
+    return max(1, min(4, os.cpu_count() or 1))
+
+
+def _get_executor() -> ProcessPoolExecutor:
+    global _EXECUTOR
+    with _EXECUTOR_LOCK:
+        if _EXECUTOR is None:
+            # spawn：API 进程里已有线程 / 事件循环，fork 不安全
+            _EXECUTOR = ProcessPoolExecutor(
+                max_workers=_num_workers(), mp_context=multiprocessing.get_context("spawn")
+            )
+            atexit.register(shutdown_raster_pool)
+        return _EXECUTOR
+
+
+def shutdown_raster_pool() -> None:
+    """关闭渲染进程池（下次渲染时按需重建）。"""
+    global _EXECUTOR
+    with _EXECUTOR_LOCK:
+        executor, _EXECUTOR = _EXECUTOR, None
+    if executor is not None:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+def pdf_sha256(pdf_path: str) -> str:
+    """PDF 内容哈希；按 (路径, 大小, mtime) 记忆，同一文件不重复计算。"""
+    p = Path(pdf_path).resolve()
+    st = p.stat()
+    memo_key = (str(p), st.st_size, st.st_mtime_ns)
+    with _HASH_LOCK:
+        cached = _HASH_MEMO.get(memo_key)
+    if cached:
+        return cached
+    h = hashlib.sha256()
+    with open(p, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    digest = h.hexdigest()
+    with _HASH_LOCK:
+        _HASH_MEMO[memo_key] = digest
+    return digest
+
+
+def page_count(pdf_path: str) -> int:
+    import fitz  # PyMuPDF
+
+    with fitz.open(pdf_path) as doc:
+        return len(doc)
+
+
+def cached_page_path(pdf_hash: str, page_index: int, dpi: int) -> Optional[Path]:
+    """(pdf hash, page, dpi) 对应的缓存文件路径；缓存关闭时返回 None。"""
+    root = _cache_root()
+    if root is None:
+        return None
+    return root / pdf_hash[:2] / pdf_hash / f"{int(dpi)}dpi" / f"page_{page_index + 1:04d}.png"
+
+
+# ----------------------------------------------------------------------
+# 容量控制
+# ----------------------------------------------------------------------
+def _entry_dir(pdf_hash: str) -> Optional[Path]:
+    root = _cache_root()
+    return None if root is None else root / pdf_hash[:2] / pdf_hash
+
+
+def _touch(pdf_hash: str) -> None:
+    """记录该 PDF 的最近使用时间（.last_used 的 mtime）。"""
+    entry = _entry_dir(pdf_hash)
+    if entry is None:
+        return
+    try:
+        entry.mkdir(parents=True, exist_ok=True)
+        marker = entry / ".last_used"
+        marker.touch()
+        os.utime(marker)
+    except OSError:
+        pass
+
+
+def _last_used(entry: Path) -> float:
+    try:
+        return (entry / ".last_used").stat().st_mtime
+    except OSError:
+        return entry.stat().st_mtime
+
+
+def _dir_size(path: Path) -> int:
+    total = 0
+    for dirpath, _, filenames in os.walk(path):
+        for name in filenames:
+            try:
+                total += os.stat(os.path.join(dirpath, name)).st_size
+            except OSError:
+                pass
+    return total
+
+
+def evict_raster_cache(force: bool = False) -> int:
+    """
+    按最近使用时间淘汰整份 PDF 的缓存页，直到总量低于 DF_PDF_RASTER_CACHE_MAX_GB；返回释放的字节数。
+    force=False 时每 _EVICT_INTERVAL 秒最多扫描一次。
+    """
+    global _LAST_EVICT
+    root = _cache_root()
+    if root is None or not root.is_dir():
+        return 0
+    now = time.time()
+    with _HASH_LOCK:
+        if not force and now - _LAST_EVICT < _EVICT_INTERVAL:
+            return 0
+        _LAST_EVICT = now
+        active = set(_ACTIVE)
+
+    limit = _max_bytes()
+    entries = []
+    total = 0
+    for shard in root.iterdir():
+        if not shard.is_dir() or shard.name.startswith("."):
+            continue
+        for entry in shard.iterdir():
+            if not entry.is_dir():
+                continue
+            size = _dir_size(entry)
+            total += size
+            entries.append((_last_used(entry), size, entry))
+    if total <= limit:
+        return 0
+
+    freed = 0
+    for last_used, size, entry in sorted(entries):
+        if total <= limit:
+            break
+        if entry.name in active or now - last_used < _EVICT_GRACE:
+            continue
+        shutil.rmtree(entry, ignore_errors=True)
+        total -= size
+        freed += size
+        log.info(f"[pdf_raster] evicted {entry.name} ({size / (1 << 20):.1f} MB)")
+        try:
+            entry.parent.rmdir()  # 空的分片目录
+        except OSError:
+            pass
+    return freed
+
+
+def _place(src: Path, dst: Path) -> str:
+    """
+    把缓存页复制到调用方目录。不用硬链接：下游若原地改写页面图片，会连带污染缓存。
+    """
+    if src == dst:
+        return str(dst)
+    dst.parent.mkdir(parents=True, exist_ok=True)
+    tmp = dst.with_name(f".{dst.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    shutil.copyfile(src, tmp)
+    os.replace(tmp, dst)
+    return str(dst)
+
+
+def iter_rendered_pages(
+    pdf_path: str,
+    dpi: int = 220,
+    out_dir: Optional[str] = None,
+    pages: Optional[Sequence[int]] = None,
+    name_fmt: str = "page_{n:03d}.png",
+) -> Iterator[str]:
+    """
+    按页序逐页产出 PNG 路径；某页一渲染完（或命中缓存）就立即 yield，不等整份 PDF。
+
+    参数
+    ----
+    pdf_path:
+        输入 PDF。
+    dpi:
+        渲染分辨率。
+    out_dir:
+        可选，把每页放到该目录下（文件名由 name_fmt 决定，n 为从 1 开始的页码）；
+        为 None 时直接返回缓存文件路径（调用方不应修改这些文件）；
+        缓存关闭时则写入临时目录，生成器结束后删除，调用方需在迭代过程中读取。
+    pages:
+        可选，只渲染这些页（0 起始）；默认全部页面。
+    """
+    pdf_path = str(Path(pdf_path).resolve())
+    indices = list(pages) if pages is not None else list(range(page_count(pdf_path)))
+    if not indices:
+        return
+
+    if _cache_root() is None and out_dir is None:
+        with tempfile.TemporaryDirectory(prefix="pdf_pages_") as tmp_dir:
+            yield from _iter_pages(pdf_path, dpi, tmp_dir, indices, name_fmt)
+        return
+    yield from _iter_pages(pdf_path, dpi, out_dir, indices, name_fmt)
+
+
+def _iter_pages(
+    pdf_path: str,
+    dpi: int,
+    out_dir: Optional[str],
+    indices: List[int],
+    name_fmt: str,
+) -> Iterator[str]:
+    st = os.stat(pdf_path)
+    doc_key = f"{pdf_path}|{st.st_size}|{st.st_mtime_ns}"  # 文件被替换后不复用旧的 Document
+
+    if _cache_root() is None:
+        targets = {i: Path(out_dir) / name_fmt.format(n=i + 1) for i in indices}
+        pdf_hash = None
+    else:
+        pdf_hash = pdf_sha256(pdf_path)
+        targets = {i: cached_page_path(pdf_hash, i, dpi) for i in indices}
+        with _HASH_LOCK:
+            _ACTIVE[pdf_hash] = _ACTIVE.get(pdf_hash, 0) + 1
+        _touch(pdf_hash)
+
+    # 关闭缓存时 out_dir 里的旧文件不可信，全部重新渲染
+    missing: List[int] = []
+    futures: Dict[int, Future] = {}
+    try:
+        missing = [i for i in indices if pdf_hash is None or not targets[i].exists()]
+        if len(missing) > 1 and _num_workers() > 1:
+            executor = _get_executor()
+            for i in missing:
+                futures[i] = executor.submit(_render_page, pdf_path, i, dpi, str(targets[i]), doc_key)
+        if missing:
+            log.info(
+                f"[pdf_raster] {Path(pdf_path).name}: {len(indices) - len(missing)}/{len(indices)} pages cached, "
+                f"rendering {len(missing)} at {dpi}dpi"
+            )
+
+        for i in indices:
+            if i in futures:
+                src = Path(futures[i].result())
+            elif i in missing:
+                src = Path(_render_page(pdf_path, i, dpi, str(targets[i]), doc_key))
+            else:
+                src = targets[i]
+                if not src.exists():  # 检查之后被其他进程淘汰
+                    src = Path(_render_page(pdf_path, i, dpi, str(targets[i]), doc_key))
+            if out_dir is not None and pdf_hash is not None:
+                yield _place(src, Path(out_dir) / name_fmt.format(n=i + 1))
+            else:
+                yield str(src)
+    finally:
+        for fut in futures.values():
+            fut.cancel()
+        if pdf_hash is not None:
+            with _HASH_LOCK:
+                _ACTIVE[pdf_hash] -= 1
+                if _ACTIVE[pdf_hash] <= 0:
+                    del _ACTIVE[pdf_hash]
+            if missing:
+                try:
+                    evict_raster_cache()
+                except Exception as e:
+                    log.warning(f"[pdf_raster] eviction failed: {e}")
+
+
+def render_pdf(
+    pdf_path: str,
+    dpi: int = 220,
+    out_dir: Optional[str] = None,
+    pages: Optional[Sequence[int]] = None,
+    name_fmt: str = "page_{n:03d}.png",
+) -> List[str]:
+    """iter_rendered_pages 的列表版本：渲染完全部页面后返回路径列表。"""
+    if out_dir is None and _cache_root() is None:
+        # 临时目录在迭代结束后即被删除，返回的路径不可用
+        raise ValueError("out_dir is required when DF_PDF_RASTER_CACHE=off")
+    return list(iter_rendered_pages(pdf_path, dpi=dpi, out_dir=out_dir, pages=pages, name_fmt=name_fmt))
@@ -2,17 +2,20 @@ from __future__ import annotations
 
 import hashlib
 import os
+import sqlite3
 import tempfile
+import threading
 import subprocess
 from dataclasses import dataclass
 from pathlib import Path
-from typing import Dict, Optional, Tuple
+from typing import Dict, List, Optional, Tuple
 
 import fitz  # PyMuPDF
 import numpy as np
 from pptx import Presentation
 from pptx.util import Inches, Pt
 from pptx.enum.text import MSO_AUTO_SIZE
+from PIL import ImageFont
 
 from dataflow_agent.logger import get_logger
 from dataflow_agent.utils import pixels_to_inches
@@ -306,4 +309,364 @@ class PptTextFitter:
         return True
 
 
-DEFAULT_FITTER = PptTextFitter()
+# ----------------------------------------------------------------------
+# Font-metric fitter (in-process, no soffice round-trip)
+# ----------------------------------------------------------------------
+
+# Default persistent cache location; override with DF_TEXT_FIT_CACHE ("off" disables it)
+DEFAULT_FIT_CACHE_DB = Path(__file__).resolve().parents[3] / "outputs" / "cache" / "text_fit.db"
+
+# Font files tried (via Pillow's font search path) for common PPT font names.
+# LibreOffice substitutes Arial with Liberation Sans, which is metric-compatible.
+_LATIN_FONT_CANDIDATES: Dict[Tuple[str, bool], List[str]] = {
+    ("arial", False): ["arial.ttf", "Arial.ttf", "LiberationSans-Regular.ttf", "DejaVuSans.ttf"],
+    ("arial", True): ["arialbd.ttf", "Arial Bold.ttf", "LiberationSans-Bold.ttf", "DejaVuSans-Bold.ttf"],
+}
+_CJK_FONT_CANDIDATES: List[str] = [
+    "NotoSansCJK-Regular.ttc",
+    "NotoSansSC-Regular.otf",
+    "SourceHanSansSC-Regular.otf",
+    "wqy-microhei.ttc",
+    "msyh.ttc",
+    "simhei.ttf",
+    "PingFang.ttc",
+]
+
+# Kinsoku rules: characters that may not start / end a line (attached to their neighbour)
+_NO_LINE_START = set("，。、．,.!！?？:：;；)）]】}」』》〉”’%‰·…～")
+_NO_LINE_END = set("（([【{「『《〈“‘")
+
+_REF_SIZE = 256  # glyph advances are measured once at this pixel size and scaled linearly
+_NOTDEF_PROBE = "\U0010FFFD"  # plane-16 private use, not mapped by real fonts
+
+
+def _is_cjk(ch: str) -> bool:
+    cp = ord(ch)
+    return (
+        0x2E80 <= cp <= 0x9FFF  # CJK radicals, kana, unified ideographs
+        or 0xAC00 <= cp <= 0xD7AF  # Hangul
+        or 0xF900 <= cp <= 0xFAFF
+        or 0xFE30 <= cp <= 0xFE4F
+        or 0xFF00 <= cp <= 0xFFEF  # full-width forms
+        or 0x20000 <= cp <= 0x2FA1F
+    )
+
+
+def _load_font(candidates: List[str]) -> Optional["ImageFont.FreeTypeFont"]:
+    for name in candidates:
+        if not name:
+            continue
+        try:
+            return ImageFont.truetype(name, _REF_SIZE)
+        except (OSError, ValueError):
+            continue
+    return None
+
+
+class _GlyphMetrics:
+    """Per-character advances (in em) for one font family / weight, with a CJK fallback font."""
+
+    # Used when no font file can be found at all
+    _FALLBACK_LATIN_EM = 0.55
+    _FALLBACK_LINE_EM = 1.15
+
+    def __init__(self, font_name: str, bold: bool):
+        key = ((font_name or "arial").lower(), bool(bold))
+        env_font = os.getenv("DF_TEXT_FIT_FONT_BOLD" if bold else "DF_TEXT_FIT_FONT")
+        candidates = [env_font or ""] + [f"{font_name}.ttf"] + _LATIN_FONT_CANDIDATES.get(
+            key, _LATIN_FONT_CANDIDATES[("arial", bool(bold))]
+        )
+        self.latin = _load_font(candidates)
+        self.cjk = _load_font([os.getenv("DF_TEXT_FIT_CJK_FONT") or ""] + _CJK_FONT_CANDIDATES)
+        self.bold = bool(bold)
+        self._adv: Dict[str, float] = {}
+
+        if self.latin is not None:
+            ascent, descent = self.latin.getmetrics()
+            self.line_em = (ascent + descent) / _REF_SIZE
+        else:
+            log.warning(f"[ppt_text_fit] no font file found for {font_name!r}, using estimated metrics")
+            self.line_em = self._FALLBACK_LINE_EM
+
+    @property
+    def font_paths(self) -> Tuple[str, str]:
+        """Resolved (latin, cjk) font file paths, empty when not found; part of the fit cache key."""
+        return (
+            str(getattr(self.latin, "path", "") or ""),
+            str(getattr(self.cjk, "path", "") or ""),
+        )
+
+    @staticmethod
+    def _is_notdef(font: "ImageFont.FreeTypeFont", ch: str) -> bool:
+        # Missing glyphs render as .notdef; compare against a code point no real font maps
+        probe = _NOTDEF_PROBE
+        return font.getlength(ch) == font.getlength(probe) and font.getbbox(ch) == font.getbbox(probe)
+
+    def advance_em(self, ch: str) -> float:
+        adv = self._adv.get(ch)
+        if adv is not None:
+            return adv
+        cjk = _is_cjk(ch)
+        if cjk:
+            # Without a CJK font (or if it lacks the glyph) assume a full-width 1 em advance
+            # rather than the width of some font's .notdef box
+            font = self.cjk
+            if font is None or self._is_notdef(font, ch):
+                adv = 1.0
+            else:
+                adv = font.getlength(ch) / _REF_SIZE
+        elif self.latin is not None:
+            adv = self.latin.getlength(ch) / _REF_SIZE
+        else:
+            adv = self._FALLBACK_LATIN_EM * (1.08 if self.bold else 1.0)
+        self._adv[ch] = adv
+        return adv
+
+    def width_em(self, s: str) -> float:
+        return sum(self.advance_em(ch) for ch in s)
+
+
+def _break_units(paragraph: str) -> List[str]:
+    """
+    Split a paragraph into unbreakable units, mirroring LibreOffice line breaking:
+    Latin words break at spaces, every CJK character is a break opportunity,
+    and kinsoku punctuation sticks to its neighbour. Whitespace units are kept
+    as separate " " entries.
+    """
+    units: List[str] = []
+    word = ""
+    for ch in paragraph:
+        if ch.isspace():
+            if word:
+                units.append(word)
+                word = ""
+            units.append(" ")
+        elif _is_cjk(ch) or ch in _NO_LINE_START:
+            if word:
+                units.append(word)
+                word = ""
+            units.append(ch)
+        else:
+            word += ch
+    if word:
+        units.append(word)
+
+    merged: List[str] = []
+    for u in units:
+        if merged and merged[-1] != " " and u[0] in _NO_LINE_START:
+            merged[-1] += u
+        elif merged and merged[-1] != " " and merged[-1][-1] in _NO_LINE_END:
+            merged[-1] += u
+        elif merged and merged[-1] != " " and not _is_cjk(u[0]) and not _is_cjk(merged[-1][-1]) and u != " ":
+            # consecutive Latin fragments (e.g. split by a Latin "," rule) form one word
+            merged[-1] += u
+        else:
+            merged.append(u)
+    return merged
+
+
+class MetricTextFitter:
+    """
+    Fit text size from font metrics instead of rendering.
+
+    Wrapping follows what LibreOffice does for a python-pptx textbox with
+    word_wrap=True and auto_size=NONE: greedy line filling inside the box minus
+    the inset margins, breaks at spaces for Latin text, between any two CJK
+    characters (with kinsoku punctuation kept attached), and character-level
+    emergency breaks for words wider than the box. Text fits when the wrapped
+    block's height (lines x ascent+descent x line_spacing) stays within the box.
+
+    Results are cached in memory and in a small SQLite file keyed by
+    (text, box size, style, bounds), so re-running a deck is free.
+    """
+
+    CACHE_VERSION = "metric-v2"
+
+    def __init__(self, dpi: int = 96, cache_path: Optional[str] = None):
+        self.dpi = dpi
+        self._metrics: Dict[Tuple[str, bool], _GlyphMetrics] = {}
+        self._cache: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._db: Optional[sqlite3.Connection] = None
+        self._db_path = cache_path if cache_path is not None else os.getenv("DF_TEXT_FIT_CACHE", str(DEFAULT_FIT_CACHE_DB))
+        self._db_failed = False
+
+    # ---------------- persistent cache ----------------
+    def _conn(self) -> Optional[sqlite3.Connection]:
+        if self._db is not None or self._db_failed:
+            return self._db
+        if not self._db_path or self._db_path.lower() == "off":
+            self._db_failed = True
+            return None
+        try:
+            Path(self._db_path).parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(self._db_path, timeout=10, check_same_thread=False, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("CREATE TABLE IF NOT EXISTS text_fit (key TEXT PRIMARY KEY, font_pt INTEGER NOT NULL)")
+            self._db = conn
+        except Exception as e:
+            log.warning(f"[ppt_text_fit] persistent cache disabled ({self._db_path}): {e}")
+            self._db_failed = True
+        return self._db
+
+    def _cache_get(self, key: str) -> Optional[int]:
+        with self._lock:
+            if key in self._cache:
+                return self._cache[key]
+            conn = self._conn()
+            if conn is None:
+                return None
+            try:
+                row = conn.execute("SELECT font_pt FROM text_fit WHERE key = ?", (key,)).fetchone()
+            except sqlite3.Error:
+                return None
+            if row is not None:
+                self._cache[key] = int(row[0])
+                return int(row[0])
+            return None
+
+    def _cache_put(self, key: str, value: int) -> None:
+        with self._lock:
+            self._cache[key] = value
+            conn = self._conn()
+            if conn is None:
+                return
+            try:
+                conn.execute("INSERT OR REPLACE INTO text_fit (key, font_pt) VALUES (?, ?)", (key, int(value)))
+            except sqlite3.Error as e:
+                log.warning(f"[ppt_text_fit] cache write failed: {e}")
+
+    # ---------------- measuring ----------------
+    def _glyphs(self, style: TextFitStyle) -> _GlyphMetrics:
+        key = (style.font_name or "Arial", bool(style.bold))
+        gm = self._metrics.get(key)
+        if gm is None:
+            gm = _GlyphMetrics(*key)
+            self._metrics[key] = gm
+        return gm
+
+    def layout_lines(self, text: str, avail_w_em: float, style: TextFitStyle) -> Optional[int]:
+        """
+        Number of lines ``text`` wraps into when the line is ``avail_w_em`` ems wide
+        (available width divided by font size). Returns None if a single glyph is
+        wider than the line, i.e. the text can never fit at this size.
+        """
+        gm = self._glyphs(style)
+        space_em = gm.advance_em(" ")
+        total = 0
+        for paragraph in text.split("\n"):
+            lines, cur, pending = 1, 0.0, 0.0
+            for unit in _break_units(paragraph):
+                if unit == " ":
+                    if cur > 0:
+                        pending += space_em  # trailing spaces may hang past the margin
+                    continue
+                w = gm.width_em(unit)
+                if cur > 0 and cur + pending + w <= avail_w_em:
+                    cur += pending + w
+                    pending = 0.0
+                    continue
+                if cur > 0:
+                    lines += 1
+                cur, pending = 0.0, 0.0
+                if w <= avail_w_em:
+                    cur = w
+                    continue
+                # emergency break inside an over-long word
+                for ch in unit:
+                    cw = gm.advance_em(ch)
+                    if cw > avail_w_em:
+                        return None
+                    if cur + cw > avail_w_em:
+                        lines += 1
+                        cur = 0.0
+                    cur += cw
+            total += lines
+        return total
+
+    def fits(
+        self,
+        *,
+        text: str,
+        box_w_px: int,
+        box_h_px: int,
+        style: TextFitStyle,
+        font_pt: float,
+        tolerance_px: int = 2,
+    ) -> bool:
+        px_to_pt = 72.0 / self.dpi
+        avail_w_pt = (box_w_px - 2 * style.margin_px) * px_to_pt
+        if avail_w_pt <= 0 or font_pt <= 0:
+            return False
+        lines = self.layout_lines(text, avail_w_pt / font_pt, style)
+        if lines is None:
+            return False
+        line_h_pt = self._glyphs(style).line_em * font_pt * float(style.line_spacing or 1.0)
+        # Text is top-anchored: ink ends roughly one line-height per line below the top inset
+        used_h_pt = style.margin_px * px_to_pt + lines * line_h_pt
+        return used_h_pt <= (box_h_px + tolerance_px) * px_to_pt
+
+    def fit_font_size_pt(
+        self,
+        *,
+        text: str,
+        bbox_px: Tuple[int, int, int, int],
+        slide_w_px: int,
+        slide_h_px: int,
+        style: TextFitStyle,
+        lower_pt: int = 6,
+        upper_pt: Optional[int] = None,
+        tolerance_px: int = 2,
+        max_iter: int = 10,
+    ) -> int:
+        """Same contract as PptTextFitter.fit_font_size_pt (slide size is unused)."""
+        text = (text or "").strip()
+        if not text:
+            return 12
+
+        x1, y1, x2, y2 = bbox_px
+        box_w = max(1, x2 - x1)
+        box_h = max(1, y2 - y1)
+        if upper_pt is None:
+            upper_pt = max(lower_pt + 1, int(box_h * 0.8))
+
+        h = hashlib.sha1()
+        h.update(text.encode("utf-8", errors="ignore"))
+        h.update(
+            f"|{self.CACHE_VERSION}|{self.dpi}|{box_w}x{box_h}|{style.font_name}|{int(style.bold)}"
+            f"|{'|'.join(self._glyphs(style).font_paths)}"
+            f"|{style.line_spacing}|{style.margin_px}|{lower_pt}-{upper_pt}|{tolerance_px}|{max_iter}".encode()
+        )
+        cache_key = h.hexdigest()
+        cached = self._cache_get(cache_key)
+        if cached is not None:
+            return cached
+
+        lo, hi = int(lower_pt), int(upper_pt)
+        best = lo
+        for _ in range(max_iter):
+            if lo > hi:
+                break
+            mid = (lo + hi) // 2
+            if self.fits(text=text, box_w_px=box_w, box_h_px=box_h, style=style, font_pt=mid, tolerance_px=tolerance_px):
+                best = mid
+                lo = mid + 1
+            else:
+                hi = mid - 1
+
+        self._cache_put(cache_key, best)
+        return best
+
+
+def make_default_fitter():
+    """
+    DF_TEXT_FIT_METHOD selects the fitter: "metric" (default, in-process font metrics)
+    or "render" (LibreOffice render loop, the reference implementation).
+    """
+    method = (os.getenv("DF_TEXT_FIT_METHOD") or "metric").lower()
+    if method == "render":
+        return PptTextFitter()
+    return MetricTextFitter()
+
+
+DEFAULT_FITTER = make_default_fitter()
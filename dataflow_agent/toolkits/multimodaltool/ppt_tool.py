@@ -3,7 +3,7 @@
 ppt_tool
 
 本模块将一组顺序图片通过 PaddleOCR 识别为可编辑文本，自动分析行高、版式和颜色，生成带“干净底图+覆盖文字框”的 PPTX，并可选同时导出 PDF；
-内部提供多种参数控制背景 inpaint 强度（INPAINT_METHOD/INPAINT_RADIUS、SIMPLE_BG_VAR_THRESH、MASK_DILATE_ITER、USE_ADAPTIVE_MASK）、
+内部提供多种参数控制背景 inpaint 强度（INPAINT_METHOD/INPAINT_RADIUS/INPAINT_SCALE、SIMPLE_BG_VAR_THRESH、MASK_DILATE_ITER、USE_ADAPTIVE_MASK）、
 OCR 分辨率与锐化（UPSCALE_LONG_SIDE_TO、UPSCALE_INTERP、ENABLE_SHARPEN、SHARPEN_AMOUNT）、
 文本过滤阈值（DROP_SCORE）以及字号放大与标题/副标题对正文的比例（BASE_BODY_PT、FONT_SCALE_FACTOR、TITLE_RATIO_*/SUBTITLE_RATIO_*/BODY_RATIO_*），
 并通过 ADD_BACKGROUND_IMAGE / CLEAN_BACKGROUND / EXTRACT_TEXT_COLOR 控制是否叠加背景图片、是否抠掉原文字、是否按原图估计文字颜色，从而在“还原视觉效果”与“可编辑性/美观度”和运行性能之间做平衡。
@@ -47,7 +47,7 @@ OCR 分辨率与锐化（UPSCALE_LONG_SIDE_TO、UPSCALE_INTERP、ENABLE_SHARPEN
 # build_adaptive_mask(bgr, lines): 结合局部对比度与自适应阈值，生成更精细的文字主 mask。
 # is_simple_background_region(bgr, mask): 判断文字区域邻域背景是否近似纯色（方差较小）。
 # fill_with_neighbor(bgr, mask): 对复杂背景的文字区域先用邻域像素进行粗填充，缓解 inpaint 伪影。
-# make_clean_background(bgr, lines): 基于文字 mask 和 inpaint 生成“去文字的干净底图”。
+# make_clean_background(bgr, lines, inpaint_scale): 基于文字 mask 和 inpaint 生成“去文字的干净底图”（可选缩小后 inpaint）。
 # ocr_images_to_ppt(image_paths, output_pptx, add_background_image, clean_background, use_text_color): 将图片序列通过 OCR 转成带背景与覆盖文本框的可编辑 PPT。
 # images_to_pdf_and_ppt(image_paths, output_pdf_path, output_pptx_path, add_background_image, clean_background, extract_text_color): 将给定图片列表一站式转换为 PDF 和 PPTX 并返回路径。
 # convert_images_dir_to_pdf_and_ppt(input_dir, output_pdf_path, output_pptx_path, add_background_image, clean_background, extract_text_color): 从图片目录读取图片并生成对应的 PDF + PPTX。
@@ -55,18 +55,14 @@ OCR 分辨率与锐化（UPSCALE_LONG_SIDE_TO、UPSCALE_INTERP、ENABLE_SHARPEN
 
 import os
 import re
-from typing import Sequence, Optional, Dict, Any, List, Tuple
+from typing import Sequence, Optional, Dict, Any, Iterator, List, Tuple
 import requests
 import random
 from collections import Counter
 
-import fitz  # PyMuPDF
-from pathlib import Path
-
 import numpy as np
 from PIL import Image
 import cv2
-from paddleocr import PaddleOCR
 
 from pptx import Presentation
 from pptx.util import Inches, Pt
@@ -74,6 +70,8 @@ from pptx.dml.color import RGBColor
 from pptx.enum.text import PP_ALIGN, MSO_ANCHOR
 from dataflow_agent.utils import get_project_root
 from dataflow_agent.logger import get_logger
+from dataflow_agent.toolkits.multimodaltool.ocr_engine import ocr_engine
+from dataflow_agent.toolkits.multimodaltool.tiling import merge_tiled_detections, needs_tiling, plan_tiles
 from typing import Union
 
 log = get_logger(__name__)
@@ -89,6 +87,7 @@ INPAINT_RADIUS = 7  # 增大修复半径（从3提高到7）
 SIMPLE_BG_VAR_THRESH = 50.0  # 放宽阈值（从12提高到50）
 MASK_DILATE_ITER = 2  # 增加膨胀次数（从1提高到2）
 USE_ADAPTIVE_MASK = True  # 使用自适应mask生成
+INPAINT_SCALE = 1.0  # inpaint 前的缩放比例（<1 时缩小后 inpaint 再放大回原图，只替换 mask 区域；1.0 与原图等价）
 
 # 输出PPT比例（16:9）
 SLIDE_W_IN = 13.333
@@ -117,13 +116,8 @@ SUBTITLE_RATIO_MAX = 2.0  # 副标题最大倍率
 BODY_RATIO_MIN = 0.9  # 正文最小倍率
 BODY_RATIO_MAX = 1.1  # 正文最大倍率
 
-# PaddleOCR 配置（全局只初始化一次）
-PADDLE_OCR = PaddleOCR(
-    use_angle_cls=True,  # 角度分类，处理横竖混排
-    lang="ch",  # 中文 + 英文
-    det_db_unclip_ratio=1.2 ,
-    det_db_box_thresh=0.5
-)
+# PaddleOCR 引擎由 ocr_engine 按需加载（首次 OCR 时才加载模型），
+# 配置见 ocr_engine.configure_ocr / DF_OCR_* 环境变量，释放见 ocr_engine.free_ocr_model
 
 # ----------------------------
 # Font Size Clustering
@@ -296,6 +290,18 @@ def images_to_pdf(image_paths: Sequence[str], output_pdf_path: str) -> str:
     return output_pdf_path
 
 
+def iter_pdf_pages(pdf_path: str, out_dir: str, dpi: int = 220) -> Iterator[str]:
+    """
+    逐页渲染 PDF：每渲染完一页就 yield 该页 PNG 路径，
+    供逐页流水线（page_pipeline）边渲染边处理，不必等整份 PDF 渲染完。
+    渲染由 pdf_raster 在进程池中并行完成，并按 (PDF 哈希, 页码, dpi) 缓存。
+    参数含义同 pdf_to_images。
+    """
+    from dataflow_agent.toolkits.multimodaltool.pdf_raster import iter_rendered_pages
+
+    yield from iter_rendered_pages(pdf_path, dpi=dpi, out_dir=out_dir)
+
+
 def pdf_to_images(pdf_path: str, out_dir: str, dpi: int = 220) -> List[str]:
     """
     将 PDF 每一页渲染为 PNG 图片，返回图片路径列表（按页码顺序）。
@@ -314,22 +320,7 @@ def pdf_to_images(pdf_path: str, out_dir: str, dpi: int = 220) -> List[str]:
     List[str]
         按页码顺序排列的 PNG 图片绝对路径列表。
     """
-    doc = fitz.open(pdf_path)
-    out_dir_path = Path(out_dir)
-    out_dir_path.mkdir(parents=True, exist_ok=True)
-
-    image_paths: List[str] = []
-    for page_index in range(len(doc)):
-        page = doc.load_page(page_index)
-        zoom = dpi / 72.0
-        mat = fitz.Matrix(zoom, zoom)
-        pix = page.get_pixmap(matrix=mat, alpha=False)
-
-        img_path = out_dir_path / f"page_{page_index + 1:03d}.png"
-        pix.save(str(img_path))
-        image_paths.append(str(img_path))
-
-    doc.close()
+    image_paths = list(iter_pdf_pages(pdf_path, out_dir, dpi=dpi))
     log.info(f"[pdf_to_images] rendered {len(image_paths)} pages from {pdf_path}")
     return image_paths
 
@@ -469,7 +460,8 @@ def paddle_ocr(bgr: np.ndarray, drop_score: int = DROP_SCORE):
     h, w = bgr.shape[:2]
 
     # ocr_result: List[List[ [box, (text, score)], ... ]]
-    ocr_result = PADDLE_OCR.ocr(bgr, cls=True)
+    with ocr_engine() as engine:
+        ocr_result = engine.ocr(bgr, cls=True)
     lines = []
 
     if not ocr_result:
@@ -503,6 +495,44 @@ def paddle_ocr(bgr: np.ndarray, drop_score: int = DROP_SCORE):
     return lines
 
 
+def _paddle_ocr_scaled(bgr: np.ndarray, name: str = "") -> List[Tuple[List[float], str, float]]:
+    """预处理（放大 + 锐化）后 OCR，bbox 映射回 bgr 的像素坐标。"""
+    h0, w0 = bgr.shape[:2]
+    ocr_img, scale = preprocess_for_ocr(bgr)
+    h1, w1 = ocr_img.shape[:2]
+
+    log.info(f"[paddle_ocr_page_with_layout] {name} up-scale={scale:.3f}")
+
+    raw_lines = paddle_ocr(ocr_img)
+
+    # 映射回原图像素坐标
+    if raw_lines and (w1 != w0 or h1 != h0):
+        sx = w0 / float(w1)
+        sy = h0 / float(h1)
+        raw_lines = [
+            ([b[0] * sx, b[1] * sy, b[2] * sx, b[3] * sy], t, c)
+            for (b, t, c) in raw_lines
+        ]
+    return raw_lines
+
+
+def _paddle_ocr_tiled(bgr: np.ndarray) -> List[Tuple[List[float], str, float]]:
+    """按 tiling.plan_tiles 分块 OCR，结果平移到全局坐标后合并重叠区里的重复 / 被切开的文本行。"""
+    h0, w0 = bgr.shape[:2]
+    dets = []
+    for i, tile in enumerate(plan_tiles(w0, h0)):
+        crop = bgr[tile.y0:tile.y1, tile.x0:tile.x1]
+        for bbox, text, conf in _paddle_ocr_scaled(crop, f"tile#{i}"):
+            dets.append({
+                "bbox_px": tile.to_global(bbox),
+                "text": text,
+                "conf": conf,
+                "tile": tile,
+                "truncated": tile.truncates(bbox),
+            })
+    return [(d["bbox_px"], d["text"], d["conf"]) for d in merge_tiled_detections(dets)]
+
+
 def paddle_ocr_page_with_layout(img_path: str) -> Dict[str, Any]:
     """
     对单页图片执行：
@@ -524,23 +554,12 @@ def paddle_ocr_page_with_layout(img_path: str) -> Dict[str, Any]:
     bgr = read_bgr(img_path)
     h0, w0 = bgr.shape[:2]
 
-    # 预处理
-    ocr_img, scale = preprocess_for_ocr(bgr)
-    h1, w1 = ocr_img.shape[:2]
-
-    log.info(f"[paddle_ocr_page_with_layout] {os.path.basename(img_path)} up-scale={scale:.3f}")
-
-    # OCR
-    raw_lines = paddle_ocr(ocr_img)
-
-    # 映射回原图像素坐标
-    if raw_lines and (w1 != w0 or h1 != h0):
-        sx = w0 / float(w1)
-        sy = h0 / float(h1)
-        raw_lines = [
-            ([b[0] * sx, b[1] * sy, b[2] * sx, b[3] * sy], t, c)
-            for (b, t, c) in raw_lines
-        ]
+    if needs_tiling(w0, h0):
+        # 大图：分块 OCR，避免整页放大后占用过多内存、小字被整体缩放吃掉
+        log.info(f"[paddle_ocr_page_with_layout] {os.path.basename(img_path)} {w0}x{h0} -> tiled OCR")
+        raw_lines = _paddle_ocr_tiled(bgr)
+    else:
+        raw_lines = _paddle_ocr_scaled(bgr, os.path.basename(img_path))
 
     # 合并行
     y_tol = max(12, int(h0 * 0.008))
@@ -836,16 +855,14 @@ def build_text_mask_from_lines(bgr: np.ndarray, lines) -> np.ndarray:
     return mask
 
 
-def build_adaptive_mask(bgr: np.ndarray, lines) -> np.ndarray:
-    """
-    使用自适应方法生成更精细的文字主mask
-    结合OCR bbox和实际文字形状（内部边缘 + 阈值）
-    """
-    h, w = bgr.shape[:2]
-    mask = np.zeros((h, w), dtype=np.uint8)
+# 自适应阈值的块大小；拼图时每块四周按 BORDER_REPLICATE 补的边宽（= 块半径）
+_ADAPTIVE_BLOCK = 11
+_ADAPTIVE_PAD = _ADAPTIVE_BLOCK // 2
 
-    gray = cv2.cvtColor(bgr, cv2.COLOR_BGR2GRAY)
 
+def _clip_line_boxes(lines, w: int, h: int) -> List[Tuple[int, int, int, int]]:
+    """OCR 行框取整并裁剪到图像范围，丢弃空框。"""
+    boxes = []
     for bbox, text, conf in lines:
         x1, y1, x2, y2 = [int(round(v)) for v in bbox]
         x1 = max(0, min(w - 1, x1))
@@ -854,41 +871,93 @@ def build_adaptive_mask(bgr: np.ndarray, lines) -> np.ndarray:
         y2 = max(0, min(h, y2))
         if x2 <= x1 or y2 <= y1:
             continue
+        boxes.append((x1, y1, x2, y2))
+    return boxes
 
-        region = gray[y1:y2, x1:x2]
-        if region.size == 0:
-            continue
 
+def _batched_adaptive_binary(gray: np.ndarray, boxes: List[Tuple[int, int, int, int]]) -> List[np.ndarray]:
+    """
+    对多个行区域一次性做 adaptiveThreshold + MORPH_CLOSE，结果与逐块调用完全一致。
+
+    每块先按 BORDER_REPLICATE 向外补 _ADAPTIVE_PAD 像素（与 adaptiveThreshold 内部对单块的
+    边界处理相同），纵向拼成一张图做一次阈值；闭运算的膨胀/腐蚀分两步做，
+    补边区域分别置 0 / 255，等价于 OpenCV 对单块的默认边界值。
+    """
+    pad = _ADAPTIVE_PAD
+    width = max(x2 - x1 for x1, y1, x2, y2 in boxes) + 2 * pad
+    height = sum(y2 - y1 + 2 * pad for x1, y1, x2, y2 in boxes)
+    mosaic = np.zeros((height, width), dtype=np.uint8)
+    inside = np.zeros((height, width), dtype=bool)
+
+    offsets = []
+    y = 0
+    for x1, y1, x2, y2 in boxes:
+        tile = cv2.copyMakeBorder(gray[y1:y2, x1:x2], pad, pad, pad, pad, cv2.BORDER_REPLICATE)
+        th, tw = tile.shape
+        mosaic[y:y + th, :tw] = tile
+        inside[y + pad:y + th - pad, pad:tw - pad] = True
+        offsets.append(y + pad)
+        y += th
+
+    binary = cv2.adaptiveThreshold(
+        mosaic, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, cv2.THRESH_BINARY_INV, _ADAPTIVE_BLOCK, 2
+    )
+    kernel = np.ones((2, 2), np.uint8)
+    binary[~inside] = 0
+    binary = cv2.dilate(binary, kernel)
+    binary[~inside] = 255
+    binary = cv2.erode(binary, kernel)
+
+    return [
+        binary[oy:oy + (y2 - y1), pad:pad + (x2 - x1)]
+        for oy, (x1, y1, x2, y2) in zip(offsets, boxes)
+    ]
+
+
+def build_adaptive_mask(bgr: np.ndarray, lines) -> np.ndarray:
+    """
+    使用自适应方法生成更精细的文字主mask
+    结合OCR bbox和实际文字形状（内部边缘 + 阈值）
+
+    对比度正常且尺寸足够的行（最常见的情况）合并成一次自适应阈值，
+    低对比度（Canny）与小区域（Otsu，阈值依赖区域本身）仍逐行处理。
+    """
+    h, w = bgr.shape[:2]
+    mask = np.zeros((h, w), dtype=np.uint8)
+
+    gray = cv2.cvtColor(bgr, cv2.COLOR_BGR2GRAY)
+
+    adaptive_boxes = []
+    for x1, y1, x2, y2 in _clip_line_boxes(lines, w, h):
+        region = gray[y1:y2, x1:x2]
         try:
             # 先看局部对比度
             if np.var(region) < 100:
                 # 对比度很低，优先用 Canny 边缘找笔画
                 edges = cv2.Canny(region, 50, 150)
-                kernel = np.ones((2, 2), np.uint8)
-                binary = cv2.dilate(edges, kernel, iterations=1)
+                binary = cv2.dilate(edges, np.ones((2, 2), np.uint8), iterations=1)
+            elif region.shape[0] < 20 or region.shape[1] < 20:
+                _, binary = cv2.threshold(region, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+                binary = 255 - binary  # 反色：文字为白
+                binary = cv2.morphologyEx(binary, cv2.MORPH_CLOSE, np.ones((2, 2), np.uint8))
             else:
-                # 对比度正常，用阈值法
-                if region.shape[0] < 20 or region.shape[1] < 20:
-                    _, binary = cv2.threshold(
-                        region, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU
-                    )
-                    binary = 255 - binary  # 反色：文字为白
-                else:
-                    binary = cv2.adaptiveThreshold(
-                        region,
-                        255,
-                        cv2.ADAPTIVE_THRESH_GAUSSIAN_C,
-                        cv2.THRESH_BINARY_INV,
-                        11,
-                        2,
-                    )
-                kernel = np.ones((2, 2), np.uint8)
-                binary = cv2.morphologyEx(binary, cv2.MORPH_CLOSE, kernel)
-
-            mask[y1:y2, x1:x2] = cv2.bitwise_or(mask[y1:y2, x1:x2], binary)
+                adaptive_boxes.append((x1, y1, x2, y2))
+                continue
+            mask[y1:y2, x1:x2] |= binary
         except Exception:
             mask[y1:y2, x1:x2] = 255
 
+    if adaptive_boxes:
+        try:
+            binaries = _batched_adaptive_binary(gray, adaptive_boxes)
+        except Exception:
+            binaries = [None] * len(adaptive_boxes)
+        for (x1, y1, x2, y2), binary in zip(adaptive_boxes, binaries):
+            if binary is None:
+                mask[y1:y2, x1:x2] = 255
+            else:
+                mask[y1:y2, x1:x2] |= binary
+
     if MASK_DILATE_ITER > 0:
         kernel = np.ones((3, 3), np.uint8)
         mask = cv2.dilate(mask, kernel, iterations=MASK_DILATE_ITER)
@@ -914,34 +983,57 @@ def fill_with_neighbor(bgr: np.ndarray, mask: np.ndarray) -> np.ndarray:
     """
     对复杂背景时，优先用邻域像素粗略填充，再交给 inpaint 做平滑，
     避免 NS/TELEA 在大块区域产生奇怪纹理。
+
+    每行 mask 的最左/最右像素之间整段填成两侧外 3px 像素的均值；
+    各行的左右端点与填充色整图一次算出，只对含 mask 的行做切片赋值。
     """
     result = bgr.copy()
     h, w = mask.shape
-    for y in range(h):
-        xs = np.where(mask[y] > 0)[0]
-        if len(xs) == 0:
-            continue
-        x_min, x_max = xs[0], xs[-1]
-        left_src = max(0, x_min - 3)
-        right_src = min(w - 1, x_max + 3)
-        fill_color = (
-            (bgr[y, left_src].astype(np.int32) + bgr[y, right_src].astype(np.int32))
-            // 2
-        ).astype(np.uint8)
-        result[y, x_min : x_max + 1] = fill_color
+    m = mask > 0
+    rows = np.flatnonzero(m.any(axis=1))
+    if rows.size == 0:
+        return result
+
+    sub = m[rows]
+    x_min = sub.argmax(axis=1)
+    x_max = w - 1 - sub[:, ::-1].argmax(axis=1)
+    left_src = np.maximum(0, x_min - 3)
+    right_src = np.minimum(w - 1, x_max + 3)
+    fill = (
+        (bgr[rows, left_src].astype(np.int32) + bgr[rows, right_src].astype(np.int32)) // 2
+    ).astype(np.uint8)
+
+    for y, x0, x1, color in zip(rows.tolist(), x_min.tolist(), x_max.tolist(), fill):
+        result[y, x0 : x1 + 1] = color
     return result
 
 
-def make_clean_background(bgr: np.ndarray, lines) -> np.ndarray:
+def _inpaint(bgr: np.ndarray, mask: np.ndarray, radius: int, method: int, scale: float) -> np.ndarray:
+    """cv2.inpaint；scale < 1 时在缩小图上 inpaint 再放大回原尺寸（半径随之缩放）。"""
+    if scale >= 1.0:
+        return cv2.inpaint(bgr, mask, radius, method)
+    h, w = mask.shape
+    sw, sh = max(1, int(round(w * scale))), max(1, int(round(h * scale)))
+    small = cv2.resize(bgr, (sw, sh), interpolation=cv2.INTER_AREA)
+    small_mask = cv2.resize(mask, (sw, sh), interpolation=cv2.INTER_AREA)
+    small_mask = np.where(small_mask > 0, 255, 0).astype(np.uint8)
+    small_clean = cv2.inpaint(small, small_mask, max(1, int(round(radius * scale))), method)
+    return cv2.resize(small_clean, (w, h), interpolation=cv2.INTER_LINEAR)
+
+
+def make_clean_background(bgr: np.ndarray, lines, inpaint_scale: Optional[float] = None) -> np.ndarray:
     """
     使用改进的 inpaint 生成“无字版底图”：
     - 自适应主文字 mask
     - 扩展阴影/发光区域 mask 只用于 inpaint
     - 简单背景直接 inpaint，复杂背景先邻域填充再小半径 inpaint
+    - inpaint_scale（默认 INPAINT_SCALE）< 1 时在缩小图上 inpaint，速度更快但结果不再逐像素一致
     """
     if not lines:
         return bgr
 
+    scale = INPAINT_SCALE if inpaint_scale is None else float(inpaint_scale)
+
     # 使用自适应或简单mask（主文字区域）
     if USE_ADAPTIVE_MASK:
         main_mask = build_adaptive_mask(bgr, lines)
@@ -955,21 +1047,17 @@ def make_clean_background(bgr: np.ndarray, lines) -> np.ndarray:
 
     if is_simple:
         # 简单背景：直接 inpaint + 轻微模糊
-        clean = cv2.inpaint(bgr, shadow_mask, INPAINT_RADIUS, cv2.INPAINT_TELEA)
+        clean = _inpaint(bgr, shadow_mask, INPAINT_RADIUS, cv2.INPAINT_TELEA, scale)
     else:
         # 复杂背景：先用邻域像素粗填，再用小半径 NS 微调
         prefilled = fill_with_neighbor(bgr, shadow_mask)
-        clean = cv2.inpaint(
-            prefilled, shadow_mask, max(3, INPAINT_RADIUS // 2), cv2.INPAINT_NS
-        )
+        clean = _inpaint(prefilled, shadow_mask, max(3, INPAINT_RADIUS // 2), cv2.INPAINT_NS, scale)
 
     clean = cv2.GaussianBlur(clean, (3, 3), 0.5)
 
-    # 只在 shadow_mask 区域应用 inpaint 结果
+    # 只在 shadow_mask 区域应用 inpaint 结果（mask 为 0/255 二值，直接按 mask 拷贝，无需浮点混合）
     result = bgr.copy()
-    mask_3ch = cv2.cvtColor(shadow_mask, cv2.COLOR_GRAY2BGR) / 255.0
-    result = (clean * mask_3ch + bgr * (1 - mask_3ch)).astype(np.uint8)
-
+    result = cv2.copyTo(clean, shadow_mask, result)
     return result
 
 
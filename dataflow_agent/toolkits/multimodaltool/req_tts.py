@@ -1,14 +1,27 @@
 import os
 import re
+import json
 import wave
 import base64
-from typing import Optional, List
+import asyncio
+import hashlib
+import threading
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Awaitable, Callable, Optional, List, Sequence, Union
 from dataflow_agent.logger import get_logger
 from dataflow_agent.toolkits.multimodaltool.providers import get_provider
 from dataflow_agent.toolkits.multimodaltool.req_img import _post_raw
 
 log = get_logger(__name__)
 
+# TTS 输出统一为 24kHz / 16bit / 单声道 PCM
+WAV_CHANNELS = 1
+WAV_SAMPLE_WIDTH = 2
+WAV_FRAME_RATE = 24000
+
+DEFAULT_TTS_CACHE_DIR = Path(__file__).resolve().parents[3] / "outputs" / "cache" / "tts"
+
 def split_tts_text(content: str, limit: int) -> List[str]:
     if limit is None or limit <= 0:
         return [content]
@@ -86,6 +99,165 @@ async def generate_speech_bytes_async(
     return audio_bytes
 
 
+# ----------------------------------------------------------------------
+# 并发 + 缓存 + 流式写入的 TTS 引擎
+# ----------------------------------------------------------------------
+# 配置：
+# - DF_TTS_CACHE:        分段音频缓存目录（默认 <项目根>/outputs/cache/tts；"off" 关闭）
+# - DF_TTS_CONCURRENCY:  同时进行的 TTS 请求数（默认 4）
+
+SynthesizeFn = Callable[[str, str], Awaitable[bytes]]
+
+
+@dataclass(frozen=True)
+class TTSSegment:
+    """一段待合成文本；voice_name 为 None 时使用调用方的默认音色。"""
+
+    text: str
+    voice_name: Optional[str] = None
+
+
+def _tts_cache_root() -> Optional[Path]:
+    value = os.getenv("DF_TTS_CACHE")
+    if value and value.lower() == "off":
+        return None
+    return Path(value) if value else DEFAULT_TTS_CACHE_DIR
+
+
+def _tts_concurrency() -> int:
+    try:
+        return max(1, int(os.getenv("DF_TTS_CONCURRENCY", "4")))
+    except ValueError:
+        return 4
+
+
+def tts_cache_key(text: str, model: str, voice_name: str, **kwargs) -> str:
+    """按 (文本, 模型, 音色, 其他请求参数) 计算缓存键。"""
+    raw = json.dumps([text, model, voice_name, sorted(kwargs.items())], ensure_ascii=False, default=str)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def _write_atomic(path: Path, data: bytes) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    tmp.write_bytes(data)
+    os.replace(tmp, path)
+
+
+async def synthesize_segments_to_wav_async(
+    segments: Sequence[Union[str, TTSSegment]],
+    save_path: str,
+    api_url: str,
+    api_key: str,
+    model: str = "gemini-2.5-pro-preview-tts",
+    voice_name: str = "Kore",
+    timeout: int = 120,
+    concurrency: Optional[int] = None,
+    attempts: int = 3,
+    retry_delay: float = 0.8,
+    synthesize: Optional[SynthesizeFn] = None,
+    **kwargs,
+) -> str:
+    """
+    并发合成多段文本，按原顺序流式写入 WAV（24kHz / 16bit / 单声道）。
+
+    - 同时最多 concurrency 个请求（默认 DF_TTS_CONCURRENCY），输出顺序与 segments 一致；
+    - 每段 PCM 按 (文本, 模型, 音色) 哈希写入磁盘缓存，重跑或只改了部分台词时只合成变化的段；
+    - 前缀段一完成就写进 save_path.part，全部成功后再 rename 为 save_path；
+      已完成但还没轮到写入的段只留在磁盘缓存里，不在内存中堆积；
+    - 某段重试 attempts 次仍失败时，其余段照常合成并入缓存，最后抛出异常，
+      再次运行只需补齐失败的段。
+
+    synthesize(text, voice) 可替换实际的 TTS 调用（默认 generate_speech_bytes_async）。
+    """
+    segs = [s if isinstance(s, TTSSegment) else TTSSegment(str(s)) for s in segments]
+    if not segs:
+        raise ValueError("No TTS segments to synthesize")
+
+    root = _tts_cache_root()
+    sem = asyncio.Semaphore(concurrency or _tts_concurrency())
+    hits = 0
+
+    async def _default_synthesize(text: str, voice: str) -> bytes:
+        return await generate_speech_bytes_async(
+            text=text,
+            api_url=api_url,
+            api_key=api_key,
+            model=model,
+            voice_name=voice,
+            timeout=timeout,
+            **kwargs,
+        )
+
+    synth = synthesize or _default_synthesize
+
+    async def _one(idx: int, seg: TTSSegment) -> Union[Path, bytes]:
+        nonlocal hits
+        voice = seg.voice_name or voice_name
+        path = None
+        if root is not None:
+            key = tts_cache_key(seg.text, model, voice, **kwargs)
+            path = root / key[:2] / f"{key}.pcm"
+            if path.exists():
+                hits += 1
+                return path
+        last_err: Optional[Exception] = None
+        for attempt in range(max(1, attempts)):
+            try:
+                async with sem:
+                    pcm = await synth(seg.text, voice)
+                break
+            except Exception as e:
+                last_err = e
+                log.warning(f"TTS chunk {idx + 1}/{len(segs)} attempt {attempt + 1} failed: {e}")
+                if attempt < attempts - 1:
+                    await asyncio.sleep(retry_delay * (attempt + 1))
+        else:
+            raise last_err
+        if path is None:
+            return pcm
+        _write_atomic(path, pcm)
+        return path
+
+    tasks = [asyncio.create_task(_one(i, seg)) for i, seg in enumerate(segs)]
+    os.makedirs(os.path.dirname(os.path.abspath(save_path)), exist_ok=True)
+    part_path = f"{save_path}.part"
+    errors = {}
+    try:
+        with wave.open(part_path, "wb") as wav_file:
+            wav_file.setnchannels(WAV_CHANNELS)
+            wav_file.setsampwidth(WAV_SAMPLE_WIDTH)
+            wav_file.setframerate(WAV_FRAME_RATE)
+            for idx, task in enumerate(tasks):
+                try:
+                    result = await task
+                except Exception as e:
+                    errors[idx] = e
+                    continue
+                if errors:
+                    continue  # 已有失败段：只等其余段完成并写入缓存
+                wav_file.writeframes(result if isinstance(result, bytes) else result.read_bytes())
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        if os.path.exists(part_path):
+            os.remove(part_path)
+        raise
+
+    if errors:
+        os.remove(part_path)
+        first = min(errors)
+        log.error(
+            f"TTS failed for {len(errors)}/{len(segs)} chunk(s) {sorted(i + 1 for i in errors)}; "
+            f"{len(segs) - len(errors)} finished chunk(s) are cached for the next run"
+        )
+        raise errors[first]
+
+    os.replace(part_path, save_path)
+    log.info(f"TTS wrote {len(segs)} chunk(s) ({hits} cached) to {save_path}")
+    return save_path
+
+
 async def generate_speech_and_save_async(
     text: str,
     save_path: str,
@@ -98,42 +270,25 @@ async def generate_speech_and_save_async(
     **kwargs,
 ) -> str:
     """
-    生成语音并保存为WAV文件
+    生成语音并保存为WAV文件（分段并发合成，见 synthesize_segments_to_wav_async）
     """
     chunks = split_tts_text(text, max_chars)
     log.info(f"TTS split into {len(chunks)} chunk(s) with max_chars={max_chars}")
 
-    audio_chunks: List[bytes] = []
-    for idx, chunk in enumerate(chunks, start=1):
-        try:
-            audio_bytes = await generate_speech_bytes_async(
-                text=chunk,
-                api_url=api_url,
-                api_key=api_key,
-                model=model,
-                voice_name=voice_name,
-                timeout=timeout,
-                **kwargs
-            )
-        except Exception as e:
-            log.error(f"Failed to generate speech (chunk {idx}/{len(chunks)}): {e}")
-            raise
-        audio_chunks.append(audio_bytes)
-
-    os.makedirs(os.path.dirname(os.path.abspath(save_path)), exist_ok=True)
-
-    # Save as WAV (assuming 24kHz, 16bit, Mono as per user doc)
-    with wave.open(save_path, "wb") as wav_file:
-        wav_file.setnchannels(1)        # 1 Channel
-        wav_file.setsampwidth(2)        # 16 bit = 2 bytes
-        wav_file.setframerate(24000)    # 24kHz
-        wav_file.writeframes(b"".join(audio_chunks))
-
+    await synthesize_segments_to_wav_async(
+        chunks,
+        save_path,
+        api_url=api_url,
+        api_key=api_key,
+        model=model,
+        voice_name=voice_name,
+        timeout=timeout,
+        **kwargs,
+    )
     log.info(f"Audio saved to {save_path}")
     return save_path
 
 if __name__ == "__main__":
-    import asyncio
     from dotenv import load_dotenv
     load_dotenv()
     
@@ -22,22 +22,25 @@ Design philosophy:
 # _ensure_matplotlib_available: 校验 matplotlib 是否可用，否则抛出安装提示。
 # _load_image_pil: 从路径读取图片并转为 RGB 的 PIL.Image。
 # _get_image_size: 返回图片的宽高 (width, height)。
-# _get_sam_model: 懒加载并缓存指定 checkpoint 的 SAM 模型。
+# _sam_model: 从模型常驻管理器取出（必要时加载）指定 checkpoint 的 SAM 模型。
 # free_sam_model: 显式释放指定 checkpoint 的 SAM 模型并清理 CUDA 显存。
 # run_sam_auto: 对单张图片运行 SAM 自动分割，返回每个实例的 mask、归一化 bbox 等信息。
-# run_sam_auto_batch: 对多张图片批量运行 SAM 自动分割，按图片返回实例列表。
-# _get_yolo_model: 懒加载并缓存指定权重和设备的 YOLOv8 分割模型。
+# run_sam_auto_batch: 按 batch_size 分块批量运行 SAM 自动分割，按图片返回实例列表。
+# _yolo_model: 从模型常驻管理器取出（必要时加载）指定权重和设备的 YOLOv8 分割模型。
 # run_yolov8_seg: 对单张图片运行 YOLOv8 实例分割，返回带类别标签和分数的实例信息。
-# run_yolov8_seg_batch: 对多张图片批量运行 YOLOv8 实例分割，按图片返回实例列表。
-# _get_hf_seg_pipeline: 懒加载并缓存 Hugging Face 语义分割 pipeline。
+# run_yolov8_seg_batch: 按 batch_size 堆叠输入批量运行 YOLOv8 实例分割，按图片返回实例列表。
+# _hf_seg_pipeline: 从模型常驻管理器取出（必要时加载）Hugging Face 语义分割 pipeline。
 # run_hf_semantic_seg: 使用 HF pipeline 对单张图片做语义分割，返回每个类别的前景掩膜。
-# run_hf_semantic_seg_batch: 对多张图片批量做语义分割，按图片返回类别掩膜列表。
+# run_hf_semantic_seg_batch: 按 batch_size 批量做语义分割，按图片返回类别掩膜列表。
 # run_felzenszwalb: 调用 Felzenszwalb 图分割算法，返回标签图或每个 segment 的布尔掩膜。
 # save_felzenszwalb_visualization: 运行 Felzenszwalb 并保存带分割边界的可视化图片。
 # save_sam_instances: 将 SAM 分割得到的每个实例按 bbox 或 RGBA mask 截图后保存为单独图片。
+# _segment_tiled: 大图分块跑 SAM，逐 tile 后处理后在全局坐标下合并（局部 mask + mask_offset）。
+# segment_layout_boxes / segment_layout_boxes_server: 布局框分割（超过 DF_TILE_MAX_PIXELS 时自动分块）。
 # 过滤/后处理函数：
 # filter_sam_items_by_area_and_score: 按最小面积、最小得分过滤 SAM 实例。
 # bbox_iou: 计算两个归一化 bbox 的 IoU。
+# bbox_iou_matrix: 向量化计算 (N,4) 与 (M,4) 两组 bbox 的 IoU 矩阵。
 # mask_iou: 计算两个布尔 mask 的 IoU。
 # nms_sam_items_by_bbox: 基于 bbox IoU 的 SAM 实例 NMS 去重。
 # nms_sam_items_by_mask: 基于 mask IoU 的 SAM 实例 NMS 去重。
@@ -46,8 +49,10 @@ Design philosophy:
 
 """
 
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager, nullcontext
 from pathlib import Path
-from typing import Any, Dict, List, Sequence, Union, Optional
+from typing import Any, Callable, Dict, List, Sequence, Union, Optional
 import base64
 import requests
 import random
@@ -89,12 +94,64 @@ except Exception:  # pragma: no cover
     torch = None  # type: ignore
 
 
+from dataflow_agent.toolkits.multimodaltool.model_residency import get_model_residency
+from dataflow_agent.toolkits.multimodaltool.tiling import (
+    crop_mask,
+    merge_tiled_detections,
+    needs_tiling,
+    plan_tiles,
+)
+
+
 # -----------------------------------------------------------------------------
-# 0. Simple global caches to avoid re-loading heavy models
+# 0. Model residency & batching config
 # -----------------------------------------------------------------------------
-_SAM_MODELS: Dict[str, Any] = {}
-_YOLO_MODELS: Dict[tuple, Any] = {}
-_HF_SEG_PIPELINES: Dict[str, Any] = {}
+# 模型由 model_residency 统一常驻管理（按空闲时间 / 内存压力淘汰），
+# 不再在每个任务结束时释放。
+#
+# - DF_SEG_BATCH: 批量接口默认每批图片数（默认 4）
+# - DF_SEG_HALF:  "auto"（默认，CUDA 上用 FP16）| "on"（CPU 上也用 bfloat16 autocast）| "off"
+def _seg_batch_size(batch_size: Optional[int] = None) -> int:
+    if batch_size:
+        return max(1, int(batch_size))
+    try:
+        return max(1, int(os.getenv("DF_SEG_BATCH", "4")))
+    except ValueError:
+        return 4
+
+
+def _precision(device: Optional[str]):
+    """
+    返回 (half, autocast_ctx)：CUDA 上让 ultralytics / HF 直接用 FP16；
+    CPU 上只有 DF_SEG_HALF=on 且 torch 支持时才用 bfloat16 autocast。
+    """
+    mode = os.getenv("DF_SEG_HALF", "auto").strip().lower()
+    if mode == "off" or torch is None:
+        return False, nullcontext
+    if str(device or "").startswith("cuda") and torch.cuda.is_available():
+        return True, nullcontext
+    if mode == "on":
+        return False, lambda: torch.autocast("cpu", dtype=torch.bfloat16)
+    return False, nullcontext
+
+
+def _unload_torch_model(m: Any) -> None:
+    """释放前把权重挪回 CPU，尽快归还显存。"""
+    inner = getattr(m, "model", None)
+    if inner is not None and hasattr(inner, "to"):
+        try:
+            inner.to("cpu")
+        except Exception:
+            pass
+
+
+def _call_ultralytics(model: Any, source: Any, **kwargs: Any):
+    """调用 ultralytics 模型；旧版本不认识某些参数时去掉参数重试。"""
+    kwargs = {k: v for k, v in kwargs.items() if v is not None}
+    try:
+        return model(source, **kwargs)
+    except TypeError:
+        return model(source)
 
 
 # -----------------------------------------------------------------------------
@@ -148,26 +205,30 @@ def _load_image_pil(image_path: str) -> Image.Image:
 
 
 def _get_image_size(image_path: str) -> tuple[int, int]:
-    img = _load_image_pil(image_path)
-    return img.size  # (width, height)
+    p = Path(image_path)
+    if not p.exists():
+        raise FileNotFoundError(f"Image file not found: {p}")
+    with Image.open(p) as img:  # only reads the header
+        return img.size  # (width, height)
 
 
 # -----------------------------------------------------------------------------
 # 1. SAM (Segment Anything Model) via ultralytics.SAM
 # -----------------------------------------------------------------------------
-def _get_sam_model(
+@contextmanager
+def _sam_model(
     checkpoint: str = "sam_b.pt",
 ):
     """
-    Lazy-load and cache ultralytics.SAM model.
+    Acquire the resident ultralytics.SAM model (loaded on first use).
     """
     _ensure_ultralytics_sam_available()
-    key = checkpoint
-    if key not in _SAM_MODELS:
-        # Note: in current ultralytics versions SAM(...) does not accept device= argument here.
-        # Device is controlled at inference time, e.g. model(img, device="cuda").
-        _SAM_MODELS[key] = UltralyticsSAM(checkpoint)
-    return _SAM_MODELS[key]
+    # Note: in current ultralytics versions SAM(...) does not accept device= argument here.
+    # Device is controlled at inference time, e.g. model(img, device="cuda").
+    with get_model_residency().use(
+        ("sam", checkpoint), loader=lambda: UltralyticsSAM(checkpoint), unloader=_unload_torch_model
+    ) as model:
+        yield model
 
 
 def free_sam_model(checkpoint: str = "sam_b.pt") -> None:
@@ -185,21 +246,8 @@ def free_sam_model(checkpoint: str = "sam_b.pt") -> None:
     - 若当前环境中没有安装 torch，则只能删除 Python 层的引用，
       无法调用 torch.cuda.empty_cache()。
     """
-    global _SAM_MODELS
-    m = _SAM_MODELS.pop(checkpoint, None)
-    if m is not None:
-        # 尝试清理 ultralytics 内部引用
-        try:
-            # 一些 ultralytics 模型提供 model.to("cpu") 等接口，此处最好切到 CPU 再删除
-            if hasattr(m, "model"):
-                try:
-                    m.model.to("cpu")
-                except Exception:
-                    pass
-        except Exception:
-            pass
-
-        del m
+    # 显式释放：立即移出常驻表；仍在推理的线程（如 sam_server 并发请求）用完后才真正卸载权重
+    get_model_residency().evict(("sam", checkpoint), force=True)
 
     # 若 torch 可用，则尝试清空 CUDA 缓存，减轻显存压力
     if torch is not None and torch.cuda.is_available():
@@ -236,17 +284,11 @@ def run_sam_auto(
             - score: float or None
             - area: int (number of True pixels in mask)
     """
-    model = _get_sam_model(checkpoint=checkpoint)
-    # In recent ultralytics versions, SAM models can receive `device` at call time.
-    # If your installed version does not support this, you can remove `device=device`.
-    try:
-        results = model(image_path, device=device)  # ultralytics will load image internally
-    except TypeError:
-        # Fallback: older/newer API without device argument
-        results = model(image_path)
+    return run_sam_auto_batch([image_path], checkpoint=checkpoint, device=device, batch_size=1)[0]
 
-    width, height = _get_image_size(image_path)
 
+def _sam_items_from_results(results: Any, width: int, height: int) -> List[Dict[str, Any]]:
+    """把 ultralytics SAM 的 Results 转成实例 dict 列表（bbox 归一化到 [0,1]）。"""
     all_items: List[Dict[str, Any]] = []
     for r in results:
         # r.masks: ultralytics Masks object or None
@@ -397,10 +439,16 @@ def run_sam_auto_batch(
     image_paths: List[str],
     checkpoint: str = "sam_b.pt",
     device: str = "cuda",
+    batch_size: Optional[int] = None,
 ) -> List[List[Dict[str, Any]]]:
     """
     Batch automatic segmentation using SAM.
 
+    The resident model is acquired once and images are fed to the predictor
+    ``batch_size`` at a time (list sources, FP16 on CUDA, see ``DF_SEG_HALF``).
+    SAM's automatic mode still generates masks image by image inside
+    ultralytics; batching saves the per-call model/predictor setup.
+
     Parameters
     ----------
     image_paths : list[str]
@@ -409,18 +457,58 @@ def run_sam_auto_batch(
         SAM checkpoint to use, by default "sam_b.pt".
     device : str, optional
         Device string, by default "cuda".
+    batch_size : int, optional
+        Images per predictor call, by default ``DF_SEG_BATCH`` (4).
 
     Returns
     -------
     List[List[Dict[str, Any]]]
         One list of items per input image, see `run_sam_auto`.
     """
-    return [run_sam_auto(p, checkpoint=checkpoint, device=device) for p in image_paths]
+    paths = [str(p) for p in image_paths]
+    bs = _seg_batch_size(batch_size)
+    half, autocast = _precision(device)
+    out: List[List[Dict[str, Any]]] = []
+    with _sam_model(checkpoint=checkpoint) as model:
+        for start in range(0, len(paths), bs):
+            chunk = paths[start:start + bs]
+            with autocast():
+                # ultralytics will load images internally
+                results = _call_ultralytics(
+                    model, chunk if len(chunk) > 1 else chunk[0], device=device, half=half or None
+                )
+            for p, r in zip(chunk, results):
+                width, height = _get_image_size(p)
+                out.append(_sam_items_from_results([r], width, height))
+    return out
 
 
 # -----------------------------------------------------------------------------
 # 1.1 SAM post-processing helpers (过滤 / 去重 / Top-K)
 # -----------------------------------------------------------------------------
+def _item_scores(items: Sequence[Dict[str, Any]], key: str) -> np.ndarray:
+    """
+    取每个实例的排序分数：key="score" 时优先用 score，缺失或无法转换时退回 area；
+    与逐个比较的旧实现保持一致。
+    """
+    out = np.empty(len(items), dtype=np.float64)
+    for i, it in enumerate(items):
+        v = it.get("score") if key == "score" else None
+        if v is not None:
+            try:
+                out[i] = float(v)
+                continue
+            except Exception:
+                pass
+        out[i] = float(it.get("area", 0))
+    return out
+
+
+def _sorted_order(scores: np.ndarray) -> np.ndarray:
+    """从大到小的稳定排序（同分保持原顺序，等价于 sorted(..., reverse=True)）。"""
+    return np.argsort(-scores, kind="stable")
+
+
 def filter_sam_items_by_area_and_score(
     items: List[Dict[str, Any]],
     min_area: int = 0,
@@ -443,16 +531,17 @@ def filter_sam_items_by_area_and_score(
     List[Dict[str, Any]]
         过滤后的实例列表。
     """
-    filtered: List[Dict[str, Any]] = []
-    for it in items:
-        area = int(it.get("area", 0))
-        score = it.get("score", None)
-        if area < min_area:
-            continue
-        if score is not None and float(score) < float(min_score):
-            continue
-        filtered.append(it)
-    return filtered
+    if not items:
+        return []
+    areas = np.fromiter((int(it.get("area", 0)) for it in items), dtype=np.int64, count=len(items))
+    # score 缺失时记为 +inf，不参与得分过滤
+    scores = np.fromiter(
+        (float(it["score"]) if it.get("score", None) is not None else np.inf for it in items),
+        dtype=np.float64,
+        count=len(items),
+    )
+    keep = (areas >= min_area) & ~(scores < float(min_score))
+    return [items[i] for i in np.flatnonzero(keep)]
 
 
 def bbox_iou(box1: Sequence[float], box2: Sequence[float]) -> float:
@@ -470,28 +559,24 @@ def bbox_iou(box1: Sequence[float], box2: Sequence[float]) -> float:
     """
     if len(box1) != 4 or len(box2) != 4:
         return 0.0
+    return float(bbox_iou_matrix(np.asarray([box1], dtype=np.float64), np.asarray([box2], dtype=np.float64))[0, 0])
 
-    x1 = max(float(box1[0]), float(box2[0]))
-    y1 = max(float(box1[1]), float(box2[1]))
-    x2 = min(float(box1[2]), float(box2[2]))
-    y2 = min(float(box1[3]), float(box2[3]))
 
-    inter_w = max(0.0, x2 - x1)
-    inter_h = max(0.0, y2 - y1)
+def bbox_iou_matrix(boxes1: np.ndarray, boxes2: np.ndarray) -> np.ndarray:
+    """
+    向量化 bbox IoU：boxes1 为 (N, 4)，boxes2 为 (M, 4)，返回 (N, M)。
+    无交集或并集为 0 时 IoU 记为 0。
+    """
+    b1 = boxes1[:, None, :]
+    b2 = boxes2[None, :, :]
+    inter_w = np.maximum(0.0, np.minimum(b1[..., 2], b2[..., 2]) - np.maximum(b1[..., 0], b2[..., 0]))
+    inter_h = np.maximum(0.0, np.minimum(b1[..., 3], b2[..., 3]) - np.maximum(b1[..., 1], b2[..., 1]))
     inter = inter_w * inter_h
-    if inter <= 0.0:
-        return 0.0
-
-    area1 = max(0.0, float(box1[2]) - float(box1[0])) * max(
-        0.0, float(box1[3]) - float(box1[1])
-    )
-    area2 = max(0.0, float(box2[2]) - float(box2[0])) * max(
-        0.0, float(box2[3]) - float(box2[1])
-    )
+    area1 = np.maximum(0.0, b1[..., 2] - b1[..., 0]) * np.maximum(0.0, b1[..., 3] - b1[..., 1])
+    area2 = np.maximum(0.0, b2[..., 2] - b2[..., 0]) * np.maximum(0.0, b2[..., 3] - b2[..., 1])
     union = area1 + area2 - inter
-    if union <= 0.0:
-        return 0.0
-    return inter / union
+    valid = (inter > 0.0) & (union > 0.0)
+    return np.where(valid, inter / np.where(valid, union, 1.0), 0.0)
 
 
 def mask_iou(m1: np.ndarray, m2: np.ndarray) -> float:
@@ -525,6 +610,8 @@ def nms_sam_items_by_bbox(
     - 按 score_key（score 或 area）从大到小排序；
     - 依次保留与已有保留框 IoU 小于阈值的实例。
 
+    bbox 堆叠为 (N, 4) 数组，一次算出 IoU 矩阵后贪心抑制。
+
     Parameters
     ----------
     items : List[Dict[str, Any]]
@@ -539,40 +626,32 @@ def nms_sam_items_by_bbox(
     List[Dict[str, Any]]
         经过 NMS 去重后的实例列表。
     """
-
-    def _score(it: Dict[str, Any]) -> float:
-        if score_key == "score":
-            v = it.get("score")
-            if v is not None:
-                try:
-                    return float(v)
-                except Exception:
-                    pass
-        # fallback to area
-        return float(it.get("area", 0))
-
-    # 从高分/大面积到低分/小面积排序
-    items_sorted = sorted(items, key=_score, reverse=True)
-
+    # 从高分/大面积到低分/小面积排序；bbox 无效的实例直接丢弃
+    order = _sorted_order(_item_scores(items, score_key))
+    cands = [items[i] for i in order if items[i].get("bbox") and len(items[i]["bbox"]) == 4]
+    if not cands:
+        return []
+
+    boxes = np.asarray([it["bbox"] for it in cands], dtype=np.float64)
+    over = bbox_iou_matrix(boxes, boxes) >= iou_threshold
+    suppressed = np.zeros(len(cands), dtype=bool)
     kept: List[Dict[str, Any]] = []
-    for it in items_sorted:
-        bbox = it.get("bbox")
-        if not bbox or len(bbox) != 4:
+    for i in range(len(cands)):
+        if suppressed[i]:
             continue
+        kept.append(cands[i])
+        suppressed[i + 1:] |= over[i, i + 1:]
+    return kept
 
-        keep = True
-        for kept_it in kept:
-            kept_bbox = kept_it.get("bbox")
-            if not kept_bbox or len(kept_bbox) != 4:
-                continue
-            iou = bbox_iou(bbox, kept_bbox)
-            if iou >= iou_threshold:
-                keep = False
-                break
-        if keep:
-            kept.append(it)
 
-    return kept
+def _mask_extent(m: np.ndarray):
+    """mask 的紧致像素包围盒 (y0, y1, x0, x1)（右开区间）与面积；空 mask 返回 None。"""
+    rows = np.flatnonzero(m.any(axis=1))
+    if rows.size == 0:
+        return None, 0
+    cols = np.flatnonzero(m.any(axis=0))
+    y0, y1, x0, x1 = int(rows[0]), int(rows[-1]) + 1, int(cols[0]), int(cols[-1]) + 1
+    return (y0, y1, x0, x1), int(np.count_nonzero(m[y0:y1, x0:x1]))
 
 
 def nms_sam_items_by_mask(
@@ -586,6 +665,10 @@ def nms_sam_items_by_mask(
     - IoU 计算使用像素级 mask，更精确但速度稍慢；
     - 其他逻辑与 nms_sam_items_by_bbox 类似。
 
+    实现上先用各 mask 的紧致包围盒和面积给出 IoU 上界
+    （inter <= min(包围盒交集, 面积1, 面积2)），对所有已保留实例向量化筛选，
+    只有上界达到阈值的才在包围盒交集区域内逐像素计算交集，结果与整图计算一致。
+
     Parameters
     ----------
     items : List[Dict[str, Any]]
@@ -600,46 +683,56 @@ def nms_sam_items_by_mask(
     List[Dict[str, Any]]
         经过 NMS 去重后的实例列表。
     """
-
-    def _score(it: Dict[str, Any]) -> float:
-        if score_key == "score":
-            v = it.get("score")
-            if v is not None:
-                try:
-                    return float(v)
-                except Exception:
-                    pass
-        return float(it.get("area", 0))
-
-    items_sorted = sorted(items, key=_score, reverse=True)
+    order = _sorted_order(_item_scores(items, score_key))
+    n = len(order)
     kept: List[Dict[str, Any]] = []
+    kept_masks: List[np.ndarray] = []
+    # 已保留实例的 (y0, y1, x0, x1, area, shape_id)，预分配避免反复拼接
+    kept_meta = np.zeros((n, 6), dtype=np.int64)
+    shape_ids: Dict[tuple, int] = {}
 
-    for it in items_sorted:
+    for idx in order:
+        it = items[idx]
         m = it.get("mask")
         if m is None:
             continue
-        m_arr = np.array(m)
+        m_arr = np.asarray(m)
         if m_arr.dtype != bool:
             m_arr = m_arr > 0
+        ext, area = _mask_extent(m_arr)
+        sid = shape_ids.setdefault(m_arr.shape, len(shape_ids))
 
+        k = len(kept)
         keep = True
-        for kept_it in kept:
-            m2 = kept_it.get("mask")
-            if m2 is None:
-                continue
-            m2_arr = np.array(m2)
-            if m2_arr.dtype != bool:
-                m2_arr = m2_arr > 0
-
+        if k:
+            meta = kept_meta[:k]
             # 形状不同则视作 IoU=0（不去重）
-            if m_arr.shape != m2_arr.shape:
-                continue
+            same_shape = meta[:, 5] == sid
+            if iou_threshold <= 0.0:
+                # IoU >= 0 恒成立：只要有同形状的已保留 mask 就被抑制
+                keep = not same_shape.any()
+            elif ext is not None:
+                y0, y1, x0, x1 = ext
+                ih = np.minimum(meta[:, 1], y1) - np.maximum(meta[:, 0], y0)
+                iw = np.minimum(meta[:, 3], x1) - np.maximum(meta[:, 2], x0)
+                bound = np.minimum(np.clip(ih, 0, None) * np.clip(iw, 0, None), np.minimum(meta[:, 4], area))
+                union_lb = meta[:, 4] + area - bound
+                # 留一点余量，避免浮点舍入漏掉恰好等于阈值的情况（之后仍按精确 IoU 判断）
+                cand = same_shape & (bound > 0) & (bound >= iou_threshold * union_lb * (1 - 1e-9))
+                for j in np.flatnonzero(cand):
+                    ky0, ky1, kx0, kx1, karea, _ = meta[j]
+                    cy0, cy1, cx0, cx1 = max(ky0, y0), min(ky1, y1), max(kx0, x0), min(kx1, x1)
+                    inter = int(np.count_nonzero(m_arr[cy0:cy1, cx0:cx1] & kept_masks[j][cy0:cy1, cx0:cx1]))
+                    if inter == 0:
+                        continue
+                    union = int(karea) + area - inter
+                    if union and float(inter) / float(union) >= iou_threshold:
+                        keep = False
+                        break
 
-            iou = mask_iou(m_arr, m2_arr)
-            if iou >= iou_threshold:
-                keep = False
-                break
         if keep:
+            kept_meta[k] = (*(ext or (0, 0, 0, 0)), area, sid)
+            kept_masks.append(m_arr)
             kept.append(it)
 
     return kept
@@ -670,18 +763,8 @@ def topk_sam_items(
     if k is None or k <= 0:
         return items
 
-    def _score(it: Dict[str, Any]) -> float:
-        if sort_key == "score":
-            v = it.get("score")
-            if v is not None:
-                try:
-                    return float(v)
-                except Exception:
-                    pass
-        return float(it.get("area", 0))
-
-    items_sorted = sorted(items, key=_score, reverse=True)
-    return items_sorted[:k]
+    order = _sorted_order(_item_scores(items, sort_key))
+    return [items[i] for i in order[:k]]
 
 
 def postprocess_sam_items(
@@ -768,18 +851,19 @@ def postprocess_sam_items(
 # -----------------------------------------------------------------------------
 # 2. YOLOv8 Instance Segmentation via ultralytics.YOLO
 # -----------------------------------------------------------------------------
-def _get_yolo_model(
+@contextmanager
+def _yolo_model(
     weights: str = "yolov8n-seg.pt",
     device: str = "cuda",
 ):
     """
-    Lazy-load and cache ultralytics.YOLO model.
+    Acquire the resident ultralytics.YOLO model (loaded on first use).
     """
     _ensure_ultralytics_yolo_available()
-    key = (weights, device)
-    if key not in _YOLO_MODELS:
-        _YOLO_MODELS[key] = YOLO(weights).to(device)
-    return _YOLO_MODELS[key]
+    with get_model_residency().use(
+        ("yolo", weights, device), loader=lambda: YOLO(weights).to(device), unloader=_unload_torch_model
+    ) as model:
+        yield model
 
 
 def run_yolov8_seg(
@@ -808,10 +892,11 @@ def run_yolov8_seg(
             - label: str
             - score: float
     """
-    model = _get_yolo_model(weights=weights, device=device)
-    results = model(image_path)
+    return run_yolov8_seg_batch([image_path], weights=weights, device=device, batch_size=1)[0]
 
-    width, height = _get_image_size(image_path)
+
+def _yolo_items_from_results(results: Any, width: int, height: int) -> List[Dict[str, Any]]:
+    """把 ultralytics YOLO 的 Results 转成实例 dict 列表（bbox 归一化到 [0,1]）。"""
     all_items: List[Dict[str, Any]] = []
 
     for r in results:
@@ -858,74 +943,71 @@ def run_yolov8_seg_batch(
     image_paths: List[str],
     weights: str = "yolov8n-seg.pt",
     device: str = "cuda",
+    batch_size: Optional[int] = None,
 ) -> List[List[Dict[str, Any]]]:
     """
     Batch instance segmentation using YOLOv8.
 
+    Images are stacked ``batch_size`` at a time into one forward pass
+    (FP16 on CUDA, see ``DF_SEG_HALF``).
+
     Returns
     -------
     List[List[Dict[str, Any]]]
         One list of items per input image, see `run_yolov8_seg`.
     """
-    return [run_yolov8_seg(p, weights=weights, device=device) for p in image_paths]
+    paths = [str(p) for p in image_paths]
+    bs = _seg_batch_size(batch_size)
+    half, autocast = _precision(device)
+    out: List[List[Dict[str, Any]]] = []
+    with _yolo_model(weights=weights, device=device) as model:
+        for start in range(0, len(paths), bs):
+            chunk = paths[start:start + bs]
+            with autocast():
+                results = _call_ultralytics(
+                    model, chunk if len(chunk) > 1 else chunk[0], batch=len(chunk), half=half or None
+                )
+            for p, r in zip(chunk, results):
+                width, height = _get_image_size(p)
+                out.append(_yolo_items_from_results([r], width, height))
+    return out
 
 
 # -----------------------------------------------------------------------------
 # 3. Hugging Face Semantic Segmentation (e.g., SegFormer)
 # -----------------------------------------------------------------------------
-def _get_hf_seg_pipeline(
+@contextmanager
+def _hf_seg_pipeline(
     model_name: str = "nvidia/segformer-b0-finetuned-ade-512-512",
+    device: Optional[str] = None,
 ):
     """
-    Lazy-load and cache HF image-segmentation pipeline.
+    Acquire the resident HF image-segmentation pipeline (loaded on first use).
     """
     _ensure_hf_pipeline_available()
-    if model_name not in _HF_SEG_PIPELINES:
-        _HF_SEG_PIPELINES[model_name] = hf_pipeline(
-            "image-segmentation",
-            model=model_name,
-        )
-    return _HF_SEG_PIPELINES[model_name]
+    half, _ = _precision(device)
 
+    def _load():
+        kwargs: Dict[str, Any] = {"model": model_name}
+        if device is not None:
+            kwargs["device"] = device
+        if half:
+            kwargs["torch_dtype"] = torch.float16
+        return hf_pipeline("image-segmentation", **kwargs)
 
-def run_hf_semantic_seg(
-    image_path: str,
-    model_name: str = "nvidia/segformer-b0-finetuned-ade-512-512",
-) -> List[Dict[str, Any]]:
-    """
-    Run semantic segmentation via Hugging Face pipeline.
+    with get_model_residency().use(("hf_seg", model_name, device, half), loader=_load, unloader=_unload_torch_model) as pipe:
+        yield pipe
 
-    Parameters
-    ----------
-    image_path : str
-        Path to the input image.
-    model_name : str, optional
-        HF model name, by default "nvidia/segformer-b0-finetuned-ade-512-512".
-
-    Returns
-    -------
-    List[Dict[str, Any]]
-        Each dict contains:
-            - label: str
-            - score: float (if provided by pipeline)
-            - mask: np.ndarray[H, W] bool    # foreground region of that label
-    """
-    seg_pipe = _get_hf_seg_pipeline(model_name=model_name)
-    img = _load_image_pil(image_path)
-    results = seg_pipe(img)
 
+def _hf_items_from_results(results: Any) -> List[Dict[str, Any]]:
     # results is usually a list of dict:
     #   {"label": ..., "score": ..., "mask": PIL.Image or np.array}
     normed: List[Dict[str, Any]] = []
     for r in results:
         label = r.get("label")
-        score = float(r.get("score", 0.0))
+        score = float(r.get("score", 0.0) or 0.0)
 
-        mask = r.get("mask")
-        if isinstance(mask, Image.Image):
-            mask_np = np.array(mask)
-        else:
-            mask_np = np.array(mask)
+        mask_np = np.array(r.get("mask"))
 
         # Convert to bool mask: non-zero as True
         if mask_np.dtype != bool:
@@ -944,23 +1026,62 @@ def run_hf_semantic_seg(
     return normed
 
 
+def run_hf_semantic_seg(
+    image_path: str,
+    model_name: str = "nvidia/segformer-b0-finetuned-ade-512-512",
+) -> List[Dict[str, Any]]:
+    """
+    Run semantic segmentation via Hugging Face pipeline.
+
+    Parameters
+    ----------
+    image_path : str
+        Path to the input image.
+    model_name : str, optional
+        HF model name, by default "nvidia/segformer-b0-finetuned-ade-512-512".
+
+    Returns
+    -------
+    List[Dict[str, Any]]
+        Each dict contains:
+            - label: str
+            - score: float (if provided by pipeline)
+            - mask: np.ndarray[H, W] bool    # foreground region of that label
+    """
+    return run_hf_semantic_seg_batch([image_path], model_name=model_name, batch_size=1)[0]
+
+
 def run_hf_semantic_seg_batch(
     image_paths: List[str],
     model_name: str = "nvidia/segformer-b0-finetuned-ade-512-512",
+    batch_size: Optional[int] = None,
+    device: Optional[str] = None,
 ) -> List[List[Dict[str, Any]]]:
     """
     Batch semantic segmentation via Hugging Face pipeline.
 
+    Images go through the pipeline with ``batch_size`` (stacked forward passes);
+    ``device`` defaults to the pipeline default (CPU), FP16 on CUDA.
+
     Returns
     -------
     List[List[Dict[str, Any]]]
         One list of items per image, see `run_hf_semantic_seg`.
     """
-    return [run_hf_semantic_seg(p, model_name=model_name) for p in image_paths]
+    bs = _seg_batch_size(batch_size)
+    _, autocast = _precision(device)
+    out: List[List[Dict[str, Any]]] = []
+    with _hf_seg_pipeline(model_name=model_name, device=device) as seg_pipe:
+        for start in range(0, len(image_paths), bs):
+            images = [_load_image_pil(p) for p in image_paths[start:start + bs]]
+            with autocast():
+                results = seg_pipe(images, batch_size=len(images))
+            out.extend(_hf_items_from_results(r) for r in results)
+    return out
 
 
 # -----------------------------------------------------------------------------
-# 4. Classical segmentation: Felzenszwalb graph-based segmentation
+# 4. Classical graph-based segmentation (Felzenszwalb)
 # -----------------------------------------------------------------------------
 def run_felzenszwalb(
     image_path: str,
@@ -1082,6 +1203,31 @@ def save_felzenszwalb_visualization(
 # -----------------------------------------------------------------------------
 # 5. Save SAM instances as images
 # -----------------------------------------------------------------------------
+def _mask_in_box(item: Dict[str, Any], width: int, height: int, box: tuple) -> np.ndarray:
+    """
+    Boolean mask of ``item`` restricted to ``box`` (left, top, right, bottom) in image pixels.
+
+    Handles full-frame masks (resized with nearest neighbour when their size differs
+    from the image) and tiled items whose mask is a local crop at ``mask_offset``.
+    """
+    left, top, right, bottom = box
+    mask = np.asarray(item.get("mask"))
+    m_bool = mask if mask.dtype == bool else mask > 0
+    offset = item.get("mask_offset")
+    if offset is not None:
+        out = np.zeros((bottom - top, right - left), dtype=bool)
+        ox, oy = int(offset[0]), int(offset[1])
+        ix0, iy0 = max(left, ox), max(top, oy)
+        ix1, iy1 = min(right, ox + m_bool.shape[1]), min(bottom, oy + m_bool.shape[0])
+        if ix1 > ix0 and iy1 > iy0:
+            out[iy0 - top:iy1 - top, ix0 - left:ix1 - left] = m_bool[iy0 - oy:iy1 - oy, ix0 - ox:ix1 - ox]
+        return out
+    if m_bool.shape[:2] != (height, width):
+        m_img = Image.fromarray(m_bool.astype(np.uint8) * 255)
+        m_bool = np.array(m_img.resize((width, height), resample=Image.NEAREST)) > 0
+    return m_bool[top:bottom, left:right]
+
+
 def save_sam_instances(
     image_path: str,
     items: List[Dict[str, Any]],
@@ -1098,7 +1244,8 @@ def save_sam_instances(
         Original image path.
     items : List[Dict[str, Any]]
         The list returned by `run_sam_auto`, each item must contain:
-          - "mask": np.ndarray[H, W] bool
+          - "mask": np.ndarray[H, W] bool (or a local crop placed at
+            ``"mask_offset"`` (x, y), as returned for tiled images)
           - "bbox": [x1, y1, x2, y2] normalized
     output_dir : str | Path
         Directory to save cropped images. Will be created if not exists.
@@ -1116,8 +1263,8 @@ def save_sam_instances(
     out_dir = Path(output_dir)
     out_dir.mkdir(parents=True, exist_ok=True)
 
-    # Load original image as RGBA for consistent processing
-    img = _load_image_pil(image_path).convert("RGBA")
+    # Load the original image once; every instance only touches its bbox crop
+    img = _load_image_pil(image_path)
     width, height = img.size
 
     saved_paths: List[str] = []
@@ -1128,14 +1275,6 @@ def save_sam_instances(
         if mask is None or bbox is None:
             continue
 
-        if not isinstance(mask, np.ndarray):
-            mask = np.array(mask)
-
-        if mask.dtype != bool:
-            m_bool = mask > 0
-        else:
-            m_bool = mask
-
         # bbox is normalized [x1, y1, x2, y2]
         x1_norm, y1_norm, x2_norm, y2_norm = bbox
         left = max(0, min(width, int(round(x1_norm * width))))
@@ -1146,25 +1285,14 @@ def save_sam_instances(
         if right <= left or bottom <= top:
             continue
 
-        # Ensure mask size matches image size
-        if m_bool.shape[:2] != (height, width):
-            # If shapes mismatch, try simple resize via PIL (nearest)
-            m_img = Image.fromarray(m_bool.astype(np.uint8) * 255)
-            m_img = m_img.resize((width, height), resample=Image.NEAREST)
-            m_bool = np.array(m_img) > 0
-
         if mode == "bbox":
             # Simple rectangular crop from original image (no transparency)
-            rgb_img = img.convert("RGB")
-            patch = rgb_img.crop((left, top, right, bottom))
+            patch = img.crop((left, top, right, bottom))
         elif mode == "rgba":
-            # Apply mask as alpha to original image, then crop
-            rgba = np.array(img)  # H x W x 4
-            alpha = rgba[:, :, 3]
-            alpha[~m_bool] = 0
-            rgba[:, :, 3] = alpha
-            masked_img = Image.fromarray(rgba)
-            patch = masked_img.crop((left, top, right, bottom))
+            # Apply mask as alpha to the bbox crop
+            rgba = np.array(img.crop((left, top, right, bottom)).convert("RGBA"))
+            rgba[:, :, 3][~_mask_in_box(item, width, height, (left, top, right, bottom))] = 0
+            patch = Image.fromarray(rgba)
         else:
             raise ValueError(f"Unsupported mode: {mode!r}, must be 'bbox' or 'rgba'.")
 
@@ -1175,6 +1303,117 @@ def save_sam_instances(
     return saved_paths
 
 
+def _segment_tiled(
+    image_path: str,
+    output_dir: str,
+    run_tiles: Callable[[List[str]], List[List[Dict[str, Any]]]],
+    min_area: int = 0,
+    min_score: float = 0.0,
+    iou_threshold: float = 0.5,
+    top_k: Optional[int] = None,
+    nms_by: str = "bbox",
+) -> List[Dict[str, Any]]:
+    """
+    大图分块分割：按 tiling.plan_tiles 切成带重叠的 tile，run_tiles(tile_paths) 逐 tile 跑 SAM，
+    每个 tile 内先做过滤 + NMS，再把结果平移到全局坐标并跨 tile 合并，最后做全局 Top-K。
+
+    返回的 item 与 run_sam_auto 相同（bbox 归一化到整图），但 "mask" 是裁到元素 bbox 的
+    局部 mask，左上角全局像素坐标记在 "mask_offset"，不再持有整图大小的 mask。
+    """
+    img = _load_image_pil(image_path)
+    width, height = img.size
+    tiles = plan_tiles(width, height)
+    tile_dir = Path(output_dir) / "tiles"
+    tile_dir.mkdir(parents=True, exist_ok=True)
+    tile_paths = []
+    for i, t in enumerate(tiles):
+        p = tile_dir / f"tile_{i:03d}.png"
+        img.crop((t.x0, t.y0, t.x1, t.y1)).save(p)
+        tile_paths.append(str(p.resolve()))
+    del img
+
+    try:
+        per_tile = run_tiles(tile_paths)
+    finally:
+        for p in tile_paths:
+            try:
+                os.remove(p)
+            except OSError:
+                pass
+        try:
+            tile_dir.rmdir()
+        except OSError:
+            pass
+
+    dets: List[Dict[str, Any]] = []
+    for t, tile_items in zip(tiles, per_tile):
+        tile_items = postprocess_sam_items(
+            tile_items,
+            min_area=min_area,
+            min_score=min_score,
+            iou_threshold=iou_threshold,
+            top_k=None,
+            nms_by=nms_by,
+            score_key_for_nms="score",
+        )
+        for it in tile_items:
+            x1n, y1n, x2n, y2n = it["bbox"]
+            local = [x1n * t.width, y1n * t.height, x2n * t.width, y2n * t.height]
+            det = {
+                "bbox_px": t.to_global(local),
+                "score": it.get("score"),
+                "area": it.get("area", 0),
+                "tile": t,
+                "truncated": t.truncates(local),
+            }
+            mask = it.get("mask")
+            if mask is not None:
+                m_bool = np.asarray(mask) > 0
+                if m_bool.shape[:2] != (t.height, t.width):
+                    m_img = Image.fromarray(m_bool.astype(np.uint8) * 255)
+                    m_bool = np.array(m_img.resize((t.width, t.height), resample=Image.NEAREST)) > 0
+                cropped = crop_mask(m_bool, (t.x0, t.y0))
+                if cropped is None:
+                    continue
+                det["mask"], det["mask_offset"] = cropped
+            dets.append(det)
+        del tile_items
+
+    items: List[Dict[str, Any]] = []
+    for d in merge_tiled_detections(dets):
+        x1, y1, x2, y2 = d["bbox_px"]
+        items.append(
+            {
+                "mask": d.get("mask"),
+                "mask_offset": d.get("mask_offset"),
+                "bbox": [x1 / width, y1 / height, x2 / width, y2 / height],
+                "score": d.get("score"),
+                "area": d.get("area", 0),
+            }
+        )
+    if top_k is not None and top_k > 0:
+        items = topk_sam_items(items, k=int(top_k), sort_key="area")
+    return items
+
+
+def _save_layout_items(image_path: str, output_dir: str, items: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """将每个实例按 bbox 裁剪为 PNG 小图，并绑定 png_path & type。"""
+    saved_paths = save_sam_instances(
+        image_path=image_path,
+        items=items,
+        output_dir=output_dir,
+        prefix="layout_",
+        mode="bbox",
+    )
+    for i, p in enumerate(saved_paths):
+        if i >= len(items):
+            break
+        items[i]["png_path"] = p
+        # 标记为布局框，和 MinerU 的 type 区分开
+        items[i]["type"] = "layout_box"
+    return items
+
+
 def segment_layout_boxes(
     image_path: str,
     output_dir: str,
@@ -1193,7 +1432,25 @@ def segment_layout_boxes(
     - 输入为二次编辑后的空框模板图（fig_layout_path）；
     - 不关心具体语义，只需要稳定的矩形/箭头布局；
     - 输出 items 将在后续被转换为 SVG / EMF 并按 bbox 映射回 PPT。
+
+    超过 DF_TILE_MAX_PIXELS 的大图走分块分割（见 _segment_tiled），此时 item["mask"]
+    是局部 mask，左上角像素坐标在 item["mask_offset"]。
     """
+    width, height = _get_image_size(image_path)
+    if needs_tiling(width, height):
+        # 大图：分块 + 跨 tile 合并，tile 按 DF_SEG_BATCH 批量送入常驻模型
+        items = _segment_tiled(
+            image_path,
+            output_dir,
+            lambda paths: run_sam_auto_batch(paths, checkpoint=checkpoint, device=device),
+            min_area=min_area,
+            min_score=min_score,
+            iou_threshold=iou_threshold,
+            top_k=top_k,
+            nms_by=nms_by,
+        )
+        return _save_layout_items(image_path, output_dir, items)
+
     # 1) SAM 自动分割
     items = run_sam_auto(image_path, checkpoint=checkpoint, device=device)
 
@@ -1209,24 +1466,8 @@ def segment_layout_boxes(
         sort_key_for_topk="area",
     )
 
-    # 3) 将每个实例按 bbox 裁剪为 PNG 小图
-    saved_paths = save_sam_instances(
-        image_path=image_path,
-        items=items,
-        output_dir=output_dir,
-        prefix="layout_",
-        mode="bbox",
-    )
-
-    # 4) 绑定 png_path & type
-    for i, p in enumerate(saved_paths):
-        if i >= len(items):
-            break
-        items[i]["png_path"] = p
-        # 标记为布局框，和 MinerU 的 type 区分开
-        items[i]["type"] = "layout_box"
-
-    return items
+    # 3) 裁剪 PNG 小图 + 绑定 png_path & type
+    return _save_layout_items(image_path, output_dir, items)
 
 
 def segment_layout_boxes_server(
@@ -1244,6 +1485,31 @@ def segment_layout_boxes_server(
     """
     Server version of segment_layout_boxes.
     """
+    width, height = _get_image_size(image_path)
+    if needs_tiling(width, height):
+        n_urls = 1 if isinstance(server_urls, str) else max(1, len(server_urls))
+
+        def _run_tiles(paths: List[str]) -> List[List[Dict[str, Any]]]:
+            with ThreadPoolExecutor(max_workers=min(len(paths), 2 * n_urls)) as pool:
+                return list(
+                    pool.map(
+                        lambda p: run_sam_auto_server(p, server_urls=server_urls, checkpoint=checkpoint, device=device),
+                        paths,
+                    )
+                )
+
+        items = _segment_tiled(
+            image_path,
+            output_dir,
+            _run_tiles,
+            min_area=min_area,
+            min_score=min_score,
+            iou_threshold=iou_threshold,
+            top_k=top_k,
+            nms_by=nms_by,
+        )
+        return _save_layout_items(image_path, output_dir, items)
+
     # 1) SAM 自动分割 (Remote)
     items = run_sam_auto_server(
         image_path, 
@@ -1264,24 +1530,8 @@ def segment_layout_boxes_server(
         sort_key_for_topk="area",
     )
 
-    # 3) 将每个实例按 bbox 裁剪为 PNG 小图
-    saved_paths = save_sam_instances(
-        image_path=image_path,
-        items=items,
-        output_dir=output_dir,
-        prefix="layout_",
-        mode="bbox",
-    )
-
-    # 4) 绑定 png_path & type
-    for i, p in enumerate(saved_paths):
-        if i >= len(items):
-            break
-        items[i]["png_path"] = p
-        # 标记为布局框，和 MinerU 的 type 区分开
-        items[i]["type"] = "layout_box"
-
-    return items
+    # 3) 裁剪 PNG 小图 + 绑定 png_path & type
+    return _save_layout_items(image_path, output_dir, items)
 
 
 # -----------------------------------------------------------------------------
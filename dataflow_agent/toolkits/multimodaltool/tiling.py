@@ -0,0 +1,306 @@
+"""
+大图分块处理：超过像素预算的图片切成带重叠的 tile 分别跑 OCR / SAM，再在全局坐标下合并结果。
+
+用法：
+    from dataflow_agent.toolkits.multimodaltool.tiling import needs_tiling, plan_tiles, merge_tiled_detections
+
+    if needs_tiling(w, h):
+        for tile in plan_tiles(w, h):
+            crop = image[tile.y0:tile.y1, tile.x0:tile.x1]
+            ...                                     # 检测结果平移到全局坐标
+            det = {"bbox_px": [...], "tile": tile, "truncated": tile.truncates(local_bbox)}
+        merged = merge_tiled_detections(dets)
+
+- tile 之间重叠 overlap 像素，小于重叠宽度的元素至少在一个 tile 里完整出现；
+- 被 tile 内部边界截断的检测标记为 truncated：
+  * 大部分落在某个完整检测内部时丢弃；
+  * 两个 truncated 片段在两 tile 的公共区域内重合时视为同一元素，合并 bbox / mask / 文本；
+- mask 统一用 (局部 mask, 左上角偏移) 表示，合并时只分配元素大小的数组，不分配整图大小的数组。
+
+配置：
+- DF_TILE_MAX_PIXELS: 超过该像素数才分块（默认 16777216 即 4096x4096；<=0 关闭分块）
+- DF_TILE_SIZE:       tile 边长（默认 2048）
+- DF_TILE_OVERLAP:    相邻 tile 重叠像素（默认 256）
+"""
+from __future__ import annotations
+
+import os
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from dataflow_agent.logger import get_logger
+
+log = get_logger(__name__)
+
+# 检测框距 tile 内部边界不超过该像素数即视为被截断
+EDGE_MARGIN_PX = 2
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(float(os.getenv(name, str(default))))
+    except ValueError:
+        return default
+
+
+def tile_max_pixels() -> int:
+    return _env_int("DF_TILE_MAX_PIXELS", 4096 * 4096)
+
+
+def needs_tiling(width: int, height: int, max_pixels: Optional[int] = None) -> bool:
+    budget = tile_max_pixels() if max_pixels is None else int(max_pixels)
+    return budget > 0 and int(width) * int(height) > budget
+
+
+@dataclass(frozen=True)
+class Tile:
+    """全局坐标下的 tile 窗口 [x0, x1) x [y0, y1)，并记录哪几条边在图片内部（与其他 tile 相邻）。"""
+
+    x0: int
+    y0: int
+    x1: int
+    y1: int
+    inner_left: bool = False
+    inner_top: bool = False
+    inner_right: bool = False
+    inner_bottom: bool = False
+
+    @property
+    def width(self) -> int:
+        return self.x1 - self.x0
+
+    @property
+    def height(self) -> int:
+        return self.y1 - self.y0
+
+    def to_global(self, bbox: Sequence[float]) -> List[float]:
+        x1, y1, x2, y2 = bbox
+        return [x1 + self.x0, y1 + self.y0, x2 + self.x0, y2 + self.y0]
+
+    def truncates(self, bbox: Sequence[float], margin: int = EDGE_MARGIN_PX) -> bool:
+        """局部坐标 bbox 是否贴着 tile 的内部边界（即可能被截断）。"""
+        x1, y1, x2, y2 = bbox
+        return bool(
+            (self.inner_left and x1 <= margin)
+            or (self.inner_top and y1 <= margin)
+            or (self.inner_right and x2 >= self.width - 1 - margin)
+            or (self.inner_bottom and y2 >= self.height - 1 - margin)
+        )
+
+
+def _axis_starts(length: int, tile: int, overlap: int) -> List[int]:
+    if length <= tile:
+        return [0]
+    step = max(1, tile - overlap)
+    n = int(np.ceil((length - tile) / step)) + 1
+    # 均匀铺开，最后一块贴齐边界
+    return [int(round(i * (length - tile) / (n - 1))) for i in range(n)]
+
+
+def plan_tiles(
+    width: int,
+    height: int,
+    tile_size: Optional[int] = None,
+    overlap: Optional[int] = None,
+) -> List[Tile]:
+    """按行优先顺序返回覆盖整张图的 tile 列表。"""
+    tile = max(64, int(tile_size or _env_int("DF_TILE_SIZE", 2048)))
+    ov = int(overlap if overlap is not None else _env_int("DF_TILE_OVERLAP", 256))
+    ov = max(0, min(ov, tile // 2))
+    xs = _axis_starts(int(width), tile, ov)
+    ys = _axis_starts(int(height), tile, ov)
+    tiles = []
+    for yi, y0 in enumerate(ys):
+        for xi, x0 in enumerate(xs):
+            tiles.append(
+                Tile(
+                    x0=x0,
+                    y0=y0,
+                    x1=min(int(width), x0 + tile),
+                    y1=min(int(height), y0 + tile),
+                    inner_left=xi > 0,
+                    inner_top=yi > 0,
+                    inner_right=xi < len(xs) - 1,
+                    inner_bottom=yi < len(ys) - 1,
+                )
+            )
+    return tiles
+
+
+# ----------------------------------------------------------------------
+# 局部 mask 工具
+# ----------------------------------------------------------------------
+def crop_mask(mask: np.ndarray, offset: Tuple[int, int] = (0, 0)) -> Optional[Tuple[np.ndarray, Tuple[int, int]]]:
+    """把 mask 裁到紧致 bbox，返回 (局部 bool mask, 全局左上角 (x, y))；空 mask 返回 None。"""
+    m = np.asarray(mask).astype(bool, copy=False)
+    rows = np.flatnonzero(m.any(axis=1))
+    if rows.size == 0:
+        return None
+    cols = np.flatnonzero(m.any(axis=0))
+    y0, y1, x0, x1 = int(rows[0]), int(rows[-1]) + 1, int(cols[0]), int(cols[-1]) + 1
+    return m[y0:y1, x0:x1].copy(), (int(offset[0]) + x0, int(offset[1]) + y0)
+
+
+def _mask_window(mask: np.ndarray, offset: Sequence[int]) -> Tuple[int, int, int, int]:
+    return int(offset[0]), int(offset[1]), int(offset[0]) + mask.shape[1], int(offset[1]) + mask.shape[0]
+
+
+def _mask_in_window(mask: np.ndarray, offset: Sequence[int], win: Tuple[int, int, int, int]) -> Tuple[np.ndarray, int]:
+    """返回 mask 在全局窗口 win 内的部分（按 win 大小，窗口外补 0）。"""
+    x0, y0, x1, y1 = win
+    out = np.zeros((max(0, y1 - y0), max(0, x1 - x0)), dtype=bool)
+    mx0, my0, mx1, my1 = _mask_window(mask, offset)
+    ix0, iy0, ix1, iy1 = max(x0, mx0), max(y0, my0), min(x1, mx1), min(y1, my1)
+    if ix1 > ix0 and iy1 > iy0:
+        out[iy0 - y0:iy1 - y0, ix0 - x0:ix1 - x0] = mask[iy0 - my0:iy1 - my0, ix0 - mx0:ix1 - mx0]
+    return out, int(np.count_nonzero(out))
+
+
+def _intersect(a: Sequence[float], b: Sequence[float]) -> Optional[Tuple[float, float, float, float]]:
+    x0, y0, x1, y1 = max(a[0], b[0]), max(a[1], b[1]), min(a[2], b[2]), min(a[3], b[3])
+    if x1 <= x0 or y1 <= y0:
+        return None
+    return x0, y0, x1, y1
+
+
+def _area(b: Sequence[float]) -> float:
+    return max(0.0, b[2] - b[0]) * max(0.0, b[3] - b[1])
+
+
+def _int_window(b: Sequence[float]) -> Tuple[int, int, int, int]:
+    return int(np.floor(b[0])), int(np.floor(b[1])), int(np.ceil(b[2])), int(np.ceil(b[3]))
+
+
+# ----------------------------------------------------------------------
+# 合并
+# ----------------------------------------------------------------------
+def _overlap_stats(a: Dict[str, Any], b: Dict[str, Any], region: Optional[Sequence[float]] = None) -> Tuple[float, float]:
+    """
+    在 region（默认整图）内计算 (交集 / a 的面积, IoU)。
+    两者都有局部 mask 时按像素计算，否则按 bbox 计算。
+    """
+    if a.get("mask") is not None and b.get("mask") is not None:
+        wa = _mask_window(a["mask"], a["mask_offset"])
+        wb = _mask_window(b["mask"], b["mask_offset"])
+        if region is not None:
+            rw = _int_window(region)
+            wa, wb = _intersect(wa, rw), _intersect(wb, rw)
+            if wa is None or wb is None:
+                return 0.0, 0.0
+        win = _intersect(wa, wb)
+        if win is None:
+            return 0.0, 0.0
+        na = _mask_in_window(a["mask"], a["mask_offset"], wa)[1]
+        nb = _mask_in_window(b["mask"], b["mask_offset"], wb)[1]
+        if not na or not nb:
+            return 0.0, 0.0
+        inter = int(np.count_nonzero(
+            _mask_in_window(a["mask"], a["mask_offset"], win)[0] & _mask_in_window(b["mask"], b["mask_offset"], win)[0]
+        ))
+        return inter / na, inter / float(na + nb - inter)
+
+    ba, bb = a["bbox_px"], b["bbox_px"]
+    if region is not None:
+        ba, bb = _intersect(ba, region), _intersect(bb, region)
+        if ba is None or bb is None:
+            return 0.0, 0.0
+    ib = _intersect(ba, bb)
+    aa, ab = _area(ba), _area(bb)
+    if ib is None or aa <= 0 or ab <= 0:
+        return 0.0, 0.0
+    inter = _area(ib)
+    return inter / aa, inter / (aa + ab - inter)
+
+
+def _join_text(left: str, right: str) -> str:
+    """拼接被 tile 边界切开的两段文本，去掉重叠区域里重复识别的部分。"""
+    for k in range(min(len(left), len(right)), 0, -1):
+        if left.endswith(right[:k]):
+            return left + right[k:]
+    sep = " " if left and right and left[-1].isascii() and right[0].isascii() else ""
+    return left + sep + right
+
+
+def _union(keep: Dict[str, Any], other: Dict[str, Any]) -> None:
+    a, b = keep["bbox_px"], other["bbox_px"]
+    if "text" in keep and "text" in other:
+        # 横向切开时按 x 排序拼接，纵向切开时按 y
+        horizontal = abs(a[0] - b[0]) >= abs(a[1] - b[1])
+        first, second = (keep, other) if (a[0] <= b[0] if horizontal else a[1] <= b[1]) else (other, keep)
+        keep["text"] = _join_text(first["text"], second["text"])
+    if keep.get("mask") is not None and other.get("mask") is not None:
+        wa = _mask_window(keep["mask"], keep["mask_offset"])
+        wb = _mask_window(other["mask"], other["mask_offset"])
+        win = (min(wa[0], wb[0]), min(wa[1], wb[1]), max(wa[2], wb[2]), max(wa[3], wb[3]))
+        ma, _ = _mask_in_window(keep["mask"], keep["mask_offset"], win)
+        mb, _ = _mask_in_window(other["mask"], other["mask_offset"], win)
+        keep["mask"] = ma | mb
+        keep["mask_offset"] = (win[0], win[1])
+        keep["area"] = int(np.count_nonzero(keep["mask"]))
+    for key in ("score", "conf"):
+        if keep.get(key) is not None and other.get(key) is not None:
+            keep[key] = max(keep[key], other[key])
+    keep["bbox_px"] = [min(a[0], b[0]), min(a[1], b[1]), max(a[2], b[2]), max(a[3], b[3])]
+    keep["tile"] = Tile(
+        x0=min(keep["tile"].x0, other["tile"].x0),
+        y0=min(keep["tile"].y0, other["tile"].y0),
+        x1=max(keep["tile"].x1, other["tile"].x1),
+        y1=max(keep["tile"].y1, other["tile"].y1),
+    )
+
+
+def merge_tiled_detections(
+    dets: List[Dict[str, Any]],
+    contain_threshold: float = 0.8,
+    seam_iou: float = 0.5,
+) -> List[Dict[str, Any]]:
+    """
+    合并各 tile 的检测结果（全局坐标）。
+
+    每个 det 需要 "bbox_px"（全局像素坐标）、"tile"（Tile）、"truncated"（bool）；
+    可选 "mask" + "mask_offset"（局部 mask 及其全局左上角）、"text"、"score" / "conf"。
+
+    处理顺序：完整检测优先，其次面积大的优先；
+    - 自身被已保留检测覆盖的比例 >= contain_threshold（重叠区里的重复 / 残片）：
+      两者都是 truncated 时合并，否则丢弃；
+    - 两个 truncated 检测在各自 tile 的公共区域内 IoU >= seam_iou：视为同一元素被切开，合并。
+    返回保留的检测（去掉 "tile" / "truncated" 字段），保持原有先后顺序。
+    """
+    order = sorted(range(len(dets)), key=lambda i: (bool(dets[i]["truncated"]), -_area(dets[i]["bbox_px"])))
+    kept: List[int] = []
+    for i in order:
+        d = dets[i]
+        absorbed = False
+        for k in kept:
+            kd = dets[k]
+            if _intersect(d["bbox_px"], kd["bbox_px"]) is None:
+                continue
+            covered, _ = _overlap_stats(d, kd)
+            both_cut = d["truncated"] and kd["truncated"]
+            if covered >= contain_threshold:
+                if both_cut:
+                    _union(kd, d)
+                absorbed = True
+                break
+            if both_cut and d["tile"] != kd["tile"]:
+                shared = _intersect(
+                    (d["tile"].x0, d["tile"].y0, d["tile"].x1, d["tile"].y1),
+                    (kd["tile"].x0, kd["tile"].y0, kd["tile"].x1, kd["tile"].y1),
+                )
+                if shared is not None and _overlap_stats(d, kd, shared)[1] >= seam_iou:
+                    _union(kd, d)
+                    absorbed = True
+                    break
+        if not absorbed:
+            kept.append(i)
+
+    out = []
+    for i in sorted(kept):
+        d = dict(dets[i])
+        d.pop("tile", None)
+        d.pop("truncated", None)
+        out.append(d)
+    log.info(f"[tiling] merged {len(dets)} tile detections -> {len(out)}")
+    return out
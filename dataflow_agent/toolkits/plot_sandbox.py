@@ -0,0 +1,344 @@
+"""
+matplotlib 代码沙箱：常驻 worker 进程池，执行 LLM 生成的绘图代码。
+
+用法：
+    from dataflow_agent.toolkits.plot_sandbox import run_plot_code, warm_plot_sandbox
+
+    warm_plot_sandbox()                                   # 可选：提前拉起 worker（后台导入 matplotlib）
+    result = run_plot_code(code, output_path, timeout=30)
+    # {"success": bool, "png": bytes | None, "error": str, "stdout": str}
+
+- worker 启动时就以 Agg 后端导入 matplotlib / numpy（有 pandas 也一并导入），
+  每张图不再付解释器启动 + 导入的开销；代码经 Pipe 发送，在全新的全局命名空间里 exec；
+- 资源限制：内存（RLIMIT_AS，按 worker 导入完成后的基线再加预算）、
+  CPU 时间（每个任务单独设置 RLIMIT_CPU 软限制）、墙钟超时（超时直接杀掉 worker）；
+- 每个任务结束后关闭所有 figure 并恢复 rcParams；worker 执行满 N 个任务、
+  遇到 MemoryError 或崩溃 / 超时后都会被回收，并在后台补一个新的；
+- 危险操作的正则检查仍由调用方（utils_common.execute_matplotlib_code）负责。
+
+配置：
+- DF_PLOT_SANDBOX:           设为 "off" 时回退为每次 subprocess 执行
+- DF_PLOT_SANDBOX_WORKERS:   worker 数（默认 2）
+- DF_PLOT_SANDBOX_MAX_JOBS:  单个 worker 最多执行的任务数（默认 50）
+- DF_PLOT_SANDBOX_MEM_MB:    单个 worker 的内存预算（默认 1024 MB；0 表示不限制）
+"""
+from __future__ import annotations
+
+import atexit
+import multiprocessing
+import os
+import threading
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Union
+
+from dataflow_agent.logger import get_logger
+
+log = get_logger(__name__)
+
+_STARTUP_TIMEOUT = 120.0
+
+_POOL: Optional["PlotSandboxPool"] = None
+_POOL_LOCK = threading.Lock()
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, str(default)))
+    except ValueError:
+        return default
+
+
+def sandbox_enabled() -> bool:
+    return (os.getenv("DF_PLOT_SANDBOX") or "").lower() != "off"
+
+
+# ----------------------------------------------------------------------
+# worker 端
+# ----------------------------------------------------------------------
+def _vm_bytes() -> int:
+    """当前进程虚拟内存大小（仅 Linux；其他平台返回 0）。"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[0]) * os.sysconf("SC_PAGE_SIZE")
+    except Exception:
+        return 0
+
+
+def _limit_memory(budget_bytes: int) -> None:
+    try:
+        import resource
+    except ImportError:
+        return
+    if budget_bytes <= 0:
+        return
+    _, hard = resource.getrlimit(resource.RLIMIT_AS)
+    limit = _vm_bytes() + budget_bytes
+    if hard != resource.RLIM_INFINITY:
+        limit = min(limit, hard)
+    resource.setrlimit(resource.RLIMIT_AS, (limit, hard))
+
+
+def _limit_cpu(seconds: Optional[float]) -> None:
+    """seconds 为 None 时解除本任务的 CPU 软限制。"""
+    try:
+        import resource
+    except ImportError:
+        return
+    _, hard = resource.getrlimit(resource.RLIMIT_CPU)
+    if seconds is None:
+        resource.setrlimit(resource.RLIMIT_CPU, (hard, hard))
+        return
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    soft = int(usage.ru_utime + usage.ru_stime + seconds) + 1
+    if hard != resource.RLIM_INFINITY:
+        soft = min(soft, hard)
+    resource.setrlimit(resource.RLIMIT_CPU, (soft, hard))
+
+
+def _run_job(code: str, output_path: str, cwd: str, cpu_seconds: float) -> Dict[str, Any]:
+    import builtins
+    import contextlib
+    import io
+    import traceback
+
+    import matplotlib
+    import matplotlib.pyplot as plt
+
+    out, err = io.StringIO(), io.StringIO()
+    namespace = {"__name__": "__main__", "__builtins__": builtins}
+    ok, error, recycle = True, "", False
+    _limit_cpu(cpu_seconds)
+    try:
+        os.chdir(cwd)
+        with contextlib.redirect_stdout(out), contextlib.redirect_stderr(err):
+            exec(compile(code, "<chart>", "exec"), namespace)
+    except SystemExit as e:
+        if e.code not in (None, 0):
+            ok, error = False, err.getvalue() + f"SystemExit: {e.code}"
+    except BaseException as e:  # noqa: BLE001 - 任何异常都要回传给调用方
+        # 去掉 _run_job 自身这一帧，只保留生成代码里的调用栈
+        tb = "".join(traceback.format_exception(type(e), e, e.__traceback__.tb_next))
+        ok, error = False, err.getvalue() + tb
+        recycle = isinstance(e, MemoryError)
+    finally:
+        _limit_cpu(None)
+        try:
+            plt.close("all")
+            matplotlib.rc_file_defaults()
+        except Exception:
+            recycle = True
+        namespace.clear()
+
+    png = None
+    if ok:
+        try:
+            png = Path(output_path).read_bytes()
+        except OSError:
+            png = None
+    return {"success": ok, "png": png, "error": error, "stdout": out.getvalue(), "recycle": recycle}
+
+
+def _worker_main(conn, mem_budget: int) -> None:
+    os.environ["MPLBACKEND"] = "Agg"
+    # 沙箱里的数值计算都很小，BLAS 多线程只会放大虚拟内存
+    for var in ("OMP_NUM_THREADS", "OPENBLAS_NUM_THREADS", "MKL_NUM_THREADS"):
+        os.environ.setdefault(var, "1")
+    import matplotlib
+
+    matplotlib.use("Agg")
+    import matplotlib.pyplot  # noqa: F401
+    import numpy  # noqa: F401
+
+    try:
+        import pandas  # noqa: F401
+    except ImportError:
+        pass
+    _limit_memory(mem_budget)
+    conn.send(("ready", os.getpid()))
+    while True:
+        try:
+            job = conn.recv()
+        except (EOFError, OSError):
+            break
+        if job is None:
+            break
+        conn.send(_run_job(*job))
+
+
+# ----------------------------------------------------------------------
+# 调用端
+# ----------------------------------------------------------------------
+class _Worker:
+    def __init__(self, proc, conn):
+        self.proc = proc
+        self.conn = conn
+        self.jobs = 0
+
+
+class PlotSandboxPool:
+    """固定大小的沙箱 worker 池（线程安全，run() 为同步阻塞调用）。"""
+
+    def __init__(self, size: int = 2, max_jobs: int = 50, mem_mb: int = 1024):
+        self.size = max(1, int(size))
+        self.max_jobs = max(1, int(max_jobs))
+        self.mem_budget = max(0, int(mem_mb)) << 20
+        self._ctx = multiprocessing.get_context("spawn")
+        self._slots = threading.BoundedSemaphore(self.size)
+        self._idle: List[_Worker] = []
+        self._lock = threading.Lock()
+        self._closed = False
+        self._starting = 0  # 后台启动中的 worker 数
+
+    # -- 生命周期 --------------------------------------------------------
+    def _spawn(self) -> _Worker:
+        parent_conn, child_conn = self._ctx.Pipe()
+        proc = self._ctx.Process(
+            target=_worker_main, args=(child_conn, self.mem_budget), name="plot-sandbox", daemon=True
+        )
+        proc.start()
+        child_conn.close()
+        worker = _Worker(proc, parent_conn)
+        try:
+            if not parent_conn.poll(_STARTUP_TIMEOUT):
+                raise RuntimeError("worker 启动超时")
+            parent_conn.recv()
+        except Exception:
+            self._kill(worker)
+            raise
+        return worker
+
+    def _spawn_idle(self) -> None:
+        try:
+            worker = self._spawn()
+        except Exception as e:
+            if not self._closed:
+                log.warning(f"[plot_sandbox] 预热 worker 失败: {e!r}")
+            return
+        finally:
+            with self._lock:
+                self._starting -= 1
+        self._give(worker)
+
+    def _start_background(self, count: int) -> None:
+        with self._lock:
+            if self._closed:
+                return
+            self._starting += count
+        for _ in range(count):
+            threading.Thread(target=self._spawn_idle, name="plot-sandbox-warm", daemon=True).start()
+
+    def warm(self) -> None:
+        """在后台把空闲 worker 补到 size 个。"""
+        with self._lock:
+            missing = self.size - len(self._idle) - self._starting
+        if missing > 0:
+            self._start_background(missing)
+
+    def _take(self) -> _Worker:
+        with self._lock:
+            while self._idle:
+                worker = self._idle.pop()
+                if worker.proc.is_alive():
+                    return worker
+                self._kill(worker)
+        return self._spawn()
+
+    def _give(self, worker: _Worker) -> None:
+        with self._lock:
+            if not self._closed and len(self._idle) < self.size and worker.proc.is_alive():
+                self._idle.append(worker)
+                return
+        self._retire(worker)
+
+    @staticmethod
+    def _kill(worker: _Worker) -> None:
+        try:
+            if worker.proc.is_alive():
+                worker.proc.kill()
+            worker.proc.join(timeout=5)
+        except Exception:
+            pass
+        try:
+            worker.conn.close()
+        except Exception:
+            pass
+
+    def _retire(self, worker: _Worker) -> None:
+        try:
+            worker.conn.send(None)
+            worker.proc.join(timeout=2)
+        except Exception:
+            pass
+        self._kill(worker)
+
+    def _replace(self) -> None:
+        self._start_background(1)
+
+    def close(self) -> None:
+        with self._lock:
+            self._closed = True
+            idle, self._idle = self._idle, []
+        for worker in idle:
+            self._retire(worker)
+
+    # -- 执行 ------------------------------------------------------------
+    def run(self, code: str, output_path: Union[str, Path], timeout: float = 30, cwd: Union[str, Path, None] = None) -> Dict[str, Any]:
+        output_path = Path(output_path)
+        cwd = Path(cwd) if cwd is not None else output_path.parent
+        with self._slots:
+            worker = self._take()
+            try:
+                worker.conn.send((code, str(output_path), str(cwd), float(timeout)))
+                if not worker.conn.poll(timeout):
+                    self._kill(worker)
+                    self._replace()
+                    return {"success": False, "png": None, "error": f"代码执行超时 ({timeout} 秒)", "stdout": ""}
+                result = worker.conn.recv()
+            except (EOFError, OSError) as e:
+                exitcode = worker.proc.exitcode
+                self._kill(worker)
+                self._replace()
+                if exitcode is None:
+                    exitcode = worker.proc.exitcode
+                reason = "CPU 时间超限" if exitcode == -24 else f"worker 异常退出 (exitcode={exitcode}): {e}"
+                return {"success": False, "png": None, "error": reason, "stdout": ""}
+
+            worker.jobs += 1
+            if result.pop("recycle", False) or worker.jobs >= self.max_jobs:
+                self._retire(worker)
+                self._replace()
+            else:
+                self._give(worker)
+            return result
+
+
+def get_plot_sandbox() -> PlotSandboxPool:
+    global _POOL
+    with _POOL_LOCK:
+        if _POOL is None:
+            _POOL = PlotSandboxPool(
+                size=_env_int("DF_PLOT_SANDBOX_WORKERS", 2),
+                max_jobs=_env_int("DF_PLOT_SANDBOX_MAX_JOBS", 50),
+                mem_mb=_env_int("DF_PLOT_SANDBOX_MEM_MB", 1024),
+            )
+            atexit.register(shutdown_plot_sandbox)
+        return _POOL
+
+
+def shutdown_plot_sandbox() -> None:
+    global _POOL
+    with _POOL_LOCK:
+        pool, _POOL = _POOL, None
+    if pool is not None:
+        pool.close()
+
+
+def warm_plot_sandbox() -> None:
+    """提前在后台拉起 worker（沙箱关闭时不做任何事）。"""
+    if sandbox_enabled():
+        get_plot_sandbox().warm()
+
+
+def run_plot_code(code: str, output_path: Union[str, Path], timeout: float = 30) -> Dict[str, Any]:
+    """在沙箱 worker 中执行绘图代码，cwd 为 output_path 所在目录。"""
+    return get_plot_sandbox().run(code, output_path, timeout=timeout)
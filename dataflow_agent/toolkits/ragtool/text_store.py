@@ -0,0 +1,349 @@
+"""
+知识库文件的文本抽取存储：PDF / DOCX / PPTX 只解析一次，之后直接读磁盘缓存。
+
+用法：
+    from dataflow_agent.toolkits.ragtool.text_store import extract_texts_async, extract_text, get_text_store
+
+    texts = await extract_texts_async(paths)        # 未命中的文件在进程池中解析，不阻塞事件循环
+    text = extract_text(path)                       # 同步版本（未命中时在当前线程解析）
+    doc = get_text_store(path).get(path)            # ExtractedText：text + 每页起始偏移 pages
+
+存储按笔记本划分，目录由文件位置决定：
+    outputs/{title}_{id}/sources/{stem}/original/x.pdf  ->  outputs/{title}_{id}/text_store/
+    outputs/kb_data/{email}/{notebook_id}/x.pdf          ->  outputs/kb_data/{email}/{notebook_id}/.text_store/
+
+    <store>/index.json           # 绝对路径 -> {size, mtime_ns, sha256}，文件未变时免去重新哈希
+    <store>/<sha256>.json        # kind / pages（每页 / 每张幻灯片在 text 中的起始偏移）/ chars
+    <store>/<sha256>.txt.gz      # 抽取出的全文
+
+- 内容按 sha256 寻址：同一笔记本里重复上传或改名的文件共享一份结果；
+- 写入先写临时文件再 os.replace，并发请求同一文件最多重复解析一次，不会读到半截结果；
+- 解析失败不写入存储，返回 "[Parse Error: ...]" 之类的占位文本（与原先各处的行为一致）；
+- 纯文本 / Markdown 直接读取，不进存储。
+
+配置：
+- DF_TEXT_STORE:          "off" 关闭存储（每次都重新解析）
+- DF_TEXT_STORE_WORKERS:  解析进程数（默认 min(4, CPU 数)；1 表示在线程中解析）
+"""
+from __future__ import annotations
+
+import asyncio
+import atexit
+import gzip
+import hashlib
+import json
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from dataflow_agent.logger import get_logger
+
+log = get_logger(__name__)
+
+STORE_VERSION = 1
+PARSED_SUFFIXES = {".pdf", ".docx", ".doc", ".pptx", ".ppt"}
+
+_STORES: Dict[Path, "TextStore"] = {}
+_STORES_LOCK = threading.Lock()
+
+_EXECUTOR: Optional[ProcessPoolExecutor] = None
+_EXECUTOR_LOCK = threading.Lock()
+
+
+@dataclass
+class ExtractedText:
+    text: str
+    kind: str = "text"                              # pdf / docx / pptx / text
+    pages: List[int] = field(default_factory=lambda: [0])  # 每页起始字符偏移
+
+    def page_text(self, index: int) -> str:
+        end = self.pages[index + 1] if index + 1 < len(self.pages) else len(self.text)
+        return self.text[self.pages[index]:end]
+
+
+# ----------------------------------------------------------------------
+# 解析（可在 worker 进程中执行）
+# ----------------------------------------------------------------------
+def _join_pages(page_texts: Sequence[str]) -> Tuple[str, List[int]]:
+    offsets, parts, pos = [], [], 0
+    for t in page_texts:
+        offsets.append(pos)
+        parts.append(t)
+        pos += len(t)
+    return "".join(parts), offsets or [0]
+
+
+def _parse_file(path: str) -> Tuple[str, str, List[int]]:
+    """解析单个文件，返回 (kind, text, pages)；失败时抛异常。"""
+    suffix = Path(path).suffix.lower()
+    if suffix == ".pdf":
+        import fitz  # PyMuPDF
+
+        with fitz.open(path) as doc:
+            text, pages = _join_pages([page.get_text() + "\n" for page in doc])
+        return "pdf", text, pages
+    if suffix in (".docx", ".doc"):
+        try:
+            from docx import Document
+        except ImportError:
+            raise RuntimeError("python-docx not installed")
+        doc = Document(path)
+        return "docx", "\n".join(p.text for p in doc.paragraphs), [0]
+    if suffix in (".pptx", ".ppt"):
+        try:
+            from pptx import Presentation
+        except ImportError:
+            raise RuntimeError("python-pptx not installed")
+        prs = Presentation(path)
+        slides = []
+        for i, slide in enumerate(prs.slides):
+            t = f"--- Slide {i + 1} ---\n"
+            for shape in slide.shapes:
+                if hasattr(shape, "text"):
+                    t += shape.text + "\n"
+            slides.append(t)
+        text, pages = _join_pages(slides)
+        return "pptx", text, pages
+    with open(path, "r", encoding="utf-8", errors="replace") as f:
+        return "text", f.read(), [0]
+
+
+def _file_sha256(path: Path) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _write_atomic(path: Path, data: bytes) -> None:
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    tmp.write_bytes(data)
+    os.replace(tmp, path)
+
+
+# ----------------------------------------------------------------------
+# 存储
+# ----------------------------------------------------------------------
+class TextStore:
+    """一个笔记本的抽取文本存储。"""
+
+    def __init__(self, root: Path):
+        self.root = Path(root)
+        self._lock = threading.Lock()
+        self._index: Optional[Dict[str, dict]] = None
+
+    # -- 索引 ---------------------------------------------------------------
+    def _load_index(self) -> Dict[str, dict]:
+        try:
+            data = json.loads((self.root / "index.json").read_text(encoding="utf-8"))
+            return data if isinstance(data, dict) else {}
+        except Exception:
+            return {}
+
+    def _index_entry(self, path: Path, st: os.stat_result) -> Tuple[str, bool]:
+        """返回 (sha256, 是否需要更新索引)；size / mtime 未变时直接用索引里的哈希。"""
+        with self._lock:
+            if self._index is None:
+                self._index = self._load_index()
+            entry = self._index.get(str(path))
+        if entry and entry.get("size") == st.st_size and entry.get("mtime_ns") == st.st_mtime_ns:
+            return entry["sha256"], False
+        return _file_sha256(path), True
+
+    def _update_index(self, path: Path, st: os.stat_result, sha: str) -> None:
+        with self._lock:
+            index = self._load_index()  # 合并其他进程写入的条目
+            index.update(self._index or {})
+            index[str(path)] = {"size": st.st_size, "mtime_ns": st.st_mtime_ns, "sha256": sha}
+            self._index = index
+            self.root.mkdir(parents=True, exist_ok=True)
+            _write_atomic(self.root / "index.json", json.dumps(index, ensure_ascii=False).encode("utf-8"))
+
+    # -- 内容 ---------------------------------------------------------------
+    def _read(self, sha: str) -> Optional[ExtractedText]:
+        try:
+            meta = json.loads((self.root / f"{sha}.json").read_text(encoding="utf-8"))
+            if meta.get("version") != STORE_VERSION:
+                return None
+            with gzip.open(self.root / f"{sha}.txt.gz", "rt", encoding="utf-8") as f:
+                text = f.read()
+        except Exception:
+            return None
+        return ExtractedText(text=text, kind=meta.get("kind", "text"), pages=meta.get("pages") or [0])
+
+    def _write(self, sha: str, doc: ExtractedText) -> None:
+        self.root.mkdir(parents=True, exist_ok=True)
+        # 先写正文再写 meta：meta 存在即表示条目完整
+        _write_atomic(self.root / f"{sha}.txt.gz", gzip.compress(doc.text.encode("utf-8"), compresslevel=6))
+        meta = {"version": STORE_VERSION, "kind": doc.kind, "pages": doc.pages, "chars": len(doc.text)}
+        _write_atomic(self.root / f"{sha}.json", json.dumps(meta).encode("utf-8"))
+
+    def lookup(self, path: str) -> Tuple[Optional[ExtractedText], Optional[str], Optional[os.stat_result]]:
+        """只查不解析：返回 (命中的结果或 None, sha256, stat)。"""
+        p = Path(path).resolve()
+        st = p.stat()
+        sha, stale = self._index_entry(p, st)
+        doc = self._read(sha)
+        if doc is not None and stale:
+            self._update_index(p, st, sha)
+        return doc, sha, st
+
+    def put(self, path: str, sha: str, st: os.stat_result, doc: ExtractedText) -> None:
+        self._write(sha, doc)
+        self._update_index(Path(path).resolve(), st, sha)
+
+    def try_lookup(self, path: str) -> Tuple[Optional[ExtractedText], Optional[str], Optional[os.stat_result]]:
+        """lookup 的容错版本：存储读失败只记日志，按未命中处理。"""
+        try:
+            return self.lookup(path)
+        except Exception as e:
+            log.warning(f"[text_store] lookup failed for {path}: {e}")
+            return None, None, None
+
+    def try_put(self, path: str, sha: Optional[str], st: Optional[os.stat_result], doc: ExtractedText) -> bool:
+        """put 的容错版本：写失败只记日志，不影响已解析出的文本。"""
+        if sha is None or st is None:
+            return False
+        try:
+            self.put(path, sha, st, doc)
+            return True
+        except Exception as e:
+            log.warning(f"[text_store] store write failed for {path}: {e}")
+            return False
+
+    def get(self, path: str) -> ExtractedText:
+        """命中时读存储，否则在当前线程解析并写入；只有解析失败才抛异常，存储读写失败仅记日志。"""
+        doc, sha, st = self.try_lookup(path)
+        if doc is None:
+            kind, text, pages = _parse_file(str(path))
+            doc = ExtractedText(text=text, kind=kind, pages=pages)
+            self.try_put(path, sha, st, doc)
+        return doc
+
+
+def store_root_for(path: str) -> Path:
+    """文件所属笔记本的存储目录（见模块说明）。"""
+    p = Path(path).resolve()
+    for parent in p.parents:
+        if parent.name == "sources":
+            return parent.parent / "text_store"
+    return p.parent / ".text_store"
+
+
+def get_text_store(path: str) -> TextStore:
+    root = store_root_for(path)
+    with _STORES_LOCK:
+        store = _STORES.get(root)
+        if store is None:
+            store = _STORES[root] = TextStore(root)
+        return store
+
+
+def _store_enabled() -> bool:
+    return (os.getenv("DF_TEXT_STORE") or "").lower() != "off"
+
+
+# ----------------------------------------------------------------------
+# 解析进程池
+# ----------------------------------------------------------------------
+def _num_workers() -> int:
+    value = os.getenv("DF_TEXT_STORE_WORKERS")
+    if value:
+        try:
+            return max(1, int(value))
+        except ValueError:
+            log.warning(f"[text_store] invalid DF_TEXT_STORE_WORKERS={value!r}, using default")
+    return max(1, min(4, os.cpu_count() or 1))
+
+
+def _get_executor() -> ProcessPoolExecutor:
+    global _EXECUTOR
+    with _EXECUTOR_LOCK:
+        if _EXECUTOR is None:
+            # spawn：API 进程里已有线程 / 事件循环，fork 不安全
+            _EXECUTOR = ProcessPoolExecutor(
+                max_workers=_num_workers(), mp_context=multiprocessing.get_context("spawn")
+            )
+            atexit.register(shutdown_text_store_pool)
+        return _EXECUTOR
+
+
+def shutdown_text_store_pool() -> None:
+    """关闭解析进程池（下次解析时按需重建）。"""
+    global _EXECUTOR
+    with _EXECUTOR_LOCK:
+        executor, _EXECUTOR = _EXECUTOR, None
+    if executor is not None:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+# ----------------------------------------------------------------------
+# 对外接口
+# ----------------------------------------------------------------------
+def _error_text(path: str, e: Exception) -> str:
+    if isinstance(e, UnicodeDecodeError):
+        return "[Unsupported file type]"
+    if isinstance(e, RuntimeError) and "not installed" in str(e):
+        return f"[Error: {e}]"
+    return f"[Parse Error: {e}]"
+
+
+def extract_text(path: str) -> str:
+    """同步抽取单个文件的文本；文件不存在 / 解析失败时返回占位文本。"""
+    if not Path(path).is_file():
+        return f"[File not found: {path}]"
+    try:
+        if _store_enabled() and Path(path).suffix.lower() in PARSED_SUFFIXES:
+            return get_text_store(path).get(path).text
+        return _parse_file(str(path))[1]
+    except Exception as e:
+        log.warning(f"[text_store] extract failed for {path}: {e}")
+        return _error_text(path, e)
+
+
+async def _extract_one(path: str) -> str:
+    if not Path(path).is_file():
+        return f"[File not found: {path}]"
+    parsed = Path(path).suffix.lower() in PARSED_SUFFIXES
+    store = get_text_store(path) if parsed and _store_enabled() else None
+    sha = st = None
+    if store is not None:
+        # 存储读写都是尽力而为：失败只记日志，不能把解析结果变成 "[Parse Error]"
+        doc, sha, st = await asyncio.to_thread(store.try_lookup, path)
+        if doc is not None:
+            return doc.text
+    try:
+        if not parsed:
+            return await asyncio.to_thread(lambda: _parse_file(str(path))[1])
+        if _num_workers() > 1:
+            loop = asyncio.get_running_loop()
+            kind, text, pages = await loop.run_in_executor(_get_executor(), _parse_file, str(path))
+        else:
+            kind, text, pages = await asyncio.to_thread(_parse_file, str(path))
+    except Exception as e:
+        log.warning(f"[text_store] extract failed for {path}: {e}")
+        return _error_text(path, e)
+    if store is not None:
+        doc = ExtractedText(text=text, kind=kind, pages=pages)
+        if await asyncio.to_thread(store.try_put, path, sha, st, doc):
+            log.info(f"[text_store] stored {Path(path).name} ({len(text)} chars)")
+    return text
+
+
+async def extract_texts_async(paths: Sequence[str]) -> List[str]:
+    """并发抽取多个文件的文本，顺序与 paths 一致；命中存储的文件不再解析。"""
+    return list(await asyncio.gather(*(_extract_one(str(p)) for p in paths)))
+
+
+async def warm_text_store(paths: Sequence[str]) -> None:
+    """导入文件后预先抽取文本（失败只记日志）。"""
+    if not _store_enabled():
+        return
+    targets = [str(p) for p in paths if Path(p).suffix.lower() in PARSED_SUFFIXES]
+    if targets:
+        await extract_texts_async(targets)
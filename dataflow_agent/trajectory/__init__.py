@@ -17,6 +17,7 @@ from dataflow_agent.trajectory.models import (
 from dataflow_agent.trajectory.collector import TrajectoryCollector
 from dataflow_agent.trajectory.builder import TrajectoryBuilder
 from dataflow_agent.trajectory.exporter import TrajectoryExporter
+from dataflow_agent.trajectory.streaming import TrajectoryStreamWriter, iter_trajectory_records
 from dataflow_agent.trajectory.manager import TrajectoryManager
 
 __all__ = [
@@ -31,4 +32,7 @@ __all__ = [
     "TrajectoryBuilder",
     "TrajectoryExporter",
     "TrajectoryManager",
+    # 流式导出
+    "TrajectoryStreamWriter",
+    "iter_trajectory_records",
 ]
@@ -3,7 +3,7 @@
 
 支持：
 1. JSON 格式导出（单个/批量）
-2. JSONL 格式导出（用于训练数据）
+2. JSONL 格式导出（用于训练数据），分批写入，可 gzip 压缩 / 导出 Parquet / 增量追加
 3. SFT/DPO 格式转换
 4. 数据库存储（可选）
 """
@@ -11,10 +11,15 @@
 import json
 import os
 from pathlib import Path
-from typing import Any, Dict, List, Optional, Union
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Union
 from datetime import datetime
 
 from dataflow_agent.trajectory.models import Trajectory
+from dataflow_agent.trajectory.streaming import (
+    DEFAULT_BATCH_SIZE,
+    TrajectoryStreamWriter,
+    iter_trajectory_records,
+)
 from dataflow_agent.logger import get_logger
 from dataflow_agent.utils import get_project_root
 
@@ -78,19 +83,23 @@ class TrajectoryExporter:
         return str(filepath)
     
     def export_to_jsonl(self,
-                       trajectories: List[Trajectory],
+                       trajectories: Iterable[Trajectory],
                        filepath: str = None,
-                       mode: str = "raw") -> str:
+                       mode: str = "raw",
+                       append: bool = False,
+                       batch_size: int = DEFAULT_BATCH_SIZE) -> str:
         """
         批量导出为 JSONL 文件（每行一个 JSON 对象）
         
         Args:
-            trajectories: 轨迹列表
-            filepath: 文件路径
+            trajectories: 轨迹列表（也可以是生成器，分批写入，不会整体载入内存）
+            filepath: 文件路径；以 .gz 结尾时 gzip 压缩，以 .parquet 结尾时导出 Parquet 目录
             mode: 导出模式
                 - "raw": 完整的 TRJ 数据
                 - "sft": SFT 训练格式
                 - "dpo": DPO 训练格式
+            append: 追加到已有文件，跳过已导出过的 trace_id
+            batch_size: 每批写入的记录数
                 
         Returns:
             保存的文件路径
@@ -102,65 +111,84 @@ class TrajectoryExporter:
         else:
             filepath = Path(filepath)
         
-        filepath.parent.mkdir(parents=True, exist_ok=True)
-        
-        with open(filepath, 'w', encoding='utf-8') as f:
-            for trj in trajectories:
-                if mode == "raw":
-                    data = trj.to_dict()
-                elif mode == "sft":
-                    data = {
-                        "trace_id": trj.trace_id,
-                        "messages": trj.to_sft_format(),
-                        "metadata": {
-                            "workflow": trj.workflow_name,
-                            "status": trj.status,
-                        }
-                    }
-                elif mode == "dpo":
-                    data = trj.to_dpo_format()
-                else:
-                    raise ValueError(f"Unknown mode: {mode}")
-                
-                f.write(json.dumps(data, ensure_ascii=False) + '\n')
+        with TrajectoryStreamWriter(filepath, mode=mode, append=append, batch_size=batch_size) as writer:
+            writer.write_many(trajectories)
         
+        skipped = f"，跳过已导出 {writer.skipped} 条" if writer.skipped else ""
         log.info(f"[TrajectoryExporter] 已导出 JSONL ({mode}): {filepath}, "
-                f"共 {len(trajectories)} 条")
+                f"共 {writer.written} 条{skipped}")
+        return str(filepath)
+    
+    def export_stream(self,
+                      trajectories: Iterable[Trajectory],
+                      filepath: str = None,
+                      mode: str = "raw",
+                      format: str = "jsonl.gz",
+                      append: bool = False,
+                      batch_size: int = DEFAULT_BATCH_SIZE) -> str:
+        """
+        流式导出（默认 gzip 压缩 JSONL），用于大规模训练数据
+        
+        Args:
+            trajectories: 轨迹迭代器
+            filepath: 文件路径，如果为 None 则按 mode / format 自动生成
+            mode: raw / sft / dpo
+            format: jsonl / jsonl.gz / parquet（Parquet 需要 pyarrow）
+            append: 追加到已有文件，跳过已导出过的 trace_id
+            batch_size: 每批写入的记录数
+            
+        Returns:
+            保存的文件路径
+        """
+        if filepath is None:
+            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+            filepath = self.output_dir / f"trajectories_{mode}_{timestamp}.{format}"
+        
+        filepath = Path(filepath)
+        with TrajectoryStreamWriter(filepath, mode=mode, format=format, append=append,
+                                    batch_size=batch_size) as writer:
+            writer.write_many(trajectories)
+        
+        log.info(f"[TrajectoryExporter] 已流式导出 {format} ({mode}): {filepath}, "
+                f"写入 {writer.written} 条，跳过 {writer.skipped} 条")
         return str(filepath)
     
     def export_sft_dataset(self,
-                          trajectories: List[Trajectory],
+                          trajectories: Iterable[Trajectory],
                           filepath: str = None,
-                          filter_success: bool = True) -> str:
+                          filter_success: bool = True,
+                          append: bool = False) -> str:
         """
         导出 SFT 训练数据集
         
         Args:
-            trajectories: 轨迹列表
-            filepath: 文件路径
+            trajectories: 轨迹列表或迭代器
+            filepath: 文件路径（.gz / .parquet 同 export_to_jsonl）
             filter_success: 是否只保留成功的轨迹
+            append: 追加到已有文件，跳过已导出过的 trace_id
             
         Returns:
             保存的文件路径
         """
-        # 过滤
+        # 过滤（惰性，边读边写）
         if filter_success:
-            trajectories = [t for t in trajectories if t.status == "success"]
-            log.info(f"[TrajectoryExporter] 过滤后保留 {len(trajectories)} 条成功轨迹")
+            trajectories = (t for t in trajectories if t.status == "success")
         
-        return self.export_to_jsonl(trajectories, filepath, mode="sft")
+        return self.export_to_jsonl(trajectories, filepath, mode="sft", append=append)
     
     def export_dpo_dataset(self,
                           chosen_trajectories: List[Trajectory],
                           rejected_trajectories: List[Trajectory],
-                          filepath: str = None) -> str:
+                          filepath: str = None,
+                          append: bool = False) -> str:
         """
         导出 DPO 训练数据集（成对数据）
         
         Args:
             chosen_trajectories: 正例轨迹（成功的）
             rejected_trajectories: 负例轨迹（失败的）
-            filepath: 文件路径
+            filepath: 文件路径（.gz / .parquet 同 export_to_jsonl）
+            append: 追加到已有文件，跳过已导出过的 (chosen, rejected) 对
             
         Returns:
             保存的文件路径
@@ -172,8 +200,6 @@ class TrajectoryExporter:
         else:
             filepath = Path(filepath)
         
-        filepath.parent.mkdir(parents=True, exist_ok=True)
-        
         # 按 prompt 分组
         prompt_groups = {}
         
@@ -189,9 +215,17 @@ class TrajectoryExporter:
                 prompt_groups[prompt] = {"chosen": [], "rejected": []}
             prompt_groups[prompt]["rejected"].append(trj)
         
-        # 生成成对数据
-        pairs_count = 0
-        with open(filepath, 'w', encoding='utf-8') as f:
+        # 生成成对数据：每条轨迹的 messages 只序列化一次，成对时直接拼接
+        encode = json.JSONEncoder(ensure_ascii=False).encode
+        messages_json: Dict[int, str] = {}
+        
+        def _messages(trj: Trajectory) -> str:
+            key = id(trj)
+            if key not in messages_json:
+                messages_json[key] = encode(trj.to_sft_format())
+            return messages_json[key]
+        
+        with TrajectoryStreamWriter(filepath, mode="dpo_pair", append=append) as writer:
             for prompt, group in prompt_groups.items():
                 chosen_list = group.get("chosen", [])
                 rejected_list = group.get("rejected", [])
@@ -199,10 +233,8 @@ class TrajectoryExporter:
                 # 每个 chosen 和每个 rejected 配对
                 for chosen in chosen_list:
                     for rejected in rejected_list:
-                        pair = {
+                        record = {
                             "prompt": prompt,
-                            "chosen": chosen.to_sft_format(),
-                            "rejected": rejected.to_sft_format(),
                             "metadata": {
                                 "chosen_trace_id": chosen.trace_id,
                                 "rejected_trace_id": rejected.trace_id,
@@ -210,8 +242,10 @@ class TrajectoryExporter:
                                 "rejected_score": rejected.feedback.score if rejected.feedback else None,
                             }
                         }
-                        f.write(json.dumps(pair, ensure_ascii=False) + '\n')
-                        pairs_count += 1
+                        line = (f'{{"prompt": {encode(prompt)}, "chosen": {_messages(chosen)}, '
+                                f'"rejected": {_messages(rejected)}, "metadata": {encode(record["metadata"])}}}')
+                        writer.write_record(record, line=line)
+        pairs_count = writer.written
         
         log.info(f"[TrajectoryExporter] 已导出 DPO 数据集: {filepath}, "
                 f"共 {pairs_count} 对")
@@ -304,23 +338,33 @@ class TrajectoryExporter:
     
     def load_from_jsonl(self, filepath: str) -> List[Dict[str, Any]]:
         """
-        从 JSONL 文件加载轨迹列表
+        从 JSONL 文件加载轨迹列表（大文件请用 iter_records）
         
         Args:
-            filepath: 文件路径
+            filepath: 文件路径（.jsonl / .jsonl.gz / .parquet）
             
         Returns:
             轨迹列表
         """
-        trajectories = []
-        with open(filepath, 'r', encoding='utf-8') as f:
-            for line in f:
-                if line.strip():
-                    data = json.loads(line)
-                    trajectories.append(data)
+        trajectories = list(iter_trajectory_records(filepath))
         
         log.info(f"[TrajectoryExporter] 已加载 {len(trajectories)} 条轨迹: {filepath}")
         return trajectories
+    
+    def iter_records(self,
+                     filepath: str,
+                     where: Callable[[Dict[str, Any]], bool] = None) -> Iterator[Dict[str, Any]]:
+        """
+        逐条读取导出的记录（常数内存）
+        
+        Args:
+            filepath: 文件路径（.jsonl / .jsonl.gz / .parquet）
+            where: 过滤函数，例如 lambda r: r.get("status") == "success"
+            
+        Returns:
+            记录迭代器
+        """
+        return iter_trajectory_records(filepath, where=where)
 
 
 # ==================== 便捷函数 ====================
@@ -154,10 +154,10 @@ class TrajectoryManager:
         批量导出轨迹
         
         Args:
-            trajectories: 轨迹列表
-            format: 导出格式
+            trajectories: 轨迹列表（也可以是迭代器）
+            format: 导出格式（jsonl/sft/jsonl.gz/parquet）
             filepath: 文件路径
-            **kwargs: 其他参数
+            **kwargs: 其他参数（如 mode、append）
             
         Returns:
             保存的文件路径
@@ -166,6 +166,8 @@ class TrajectoryManager:
             return self.exporter.export_to_jsonl(trajectories, filepath, **kwargs)
         elif format == "sft":
             return self.exporter.export_sft_dataset(trajectories, filepath, **kwargs)
+        elif format in ("jsonl.gz", "parquet"):
+            return self.exporter.export_stream(trajectories, filepath, format=format, **kwargs)
         else:
             raise ValueError(f"Batch export not supported for format: {format}")
     
@@ -0,0 +1,428 @@
+"""
+轨迹流式导出 - 分批写入压缩 JSONL / Parquet，迭代读取
+
+支持：
+1. 分批序列化写入（JSONL / JSONL.gz / Parquet），内存只保留一个批次
+2. 增量追加：按 trace_id 去重，只写入新的轨迹
+3. 迭代加载 + 过滤，多 GB 的轨迹文件也只占常数内存（追加去重另需保存已写入的 id 集合）
+
+文件格式：
+- *.jsonl / *.jsonl.gz：每行一条记录，与 TrajectoryExporter.export_to_jsonl 的行完全一致；
+  gzip 追加时写入新的 gzip member，标准工具可直接解压整个文件
+- *.parquet：目录形式的数据集，每次写入新增一个 part-<纳秒时间戳>-<pid>-<随机>.parquet，
+  读取时按时间戳（同一进程内严格递增）排序，保证追加顺序；
+  列 = 按 mode 固定的标量列（便于筛选）+ record 列（整条记录的 JSON，保证无损）
+- <文件>.ids：追加模式下已写入记录的 trace_id（每行一个），用于增量去重；
+  缺失时扫描一遍已有文件重建
+
+Parquet 依赖 pyarrow（可选）；未安装时只能使用 JSONL 格式。
+"""
+
+import gzip
+import json
+import os
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+from dataflow_agent.trajectory.models import Trajectory
+from dataflow_agent.logger import get_logger
+
+log = get_logger(__name__)
+
+DEFAULT_BATCH_SIZE = 256
+GZIP_LEVEL = 6
+
+RECORD_MODES = ("raw", "sft", "dpo", "dpo_pair")
+
+# Parquet 固定 schema：(列名, 记录中的路径, 类型)；record 列始终追加在最后
+PARQUET_FIELDS: Dict[str, List[Tuple[str, Tuple[str, ...], str]]] = {
+    "raw": [
+        ("trace_id", ("trace_id",), "string"),
+        ("workflow_name", ("workflow_name",), "string"),
+        ("timestamp", ("timestamp",), "string"),
+        ("status", ("status",), "string"),
+        ("mode", ("mode",), "string"),
+        ("user_id", ("user_id",), "string"),
+        ("session_id", ("session_id",), "string"),
+        ("total_steps", ("statistics", "total_steps"), "int64"),
+        ("total_llm_calls", ("statistics", "total_llm_calls"), "int64"),
+        ("total_tool_calls", ("statistics", "total_tool_calls"), "int64"),
+        ("total_duration_ms", ("statistics", "total_duration_ms"), "float64"),
+        ("feedback_score", ("feedback", "score"), "int64"),
+    ],
+    "sft": [
+        ("trace_id", ("trace_id",), "string"),
+        ("workflow_name", ("metadata", "workflow"), "string"),
+        ("status", ("metadata", "status"), "string"),
+    ],
+    "dpo": [
+        ("prompt", ("prompt",), "string"),
+        ("status", ("status",), "string"),
+        ("score", ("score",), "int64"),
+    ],
+    "dpo_pair": [
+        ("prompt", ("prompt",), "string"),
+        ("chosen_trace_id", ("metadata", "chosen_trace_id"), "string"),
+        ("rejected_trace_id", ("metadata", "rejected_trace_id"), "string"),
+        ("chosen_score", ("metadata", "chosen_score"), "int64"),
+        ("rejected_score", ("metadata", "rejected_score"), "int64"),
+    ],
+}
+
+
+def trajectory_record(trj: Trajectory, mode: str = "raw") -> Dict[str, Any]:
+    """
+    将轨迹转换为导出记录
+
+    Args:
+        trj: 轨迹对象
+        mode: raw（完整 TRJ）/ sft / dpo
+
+    Returns:
+        记录字典
+    """
+    if mode == "raw":
+        return trj.to_dict()
+    if mode == "sft":
+        return {
+            "trace_id": trj.trace_id,
+            "messages": trj.to_sft_format(),
+            "metadata": {
+                "workflow": trj.workflow_name,
+                "status": trj.status,
+            }
+        }
+    if mode == "dpo":
+        return trj.to_dpo_format()
+    raise ValueError(f"Unknown mode: {mode}")
+
+
+def record_id(record: Dict[str, Any]) -> Optional[str]:
+    """记录的去重键：trace_id；DPO 成对数据为 chosen|rejected。"""
+    if record.get("trace_id"):
+        return str(record["trace_id"])
+    meta = record.get("metadata")
+    if isinstance(meta, dict) and meta.get("chosen_trace_id") and meta.get("rejected_trace_id"):
+        return f"{meta['chosen_trace_id']}|{meta['rejected_trace_id']}"
+    return None
+
+
+def detect_format(filepath: Union[str, Path]) -> str:
+    """按文件名判断格式：parquet / jsonl.gz / jsonl。"""
+    name = str(filepath).lower().rstrip("/")
+    if name.endswith(".parquet"):
+        return "parquet"
+    if name.endswith(".gz"):
+        return "jsonl.gz"
+    return "jsonl"
+
+
+def _ids_path(filepath: Path) -> Path:
+    return filepath.with_name(filepath.name + ".ids")
+
+
+def _require_pyarrow():
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError as e:
+        raise ImportError("Parquet 导出需要 pyarrow：pip install pyarrow") from e
+    return pa, pq
+
+
+def _lookup(record: Dict[str, Any], path: Tuple[str, ...]) -> Any:
+    value: Any = record
+    for key in path:
+        if not isinstance(value, dict):
+            return None
+        value = value.get(key)
+    return value
+
+
+def _coerce(value: Any, kind: str) -> Any:
+    if value is None:
+        return None
+    try:
+        if kind == "int64":
+            return None if isinstance(value, bool) else int(value)
+        if kind == "float64":
+            return float(value)
+    except (TypeError, ValueError):
+        return None
+    return value if isinstance(value, str) else str(value)
+
+
+class TrajectoryStreamWriter:
+    """
+    分批写入轨迹记录
+
+    使用示例：
+    ```python
+    with TrajectoryStreamWriter("outputs/trajectories/sft.jsonl.gz", mode="sft", append=True) as writer:
+        for trj in trajectories:          # 可以是生成器
+            writer.write(trj)
+    print(writer.written, writer.skipped)
+    ```
+    """
+
+    def __init__(self,
+                 filepath: Union[str, Path],
+                 mode: str = "raw",
+                 format: str = None,
+                 append: bool = False,
+                 batch_size: int = DEFAULT_BATCH_SIZE):
+        """
+        Args:
+            filepath: 输出路径（Parquet 为目录）
+            mode: 记录模式（raw/sft/dpo/dpo_pair），决定 Parquet 的 schema
+            format: jsonl / jsonl.gz / parquet，默认按文件名判断
+            append: 追加到已有文件，并跳过已写入过的 trace_id（记录在 <文件>.ids）；
+                非追加模式与 export_to_jsonl 一致，不去重
+            batch_size: 每批写入的记录数
+        """
+        if mode not in RECORD_MODES:
+            raise ValueError(f"Unknown mode: {mode}")
+        self.filepath = Path(filepath)
+        self.mode = mode
+        self.format = format or detect_format(self.filepath)
+        if self.format not in ("jsonl", "jsonl.gz", "parquet"):
+            raise ValueError(f"Unknown format: {self.format}")
+        self.append = append
+        self.batch_size = max(1, int(batch_size))
+        self.written = 0
+        self.skipped = 0
+
+        self._encoder = json.JSONEncoder(ensure_ascii=False)
+        self._batch: List[Tuple[Optional[str], Dict[str, Any], str]] = []
+        self._seen = self._load_ids() if append else set()
+        self._ids_file = None
+        self._fh = None
+        self._tmp: Optional[Path] = None
+        self._parquet = None
+        self._parquet_part: Optional[Path] = None
+        self._stale_parts: List[Path] = []
+        self._closed = False
+        self._open()
+
+    # -- 打开 / 关闭 -------------------------------------------------------
+    def _open(self) -> None:
+        if self.format == "parquet":
+            self._build_parquet_schema()
+            if self.filepath.exists() and not self.filepath.is_dir():
+                raise ValueError(f"Parquet 输出应为目录: {self.filepath}")
+            if self.filepath.is_dir() and not self.append:
+                # 覆盖写：旧的 part 在本次写入成功后再删除
+                self._stale_parts = list(self.filepath.glob("part-*.parquet"))
+            self.filepath.mkdir(parents=True, exist_ok=True)
+            self._parquet_part = self.filepath / f"part-{_next_part_seq():020d}-{os.getpid()}-{uuid.uuid4().hex[:8]}.parquet"
+            self._tmp = self._parquet_part.with_name(f".{self._parquet_part.name}.tmp")
+        else:
+            self.filepath.parent.mkdir(parents=True, exist_ok=True)
+            if self.append:
+                target = self.filepath
+            else:
+                # 非追加模式先写临时文件，成功后原子替换
+                self._tmp = self.filepath.with_name(f".{self.filepath.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+                target = self._tmp
+            file_mode = "ab" if self.append else "wb"
+            if self.format == "jsonl.gz":
+                self._fh = gzip.open(target, file_mode, compresslevel=GZIP_LEVEL)
+            else:
+                self._fh = open(target, file_mode)
+
+        if self.append:
+            self._ids_file = open(_ids_path(self.filepath), "a", encoding="utf-8")
+
+    def _build_parquet_schema(self) -> None:
+        pa, _ = _require_pyarrow()
+        types = {"string": pa.string(), "int64": pa.int64(), "float64": pa.float64()}
+        fields = [pa.field(name, types[kind]) for name, _, kind in PARQUET_FIELDS[self.mode]]
+        fields.append(pa.field("record", pa.string()))
+        self._schema = pa.schema(fields, metadata={"trajectory_mode": self.mode, "version": "1"})
+
+    def _load_ids(self) -> set:
+        """已写入的记录 id；.ids 缺失时扫描一遍已有文件重建。"""
+        ids_path = _ids_path(self.filepath)
+        if ids_path.exists():
+            with open(ids_path, "r", encoding="utf-8") as f:
+                return {line.rstrip("\n") for line in f if line.strip()}
+        seen = set()
+        if self.filepath.exists():
+            for record in iter_trajectory_records(self.filepath):
+                rid = record_id(record)
+                if rid:
+                    seen.add(rid)
+            with open(ids_path, "w", encoding="utf-8") as f:
+                f.writelines(f"{rid}\n" for rid in seen)
+        return seen
+
+    def close(self) -> None:
+        if self._closed:
+            return
+        self._closed = True
+        try:
+            self.flush()
+        finally:
+            if self._fh is not None:
+                self._fh.close()
+            if self._parquet is not None:
+                self._parquet.close()
+            if self._ids_file is not None:
+                self._ids_file.close()
+        if self.format == "parquet":
+            if self._parquet is not None:
+                os.replace(self._tmp, self._parquet_part)
+            for old in self._stale_parts:
+                old.unlink(missing_ok=True)
+        elif self._tmp is not None:
+            os.replace(self._tmp, self.filepath)
+        if not self.append:
+            # 覆盖写之后旧的 .ids 已失效
+            _ids_path(self.filepath).unlink(missing_ok=True)
+
+    def abort(self) -> None:
+        """出错时放弃本次写入（非追加模式下不覆盖已有文件）。"""
+        if self._closed:
+            return
+        self._closed = True
+        for fh in (self._fh, self._parquet, self._ids_file):
+            try:
+                if fh is not None:
+                    fh.close()
+            except Exception:
+                pass
+        if self._tmp is not None:
+            self._tmp.unlink(missing_ok=True)
+
+    def __enter__(self) -> "TrajectoryStreamWriter":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+    # -- 写入 --------------------------------------------------------------
+    def write(self, trajectory: Trajectory) -> bool:
+        """写入一条轨迹（按 mode 转换）；已写入过的 trace_id 返回 False。"""
+        if self.append and trajectory.trace_id and trajectory.trace_id in self._seen:
+            self.skipped += 1
+            return False
+        return self.write_record(trajectory_record(trajectory, self.mode))
+
+    def write_record(self, record: Dict[str, Any], line: str = None) -> bool:
+        """
+        写入一条已转换的记录
+
+        Args:
+            record: 记录字典
+            line: 已序列化的 JSON（可选，省去重复序列化）
+        """
+        rid = record_id(record) if self.append else None
+        if rid is not None:
+            if rid in self._seen:
+                self.skipped += 1
+                return False
+            self._seen.add(rid)
+        self._batch.append((rid, record, line if line is not None else self._encoder.encode(record)))
+        if len(self._batch) >= self.batch_size:
+            self.flush()
+        return True
+
+    def write_many(self, trajectories: Iterable[Trajectory]) -> int:
+        count = 0
+        for trj in trajectories:
+            count += self.write(trj)
+        return count
+
+    def flush(self) -> None:
+        if not self._batch:
+            return
+        batch, self._batch = self._batch, []
+        if self.format == "parquet":
+            self._flush_parquet(batch)
+        else:
+            self._fh.write("".join(line + "\n" for _, _, line in batch).encode("utf-8"))
+        if self._ids_file is not None:
+            self._ids_file.writelines(f"{rid}\n" for rid, _, _ in batch if rid is not None)
+            self._ids_file.flush()
+        self.written += len(batch)
+
+    def _flush_parquet(self, batch) -> None:
+        pa, pq = _require_pyarrow()
+        columns: Dict[str, list] = {}
+        for name, path, kind in PARQUET_FIELDS[self.mode]:
+            columns[name] = [_coerce(_lookup(record, path), kind) for _, record, _ in batch]
+        columns["record"] = [line for _, _, line in batch]
+        table = pa.Table.from_pydict(columns, schema=self._schema)
+        if self._parquet is None:
+            self._parquet = pq.ParquetWriter(str(self._tmp), self._schema, compression="zstd")
+        self._parquet.write_table(table)
+
+
+_PART_SEQ_LOCK = threading.Lock()
+_LAST_PART_SEQ = 0
+
+
+def _next_part_seq() -> int:
+    """Parquet part 的序号：纳秒时间戳，同一进程内严格递增（同一秒内多次追加也有序）。"""
+    global _LAST_PART_SEQ
+    with _PART_SEQ_LOCK:
+        _LAST_PART_SEQ = max(time.time_ns(), _LAST_PART_SEQ + 1)
+        return _LAST_PART_SEQ
+
+
+def _part_sort_key(part: Path) -> Tuple[int, str]:
+    """按写入顺序排序；兼容旧命名 part-<YYYYmmddHHMMSS>-<uuid>.parquet（换算为纳秒）。"""
+    stamp = part.name.split("-", 2)[1] if part.name.count("-") >= 2 else ""
+    if stamp.isdigit() and len(stamp) == 14:
+        try:
+            return int(time.mktime(time.strptime(stamp, "%Y%m%d%H%M%S"))) * 10 ** 9, part.name
+        except ValueError:
+            pass
+    return (int(stamp) if stamp.isdigit() else 0), part.name
+
+
+def list_parquet_parts(dirpath: Union[str, Path]) -> List[Path]:
+    """Parquet 数据集目录下的 part 文件，按写入顺序排列。"""
+    return sorted(Path(dirpath).glob("part-*.parquet"), key=_part_sort_key)
+
+
+def iter_trajectory_records(filepath: Union[str, Path],
+                            where: Callable[[Dict[str, Any]], bool] = None,
+                            batch_size: int = DEFAULT_BATCH_SIZE) -> Iterator[Dict[str, Any]]:
+    """
+    迭代读取导出的轨迹记录（常数内存）
+
+    Args:
+        filepath: .jsonl / .jsonl.gz 文件，或 .parquet 目录 / 文件
+        where: 过滤函数，返回 True 的记录才会产出
+        batch_size: Parquet 每次读取的行数
+
+    Yields:
+        记录字典（与写入时一致）
+    """
+    filepath = Path(filepath)
+    fmt = detect_format(filepath)
+    if fmt == "parquet":
+        _, pq = _require_pyarrow()
+        parts = list_parquet_parts(filepath) if filepath.is_dir() else [filepath]
+        for part in parts:
+            for rb in pq.ParquetFile(str(part)).iter_batches(batch_size=batch_size, columns=["record"]):
+                for line in rb.column(0).to_pylist():
+                    record = json.loads(line)
+                    if where is None or where(record):
+                        yield record
+        return
+
+    opener = gzip.open if fmt == "jsonl.gz" else open
+    with opener(filepath, "rt", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                record = json.loads(line)
+                if where is None or where(record):
+                    yield record
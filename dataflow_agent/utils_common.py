@@ -27,13 +27,9 @@ from pptx.dml.color import RGBColor
 from pptx.enum.shapes import MSO_SHAPE
 from pptx.util import Inches, Pt
 
-import fitz  # PyMuPDF
-
 from PIL import Image
-import pdfplumber
 import uuid
 
-from dataflow_agent.toolkits.multimodaltool.mineru_tool import run_aio_batch_two_step_extract, run_aio_two_step_extract
 
 def get_project_root() -> Path:
     return Path(__file__).resolve().parent.parent
@@ -500,7 +496,6 @@ def build_output_directory(image_path: Path) -> Path:
 import asyncio
 from pathlib import Path
 from PIL import Image
-from mineru_vl_utils import MinerUClient
 
 
 # -----------------------------
@@ -574,9 +569,11 @@ async def recursive_run_mineru_http(
     current_depth: int = 0,
 ):
     """
-    使用 aio_two_step_extract 执行异步 mineru 提取。
+    使用 aio_batch_two_step_extract 执行异步 mineru 提取。
     不依赖中间 JSON 文件。
-    自动截图 image/table/list 等元素作为下一轮输入。
+    自动截图 image/table/list 等元素作为下一轮输入：按深度逐层展开，同一层的子图
+    在内存中裁剪后批量送入 MinerU（多端口负载均衡见 mineru_tool.aio_batch_extract_images），
+    只有最终保留为 image 结果的子图才写入 out_dir。
     """
 
     # ---- 深度控制 ----
@@ -585,113 +582,128 @@ async def recursive_run_mineru_http(
 
     out_dir.mkdir(parents=True, exist_ok=True)
 
-    log.info(f"[recursive_http] ─ Depth={current_depth}, Image={image_path}")
+    # 延迟导入：dataflow_agent.utils 被广泛引用，避免为 get_project_root 等轻量工具加载 MinerU 客户端
+    from dataflow_agent.toolkits.multimodaltool.mineru_tool import aio_batch_extract_images
 
-    # ---- 加载图片 ----
-    img = Image.open(image_path)
-    W, H = img.size
-    log.info(f"[recursive_http] Image size: W={W}, H={H}")
+    # 每个节点：{"img": PIL 图, "path": 已落盘路径或 None, "results": 本图的结果列表}
+    root = {"img": Image.open(image_path), "path": Path(image_path), "results": []}
+    level = [root]
+    depth = current_depth
 
-    # ---- 调用 MinerU 异步接口 ----
-    try:
-        blocks = await run_aio_two_step_extract(image_path, port)
-        log.info(f"[recursive_http] MinerU returned {len(blocks)} blocks")
-    except Exception as e:
-        log.info(f"[recursive_http] MinerU error: {e}")
-        return []
-
-    results = []
-    sub_images_paths = []  # 下一层递归的图片路径
+    while level:
+        log.info(f"[recursive_http] ─ Depth={depth}, {len(level)} image(s)")
 
-    # -----------------------------
-    # 解析 block 并处理不同类型
-    # -----------------------------
-    for idx, blk in enumerate(blocks):
+        # ---- 调用 MinerU 异步批量接口 ----
+        try:
+            batch_blocks = await aio_batch_extract_images([node["img"] for node in level], port)
+        except Exception as e:
+            # 整批失败时逐张重试，只有真正失败的那几张按无结果处理，不连累同层其它图片
+            log.info(f"[recursive_http] MinerU batch error: {e}, retrying {len(level)} image(s) individually")
+            singles = await asyncio.gather(
+                *(aio_batch_extract_images([node["img"]], port) for node in level),
+                return_exceptions=True,
+            )
+            batch_blocks = []
+            for node, out in zip(level, singles):
+                if isinstance(out, BaseException):
+                    log.info(f"[recursive_http] MinerU error on {node['path'] or 'sub-image'}: {out}")
+                    batch_blocks.append([])
+                else:
+                    batch_blocks.append(out[0] if out else [])
+
+        next_level = []
+        for node, blocks in zip(level, batch_blocks):
+            blocks = blocks or []
+            img = node["img"]
+            W, H = img.size
+            log.info(f"[recursive_http] Image size: W={W}, H={H}, MinerU returned {len(blocks)} blocks")
+
+            # -----------------------------
+            # 解析 block 并处理不同类型
+            # -----------------------------
+            for idx, blk in enumerate(blocks):
+
+                btype = blk.get("type")
+                bbox_rel = blk.get("bbox", [0, 0, 1, 1])
+                content = blk.get("content")
+
+                log.info(f"  Block[{idx}] type={btype}, bbox_rel={bbox_rel}, "
+                         f"content={str(content)[:30] if content else None}")
+
+                bbox_pixel = rel_bbox_to_pixel(bbox_rel, W, H)
+
+                # ---- 文本类 block：直接保存 ----
+                if btype in ["title", "text", "paragraph", "caption", "image_caption", "table_caption"]:
+                    node["results"].append({
+                        "type": "text",
+                        "text": content or "",
+                        "bbox": bbox_pixel,
+                    })
 
-        btype = blk.get("type")
-        bbox_rel = blk.get("bbox", [0, 0, 1, 1])
-        content = blk.get("content")
+                # ---- 图片类 block：截图作为下一轮输入 ----
+                elif btype in ["image", "table", "list"]:
+                    cropped = _crop_in_memory(img, bbox_pixel)
+                    # 不需要裁剪（越界 / 覆盖整图）时沿用当前图，与 crop_and_save 的回退一致
+                    child = (
+                        {"img": cropped, "path": None, "results": []}
+                        if cropped is not None
+                        else {"img": img, "path": node["path"], "results": []}
+                    )
+                    item = {"type": "image", "img_path": None, "bbox": bbox_pixel, "_node": child}
+                    node["results"].append(item)
+                    if depth < max_depth:
+                        next_level.append(child)
+
+        level = next_level
+        depth += 1
+
+    results = _expand_http_results(root, out_dir, current_depth, max_depth)
+    log.info(f"[recursive_http] Depth={current_depth} → Parsed {len(results)} items")
+    return results
 
-        log.info(f"  Block[{idx}] type={btype}, bbox_rel={bbox_rel}, "
-                 f"content={str(content)[:30] if content else None}")
 
-        bbox_pixel = rel_bbox_to_pixel(bbox_rel, W, H)
-        log.info(f"  → bbox_pixel={bbox_pixel}")
+def _crop_in_memory(img, bbox_pixel, margin=3):
+    """与 crop_and_save 相同的越界 / 整图判断，但只在内存中裁剪；不需要裁剪时返回 None。"""
+    W, H = img.size
+    x1, y1, x2, y2 = bbox_pixel
+    if x1 < 0 or y1 < 0 or x2 > W or y2 > H or x2 <= x1 or y2 <= y1:
+        return None
+    if x1 <= margin and y1 <= margin and x2 >= W - margin and y2 >= H - margin:
+        return None
+    try:
+        return img.crop(bbox_pixel)
+    except Exception as e:
+        log.info(f"[crop_in_memory] ERROR during crop: {e}")
+        return None
 
-        # ---- 文本类 block：直接保存 ----
-        if btype in ["title", "text", "paragraph", "caption", "image_caption", "table_caption"]:
-            results.append({
-                "type": "text",
-                "text": content or "",
-                "bbox": bbox_pixel,
-            })
-            log.info(f"    Added TEXT block, content preview: {str(content)[:30]}")
 
-        # ---- 图片类 block：截图作为下一轮输入 ----
-        elif btype in ["image", "table", "list"]:
+def _ensure_saved(node, out_dir: Path, depth: int) -> str:
+    """子图只有作为最终 image 结果保留时才落盘。"""
+    if node["path"] is None:
+        path = out_dir / f"sub_{depth}_{uuid.uuid4()}.png"
+        node["img"].save(path)
+        node["path"] = path
+    return str(node["path"])
 
-            sub_img_name = f"sub_{current_depth}_{uuid.uuid4()}.png"
-            sub_img_path = out_dir / sub_img_name
-            
-            log.info(f"Try to crop img: {image_path}")
-            cropped_path = crop_and_save(img, bbox_pixel, sub_img_path) 
-            sub_img_path = cropped_path if cropped_path else image_path
-            log.info(f"    Cropped IMAGE block → {sub_img_path}")
 
+def _expand_http_results(node, out_dir: Path, depth: int, max_depth: int):
+    """把逐层得到的树展开为与旧版递归相同的结果：中间层 image 替换为子结果并映射坐标。"""
+    results = []
+    for item in node["results"]:
+        child = item.get("_node")
+        if child is None:
+            results.append(item)
+        elif depth < max_depth:
+            for si in _expand_http_results(child, out_dir, depth + 1, max_depth):
+                new_item = si.copy()
+                new_item["bbox"] = transform_sub_bbox(si["bbox"], item["bbox"])
+                results.append(new_item)
+        else:
             results.append({
                 "type": "image",
-                "img_path": str(sub_img_path),
-                "bbox": bbox_pixel,
+                "img_path": _ensure_saved(child, out_dir, depth),
+                "bbox": item["bbox"],
             })
-
-            sub_images_paths.append(sub_img_path)
-
-    log.info(f"[recursive_http] Depth={current_depth} → Parsed {len(results)} items, {len(sub_images_paths)} sub-images")
-
-    # ----------------------------------------------
-    # 递归处理子图，并将对应的 image 元素替换为子结果
-    # ----------------------------------------------
-    if current_depth < max_depth and len(sub_images_paths) > 0:
-
-        tasks = [
-            recursive_run_mineru_http(
-                sub_img_path,
-                out_dir,
-                port=port,
-                max_depth=max_depth,
-                current_depth=current_depth + 1
-            )
-            for sub_img_path in sub_images_paths
-        ]
-
-        sub_results_list = await asyncio.gather(*tasks)
-
-        new_results = []
-
-        sub_map = {
-            str(path): sub_results_list[i]
-            for i, path in enumerate(sub_images_paths)
-        }
-
-        for item in results:
-            img_path = item.get("img_path")
-
-            # 只对当前层生成的子图做展开替换
-            if item["type"] in ["image", 'table', 'list'] and img_path in sub_map:
-                parent_bbox = item["bbox"]
-                sub_items = sub_map[img_path]
-
-                log.info(f"    Replacing sub-image {img_path} with {len(sub_items)} items")
-
-                for si in sub_items:
-                    new_item = si.copy()
-                    new_item["bbox"] = transform_sub_bbox(si["bbox"], parent_bbox)
-                    new_results.append(new_item)
-            else:
-                new_results.append(item)
-
-        results = new_results
-
     return results
 
 # -------------------------------------------------------------------------------------
@@ -961,50 +973,25 @@ def pdf_to_pil_images(
 ) -> List[Image.Image]:
     """
     将 PDF 文件的每一页转换为 PIL Image 对象。
-    修复了 CMYK/灰度/透明背景导致的白图或花屏问题。
+    修复了 CMYK/灰度/透明背景导致的白图或花屏问题（pdf_raster 渲染时统一转为 RGB、不透明背景）。
+    页面由 pdf_raster 进程池并行渲染，并按 (PDF 哈希, 页码, dpi) 缓存。
     """
+    from dataflow_agent.toolkits.multimodaltool.pdf_raster import iter_rendered_pages
+
     pdf_path = Path(pdf_path)
     if not pdf_path.exists():
         raise FileNotFoundError(f"PDF 文件不存在: {pdf_path}")
 
-    # 计算缩放比例
-    zoom = dpi / 72.0
-    matrix = fitz.Matrix(zoom, zoom)
-
     images: List[Image.Image] = []
-    
-    # 这里的 flags 用于处理一些复杂的渲染情况（可选，但在某些图表 PDF 中很有用）
-    # fitz.pdf.Page.get_pixmap 默认会自动处理大多情况
-    
-    doc = fitz.open(pdf_path)
     try:
-        for page_num in range(len(doc)):
-            page = doc[page_num]
-            
-            # 1. 获取初始 Pixmap
-            # alpha=False: 强制背景不透明（默认白色），解决透明底变黑或变白的问题
-            pix = page.get_pixmap(matrix=matrix, alpha=False)
-
-            # 2. 关键修复：检查色彩空间并转换
-            # pix.n 是通道数。如果不是 3 (RGB)，则强制转换为 RGB
-            if pix.n != 3:
-                # fitz.csRGB 是 PyMuPDF 内置的 RGB 色彩空间定义
-                temp_pix = fitz.Pixmap(fitz.csRGB, pix)
-                pix = temp_pix  # 替换为转换后的 RGB pixmap
-                # 注意：temp_pix 只是引用，赋值给 pix 后后续逻辑一致，且会自动管理内存
-
-            # 3. 安全转换为 PIL
-            # 现在我们可以 100% 确定数据是 RGB 格式的
-            img = Image.frombytes("RGB", (pix.width, pix.height), pix.samples)
+        for page_num, png_path in enumerate(iter_rendered_pages(str(pdf_path), dpi=dpi)):
+            with Image.open(png_path) as im:
+                img = im.convert("RGB")
             images.append(img)
-
-            log.info(f"[pdf_to_pil_images] 已转换第 {page_num + 1} 页 (模式:{pix.n}通道)，尺寸: {pix.width}x{pix.height}")
-
+            log.info(f"[pdf_to_pil_images] 已转换第 {page_num + 1} 页，尺寸: {img.width}x{img.height}")
     except Exception as e:
         log.error(f"[pdf_to_pil_images] 转换过程出错: {e}")
         raise e
-    finally:
-        doc.close()
 
     log.info(f"[pdf_to_pil_images] 完成，共生成 {len(images)} 张图片")
     return images
@@ -1302,6 +1289,25 @@ def execute_matplotlib_code(
 {code}
 '''
 
+    # 优先在常驻沙箱 worker 中执行（已预先导入 matplotlib），worker 不可用时回退到 subprocess
+    from dataflow_agent.toolkits.plot_sandbox import run_plot_code, sandbox_enabled
+
+    if sandbox_enabled():
+        try:
+            sandbox_result = run_plot_code(full_code, output_path, timeout=timeout)
+        except Exception as e:
+            log.warning(f"[execute_matplotlib] 沙箱不可用，回退到子进程执行: {e}")
+        else:
+            if sandbox_result["success"] and sandbox_result["png"] is not None:
+                log.info(f"[execute_matplotlib] 图表生成成功: {output_path}")
+                return {"success": True, "output_path": str(output_path), "error": ""}
+            if sandbox_result["success"]:
+                log.warning(f"[execute_matplotlib] 代码执行成功但图片未生成")
+                return {"success": False, "output_path": "", "error": "代码执行成功但图片未生成"}
+            error_msg = sandbox_result["error"] or sandbox_result["stdout"] or "未知错误"
+            log.warning(f"[execute_matplotlib] 执行失败: {error_msg}")
+            return {"success": False, "output_path": "", "error": error_msg[:500]}
+
     # 写入临时文件并执行
     try:
         with tempfile.NamedTemporaryFile(mode='w', suffix='.py', delete=False, encoding='utf-8') as f:
@@ -1,20 +1,18 @@
 # dataflow_agent/workflow/__init__.py
 
-import importlib
-from pathlib import Path
+from typing import Optional
+
+from dataflow_agent.graphbuilder.checkpoint import default_thread_id, discard_thread, open_checkpointer
+from dataflow_agent.logger import get_logger
 
 from .registry import RuntimeRegistry
 
-# ---- 1. 自动发现并导入所有工作流定义模块 ---------------------------------
-# 遍历当前包目录下所有以 wf_*.py 命名的 Python 文件，并动态导入。
-# 通过 importlib 以全限定名加载模块，从而确保每个工作流文件中的 @register 装饰器
-# 能够在导入时将相应工作流注册到 RuntimeRegistry。
-_pkg_path = Path(__file__).resolve().parent
-for py in _pkg_path.glob("wf_*.py"):
-    # importlib 需要模块的点分路径（dotted-path），例如 dataflow_agent.workflow.wf_xxx
-    mod_name = f"{__name__}.{py.stem}"
-    importlib.import_module(mod_name)
-# 模块导入后，各 wf_*.py 文件内的 @register 装饰器会自动注册工作流到 RuntimeRegistry
+log = get_logger(__name__)
+
+# ---- 1. 工作流按需加载 ---------------------------------------------------
+# 不再在导入本包时加载全部 wf_*.py：各工作流在 manifest.WORKFLOW_MANIFEST 中登记
+# 注册名 -> 模块路径，RuntimeRegistry.get 首次查询时才导入对应模块，
+# 模块内的 @register 装饰器随之把工作流注册到 RuntimeRegistry。
 
 # ---- 2. 工作流的统一接口 ---------------------------------------------
 def get_workflow(name: str):
@@ -29,14 +27,61 @@ def get_workflow(name: str):
     """
     return RuntimeRegistry.get(name)
 
-async def run_workflow(name: str, state):
+async def run_workflow(name: str, state, thread_id: Optional[str] = None):
+    """
+    运行工作流并返回最终状态。
+
+    对调用了 ``builder.enable_checkpoint()`` 的工作流（或显式传入 thread_id 时），
+    每个节点完成后把状态写入本地 SQLite checkpoint。同一 thread_id 的上一次运行
+    若在中途失败，本次直接从失败的节点继续（忽略传入的 state），已完成的节点不再重复执行；
+    运行成功后删除该 thread 的 checkpoint。
+
+    Args:
+        name (str): 工作流名称（注册名）
+        state: 初始状态
+        thread_id: checkpoint 线程 ID；缺省时由 result_path 与初始状态推导
+    """
     factory = get_workflow(name)
     graph_builder = factory()
 
-    # graph = graph_builder.compile()
-    graph = graph_builder.build()       
+    if thread_id is None and getattr(graph_builder, "checkpoint_enabled", False):
+        thread_id = default_thread_id(name, state)
+    if not thread_id:
+        graph = graph_builder.build()
+        return await graph.ainvoke(state)
+
+    async with open_checkpointer() as checkpointer:
+        graph = graph_builder.build(checkpointer=checkpointer)
+        config = {"configurable": {"thread_id": thread_id}}
+        snapshot = await graph.aget_state(config)
+        if snapshot.next:
+            log.info(f"[run_workflow] {name} 从断点续跑: thread={thread_id}, next={list(snapshot.next)}")
+            result = await graph.ainvoke(None, config)
+        else:
+            result = await graph.ainvoke(state, config)
+        await discard_thread(checkpointer, thread_id)
+        return result
 
-    return await graph.ainvoke(state)
+async def stream_workflow(name: str, state, stream_mode="custom"):
+    """
+    以流式方式运行工作流，逐个产出 LangGraph 的流事件。
+
+    节点内部可通过 ``langgraph.config.get_stream_writer()`` 写入自定义事件
+    （例如检索结果、LLM token），在默认的 ``stream_mode="custom"`` 下原样产出；
+    非流式运行（run_workflow）时 writer 为空操作，节点代码无需区分两种调用方式。
+
+    Args:
+        name (str): 工作流名称（注册名）
+        state: 初始状态
+        stream_mode: 透传给 graph.astream 的 stream_mode，可为字符串或列表
+
+    Yields:
+        LangGraph 流事件；stream_mode 为列表时为 (mode, chunk) 元组
+    """
+    factory = get_workflow(name)
+    graph = factory().build()
+    async for chunk in graph.astream(state, stream_mode=stream_mode):
+        yield chunk
 
 # ---- 3. 工作流注册信息公开接口 -------------------------------------------
 # 提供所有已注册工作流的列表，便于外部查询与 introspection
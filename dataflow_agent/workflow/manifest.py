@@ -0,0 +1,35 @@
+# dataflow_agent/workflow/manifest.py
+"""
+工作流清单：注册名 -> 定义该工作流的模块。
+
+dataflow_agent.workflow 不再在导入时加载全部 wf_*.py（其中不少会连带导入 OCR / SAM / torch 等重依赖），
+RuntimeRegistry.get 首次查询某个名字时才按清单导入对应模块，模块内的 @register 完成注册。
+新增工作流时请在此登记；未登记的名字查询时会退化为扫描全部 wf_*.py。
+"""
+from typing import Dict
+
+_PKG = "dataflow_agent.workflow"
+
+WORKFLOW_MANIFEST: Dict[str, str] = {
+    "image2drawio": f"{_PKG}.wf_image2drawio",
+    "image2ppt": f"{_PKG}.wf_image2ppt",
+    "intelligent_qa": f"{_PKG}.wf_intelligent_qa",
+    "kb_mindmap": f"{_PKG}.wf_kb_mindmap",
+    "kb_page_content": f"{_PKG}.wf_kb_page_content",
+    "kb_podcast": f"{_PKG}.wf_kb_podcast",
+    "paper2drawio": f"{_PKG}.wf_paper2drawio",
+    "paper2drawio_sam3": f"{_PKG}.wf_paper2drawio_sam3",
+    "paper2expfigure": f"{_PKG}.wf_paper2expfigure",
+    "paper2fig_image_only": f"{_PKG}.wf_paper2figure_image_only",
+    "paper2fig_with_sam": f"{_PKG}.wf_paper2figure_with_sam",
+    "paper2page_content": f"{_PKG}.wf_paper2page_content",
+    "paper2page_content_for_long_paper": f"{_PKG}.wf_paper2page_content_for_long_paper",
+    "paper2ppt_parallel": f"{_PKG}.wf_paper2ppt_parallel",
+    "paper2ppt_parallel_consistent_style": f"{_PKG}.wf_paper2ppt_parallel_consistent_style",
+    "paper2technical": f"{_PKG}.wf_paper2technical",
+    "pdf2ppt_optimized": f"{_PKG}.wf_pdf2ppt_optimized",
+    "pdf2ppt_parallel": f"{_PKG}.wf_pdf2ppt_parallel",
+    "pdf2ppt_qwenvl": f"{_PKG}.wf_pdf2ppt_qwenvl",
+    "pdf2ppt_with_sam_ocr_mineru": f"{_PKG}.wf_pdf2ppt_with_sam_ocr_mineru",
+    "test_graph": f"{_PKG}.wf_test_graph",
+}
@@ -1,6 +1,28 @@
 # dataflow_agent/workflow/registry.py
+import importlib
+from pathlib import Path
 from typing import Callable, Dict
 
+from dataflow_agent.logger import get_logger
+
+log = get_logger(__name__)
+
+
+def _import_workflow_module(module: str) -> None:
+    importlib.import_module(module)
+
+
+def _import_all_workflow_modules() -> None:
+    """导入包目录下全部 wf_*.py（清单未命中或需要完整列表时使用）。"""
+    pkg_path = Path(__file__).resolve().parent
+    for py in sorted(pkg_path.glob("wf_*.py")):
+        try:
+            _import_workflow_module(f"dataflow_agent.workflow.{py.stem}")
+        except Exception as e:
+            # 不让单个工作流的依赖缺失影响其他工作流
+            log.warning(f"导入工作流模块失败: {py.stem}: {e}")
+
+
 class RuntimeRegistry:
     _workflows: Dict[str, Callable] = {}
 
@@ -8,7 +30,7 @@ class RuntimeRegistry:
     def register(cls, name: str, factory: Callable):
         # 同一个对象重复登记 → 忽略
         if name in cls._workflows:
-            if cls._workflows[name] is factory: 
+            if cls._workflows[name] is factory:
                 return
             raise ValueError(
                 f"Workflow '{name}' already registered by "
@@ -18,6 +40,15 @@ class RuntimeRegistry:
 
     @classmethod
     def get(cls, name: str) -> Callable:
+        if name not in cls._workflows:
+            from dataflow_agent.workflow.manifest import WORKFLOW_MANIFEST
+
+            # 按清单延迟导入；清单里没有的名字退化为全量扫描
+            module = WORKFLOW_MANIFEST.get(name)
+            if module:
+                _import_workflow_module(module)
+            else:
+                _import_all_workflow_modules()
         try:
             return cls._workflows[name]
         except KeyError:
@@ -27,10 +58,11 @@ class RuntimeRegistry:
 
     @classmethod
     def all(cls) -> Dict[str, Callable]:
+        _import_all_workflow_modules()
         return dict(cls._workflows)
 
 def register(name: str):
     def _decorator(func_or_cls):
         RuntimeRegistry.register(name, func_or_cls)
         return func_or_cls
-    return _decorator
\ No newline at end of file
+    return _decorator
@@ -33,16 +33,16 @@ from dataflow_agent.state import Paper2FigureState
 from dataflow_agent.agentroles import create_vlm_agent
 
 from dataflow_agent.toolkits.multimodaltool.req_img import generate_or_edit_and_save_image_async
-from dataflow_agent.toolkits.multimodaltool.sam_tool import segment_layout_boxes, segment_layout_boxes_server, free_sam_model
+from dataflow_agent.toolkits.multimodaltool.sam_tool import segment_layout_boxes, segment_layout_boxes_server
 from dataflow_agent.toolkits.multimodaltool import ppt_tool
 from dataflow_agent.toolkits.drawio_tools import wrap_xml
 from dataflow_agent.toolkits.image2drawio import (
     classify_shape,
-    mask_to_bbox,
-    normalize_mask,
+    mask_roi,
     sample_fill_stroke,
     save_masked_rgba,
     bbox_iou_px,
+    window_bbox,
 )
 
 log = get_logger(__name__)
@@ -361,11 +361,6 @@ def create_image2drawio_graph() -> GenericGraphBuilder:
             except Exception as e_local:
                 log.error(f"[image2drawio] SAM local failed: {e_local}")
                 layout_items = []
-            finally:
-                try:
-                    free_sam_model(checkpoint=sam_ckpt)
-                except Exception:
-                    pass
 
         # compute bbox_px
         try:
@@ -405,26 +400,29 @@ def create_image2drawio_graph() -> GenericGraphBuilder:
         shapes = []
         images = []
 
-        # classify SAM items
+        # classify SAM items（逐元素只处理 bbox 裁剪后的局部 mask / 图像）
         for idx, it in enumerate(getattr(state, "layout_items", []) or []):
             mask = it.get("mask")
+            if mask is None:
+                continue
+            try:
+                roi = mask_roi(mask, image_bgr.shape[:2], offset=it.get("mask_offset"))
+            except Exception:
+                roi = None
+            if roi is None:
+                continue
+            mask, window = roi
+
             bbox_px = it.get("bbox_px")
-            if mask is None or bbox_px is None:
-                if mask is None:
-                    continue
-                try:
-                    tmp_mask = normalize_mask(mask, image_bgr.shape[:2])
-                    bbox_px = mask_to_bbox(tmp_mask)
-                except Exception:
-                    bbox_px = None
+            if bbox_px is None:
+                bbox_px = window_bbox(mask, window)
                 if bbox_px is None:
                     continue
 
-            mask = normalize_mask(mask, image_bgr.shape[:2])
             shape_type, conf = classify_shape(mask)
 
             if shape_type != "unknown" and conf >= 0.8:
-                fill_hex, stroke_hex = sample_fill_stroke(image_bgr, mask)
+                fill_hex, stroke_hex = sample_fill_stroke(image_bgr, mask, window=window)
                 shapes.append({
                     "id": f"s{idx}",
                     "kind": "shape",
@@ -437,7 +435,7 @@ def create_image2drawio_graph() -> GenericGraphBuilder:
                 })
             else:
                 out_path = icon_dir / f"icon_{idx}.png"
-                save_masked_rgba(image_bgr, mask, str(out_path))
+                save_masked_rgba(image_bgr, mask, str(out_path), window=window)
                 images.append({
                     "id": f"i{idx}",
                     "kind": "image",
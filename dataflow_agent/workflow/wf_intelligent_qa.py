@@ -5,13 +5,14 @@ import asyncio
 from pathlib import Path
 from typing import List, Dict, Any, Optional
 
-import fitz  # PyMuPDF
+from langgraph.config import get_stream_writer
 from dataflow_agent.workflow.registry import register
 from dataflow_agent.graphbuilder.graph_builder import GenericGraphBuilder
 from dataflow_agent.logger import get_logger
 from dataflow_agent.state import IntelligentQAState, MainState
 from dataflow_agent.agentroles import create_vlm_agent, create_agent
 from dataflow_agent.utils import get_project_root
+from dataflow_agent.toolkits.ragtool.text_store import PARSED_SUFFIXES, extract_texts_async
 from dataflow_agent.promptstemplates.resources.pt_qa_agent_repo import QaAgent as QaAgentPrompts
 
 log = get_logger(__name__)
@@ -21,17 +22,6 @@ MAX_DOC_CONTEXT_CHARS = 48000
 RAG_TOP_K = 30
 MAX_HISTORY_TURNS = 10
 
-# Try importing office libraries
-try:
-    from docx import Document
-except ImportError:
-    Document = None
-
-try:
-    from pptx import Presentation
-except ImportError:
-    Presentation = None
-
 @register("intelligent_qa")
 def create_intelligent_qa_graph() -> GenericGraphBuilder:
     """
@@ -146,48 +136,11 @@ def create_intelligent_qa_graph() -> GenericGraphBuilder:
                 # 1. Extraction Phase
                 # ==========================
                 
-                # PDF
-                if suffix == ".pdf":
-                    file_type = "document"
-                    try:
-                        doc = fitz.open(file_path)
-                        text = ""
-                        for page in doc:
-                            text += page.get_text() + "\n"
-                        raw_content = text
-                    except Exception as e:
-                        raw_content = f"[Error parsing PDF: {e}]"
-
-                # Word
-                elif suffix in [".docx", ".doc"]:
-                    file_type = "document"
-                    if Document is None:
-                         raw_content = "[Error: python-docx not installed]"
-                    else:
-                        try:
-                            doc = Document(file_path)
-                            raw_content = "\n".join([p.text for p in doc.paragraphs])
-                        except Exception as e:
-                             raw_content = f"[Error parsing Docx: {e}]"
+                # PDF / Word / PPT：走笔记本文本存储，同一文件只解析一次
+                if suffix in PARSED_SUFFIXES:
+                    file_type = "presentation" if suffix in [".pptx", ".ppt"] else "document"
+                    raw_content = (await extract_texts_async([file_path]))[0]
 
-                # PPT (Simulate PPT -> Text)
-                elif suffix in [".pptx", ".ppt"]:
-                    file_type = "presentation"
-                    if Presentation is None:
-                        raw_content = "[Error: python-pptx not installed]"
-                    else:
-                        try:
-                            prs = Presentation(file_path)
-                            text = ""
-                            for i, slide in enumerate(prs.slides):
-                                text += f"--- Slide {i+1} ---\n"
-                                for shape in slide.shapes:
-                                    if hasattr(shape, "text"):
-                                        text += shape.text + "\n"
-                            raw_content = text
-                        except Exception as e:
-                            raw_content = f"[Error parsing PPT: {e}]"
-                
                 # Image / Video
                 elif suffix in [".jpg", ".jpeg", ".png", ".mp4", ".mov", ".avi"]:
                     file_type = "media"
@@ -418,6 +371,24 @@ def create_intelligent_qa_graph() -> GenericGraphBuilder:
         doc_context = _build_doc_context(state)
         history_str = _format_history(state.request.history)
 
+        # 流式运行（stream_workflow）时先推送检索结果，再逐 token 推送回答；
+        # 非流式运行时 writer 为空操作
+        writer = get_stream_writer()
+        writer({
+            "type": "retrieval",
+            "retrieved_chunks": [
+                {
+                    "score": item.get("score"),
+                    "content": item.get("content"),
+                    "source_file_id": item.get("source_file_id"),
+                    "type": item.get("type"),
+                }
+                for item in state.retrieved_chunks
+            ],
+            "file_analyses": state.file_analyses,
+            "source_mapping": {str(k): v for k, v in state.source_mapping.items()},
+        })
+
         final_prompt = QaAgentPrompts.final_qa_prompt.format(
             query=state.request.query,
             file_analyses=doc_context,
@@ -432,8 +403,9 @@ def create_intelligent_qa_graph() -> GenericGraphBuilder:
             parser_type="text",
         )
 
-        new_state = await agent.execute(state, prompt=final_prompt)
-        answer_text = _extract_text_result(new_state, "kb_prompt_agent")
+        async for delta in agent.astream(state, prompt=final_prompt):
+            writer({"type": "token", "content": delta})
+        answer_text = _extract_text_result(state, "kb_prompt_agent")
         state.answer = answer_text or "Sorry, I couldn't generate an answer."
 
         return state
@@ -4,26 +4,16 @@ import asyncio
 from pathlib import Path
 from typing import List, Dict, Any
 
-import fitz  # PyMuPDF
 from dataflow_agent.workflow.registry import register
 from dataflow_agent.graphbuilder.graph_builder import GenericGraphBuilder
 from dataflow_agent.logger import get_logger
 from dataflow_agent.state import KBMindMapState, MainState
 from dataflow_agent.agentroles import create_agent
 from dataflow_agent.utils import get_project_root
+from dataflow_agent.toolkits.ragtool.text_store import PARSED_SUFFIXES, extract_texts_async
 
 log = get_logger(__name__)
 
-# Try importing office libraries
-try:
-    from docx import Document
-except ImportError:
-    Document = None
-
-try:
-    from pptx import Presentation
-except ImportError:
-    Presentation = None
 
 @register("kb_mindmap")
 def create_kb_mindmap_graph() -> GenericGraphBuilder:
@@ -91,45 +81,9 @@ def create_kb_mindmap_graph() -> GenericGraphBuilder:
             raw_content = ""
 
             try:
-                # PDF
-                if suffix == ".pdf":
-                    try:
-                        doc = fitz.open(file_path)
-                        text = ""
-                        for page in doc:
-                            text += page.get_text() + "\n"
-                        raw_content = text
-                    except Exception as e:
-                        raw_content = f"[Error parsing PDF: {e}]"
-
-                # Word
-                elif suffix in [".docx", ".doc"]:
-                    if Document is None:
-                         raw_content = "[Error: python-docx not installed]"
-                    else:
-                        try:
-                            doc = Document(file_path)
-                            raw_content = "\n".join([p.text for p in doc.paragraphs])
-                        except Exception as e:
-                             raw_content = f"[Error parsing Docx: {e}]"
-
-                # PPT
-                elif suffix in [".pptx", ".ppt"]:
-                    if Presentation is None:
-                        raw_content = "[Error: python-pptx not installed]"
-                    else:
-                        try:
-                            prs = Presentation(file_path)
-                            text = ""
-                            for i, slide in enumerate(prs.slides):
-                                text += f"--- Slide {i+1} ---\n"
-                                for shape in slide.shapes:
-                                    if hasattr(shape, "text"):
-                                        text += shape.text + "\n"
-                            raw_content = text
-                        except Exception as e:
-                            raw_content = f"[Error parsing PPT: {e}]"
-
+                # PDF / Word / PPT：走笔记本文本存储，同一文件只解析一次
+                if suffix in PARSED_SUFFIXES:
+                    raw_content = (await extract_texts_async([file_path]))[0]
                 else:
                     try:
                         with open(file_path, "r", encoding="utf-8") as f:
@@ -1,35 +1,24 @@
 from __future__ import annotations
-import os
 import asyncio
 from pathlib import Path
 from typing import List, Dict, Any
 
-import fitz  # PyMuPDF
 from dataflow_agent.workflow.registry import register
 from dataflow_agent.graphbuilder.graph_builder import GenericGraphBuilder
 from dataflow_agent.logger import get_logger
 from dataflow_agent.state import KBPodcastState, MainState
 from dataflow_agent.agentroles import create_agent
 from dataflow_agent.utils import get_project_root
+from dataflow_agent.toolkits.ragtool.text_store import PARSED_SUFFIXES, extract_texts_async
 import re
-import wave
 from dataflow_agent.toolkits.multimodaltool.req_tts import (
-    generate_speech_bytes_async,
-    split_tts_text
+    TTSSegment,
+    split_tts_text,
+    synthesize_segments_to_wav_async,
 )
 
 log = get_logger(__name__)
 
-# Try importing office libraries
-try:
-    from docx import Document
-except ImportError:
-    Document = None
-
-try:
-    from pptx import Presentation
-except ImportError:
-    Presentation = None
 
 @register("kb_podcast")
 def create_kb_podcast_graph() -> GenericGraphBuilder:
@@ -98,45 +87,9 @@ def create_kb_podcast_graph() -> GenericGraphBuilder:
             raw_content = ""
 
             try:
-                # PDF
-                if suffix == ".pdf":
-                    try:
-                        doc = fitz.open(file_path)
-                        text = ""
-                        for page in doc:
-                            text += page.get_text() + "\n"
-                        raw_content = text
-                    except Exception as e:
-                        raw_content = f"[Error parsing PDF: {e}]"
-
-                # Word
-                elif suffix in [".docx", ".doc"]:
-                    if Document is None:
-                         raw_content = "[Error: python-docx not installed]"
-                    else:
-                        try:
-                            doc = Document(file_path)
-                            raw_content = "\n".join([p.text for p in doc.paragraphs])
-                        except Exception as e:
-                             raw_content = f"[Error parsing Docx: {e}]"
-
-                # PPT
-                elif suffix in [".pptx", ".ppt"]:
-                    if Presentation is None:
-                        raw_content = "[Error: python-pptx not installed]"
-                    else:
-                        try:
-                            prs = Presentation(file_path)
-                            text = ""
-                            for i, slide in enumerate(prs.slides):
-                                text += f"--- Slide {i+1} ---\n"
-                                for shape in slide.shapes:
-                                    if hasattr(shape, "text"):
-                                        text += shape.text + "\n"
-                            raw_content = text
-                        except Exception as e:
-                            raw_content = f"[Error parsing PPT: {e}]"
-
+                # PDF / Word / PPT：走笔记本文本存储，同一文件只解析一次
+                if suffix in PARSED_SUFFIXES:
+                    raw_content = (await extract_texts_async([file_path]))[0]
                 else:
                     try:
                         with open(file_path, "r", encoding="utf-8") as f:
@@ -250,7 +203,6 @@ def create_kb_podcast_graph() -> GenericGraphBuilder:
             audio_path = str(Path(state.result_path) / "podcast.wav")
             mode = getattr(state.request, "podcast_mode", "monologue")
             max_chars = 1500
-            concurrency = 4
 
             segments = []
             if mode == "dialog":
@@ -306,60 +258,17 @@ def create_kb_podcast_graph() -> GenericGraphBuilder:
             if not segments:
                 raise RuntimeError("No valid TTS segments generated from script")
 
-            sem = asyncio.Semaphore(concurrency)
-
-            async def _run(seg):
-                voice = state.request.voice_name if seg["speaker"] == "A" else state.request.voice_name_b
-                async with sem:
-                    return await generate_speech_bytes_async(
-                        text=seg["text"],
-                        api_url=state.request.chat_api_url,
-                        api_key=state.request.api_key,
-                        model=state.request.tts_model,
-                        voice_name=voice,
-                    )
-
-            async def _run_no_sem(seg):
-                voice = state.request.voice_name if seg["speaker"] == "A" else state.request.voice_name_b
-                return await generate_speech_bytes_async(
-                    text=seg["text"],
-                    api_url=state.request.chat_api_url,
-                    api_key=state.request.api_key,
-                    model=state.request.tts_model,
-                    voice_name=voice,
-                )
-
-            async def _run_with_retry(seg, attempts=3, base_delay=0.8, use_sem=True):
-                last_err = None
-                for i in range(attempts):
-                    try:
-                        if use_sem:
-                            return await _run(seg)
-                        return await _run_no_sem(seg)
-                    except Exception as e:
-                        last_err = e
-                        if i < attempts - 1:
-                            await asyncio.sleep(base_delay * (i + 1))
-                        continue
-                raise last_err
-
-            tasks = [asyncio.create_task(_run_with_retry(seg, attempts=2, use_sem=True)) for seg in segments]
-            results = await asyncio.gather(*tasks, return_exceptions=True)
-
-            failed_indices = [i for i, r in enumerate(results) if isinstance(r, Exception)]
-            if failed_indices:
-                log.warning(f"TTS retry sequentially for {len(failed_indices)} failed segment(s)")
-                for i in failed_indices:
-                    results[i] = await _run_with_retry(segments[i], attempts=3, use_sem=False)
-
-            audio_chunks = results
-
-            os.makedirs(os.path.dirname(os.path.abspath(audio_path)), exist_ok=True)
-            with wave.open(audio_path, "wb") as wav_file:
-                wav_file.setnchannels(1)        # 1 Channel
-                wav_file.setsampwidth(2)        # 16 bit = 2 bytes
-                wav_file.setframerate(24000)    # 24kHz
-                wav_file.writeframes(b"".join(audio_chunks))
+            voices = {"A": state.request.voice_name, "B": state.request.voice_name_b}
+            # 分段并发合成、按 (文本, 模型, 音色) 缓存，并按顺序流式写入 WAV；
+            # 修改脚本后重跑只会重新合成变化的台词
+            await synthesize_segments_to_wav_async(
+                [TTSSegment(seg["text"], voices[seg["speaker"]]) for seg in segments],
+                audio_path,
+                api_url=state.request.chat_api_url,
+                api_key=state.request.api_key,
+                model=state.request.tts_model,
+                voice_name=state.request.voice_name,
+            )
 
             state.audio_path = audio_path
             log.info(f"Audio generated successfully: {audio_path}")
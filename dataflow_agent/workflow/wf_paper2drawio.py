@@ -17,6 +17,7 @@ AI 驱动的 draw.io 图表生成工作流
 """
 
 from __future__ import annotations
+import asyncio
 import os
 import time
 from pathlib import Path
@@ -29,6 +30,7 @@ from dataflow_agent.workflow.registry import register
 from dataflow_agent.agentroles import create_simple_agent, create_react_agent, create_vlm_agent
 from dataflow_agent.logger import get_logger
 from dataflow_agent.toolkits.drawio_tools import wrap_xml, validate_xml, export_drawio_png
+from dataflow_agent.toolkits.drawio_renderer import warm_drawio_renderer
 
 log = get_logger(__name__)
 
@@ -164,6 +166,9 @@ def create_paper2drawio_graph() -> GenericGraphBuilder:
             env_flag = os.getenv("PAPER2DRAWIO_ENABLE_VLM_VALIDATION", "false").lower()
             enable_vlm = env_flag in ("1", "true", "yes", "on")
         max_vlm_rounds = state.request.vlm_validation_max_retries or 3
+        if enable_vlm:
+            # 生成 XML 期间在后台拉起渲染器，每轮预览只付一次渲染的开销
+            warm_drawio_renderer()
 
         def _format_validation_feedback(result: Dict[str, Any]) -> str:
             if not isinstance(result, dict):
@@ -251,9 +256,10 @@ def create_paper2drawio_graph() -> GenericGraphBuilder:
                 break
 
             png_path = base_dir / f"diagram_{int(time.time())}_try{attempt + 1}.png"
-            ok, msg = export_drawio_png(xml_code, str(png_path))
+            # 兜底的 Python 光栅化只是近似渲染，拿它给 VLM 校验会误导修正，视为导出失败
+            ok, msg = await asyncio.to_thread(export_drawio_png, xml_code, str(png_path), allow_fallback=False)
             if not ok:
-                log.warning(f"[paper2drawio] drawio PNG export skipped: {msg}")
+                log.warning(f"[paper2drawio] drawio PNG export skipped, skip VLM validation: {msg}")
                 break
 
             state.validation_png_path = str(png_path)
@@ -25,7 +25,7 @@ import time
 import html
 from dataclasses import dataclass
 from pathlib import Path
-from typing import Any, Dict, List, Optional, Tuple
+from typing import Any, Callable, Dict, List, Optional, Tuple
 
 import cv2
 import numpy as np
@@ -48,11 +48,11 @@ from dataflow_agent.toolkits.multimodaltool.ocr_config import get_ocr_api_creden
 from dataflow_agent.toolkits.drawio_tools import wrap_xml
 from dataflow_agent.toolkits.image2drawio import (
     extract_text_color,
-    mask_to_bbox,
-    normalize_mask,
+    mask_roi,
     sample_fill_stroke,
     save_masked_rgba,
     bbox_iou_px,
+    window_bbox,
 )
 from dataflow_agent.utils_common import robust_parse_json
 
@@ -125,6 +125,7 @@ MAX_IMAGE_BBOX_AREA_RATIO = 0.88
 IMAGE_MASK_REPAIR_LOW_COVERAGE_THRESHOLD = 0.58
 IMAGE_MASK_REPAIR_MIN_BBOX_AREA = 5000
 IMAGE_MASK_REPAIR_PAD_PX = 12
+IMAGE_MASK_REPAIR_CONTEXT_PX = 64
 IMAGE_MASK_REPAIR_MAX_COVERAGE_ON_ORIG_BBOX = 0.74
 IMAGE_MASK_REPAIR_MIN_GAIN_RATIO = 0.08
 IMAGE_FRAGMENT_SKIP_MAX_AREA = 2500
@@ -202,6 +203,123 @@ class CoordProcessor:
         }
 
 
+# -- Block clustering --
+_MAX_BLOCK_CELLS = 1024
+
+
+def _block_rect(block: Dict[str, Any]) -> Optional[Tuple[float, float, float, float]]:
+    """(x, y, w, h) of a text block; None when the geometry is not finite numbers."""
+    geo = block.get("geometry", {})
+    try:
+        rect = tuple(float(geo.get(k, 0)) for k in ("x", "y", "width", "height"))
+    except (TypeError, ValueError):
+        return None
+    return rect if all(math.isfinite(v) for v in rect) else None
+
+
+def _cluster_blocks(
+    text_blocks: List[Dict[str, Any]],
+    should_merge: Callable[[Dict[str, Any], Dict[str, Any]], bool],
+    y_margin: float = 0.0,
+    degenerate_merges: bool = False,
+) -> List[List[int]]:
+    """
+    按 should_merge 连通关系对文本块分组，返回各组下标（组内升序，组按最小下标排序）。
+
+    分组结果与两两比较完全一致，但只比较空间上相邻的块：
+    - should_merge 为真的两个块，外接框（纵向各外扩 y_margin * 高度）必定相交，
+      因此按网格分桶后只需比较同桶的块；
+    - 坐标非数值 / 非有限的块与所有块逐一比较；degenerate_merges 为 False 时
+      宽高非正的块视为不会与任何块合并，为 True 时高度非正的块同样逐一比较；
+    - 并查集使用路径压缩 + 按秩合并，已在同一组的两块不再调用 should_merge。
+    """
+    n = len(text_blocks)
+    parent = list(range(n))
+    rank = [0] * n
+
+    def find(x: int) -> int:
+        root = x
+        while parent[root] != root:
+            root = parent[root]
+        while parent[x] != root:
+            parent[x], x = root, parent[x]
+        return root
+
+    def union(a: int, b: int) -> None:
+        ra, rb = find(a), find(b)
+        if ra == rb:
+            return
+        if rank[ra] < rank[rb]:
+            ra, rb = rb, ra
+        parent[rb] = ra
+        if rank[ra] == rank[rb]:
+            rank[ra] += 1
+
+    def try_merge(i: int, j: int) -> None:
+        if find(i) != find(j) and should_merge(text_blocks[i], text_blocks[j]):
+            union(i, j)
+
+    rects: Dict[int, Tuple[float, float, float, float]] = {}
+    brute: List[int] = []
+    margin = max(0.0, y_margin)
+    for i, block in enumerate(text_blocks):
+        rect = _block_rect(block)
+        if rect is None:
+            brute.append(i)
+            continue
+        x, y, w, h = rect
+        if not degenerate_merges and (w <= 0 or h <= 0):
+            continue
+        if h <= 0:
+            brute.append(i)
+            continue
+        # 宽度非正时按 [x + w, x] 入桶；额外留一点余量，避免浮点舍入让边界上的候选对漏掉
+        x0, x1 = min(x, x + w), max(x, x + w)
+        pad = 1e-6 * (abs(x) + abs(y) + abs(w) + h + 1.0)
+        rects[i] = (x0 - pad, y - margin * h - pad, x1 + pad, y + h + margin * h + pad)
+
+    if rects:
+        extents = sorted(max(r[2] - r[0], r[3] - r[1]) for r in rects.values())
+        cell = max(extents[len(extents) // 2], 1.0)
+        buckets: Dict[Tuple[int, int], List[int]] = {}
+        spans: Dict[int, Tuple[range, range]] = {}
+        for i, (x0, y0, x1, y1) in list(rects.items()):
+            gx = range(int(math.floor(x0 / cell)), int(math.floor(x1 / cell)) + 1)
+            gy = range(int(math.floor(y0 / cell)), int(math.floor(y1 / cell)) + 1)
+            if len(gx) * len(gy) > _MAX_BLOCK_CELLS:
+                # 远大于常规文本块的框（整页标题等）不进网格，直接逐一比较
+                del rects[i]
+                brute.append(i)
+                continue
+            spans[i] = (gx, gy)
+            for cx in gx:
+                for cy in gy:
+                    buckets.setdefault((cx, cy), []).append(i)
+        for i in sorted(rects):
+            x0, y0, x1, y1 = rects[i]
+            gx, gy = spans[i]
+            near = set()
+            for cx in gx:
+                for cy in gy:
+                    near.update(buckets[(cx, cy)])
+            for j in sorted(near):
+                if j <= i:
+                    continue
+                ox0, oy0, ox1, oy1 = rects[j]
+                if ox0 <= x1 and x0 <= ox1 and oy0 <= y1 and y0 <= oy1:
+                    try_merge(i, j)
+
+    for i in brute:
+        for j in range(n):
+            if j != i:
+                try_merge(min(i, j), max(i, j))
+
+    groups: Dict[int, List[int]] = {}
+    for i in range(n):
+        groups.setdefault(find(i), []).append(i)
+    return list(groups.values())
+
+
 # -- Text processors --
 class FontSizeProcessor:
     def __init__(
@@ -297,34 +415,16 @@ class FontSizeProcessor:
     ) -> List[Dict[str, Any]]:
         if not text_blocks:
             return text_blocks
-        n = len(text_blocks)
-        parent = list(range(n))
-
-        def find(x):
-            if parent[x] != x:
-                parent[x] = find(parent[x])
-            return parent[x]
-
-        def union(x, y):
-            px, py = find(x), find(y)
-            if px != py:
-                parent[px] = py
-
-        for i in range(n):
-            for j in range(i + 1, n):
-                if self._should_group(
-                    text_blocks[i], text_blocks[j],
-                    vertical_threshold_ratio, font_diff_threshold
-                ):
-                    union(i, j)
-
-        groups: Dict[int, List[int]] = {}
-        for i in range(n):
-            root = find(i)
-            groups.setdefault(root, []).append(i)
+        # 纵向距离 < min(h1, h2) * ratio 才会分到一组，按 ratio * 高度外扩即可覆盖所有候选
+        groups = _cluster_blocks(
+            text_blocks,
+            lambda a, b: self._should_group(a, b, vertical_threshold_ratio, font_diff_threshold),
+            y_margin=vertical_threshold_ratio,
+            degenerate_merges=True,
+        )
 
         result = copy.deepcopy(text_blocks)
-        for group_indices in groups.values():
+        for group_indices in groups:
             if len(group_indices) < 2:
                 continue
             font_sizes = [result[i].get("font_size", 12) for i in group_indices]
@@ -501,31 +601,10 @@ class FontFamilyProcessor:
     def unify_by_clustering(self, text_blocks: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
         if not text_blocks:
             return text_blocks
-        n = len(text_blocks)
-        parent = list(range(n))
-
-        def find(x):
-            if parent[x] != x:
-                parent[x] = find(parent[x])
-            return parent[x]
-
-        def union(x, y):
-            px, py = find(x), find(y)
-            if px != py:
-                parent[px] = py
-
-        for i in range(n):
-            for j in range(i + 1, n):
-                if self._should_merge(text_blocks[i], text_blocks[j]):
-                    union(i, j)
-
-        groups: Dict[int, List[int]] = {}
-        for i in range(n):
-            root = find(i)
-            groups.setdefault(root, []).append(i)
+        groups = _cluster_blocks(text_blocks, self._should_merge)
 
         result = copy.deepcopy(text_blocks)
-        for group_indices in groups.values():
+        for group_indices in groups:
             if len(group_indices) < 2:
                 continue
             fonts = [result[i].get("font_family", self.default_font) for i in group_indices]
@@ -635,31 +714,13 @@ class StyleProcessor:
     ) -> List[Dict[str, Any]]:
         if not text_blocks:
             return text_blocks
-        n = len(text_blocks)
-        parent = list(range(n))
-
-        def find(x):
-            if parent[x] != x:
-                parent[x] = find(parent[x])
-            return parent[x]
-
-        def union(x, y):
-            px, py = find(x), find(y)
-            if px != py:
-                parent[px] = py
-
-        for i in range(n):
-            for j in range(i + 1, n):
-                if self._should_merge(text_blocks[i], text_blocks[j], vertical_threshold, horizontal_threshold):
-                    union(i, j)
-
-        groups: Dict[int, List[int]] = {}
-        for i in range(n):
-            root = find(i)
-            groups.setdefault(root, []).append(i)
+        groups = _cluster_blocks(
+            text_blocks,
+            lambda a, b: self._should_merge(a, b, vertical_threshold, horizontal_threshold),
+        )
 
         result = copy.deepcopy(text_blocks)
-        for group_indices in groups.values():
+        for group_indices in groups:
             if len(group_indices) < 2:
                 continue
             colors = [result[i].get("font_color") for i in group_indices if result[i].get("font_color")]
@@ -793,19 +854,12 @@ def _is_image_path(path: str) -> bool:
 
 
 def _render_pdf_first_page(pdf_path: str, out_path: str) -> Optional[str]:
+    from dataflow_agent.toolkits.multimodaltool.pdf_raster import render_pdf
+
     try:
-        import fitz
-    except Exception as e:
-        log.error(f"[paper2drawio_sam3] PyMuPDF not available: {e}")
-        return None
-    try:
-        doc = fitz.open(pdf_path)
-        if len(doc) == 0:
-            return None
-        page = doc.load_page(0)
-        pix = page.get_pixmap(alpha=False)
-        pix.save(out_path)
-        return out_path
+        out = Path(out_path)
+        pages = render_pdf(pdf_path, dpi=72, out_dir=str(out.parent), pages=[0], name_fmt=out.name)
+        return pages[0] if pages else None
     except Exception as e:
         log.error(f"[paper2drawio_sam3] PDF render failed: {e}")
         return None
@@ -1083,18 +1137,24 @@ def _build_elements_from_sam3(
             return 0.0
         return inter / float(area_inner)
 
-    def _refine_low_coverage_image_mask(mask: np.ndarray, bbox: List[int]) -> Tuple[np.ndarray, List[int], bool]:
+    def _refine_low_coverage_image_mask(
+        mask: np.ndarray,
+        window: Tuple[int, int, int, int],
+        bbox: List[int],
+    ) -> Tuple[np.ndarray, Tuple[int, int, int, int], List[int], bool]:
+        """mask 为 window 内的局部 mask；返回 (mask, window, bbox, 是否修复)。"""
+        unchanged = (mask, window, window_bbox(mask, window) or bbox, False)
         bbox_area = _bbox_area(bbox)
         if bbox_area < IMAGE_MASK_REPAIR_MIN_BBOX_AREA:
-            return mask, (mask_to_bbox(mask) or bbox), False
+            return unchanged
 
         mask_area = int(np.count_nonzero(mask))
         if mask_area <= 0:
-            return mask, bbox, False
+            return mask, window, bbox, False
 
         cover_ratio = float(mask_area) / float(max(1, bbox_area))
         if cover_ratio >= IMAGE_MASK_REPAIR_LOW_COVERAGE_THRESHOLD:
-            return mask, (mask_to_bbox(mask) or bbox), False
+            return unchanged
 
         x1, y1, x2, y2 = [int(v) for v in bbox]
         pad = IMAGE_MASK_REPAIR_PAD_PX
@@ -1103,13 +1163,22 @@ def _build_elements_from_sam3(
         x2 = min(w, x2 + pad)
         y2 = min(h, y2 + pad)
         if x2 <= x1 or y2 <= y1:
-            return mask, (mask_to_bbox(mask) or bbox), False
-
-        mask_u8 = mask.astype(np.uint8)
+            return unchanged
+
+        # grabCut 只在 bbox 周围的上下文窗口内运行：窗口外本就是确定背景，
+        # 一圈上下文足够估计背景颜色模型，代价随元素大小而不是整图大小增长
+        ctx = max(IMAGE_MASK_REPAIR_CONTEXT_PX, max(x2 - x1, y2 - y1) // 2)
+        cx0, cy0 = max(0, min(x1 - ctx, window[0])), max(0, min(y1 - ctx, window[1]))
+        cx1, cy1 = min(w, max(x2 + ctx, window[2])), min(h, max(y2 + ctx, window[3]))
+        local = np.zeros((cy1 - cy0, cx1 - cx0), dtype=bool)
+        local[window[1] - cy0:window[3] - cy0, window[0] - cx0:window[2] - cx0] = mask
+        x1, y1, x2, y2 = x1 - cx0, y1 - cy0, x2 - cx0, y2 - cy0
+
+        mask_u8 = local.astype(np.uint8)
         seed_dil = cv2.dilate(mask_u8, np.ones((7, 7), np.uint8), iterations=1)
         seed_ero = cv2.erode(mask_u8, np.ones((3, 3), np.uint8), iterations=1)
 
-        gc_mask = np.full((h, w), cv2.GC_BGD, dtype=np.uint8)
+        gc_mask = np.full(local.shape, cv2.GC_BGD, dtype=np.uint8)
         gc_mask[y1:y2, x1:x2] = cv2.GC_PR_BGD
         gc_mask[seed_dil > 0] = cv2.GC_PR_FGD
         gc_mask[seed_ero > 0] = cv2.GC_FGD
@@ -1117,16 +1186,17 @@ def _build_elements_from_sam3(
         bgd_model = np.zeros((1, 65), np.float64)
         fgd_model = np.zeros((1, 65), np.float64)
         try:
-            cv2.grabCut(image_bgr, gc_mask, None, bgd_model, fgd_model, 2, cv2.GC_INIT_WITH_MASK)
+            crop = np.ascontiguousarray(image_bgr[cy0:cy1, cx0:cx1])
+            cv2.grabCut(crop, gc_mask, None, bgd_model, fgd_model, 2, cv2.GC_INIT_WITH_MASK)
         except Exception:
-            return mask, (mask_to_bbox(mask) or bbox), False
+            return unchanged
 
         refined = (gc_mask == cv2.GC_FGD) | (gc_mask == cv2.GC_PR_FGD)
         roi = np.zeros_like(refined, dtype=bool)
         roi[y1:y2, x1:x2] = True
         refined = refined & roi
         if int(np.count_nonzero(refined)) <= 0:
-            return mask, (mask_to_bbox(mask) or bbox), False
+            return unchanged
 
         # 保留与原前景相连的连通域，或面积足够大的连通域
         num_labels, labels, stats, _ = cv2.connectedComponentsWithStats(refined.astype(np.uint8), connectivity=8)
@@ -1145,12 +1215,13 @@ def _build_elements_from_sam3(
         gain_ratio = float(refined_area - mask_area) / float(max(1, mask_area))
         refined_cover_on_orig_bbox = float(refined_area) / float(max(1, bbox_area))
         if gain_ratio < IMAGE_MASK_REPAIR_MIN_GAIN_RATIO:
-            return mask, (mask_to_bbox(mask) or bbox), False
+            return unchanged
         if refined_cover_on_orig_bbox > IMAGE_MASK_REPAIR_MAX_COVERAGE_ON_ORIG_BBOX:
-            return mask, (mask_to_bbox(mask) or bbox), False
+            return unchanged
 
-        refined_bbox = mask_to_bbox(refined) or bbox
-        return refined, refined_bbox, True
+        refined_window = (cx0, cy0, cx1, cy1)
+        refined_bbox = window_bbox(refined, refined_window) or bbox
+        return refined, refined_window, refined_bbox, True
 
     for idx, item in enumerate(results):
         bbox = item.get("bbox")
@@ -1167,15 +1238,24 @@ def _build_elements_from_sam3(
             continue
         prompt = item.get("prompt", "")
 
+        # 整图大小的 mask 解码后立即裁到元素窗口，后续逐元素操作只用局部 mask
         mask = None
+        window = None
         if item.get("mask"):
-            mask = decode_sam3_mask(item.get("mask"))
-            if mask is not None:
-                mask = normalize_mask(mask.astype(bool), (h, w))
+            decoded = decode_sam3_mask(item.get("mask"))
+            if decoded is not None:
+                roi = mask_roi(decoded, (h, w))
+                del decoded
+                if roi is None:
+                    # 空 mask：保留 bbox 大小的全零窗口，行为与整图空 mask 一致
+                    bx1, by1 = max(0, int(bbox[0])), max(0, int(bbox[1]))
+                    bx2, by2 = min(w, max(bx1, int(bbox[2]))), min(h, max(by1, int(bbox[3])))
+                    roi = (np.zeros((by2 - by1, bx2 - bx1), dtype=bool), (bx1, by1, bx2, by2))
+                mask, window = roi
 
         if group in {"shape", "background"} and mask is not None:
             shape_type = _shape_type_from_prompt(prompt)
-            fill_hex, stroke_hex = sample_fill_stroke(image_bgr, mask)
+            fill_hex, stroke_hex = sample_fill_stroke(image_bgr, mask, window=window)
             shapes.append({
                 "id": f"s{idx}",
                 "kind": "shape",
@@ -1205,15 +1285,17 @@ def _build_elements_from_sam3(
                 continue
 
         if mask is not None:
-            work_mask = mask
+            work_mask, work_window = mask, window
             if group == "image":
-                work_mask, repaired_bbox, is_repaired = _refine_low_coverage_image_mask(mask, bbox)
+                work_mask, work_window, repaired_bbox, is_repaired = _refine_low_coverage_image_mask(
+                    mask, window, bbox
+                )
                 if is_repaired:
                     repaired_image_bboxes.append(repaired_bbox)
 
             out_path = icon_dir / f"sam3_{group}_{idx}.png"
-            save_masked_rgba(image_bgr, work_mask, str(out_path), dilate_px=1)
-            effective_bbox = mask_to_bbox(work_mask) or bbox
+            save_masked_rgba(image_bgr, work_mask, str(out_path), window=work_window, dilate_px=1)
+            effective_bbox = window_bbox(work_mask, work_window) or bbox
 
             img_area_ratio = float(_bbox_area(effective_bbox)) / image_area
             if img_area_ratio < MIN_IMAGE_AREA_RATIO:
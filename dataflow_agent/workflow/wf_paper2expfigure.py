@@ -23,6 +23,8 @@ from __future__ import annotations
 import os
 import uuid
 import json
+import base64
+import hashlib
 from pathlib import Path
 from typing import Dict, Any, List
 import asyncio
@@ -34,6 +36,7 @@ from pptx.util import Inches
 from PIL import Image
 
 from dataflow_agent.state import Paper2FigureState
+from dataflow_agent.graphbuilder.checkpoint import PageResultLedger, page_fingerprint
 from dataflow_agent.graphbuilder.graph_builder import GenericGraphBuilder
 from dataflow_agent.workflow.registry import register
 from dataflow_agent.agentroles import create_simple_agent
@@ -42,13 +45,14 @@ from dataflow_agent.agentroles.paper2any_agents.chart_code_generator import crea
 from dataflow_agent.toolkits.tool_manager import get_tool_manager
 from dataflow_agent.logger import get_logger
 from dataflow_agent.utils import (
-    pdf_to_pil_images,
     extract_tables_from_mineru_results,
     extract_text_from_mineru_results,
     execute_matplotlib_code,
 )
 from dataflow_agent.toolkits.multimodaltool.mineru_tool import run_aio_two_step_extract
+from dataflow_agent.toolkits.multimodaltool.pdf_raster import iter_rendered_pages
 from dataflow_agent.toolkits.multimodaltool.req_img import generate_or_edit_and_save_image_async
+from dataflow_agent.toolkits.plot_sandbox import warm_plot_sandbox
 
 
 log = get_logger(__name__)
@@ -70,6 +74,8 @@ def create_paper2expfigure_graph() -> GenericGraphBuilder:
         state_model=Paper2FigureState,
         entry_point="_start_"
     )
+    # 节点级断点续跑（见 graphbuilder/checkpoint.py）
+    builder.enable_checkpoint()
 
     # ======================================================================
     # PRE-TOOLS: 为 Agent 提供输入数据
@@ -328,7 +334,7 @@ def create_paper2expfigure_graph() -> GenericGraphBuilder:
     async def pdf_to_images_node(state: Paper2FigureState) -> Paper2FigureState:
         """
         节点 1: PDF → 图片
-        将 PDF 的每一页转换为 PIL Image 对象，保存到临时目录
+        将 PDF 的每一页渲染为 PNG，保存到 result_path/images
         """
         pdf_path = Path(state.paper_file)
         if not pdf_path.exists():
@@ -337,26 +343,20 @@ def create_paper2expfigure_graph() -> GenericGraphBuilder:
         
         log.info(f"[pdf_to_images] 开始转换 PDF: {pdf_path}")
         
-        # 转换 PDF 为图片
-        images = pdf_to_pil_images(pdf_path, dpi=150)
-        
-        # 创建临时目录保存图片
+        # 转换 PDF 为图片（pdf_raster 并行渲染 + 页面缓存，直接落到 images 目录）
         output_path = Path(state.result_path)
         images_dir = output_path / "images"
         images_dir.mkdir(exist_ok=True)
-        
-        # 保存图片
+
         image_paths = []
-        for idx, img in enumerate(images):
-            img_path = images_dir / f"page_{idx+1}.png"
-            img.save(img_path)
-            image_paths.append(str(img_path))
-            log.info(f"[pdf_to_images] 保存第 {idx+1} 页: {img_path}")
-        
+        for img_path in iter_rendered_pages(str(pdf_path), dpi=150, out_dir=str(images_dir), name_fmt="page_{n}.png"):
+            image_paths.append(img_path)
+            log.info(f"[pdf_to_images] 保存第 {len(image_paths)} 页: {img_path}")
+
         # 存储到 state（使用绝对路径）
         state.temp_data['image_paths'] = image_paths
         
-        log.info(f"[pdf_to_images] 完成，共转换 {len(images)} 页")
+        log.info(f"[pdf_to_images] 完成，共转换 {len(image_paths)} 页")
         return state
     
     async def mineru_extract_node(state: Paper2FigureState) -> Paper2FigureState:
@@ -649,6 +649,8 @@ def create_paper2expfigure_graph() -> GenericGraphBuilder:
             return state
 
         log.info(f"[code_executor] 共有 {len(tables)} 个表格待处理")
+        # LLM 生成代码期间在后台拉起绘图沙箱 worker
+        warm_plot_sandbox()
         
         image_paths = [t["image_path"] for t in tables if "image_path" in t]
         
@@ -755,7 +757,9 @@ output_path = {repr(str(chart_path))}
 {code}
 """
                 
-                result = execute_matplotlib_code(
+                # 放到线程里等沙箱 worker，多张图可以同时在不同 worker 上执行
+                result = await asyncio.to_thread(
+                    execute_matplotlib_code,
                     code=exec_code,
                     output_path=chart_path,
                     timeout=30,
@@ -816,7 +820,24 @@ output_path = {repr(str(chart_path))}
             for table in tables if is_suitable(table)
         ]
         
-        tasks = [task(s) for s in states]
+        # 逐表结果台账：重跑时复用已成功生成的图表，只重新处理失败的表格
+        ledger = PageResultLedger(str(output_path), "code_executor")
+        chart_model = getattr(state.request, "chart_model", "deepseek-v3.2")
+
+        async def cached_task(ccg_state: ChartCodeGeneratorState):
+            table_id = ccg_state.table["table_id"]
+            fingerprint = page_fingerprint(ccg_state.table, ccg_state.pre_tool_results, chart_model)
+            cached = ledger.get(table_id, fingerprint)
+            if cached and os.path.exists(cached["chart_path"]):
+                log.info(f"[code_executor] 复用上次生成的图表: {table_id}")
+                return (cached["codes"], {table_id: Path(cached["chart_path"])})
+            code, chart = await task(ccg_state)
+            chart_path = chart.get(table_id)
+            if chart_path is not None and os.path.exists(chart_path):
+                ledger.put(table_id, fingerprint, {"codes": code, "chart_path": str(chart_path)})
+            return (code, chart)
+
+        tasks = [cached_task(s) for s in states]
         generated_results = await asyncio.gather(*tasks)
         generated_code = [result[0] for result in generated_results]
         generated_charts = [result[1] for result in generated_results]
@@ -886,7 +907,24 @@ output_path = {repr(str(chart_path))}
                 log.error(f"[post_stylize] {table_id} 图表风格化出错: {e}")
                 return {table_id: None}
         
-        tasks = [stylize_task(table_id, str(save_dir), str(chart_path)) for table_id, chart_path in chart_paths.items()]
+        # 逐图结果台账：重跑时复用已风格化的图表
+        ledger = PageResultLedger(str(state.result_path), "post_stylize")
+
+        async def cached_stylize_task(table_id: str, save_dir_path: str, chart_path: str):
+            # 以图表内容而非路径做指纹：图表被重新生成后，旧的风格化结果不再复用
+            chart_digest = hashlib.sha256(Path(chart_path).read_bytes()).hexdigest() if os.path.exists(chart_path) else chart_path
+            fingerprint = page_fingerprint(chart_digest, stylize_prompt, state.request.gen_fig_model)
+            cached = ledger.get(table_id, fingerprint)
+            if cached and os.path.exists(cached):
+                log.info(f"[post_stylize] 复用上次风格化的图表: {table_id}")
+                b64_result = base64.b64encode(Path(cached).read_bytes()).decode("utf-8")
+                return {table_id: [b64_result, Path(cached)]}
+            result = await stylize_task(table_id, save_dir_path, chart_path)
+            if result.get(table_id) is not None:
+                ledger.put(table_id, fingerprint, str(result[table_id][1]))
+            return result
+
+        tasks = [cached_stylize_task(table_id, str(save_dir), str(chart_path)) for table_id, chart_path in chart_paths.items()]
         results = await asyncio.gather(*tasks)
         # 过滤掉失败的图表
         results = [
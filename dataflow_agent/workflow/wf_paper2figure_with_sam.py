@@ -29,8 +29,9 @@ from dataflow_agent.graphbuilder.graph_builder import GenericGraphBuilder
 from dataflow_agent.logger import get_logger
 
 from dataflow_agent.toolkits.multimodaltool.req_img import generate_or_edit_and_save_image_async
-from dataflow_agent.toolkits.multimodaltool.bg_tool import local_tool_for_bg_remove, local_tool_for_raster_to_svg, free_bg_rm_model
-from dataflow_agent.toolkits.multimodaltool.sam_tool import segment_layout_boxes, segment_layout_boxes_server, free_sam_model
+from dataflow_agent.toolkits.multimodaltool.bg_tool import local_tool_for_raster_to_svg
+from dataflow_agent.toolkits.multimodaltool.bg_service import get_bg_remove_service
+from dataflow_agent.toolkits.multimodaltool.sam_tool import segment_layout_boxes, segment_layout_boxes_server
 from dataflow_agent.toolkits.multimodaltool.mineru_tool import (
     svg_to_emf,
     recursive_mineru_layout,
@@ -300,8 +301,7 @@ def create_p2fig_graph() -> GenericGraphBuilder:  # noqa: N802
                     top_k           = 15,
                     nms_by          = "mask",
                 )
-                # 只有本地运行时才需要手动释放模型
-                free_sam_model(checkpoint= sam_ckpt)
+                # 本地模型由 model_residency 常驻复用，按空闲 / 内存压力自动释放
 
             log.info(f"[figure_layout_sam] SAM 分割结果: {len(layout_items)} 个布局元素")
 
@@ -654,32 +654,24 @@ def create_p2fig_graph() -> GenericGraphBuilder:  # noqa: N802
             icons_dir = base_dir / "icons"
             icons_dir.mkdir(parents=True, exist_ok=True)
 
-            img_cnt = 0
-            for item in state.fig_mask:
-                if item.get('type') in ['image', 'table']:
-                    img_cnt += 1
-                    try:
-                        output_path = local_tool_for_bg_remove({
-                            "image_path": item.get('img_path'),
-                            "model_path": state.request.bg_rm_model,
-                            "output_dir": str(icons_dir)
-                        })
-                        if output_path:
-                            item['img_path'] = output_path
-                            log.info(f"[figure_icon_bg_remover] background removed: {output_path}")
-                        else:
-                            log.warning(f"[figure_icon_bg_remover] bg remove failed for {item.get('img_path')}")
-                    except Exception as e:
-                        log.warning(f"[figure_icon_bg_remover] Single item bg remove failed: {e}")
-
-            log.info(f"[figure_icon_bg_remover] processed image/table elements: {img_cnt}")
-
-            # 抠图完成后，显式释放 RGB2.0 模型占用的显存
-            try:
-                free_bg_rm_model(model_path=state.request.bg_rm_model)
-                log.info("[figure_icon_bg_remover] freed RMBG-2.0 model from GPU")
-            except Exception as e:
-                log.error(f"[figure_icon_bg_remover] free_bg_rm_model failed: {e}")
+            # 全部图块一次提交给常驻抠图服务，合批推理；模型空闲超时后由服务释放
+            service = get_bg_remove_service(state.request.bg_rm_model)
+            targets = [
+                item for item in state.fig_mask
+                if item.get('type') in ['image', 'table'] and item.get('img_path')
+            ]
+            results = await asyncio.to_thread(
+                service.remove_many,
+                [{"image_path": item['img_path'], "output_dir": str(icons_dir)} for item in targets],
+            )
+            for item, output_path in zip(targets, results.values()):
+                if output_path:
+                    item['img_path'] = output_path
+                    log.info(f"[figure_icon_bg_remover] background removed: {output_path}")
+                else:
+                    log.warning(f"[figure_icon_bg_remover] bg remove failed for {item.get('img_path')}")
+
+            log.info(f"[figure_icon_bg_remover] processed image/table elements: {len(targets)}")
 
         except Exception as e:
             log.error(f"[figure_icon_bg_remover] Critical Failure, skipping bg removal: {e}")
@@ -7,6 +7,7 @@ import time
 from pathlib import Path
 from typing import Any, Dict, List, Optional, Tuple, Union
 
+from dataflow_agent.graphbuilder.checkpoint import PageResultLedger, page_fingerprint
 from dataflow_agent.graphbuilder.graph_builder import GenericGraphBuilder
 from dataflow_agent.logger import get_logger
 from dataflow_agent.state import Paper2FigureState
@@ -235,7 +236,7 @@ def create_paper2ppt_parallel_graph() -> GenericGraphBuilder:  # noqa: N802
     - 若 state.gen_down == False：批量生成/编辑每页 PPT 图，保存到统一目录
     - 若 state.gen_down == True：按 0-based edit_page_num 对已有页面图做二次编辑（edit_page_prompt）
     """
-    builder = GenericGraphBuilder(state_model=Paper2FigureState, entry_point="_start_")
+    builder = GenericGraphBuilder(state_model=Paper2FigureState, entry_point="_start_").enable_checkpoint()
 
     def _start_(state: Paper2FigureState) -> Paper2FigureState:
         _ensure_result_path(state)
@@ -301,8 +302,22 @@ def create_paper2ppt_parallel_graph() -> GenericGraphBuilder:  # noqa: N802
         # 清空旧数据（避免重复执行堆积）
         state.generated_pages = []
         
-        # 定义单个页面处理任务
+        # 逐页结果台账：重跑时复用已成功的页，只重新生成失败的页
+        ledger = PageResultLedger(str(result_root), "generate_pages")
+
         async def _process_single_page(idx: int, item: Any) -> Dict[str, Any]:
+            fingerprint = page_fingerprint(item, style, aspect_ratio, state.request.gen_fig_model)
+            cached = ledger.get(idx, fingerprint)
+            if cached and cached.get("generated_img_path") and os.path.exists(cached["generated_img_path"]):
+                log.info(f"[paper2ppt] page={idx} 复用上次已生成的页面: {cached['generated_img_path']}")
+                return cached
+            res = await _generate_single_page(idx, item)
+            if res.get("generated_img_path"):
+                ledger.put(idx, fingerprint, res)
+            return res
+
+        # 定义单个页面处理任务
+        async def _generate_single_page(idx: int, item: Any) -> Dict[str, Any]:
             """
             处理单个页面：返回生成的 result item (dict)。
             如果失败，result item 中的 generated_img_path 为 None。
@@ -7,6 +7,7 @@ import time
 from pathlib import Path
 from typing import Any, Dict, List, Optional, Tuple, Union
 
+from dataflow_agent.graphbuilder.checkpoint import PageResultLedger, page_fingerprint
 from dataflow_agent.graphbuilder.graph_builder import GenericGraphBuilder
 from dataflow_agent.logger import get_logger
 from dataflow_agent.state import Paper2FigureState
@@ -210,7 +211,7 @@ def create_paper2ppt_parallel_consistent_graph() -> GenericGraphBuilder:  # noqa
       - 原本是 Text2Img 的页面 -> 改为 Img2Img (img0 as base)
       - 原本是 Img2Img (有素材) 的页面 -> 改为 Multi-Image Edit (img0 + asset)
     """
-    builder = GenericGraphBuilder(state_model=Paper2FigureState, entry_point="_start_")
+    builder = GenericGraphBuilder(state_model=Paper2FigureState, entry_point="_start_").enable_checkpoint()
 
     def _start_(state: Paper2FigureState) -> Paper2FigureState:
         _ensure_result_path(state)
@@ -275,8 +276,28 @@ def create_paper2ppt_parallel_consistent_graph() -> GenericGraphBuilder:  # noqa
             else:
                 log.info(f"[paper2ppt] Using user-provided ref_img: {user_ref_img}")
 
-        # 定义通用的单页处理函数，增加 ref_img_path 参数
+        # 逐页结果台账：重跑时复用已成功的页，只重新生成失败的页
+        ledger = PageResultLedger(str(result_root), "generate_pages")
+
         async def _process_single_page(
+            idx: int,
+            item: Any,
+            ref_img_path: Optional[str] = None
+        ) -> Dict[str, Any]:
+            fingerprint = page_fingerprint(
+                item, style, aspect_ratio, image_resolution, state.request.gen_fig_model, ref_img_path
+            )
+            cached = ledger.get(idx, fingerprint)
+            if cached and cached.get("generated_img_path") and os.path.exists(cached["generated_img_path"]):
+                log.info(f"[paper2ppt] page={idx} 复用上次已生成的页面: {cached['generated_img_path']}")
+                return cached
+            res = await _generate_single_page(idx, item, ref_img_path=ref_img_path)
+            if res.get("generated_img_path"):
+                ledger.put(idx, fingerprint, res)
+            return res
+
+        # 定义通用的单页处理函数，增加 ref_img_path 参数
+        async def _generate_single_page(
             idx: int, 
             item: Any, 
             ref_img_path: Optional[str] = None
@@ -9,13 +9,15 @@ Optimized version of pdf2ppt_parallel:
     -   Samples text color from the original image.
     -   Auto-centers titles.
     -   Calculates optimal font size.
+4.  **Page Pipeline**: pages stream through page_pipeline (render -> MinerU / SAM -> bg-remove /
+    AI background, each stage with its own worker limit) and slides are assembled in page order.
 """
 
 from __future__ import annotations
 import os
 import asyncio
 from pathlib import Path
-from typing import List, Dict, Any, Optional
+from typing import Iterable, List, Dict, Any, Optional
 from collections import Counter
 import copy
 import time
@@ -35,11 +37,18 @@ from dataflow_agent.state import Paper2FigureState
 from dataflow_agent.utils import get_project_root, pixels_to_inches, calculate_font_size
 
 # Tools
-from dataflow_agent.toolkits.multimodaltool.sam_tool import segment_layout_boxes, segment_layout_boxes_server, free_sam_model
-from dataflow_agent.toolkits.multimodaltool.bg_tool import local_tool_for_bg_remove, free_bg_rm_model
-from dataflow_agent.toolkits.multimodaltool.mineru_tool import recursive_mineru_layout
 from dataflow_agent.toolkits.multimodaltool.req_img import generate_or_edit_and_save_image_async
 from dataflow_agent.toolkits.multimodaltool import ppt_tool
+from dataflow_agent.toolkits.multimodaltool.page_pipeline import (
+    PageContext,
+    PagePipeline,
+    PageStage,
+    bg_remove_page,
+    mineru_page,
+    release_models,
+    sam_page,
+    workers_from_env,
+)
 
 from pptx import Presentation
 from pptx.util import Inches, Pt
@@ -133,72 +142,6 @@ def _ensure_result_path(state: Paper2FigureState) -> str:
     state.result_path = str(base_dir)
     return state.result_path
 
-def _run_sam_on_pages(image_paths: List[str], base_dir: str) -> List[Dict[str, Any]]:
-    results: List[Dict[str, Any]] = []
-    sam_ckpt = f"{get_project_root()}/sam_b.pt"
-
-    for page_idx, img_path in enumerate(image_paths):
-        img_path_obj = Path(img_path)
-        if not img_path_obj.exists():
-            log.warning(f"[pdf2ppt_opt] image not found for SAM: {img_path}")
-            results.append({"page_idx": page_idx, "layout_items": []})
-            continue
-
-        out_dir = Path(base_dir) / "layout_items" / f"page_{page_idx+1:03d}"
-        out_dir.mkdir(parents=True, exist_ok=True)
-
-        try:
-            layout_items = segment_layout_boxes_server(
-                image_path=str(img_path_obj),
-                output_dir=str(out_dir),
-                server_urls=SAM_SERVER_URLS,
-                checkpoint=sam_ckpt,
-                min_area=200,
-                min_score=0.0,
-                iou_threshold=0.4,
-                top_k=25,
-                nms_by="mask",
-            )
-        except Exception as e:
-            log.error(f"[pdf2ppt_opt] Remote SAM failed: {e}. Fallback to local.")
-            layout_items = segment_layout_boxes(
-                image_path=str(img_path_obj),
-                output_dir=str(out_dir),
-                checkpoint=sam_ckpt,
-                min_area=200,
-                min_score=0.0,
-                iou_threshold=0.4,
-                top_k=25,
-                nms_by="mask",
-            )
-            
-        try:
-            pil_img = Image.open(str(img_path_obj))
-            w, h = pil_img.size
-        except Exception as e:
-            log.error(f"[pdf2ppt_opt][page#{page_idx+1}] open image failed: {e}")
-            w, h = 1024, 768
-
-        for it in layout_items:
-            bbox = it.get("bbox")
-            if bbox and len(bbox) == 4:
-                x1n, y1n, x2n, y2n = bbox
-                x1 = int(round(x1n * w))
-                y1 = int(round(y1n * h))
-                x2 = int(round(x2n * w))
-                y2 = int(round(y2n * h))
-                if x2 > x1 and y2 > y1:
-                    it["bbox_px"] = [x1, y1, x2, y2]
-
-        results.append({"page_idx": page_idx, "layout_items": layout_items})
-
-    try:
-        free_sam_model(checkpoint=sam_ckpt)
-    except Exception as e:
-        log.error(f"[pdf2ppt_opt] free_sam_model failed: {e}")
-
-    return results
-
 # ==============================================================================
 # Helper Functions for PPT Generation
 # ==============================================================================
@@ -529,6 +472,20 @@ def _add_smart_textbox(
     elif text_level == 2:
         p.font.bold = True
 
+async def _call_image_api_with_retry(coro_factory, retries: int = 3, delay: float = 1.0) -> bool:
+    last_err = None
+    for attempt in range(1, retries + 1):
+        try:
+            await coro_factory()
+            return True
+        except Exception as e:
+            last_err = e
+            log.error(f"[pdf2ppt_opt] image api failed attempt {attempt}/{retries}: {e}")
+            await asyncio.sleep(delay)
+    log.error(f"[pdf2ppt_opt] image api failed after {retries} attempts: {last_err}")
+    return False
+
+
 @register("pdf2ppt_optimized")
 def create_pdf2ppt_optimized_graph() -> GenericGraphBuilder:
     builder = GenericGraphBuilder(state_model=Paper2FigureState, entry_point="_start_")
@@ -537,186 +494,33 @@ def create_pdf2ppt_optimized_graph() -> GenericGraphBuilder:
         _ensure_result_path(state)
         return state
 
-    async def pdf_to_images_node(state: Paper2FigureState) -> Paper2FigureState:
+    def _page_source(state: Paper2FigureState, base_dir: Path) -> Iterable[str]:
         if state.request.input_type == "FIGURE":
             img_path = state.request.input_content
             # 强制开启 AI 编辑，以便在转 PPT 过程中去除背景文字
             state.use_ai_edit = True
             if img_path and os.path.exists(img_path):
-                state.slide_images = [img_path]
-            return state
+                return [img_path]
+            return []
 
         pdf_path = getattr(state, "pdf_file", None)
         if not pdf_path:
             log.error("[pdf2ppt_opt] state.pdf_file is empty")
-            return state
-
-        base_dir = Path(_ensure_result_path(state))
-        img_dir = base_dir / "slides_png"
-        image_paths = ppt_tool.pdf_to_images(pdf_path, str(img_dir))
-        state.slide_images = image_paths
-        return state
-
-    # --- Reused Nodes Logic from parallel wf ---
-    
-    async def slides_mineru_node(state: Paper2FigureState) -> Paper2FigureState:
-        image_paths: List[str] = getattr(state, "slide_images", []) or []
-        base_dir = Path(_ensure_result_path(state))
-        mineru_dir = base_dir / "mineru_pages"
-        mineru_dir.mkdir(parents=True, exist_ok=True)
-        port = getattr(getattr(state, "request", None), "mineru_port", 8010)
-
-        mineru_pages: List[Dict[str, Any]] = []
-
-        for page_idx, img_path in enumerate(image_paths):
-            try:
-                out_dir = mineru_dir / f"page_{page_idx+1:03d}"
-                out_dir.mkdir(parents=True, exist_ok=True)
-                
-                mineru_items = await recursive_mineru_layout(
-                    image_path=str(img_path),
-                    port=port,
-                    max_depth=3,
-                    output_dir=str(out_dir),
-                )
-                mineru_pages.append({
-                    "page_idx": page_idx,
-                    "blocks": mineru_items,
-                    "path": img_path,
-                    "mineru_output_dir": str(out_dir)
-                })
-            except Exception as e:
-                log.error(f"[pdf2ppt_opt][MinerU] page#{page_idx+1} failed: {e}")
-                mineru_pages.append({
-                    "page_idx": page_idx,
-                    "blocks": [],
-                    "path": img_path,
-                })
-
-        state.mineru_pages = mineru_pages
-        return state
-
-    async def slides_sam_node(state: Paper2FigureState) -> Paper2FigureState:
-        image_paths: List[str] = getattr(state, "slide_images", []) or []
-        base_dir = _ensure_result_path(state)
-        sam_pages = await asyncio.to_thread(_run_sam_on_pages, image_paths, base_dir)
-        state.sam_pages = sam_pages
-        return state
-
-    async def slides_layout_bg_remove_node(state: Paper2FigureState, sam_pages: List[Dict[str, Any]] = None) -> Paper2FigureState:
-        if sam_pages is None:
-            sam_pages = getattr(state, "sam_pages", []) or []
-        
-        base_dir = Path(_ensure_result_path(state))
-        icons_dir = base_dir / "sam_icons"
-        icons_dir.mkdir(parents=True, exist_ok=True)
-        model_path = getattr(getattr(state, "request", None), "bg_rm_model", None)
-
-        def _sync_bg_remove():
-            processed = 0
-            for p in sam_pages:
-                page_idx = p.get("page_idx", 0)
-                for it in p.get("layout_items", []):
-                    png_path = it.get("png_path")
-                    if not png_path or not os.path.exists(png_path): continue
-                    
-                    try:
-                        original_stem = Path(png_path).stem
-                        output_filename = f"page_{page_idx+1:03d}_{original_stem}_bg_removed.png"
-                        output_path = icons_dir / output_filename
-                        
-                        req = {"image_path": png_path, "output_dir": str(icons_dir)}
-                        if model_path: req["model_path"] = model_path
-                        
-                        fg_path = local_tool_for_bg_remove(req)
-                        
-                        if fg_path and os.path.exists(fg_path):
-                            fg_path_obj = Path(fg_path)
-                            if fg_path_obj.name != output_filename:
-                                new_fg_path = fg_path_obj.parent / output_filename
-                                fg_path_obj.rename(new_fg_path)
-                                fg_path = str(new_fg_path)
-                            it["fg_png_path"] = fg_path
-                        else:
-                            it["fg_png_path"] = png_path
-                        processed += 1
-                    except Exception as e:
-                        log.error(f"[pdf2ppt_opt][bg_rm] failed for {png_path}: {e}")
-                        it["fg_png_path"] = png_path
-
-            try:
-                if model_path: free_bg_rm_model(model_path=model_path)
-            except Exception: pass
-            return processed
-
-        await asyncio.to_thread(_sync_bg_remove)
-        state.sam_pages = sam_pages
-        return state
-
-    async def parallel_processing_node(state: Paper2FigureState) -> Paper2FigureState:
-        import copy
-        import time
-        
-        start_time = time.time()
-        
-        async def mineru_branch():
-            branch_state = copy.copy(state)
-            result = await slides_mineru_node(branch_state)
-            return ("mineru", result)
-        
-        async def sam_branch():
-            branch_state = copy.copy(state)
-            branch_state = await slides_sam_node(branch_state)
-            sam_pages = getattr(branch_state, "sam_pages", [])
-            branch_state = await slides_layout_bg_remove_node(branch_state, sam_pages=sam_pages)
-            return ("sam", branch_state)
-        
-        results = await asyncio.gather(mineru_branch(), sam_branch(), return_exceptions=True)
-        
-        for r in results:
-            if isinstance(r, Exception):
-                log.error(f"[pdf2ppt_opt] Branch failed: {r}")
-                continue
-            
-            branch_name, branch_state = r
-            if branch_name == "mineru":
-                state.mineru_pages = getattr(branch_state, "mineru_pages", None)
-            elif branch_name == "sam":
-                state.sam_pages = getattr(branch_state, "sam_pages", None)
-        
-        log.info(f"[pdf2ppt_opt] Parallel processing done in {time.time() - start_time:.2f}s")
-        return state
+            return []
+        return ppt_tool.iter_pdf_pages(pdf_path, str(base_dir / "slides_png"))
 
-    async def slides_ppt_generation_node(state: Paper2FigureState) -> Paper2FigureState:
+    async def page_pipeline_node(state: Paper2FigureState) -> Paper2FigureState:
         """
         Final PPT Generation using Hybrid Logic + Dynamic Sizing + Smart Style
+
+        逐页流水线：渲染 → MinerU / SAM→抠图 / AI 去字背景（三者并发）→ 按页序组装幻灯片。
         """
-        # Helper: API Retry
-        async def _call_image_api_with_retry(coro_factory, retries: int = 3, delay: float = 1.0) -> bool:
-            last_err = None
-            for attempt in range(1, retries + 1):
-                try:
-                    await coro_factory()
-                    return True
-                except Exception as e:
-                    last_err = e
-                    log.error(f"[pdf2ppt_opt] image api failed attempt {attempt}/{retries}: {e}")
-                    await asyncio.sleep(delay)
-            log.error(f"[pdf2ppt_opt] image api failed after {retries} attempts: {last_err}")
-            return False
-
-        sam_pages = getattr(state, "sam_pages", []) or []
-        mineru_pages = getattr(state, "mineru_pages", []) or []
-        
-        if not mineru_pages:
-            log.error("[pdf2ppt_opt] No MinerU pages found! Aborting.")
-            return state
+        base_dir = Path(_ensure_result_path(state))
+        pages = _page_source(state, base_dir)
 
-        # Create dict indices
-        sam_dict = {p.get("page_idx"): p for p in sam_pages}
-        
-        # Determine PPT size from first image
-        first_img_path = getattr(state, "slide_images", [])[0] if getattr(state, "slide_images", []) else None
+        port = getattr(getattr(state, "request", None), "mineru_port", 8010)
+        model_path = getattr(getattr(state, "request", None), "bg_rm_model", None)
+        sam_ckpt = f"{get_project_root()}/sam_b.pt"
 
         prs = Presentation()
 
@@ -749,66 +553,42 @@ def create_pdf2ppt_optimized_graph() -> GenericGraphBuilder:
         # FIGURE 模式下，后面 _map_bbox_px 会把原图 contain 到该画布；
         # 非 FIGURE 模式，我们会拉伸映射 (Stretch) 以匹配背景的填充方式。
 
-        base_dir = Path(_ensure_result_path(state))
-
-        # --- Pre-Phase: AI Background Generation ---
+        # --- AI Background Generation（不依赖版面分析，与 MinerU / SAM 并发执行）---
         use_ai_bg = bool(getattr(state, "use_ai_edit", False))
-        page_bg_map = {} # page_idx -> bg_path
-        ai_coroutines = []
-        
+        req_cfg = getattr(state, "request", None) or {}
+        if not isinstance(req_cfg, dict):
+            req_cfg = req_cfg.__dict__ if hasattr(req_cfg, "__dict__") else {}
+        api_key = req_cfg.get("api_key") or os.getenv("DF_API_KEY")
+        api_url = req_cfg.get("chat_api_url") or "https://api.apiyi.com"
+        model_name = req_cfg.get("gen_fig_model") or "gemini-3-pro-image-preview"
         if use_ai_bg:
-            log.info(f"[pdf2ppt_opt] AI Edit Enabled. Preparing background cleaning tasks...")
-            masks_dir = base_dir / "masks"
-            masks_dir.mkdir(parents=True, exist_ok=True)
+            log.info(f"[pdf2ppt_opt] AI Edit Enabled. Background cleaning runs per page in the pipeline.")
+            if not api_key:
+                log.warning("[pdf2ppt_opt] use_ai_edit is True but no API Key found.")
+
+        async def _clean_background(ctx: PageContext) -> Optional[str]:
+            if not use_ai_bg or not api_key or not os.path.exists(ctx.img_path):
+                return None
             bg_dir = base_dir / "clean_backgrounds"
             bg_dir.mkdir(parents=True, exist_ok=True)
-            
-            # API Config
-            req_cfg = getattr(state, "request", None) or {}
-            if not isinstance(req_cfg, dict):
-                req_cfg = req_cfg.__dict__ if hasattr(req_cfg, "__dict__") else {}
-            api_key = req_cfg.get("api_key") or os.getenv("DF_API_KEY")
-            api_url = req_cfg.get("chat_api_url") or "https://api.apiyi.com"
-            model_name = req_cfg.get("gen_fig_model") or "gemini-3-pro-image-preview"
-            
-            if api_key:
-                for page_data in mineru_pages:
-                    page_idx = page_data.get("page_idx", 0)
-                    img_path = page_data.get("path")
-                    if not img_path or not os.path.exists(img_path):
-                        continue
-
-                    try:
-                        clean_bg_path = bg_dir / f"clean_bg_{page_idx+1:03d}.png"
-                        page_bg_map[page_idx] = str(clean_bg_path)
-
-                        # New Prompt: Single Image Edit
-                        prompt = "Remove all text from the image, keeping only the background, figures, and icons. Do not change the layout or style. 去除文字，只保留底色 图像 图标"
-
-                        async def _run_ai(ip=img_path, op=str(clean_bg_path)):
-                            await _call_image_api_with_retry(
-                                lambda: generate_or_edit_and_save_image_async(
-                                    prompt=prompt,
-                                    image_path=ip,
-                                    save_path=op,
-                                    api_url=api_url,
-                                    api_key=api_key,
-                                    model=model_name,
-                                    use_edit=True,
-                                    resolution="2K",
-                                    timeout=300,
-                                )
-                            )
-
-                        ai_coroutines.append(_run_ai())
-                    except Exception as e:
-                        log.error(f"[pdf2ppt_opt] AI Edit setup failed page#{page_idx}: {e}")
-
-                if ai_coroutines:
-                    log.info(f"[pdf2ppt_opt] Waiting for {len(ai_coroutines)} AI tasks...")
-                    await asyncio.gather(*ai_coroutines, return_exceptions=True)
-            else:
-                log.warning("[pdf2ppt_opt] use_ai_edit is True but no API Key found.")
+            clean_bg_path = bg_dir / f"clean_bg_{ctx.page_idx+1:03d}.png"
+
+            # New Prompt: Single Image Edit
+            prompt = "Remove all text from the image, keeping only the background, figures, and icons. Do not change the layout or style. 去除文字，只保留底色 图像 图标"
+            await _call_image_api_with_retry(
+                lambda: generate_or_edit_and_save_image_async(
+                    prompt=prompt,
+                    image_path=ctx.img_path,
+                    save_path=str(clean_bg_path),
+                    api_url=api_url,
+                    api_key=api_key,
+                    model=model_name,
+                    use_edit=True,
+                    resolution="2K",
+                    timeout=300,
+                )
+            )
+            return str(clean_bg_path)
 
         # Coordinate mapping:
         # - non-FIGURE (PDF): Stretch mapping (匹配背景的拉伸填充)
@@ -843,13 +623,14 @@ def create_pdf2ppt_optimized_graph() -> GenericGraphBuilder:
                     int(round(y2 * s + dy)),
                 ]
 
-        for page_data in mineru_pages:
-            page_idx = page_data.get("page_idx", 0)
+        def _assemble(ctx: PageContext) -> None:
+            page_idx = ctx.page_idx
+            page_data = ctx.get("mineru") or {}
             mineru_blocks = page_data.get("blocks", [])
-            img_path = page_data.get("path")
-            
-            # Get corresponding SAM data
-            sam_data = sam_dict.get(page_idx, {})
+            img_path = ctx.img_path
+
+            # Get corresponding SAM data（抠图完成时优先用带 fg_png_path 的结果）
+            sam_data = ctx.get("bg_remove") or ctx.get("sam") or {}
             sam_items = sam_data.get("layout_items", [])
 
             slide = prs.slides.add_slide(prs.slide_layouts[6]) # Blank
@@ -863,7 +644,7 @@ def create_pdf2ppt_optimized_graph() -> GenericGraphBuilder:
                 pass
 
             # --- 1. Background ---
-            clean_bg = page_bg_map.get(page_idx)
+            clean_bg = ctx.get("clean_bg")
             if clean_bg and os.path.exists(clean_bg):
                 try:
                     # In FIGURE mode we also want the background to be scaled+centered into canvas,
@@ -1055,6 +836,48 @@ def create_pdf2ppt_optimized_graph() -> GenericGraphBuilder:
                         fitter_dpi=96,
                     )
 
+
+        stages = [
+            PageStage(
+                "mineru",
+                lambda ctx: mineru_page(ctx.img_path, ctx.page_idx, str(base_dir), port, max_depth=3, tag="pdf2ppt_opt"),
+                workers=4,
+            ),
+            PageStage(
+                "sam",
+                lambda ctx: sam_page(
+                    ctx.img_path, ctx.page_idx, str(base_dir), SAM_SERVER_URLS, sam_ckpt, top_k=25, tag="pdf2ppt_opt"
+                ),
+                workers=len(SAM_SERVER_URLS),
+                blocking=True,
+            ),
+            PageStage(
+                "bg_remove",
+                lambda ctx: bg_remove_page(ctx.get("sam"), str(base_dir), model_path, tag="pdf2ppt_opt"),
+                workers=4,
+                after=("sam",),
+                blocking=True,
+            ),
+            PageStage("clean_bg", _clean_background, workers=3),
+        ]
+        pipeline = PagePipeline(
+            stages,
+            workers=workers_from_env({s.name: s.workers for s in stages}),
+            name="pdf2ppt_opt",
+        )
+        try:
+            contexts = await pipeline.run(pages, on_page=_assemble)
+        finally:
+            release_models(sam_ckpt, tag="pdf2ppt_opt")
+
+        state.slide_images = [ctx.img_path for ctx in contexts]
+        state.mineru_pages = [ctx.get("mineru") for ctx in contexts if ctx.get("mineru")]
+        state.sam_pages = [ctx.get("bg_remove") or ctx.get("sam") for ctx in contexts if ctx.get("sam")]
+
+        if not contexts:
+            log.error("[pdf2ppt_opt] No slide images found! Aborting.")
+            return state
+
         # Save PPT
         ppt_path = base_dir / "pdf2ppt_optimized_output.pptx"
         prs.save(str(ppt_path))
@@ -1065,18 +888,14 @@ def create_pdf2ppt_optimized_graph() -> GenericGraphBuilder:
 
     nodes = {
         "_start_": _init_result_path,
-        "pdf_to_images": pdf_to_images_node,
-        "parallel_processing": parallel_processing_node,
-        "slides_ppt_generation": slides_ppt_generation_node,
+        "page_pipeline": page_pipeline_node,
         "_end_": lambda state: state,
     }
 
     edges = [
-        ("pdf_to_images", "parallel_processing"),
-        ("parallel_processing", "slides_ppt_generation"),
-        ("slides_ppt_generation", "_end_"),
+        ("page_pipeline", "_end_"),
     ]
 
     builder.add_nodes(nodes).add_edges(edges)
-    builder.add_edge("_start_", "pdf_to_images")
+    builder.add_edge("_start_", "page_pipeline")
     return builder
@@ -11,13 +11,16 @@ pdf2ppt_qwenvl workflow
    - 调用 Inpainting API：填补 mask 之后的白色区域，结合背景颜色做 Inpainting
 6. 智能合并与 PPT 生成：
    - 结合 MinerU (版面), SAM (图标), VLM (文字) 结果生成 PPT。
+
+执行方式：page_pipeline 逐页流水线，各阶段独立限流（DF_PDF2PPT_WORKERS 可覆盖），
+幻灯片按页序在页面完成时组装。
 """
 
 from __future__ import annotations
 import os
 import asyncio
 from pathlib import Path
-from typing import List, Dict, Any, Optional
+from typing import Iterable, List, Dict, Any, Optional
 from collections import Counter
 import copy
 
@@ -36,11 +39,18 @@ from dataflow_agent.utils import get_project_root
 from dataflow_agent.agentroles import create_vlm_agent
 
 # Tools
-from dataflow_agent.toolkits.multimodaltool.sam_tool import segment_layout_boxes, segment_layout_boxes_server, free_sam_model
-from dataflow_agent.toolkits.multimodaltool.bg_tool import local_tool_for_bg_remove, free_bg_rm_model
-from dataflow_agent.toolkits.multimodaltool.mineru_tool import recursive_mineru_layout
 from dataflow_agent.toolkits.multimodaltool.req_img import generate_or_edit_and_save_image_async
 from dataflow_agent.toolkits.multimodaltool import ppt_tool
+from dataflow_agent.toolkits.multimodaltool.page_pipeline import (
+    PageContext,
+    PagePipeline,
+    PageStage,
+    bg_remove_page,
+    mineru_page,
+    release_models,
+    sam_page,
+    workers_from_env,
+)
 
 from pptx import Presentation
 from pptx.util import Inches, Pt
@@ -112,103 +122,6 @@ def _ensure_result_path(state: Paper2FigureState) -> str:
     state.result_path = str(base_dir)
     return state.result_path
 
-def _process_single_sam_page(page_idx: int, img_path: str, base_dir: str) -> Dict[str, Any]:
-    sam_ckpt = f"{get_project_root()}/sam_b.pt"
-    log.info(f"[pdf2ppt_qwenvl][SAM] processing page#{page_idx+1}: {img_path}")
-    img_path_obj = Path(img_path)
-    if not img_path_obj.exists():
-        log.warning(f"[pdf2ppt_qwenvl][SAM] page#{page_idx+1} image not found")
-        return {"page_idx": page_idx, "layout_items": []}
-
-    out_dir = Path(base_dir) / "layout_items" / f"page_{page_idx+1:03d}"
-    out_dir.mkdir(parents=True, exist_ok=True)
-
-    layout_items = []
-    try:
-        # 尝试远程调用，增加显式日志
-        log.info(f"[pdf2ppt_qwenvl][SAM] page#{page_idx+1} calling segment_layout_boxes_server urls={SAM_SERVER_URLS}")
-        layout_items = segment_layout_boxes_server(
-            image_path=str(img_path_obj),
-            output_dir=str(out_dir),
-            server_urls=SAM_SERVER_URLS,
-            checkpoint=sam_ckpt,
-            min_area=200,
-            min_score=0.0,
-            iou_threshold=0.4,
-            top_k=15,
-            nms_by="mask",
-        )
-        log.info(f"[pdf2ppt_qwenvl][SAM] page#{page_idx+1} server returned {len(layout_items)} items")
-    except Exception as e:
-        log.error(f"[pdf2ppt_qwenvl][SAM] page#{page_idx+1} Remote SAM failed: {e}. Fallback to local.")
-        try:
-            layout_items = segment_layout_boxes(
-                image_path=str(img_path_obj),
-                output_dir=str(out_dir),
-                checkpoint=sam_ckpt,
-                min_area=200,
-                min_score=0.0,
-                iou_threshold=0.4,
-                top_k=15,
-                nms_by="mask",
-            )
-            log.info(f"[pdf2ppt_qwenvl][SAM] page#{page_idx+1} local SAM returned {len(layout_items)} items")
-        except Exception as e_local:
-             log.error(f"[pdf2ppt_qwenvl][SAM] page#{page_idx+1} Local SAM failed: {e_local}")
-             layout_items = []
-        
-    try:
-        pil_img = Image.open(str(img_path_obj))
-        w, h = pil_img.size
-    except Exception:
-        w, h = 1024, 768
-
-    for it in layout_items:
-        bbox = it.get("bbox")
-        if bbox and len(bbox) == 4:
-            x1n, y1n, x2n, y2n = bbox
-            x1 = int(round(x1n * w))
-            y1 = int(round(y1n * h))
-            x2 = int(round(x2n * w))
-            y2 = int(round(y2n * h))
-            if x2 > x1 and y2 > y1:
-                it["bbox_px"] = [x1, y1, x2, y2]
-
-    return {"page_idx": page_idx, "layout_items": layout_items}
-
-def _run_sam_on_pages(image_paths: List[str], base_dir: str) -> List[Dict[str, Any]]:
-    from concurrent.futures import ThreadPoolExecutor, as_completed
-    
-    results: List[Dict[str, Any]] = []
-    # 限制并发数
-    max_workers = min(len(image_paths), 6)
-    
-    log.info(f"[pdf2ppt_qwenvl][SAM] starting parallel processing with {max_workers} workers")
-    
-    with ThreadPoolExecutor(max_workers=max_workers) as executor:
-        future_to_idx = {
-            executor.submit(_process_single_sam_page, idx, path, base_dir): idx 
-            for idx, path in enumerate(image_paths)
-        }
-        
-        for future in as_completed(future_to_idx):
-            try:
-                res = future.result()
-                results.append(res)
-            except Exception as e:
-                idx = future_to_idx[future]
-                log.error(f"[pdf2ppt_qwenvl][SAM] page#{idx+1} task exception: {e}")
-                results.append({"page_idx": idx, "layout_items": []})
-
-    # 清理本地可能加载的模型
-    sam_ckpt = f"{get_project_root()}/sam_b.pt"
-    try:
-        free_sam_model(checkpoint=sam_ckpt)
-    except Exception:
-        pass
-
-    return sorted(results, key=lambda x: x["page_idx"])
-
 @register("pdf2ppt_qwenvl")
 def create_pdf2ppt_qwenvl_graph() -> GenericGraphBuilder:
     """
@@ -220,39 +133,43 @@ def create_pdf2ppt_qwenvl_graph() -> GenericGraphBuilder:
         _ensure_result_path(state)
         return state
 
-    async def pdf_to_images_node(state: Paper2FigureState) -> Paper2FigureState:
+    def _page_source(state: Paper2FigureState, base_dir: Path) -> Iterable[str]:
         if state.request.input_type == "FIGURE":
             img_path = state.request.input_content
             log.info(f"[pdf2ppt_qwenvl] FIGURE mode: using input image {img_path}")
             state.use_ai_edit = True
             if img_path and os.path.exists(img_path):
-                state.slide_images = [img_path]
-            else:
-                log.error(f"[pdf2ppt_qwenvl] FIGURE mode: image not found {img_path}")
-            return state
+                return [img_path]
+            log.error(f"[pdf2ppt_qwenvl] FIGURE mode: image not found {img_path}")
+            return []
 
         pdf_path = getattr(state, "pdf_file", None)
         if not pdf_path:
             log.error("[pdf2ppt_qwenvl] state.pdf_file is empty")
-            return state
-
-        base_dir = Path(_ensure_result_path(state))
-        img_dir = base_dir / "slides_png"
-        image_paths = ppt_tool.pdf_to_images(pdf_path, str(img_dir))
-        state.slide_images = image_paths
-        return state
+            return []
+        return ppt_tool.iter_pdf_pages(pdf_path, str(base_dir / "slides_png"))
 
-    # --- 新增：VLM 节点 (替代原 OCR) ---
-    async def vlm_recognition_node(state: Paper2FigureState) -> Paper2FigureState:
+    async def page_pipeline_node(state: Paper2FigureState) -> Paper2FigureState:
         """
-        使用 VLM (ImageTextBBoxAgent) 提取文本和 bbox。
-        结果写入 state.vlm_pages。
+        逐页流水线，每页独立地经过：
+        1. VLM (ImageTextBBoxAgent) 文字识别与定位 → AI Inpainting 去字背景
+        2. MinerU 版面分析
+        3. SAM 图标分割 → 背景抠图
+        三条分支按页并发，页面完成后按页序整合 VLM / MinerU / SAM 结果组装幻灯片。
         """
-        image_paths: List[str] = getattr(state, "slide_images", []) or []
-        if not image_paths:
-            log.warning("[pdf2ppt_qwenvl][vlm] no slide_images")
-            state.vlm_pages = []
-            return state
+        base_dir = Path(_ensure_result_path(state))
+        pages = _page_source(state, base_dir)
+
+        port = getattr(getattr(state, "request", None), "mineru_port", 8010)
+        model_path = getattr(getattr(state, "request", None), "bg_rm_model", None)
+        sam_ckpt = f"{get_project_root()}/sam_b.pt"
+
+        # API 配置
+        req_cfg = getattr(state, "request", None) or {}
+        if not isinstance(req_cfg, dict): req_cfg = req_cfg.__dict__ if hasattr(req_cfg, "__dict__") else {}
+        api_key = req_cfg.get("api_key") or os.getenv("DF_API_KEY")
+        api_url = req_cfg.get("chat_api_url") or "https://api.apiyi.com"
+        model_name = req_cfg.get("gen_fig_model") or "gemini-3-pro-image-preview"
 
         async def _process_single_image(page_idx: int, img_path: str) -> Dict[str, Any]:
             try:
@@ -377,164 +294,6 @@ def create_pdf2ppt_qwenvl_graph() -> GenericGraphBuilder:
                     "error": str(e)
                 }
 
-        tasks = [_process_single_image(i, p) for i, p in enumerate(image_paths)]
-        results = await asyncio.gather(*tasks)
-        state.vlm_pages = results
-        return state
-
-    async def slides_mineru_node(state: Paper2FigureState) -> Paper2FigureState:
-        """MinerU 版面分析 (并行优化)"""
-        image_paths: List[str] = getattr(state, "slide_images", []) or []
-        log.info(f"[pdf2ppt_qwenvl][MinerU] start, images={len(image_paths)}")
-        if not image_paths:
-            return state
-
-        base_dir = Path(_ensure_result_path(state))
-        mineru_dir = base_dir / "mineru_pages"
-        mineru_dir.mkdir(parents=True, exist_ok=True)
-        port = getattr(getattr(state, "request", None), "mineru_port", 8010)
-
-        async def _process_mineru_page(page_idx: int, img_path: str) -> Dict[str, Any]:
-            try:
-                out_dir = mineru_dir / f"page_{page_idx+1:03d}"
-                out_dir.mkdir(parents=True, exist_ok=True)
-                log.info(f"[pdf2ppt_qwenvl][MinerU] page#{page_idx+1} calling recursive_mineru_layout, port={port}")
-
-                # 加超时保护，避免挂死
-                try:
-                    mineru_items = await asyncio.wait_for(
-                        recursive_mineru_layout(
-                            image_path=str(img_path),
-                            port=port,
-                            max_depth=3,
-                            output_dir=str(out_dir),
-                        ),
-                        timeout=120.0,
-                    )
-                except asyncio.TimeoutError:
-                    log.error(f"[pdf2ppt_qwenvl][MinerU] page#{page_idx+1} MinerU timeout (>120s)")
-                    mineru_items = []
-                except Exception as inner_e:
-                    log.error(f"[pdf2ppt_qwenvl][MinerU] page#{page_idx+1} MinerU exception: {inner_e}")
-                    mineru_items = []
-
-                log.info(f"[pdf2ppt_qwenvl][MinerU] page#{page_idx+1} got {len(mineru_items)} blocks")
-                return {
-                    "page_idx": page_idx,
-                    "blocks": mineru_items,
-                    "path": img_path,
-                    "mineru_output_dir": str(out_dir)
-                }
-            except Exception as e:
-                log.error(f"[pdf2ppt_qwenvl][MinerU] page#{page_idx+1} failed: {e}")
-                return {
-                    "page_idx": page_idx,
-                    "blocks": [],
-                    "path": img_path
-                }
-
-        tasks = [_process_mineru_page(i, p) for i, p in enumerate(image_paths)]
-        results = await asyncio.gather(*tasks, return_exceptions=True)
-
-        # 过滤异常并打印
-        cleaned_results: List[Dict[str, Any]] = []
-        for r in results:
-            if isinstance(r, Exception):
-                log.error(f"[pdf2ppt_qwenvl][MinerU] task exception: {r}")
-                continue
-            cleaned_results.append(r)
-        
-        # 按 page_idx 排序确保顺序
-        state.mineru_pages = sorted(cleaned_results, key=lambda x: x["page_idx"])
-        log.info(f"[pdf2ppt_qwenvl][MinerU] done, pages={len(state.mineru_pages)}")
-        return state
-
-    async def slides_sam_node(state: Paper2FigureState) -> Paper2FigureState:
-        """SAM 图标分割"""
-        image_paths: List[str] = getattr(state, "slide_images", []) or []
-        log.info(f"[pdf2ppt_qwenvl][SAM] start, images={len(image_paths)}")
-        if not image_paths:
-            return state
-        base_dir = _ensure_result_path(state)
-        try:
-            sam_pages = await asyncio.to_thread(_run_sam_on_pages, image_paths, base_dir)
-            log.info(f"[pdf2ppt_qwenvl][SAM] done, pages={len(sam_pages)}")
-        except Exception as e:
-            log.error(f"[pdf2ppt_qwenvl][SAM] SAM processing failed: {e}")
-            sam_pages = []
-        state.sam_pages = sam_pages
-        return state
-
-    async def slides_layout_bg_remove_node(state: Paper2FigureState, sam_pages: List[Dict[str, Any]] = None) -> Paper2FigureState:
-        """SAM 结果背景移除"""
-        if sam_pages is None:
-            sam_pages = getattr(state, "sam_pages", []) or []
-        if not sam_pages:
-            return state
-
-        base_dir = Path(_ensure_result_path(state))
-        icons_dir = base_dir / "sam_icons"
-        icons_dir.mkdir(parents=True, exist_ok=True)
-        model_path = getattr(getattr(state, "request", None), "bg_rm_model", None)
-
-        def _sync_bg_remove():
-            processed = 0
-            for p in sam_pages:
-                page_idx = p.get("page_idx", 0)
-                for it in p.get("layout_items", []):
-                    png_path = it.get("png_path")
-                    if not png_path or not os.path.exists(png_path): continue
-                    
-                    try:
-                        original_stem = Path(png_path).stem
-                        output_filename = f"page_{page_idx+1:03d}_{original_stem}_bg_removed.png"
-                        output_path = icons_dir / output_filename
-                        
-                        req = {"image_path": png_path, "output_dir": str(icons_dir)}
-                        if model_path: req["model_path"] = model_path
-                        
-                        fg_path = local_tool_for_bg_remove(req)
-                        
-                        if fg_path and os.path.exists(fg_path):
-                            fg_path_obj = Path(fg_path)
-                            if fg_path_obj.name != output_filename:
-                                new_fg_path = fg_path_obj.parent / output_filename
-                                fg_path_obj.rename(new_fg_path)
-                                fg_path = str(new_fg_path)
-                            it["fg_png_path"] = fg_path
-                        else:
-                            it["fg_png_path"] = png_path
-                        processed += 1
-                    except Exception:
-                        it["fg_png_path"] = png_path
-            
-            try:
-                if model_path: free_bg_rm_model(model_path=model_path)
-            except Exception: pass
-            return processed
-
-        await asyncio.to_thread(_sync_bg_remove)
-        state.sam_pages = sam_pages
-        return state
-
-    async def slides_inpainting_node(state: Paper2FigureState) -> Paper2FigureState:
-        """AI Inpainting: 填补文字 mask 区域"""
-        vlm_pages = getattr(state, "vlm_pages", []) or []
-        if not vlm_pages:
-            return state
-
-        base_dir = Path(_ensure_result_path(state))
-        
-        # API 配置
-        req_cfg = getattr(state, "request", None) or {}
-        if not isinstance(req_cfg, dict): req_cfg = req_cfg.__dict__ if hasattr(req_cfg, "__dict__") else {}
-        api_key = req_cfg.get("api_key") or os.getenv("DF_API_KEY")
-        api_url = req_cfg.get("chat_api_url") or "https://api.apiyi.com"
-        model_name = req_cfg.get("gen_fig_model") or "gemini-3-pro-image-preview"
-        
-        # 限制并发
-        sem = asyncio.Semaphore(3)
-
         async def _call_image_api_with_retry(coro_factory, retries=3):
             for i in range(retries):
                 try:
@@ -564,20 +323,19 @@ def create_pdf2ppt_qwenvl_graph() -> GenericGraphBuilder:
                 
                 inpainting_prompt = "使用背景颜色，填充图里被mask的白色部分，去掉全部文字！"
                 
-                async with sem:
-                    await _call_image_api_with_retry(
-                        lambda: generate_or_edit_and_save_image_async(
-                            prompt=inpainting_prompt,
-                            save_path=str(clean_bg_path),
-                            api_url=api_url,
-                            api_key=api_key,
-                            model=model_name,
-                            use_edit=True,
-                            image_path=no_text_path,
-                            aspect_ratio=ratio_str,
-                            resolution="2K"
-                        )
+                await _call_image_api_with_retry(
+                    lambda: generate_or_edit_and_save_image_async(
+                        prompt=inpainting_prompt,
+                        save_path=str(clean_bg_path),
+                        api_url=api_url,
+                        api_key=api_key,
+                        model=model_name,
+                        use_edit=True,
+                        image_path=no_text_path,
+                        aspect_ratio=ratio_str,
+                        resolution="2K"
                     )
+                )
             else:
                 # 降级：复制 no_text 图
                 if no_text_path and os.path.exists(no_text_path):
@@ -585,86 +343,10 @@ def create_pdf2ppt_qwenvl_graph() -> GenericGraphBuilder:
                      try: shutil.copy(no_text_path, clean_bg_path)
                      except: pass
 
-        tasks = [_process_inpainting(p) for p in vlm_pages]
-        if tasks:
-            log.info(f"[pdf2ppt_qwenvl][Inpainting] starting {len(tasks)} tasks in parallel with VLM flow")
-            await asyncio.gather(*tasks)
-            
-        return state
-
-    # --- 并行处理节点 ---
-    async def parallel_processing_node(state: Paper2FigureState) -> Paper2FigureState:
-        """
-        并行执行：
-        1. VLM (OCR) -> Inpainting
-        2. MinerU
-        3. SAM + BgRemove
-        """
-        import copy
-        import time
-        start_time = time.time()
-        
-        async def vlm_and_inpainting_branch():
-            branch_state = copy.copy(state)
-            branch_state = await vlm_recognition_node(branch_state)
-            branch_state = await slides_inpainting_node(branch_state)
-            return ("vlm", branch_state)
-        
-        async def mineru_branch():
-            branch_state = copy.copy(state)
-            result = await slides_mineru_node(branch_state)
-            return ("mineru", result)
-        
-        async def sam_branch():
-            branch_state = copy.copy(state)
-            branch_state = await slides_sam_node(branch_state)
-            sam_pages = getattr(branch_state, "sam_pages", [])
-            branch_state = await slides_layout_bg_remove_node(branch_state, sam_pages=sam_pages)
-            return ("sam", branch_state)
-        
-        results = await asyncio.gather(
-            vlm_and_inpainting_branch(),
-            mineru_branch(),
-            sam_branch(),
-            return_exceptions=True
-        )
-
-        log.info(f"[pdf2ppt_qwenvl] parallel branches returned: {results}")
-        
-        for r in results:
-            if isinstance(r, Exception):
-                log.error(f"[pdf2ppt_qwenvl] Branch failed: {r}")
-                continue
-            branch_name, branch_state = r
-            if branch_name == "vlm":
-                state.vlm_pages = getattr(branch_state, "vlm_pages", [])
-            elif branch_name == "mineru":
-                state.mineru_pages = getattr(branch_state, "mineru_pages", [])
-            elif branch_name == "sam":
-                state.sam_pages = getattr(branch_state, "sam_pages", [])
-        
-        log.info(f"[pdf2ppt_qwenvl] Parallel processing finished in {time.time() - start_time:.2f}s")
-        return state
-
-    async def slides_ppt_generation_node(state: Paper2FigureState) -> Paper2FigureState:
-        """
-        生成 PPT：
-        1. 整合 VLM, MinerU, SAM 结果
-        2. 渲染页面 (Inpainting 已经在上一步并行完成)
-        """
-        vlm_pages = getattr(state, "vlm_pages", []) or []
-        sam_pages = getattr(state, "sam_pages", []) or []
-        mineru_pages = getattr(state, "mineru_pages", []) or []
-
-        if not vlm_pages:
-            log.error("[pdf2ppt_qwenvl] no vlm_pages, abort PPT generation")
-            return state
-
-        # Indexing
-        sam_dict = {p.get("page_idx", 0): p.get("layout_items", []) for p in sam_pages}
-        mineru_dict = {}
-        for p in mineru_pages:
-            mineru_dict[p.get("page_idx", 0)] = p
+        async def _inpaint_page(ctx: PageContext) -> Optional[str]:
+            pinfo = ctx.get("vlm") or {}
+            await _process_inpainting(pinfo)
+            return pinfo.get("clean_bg_path")
 
         prs = Presentation()
         prs.slide_width = Inches(ppt_tool.SLIDE_W_IN)
@@ -672,8 +354,6 @@ def create_pdf2ppt_qwenvl_graph() -> GenericGraphBuilder:
         slide_w_emu = prs.slide_width
         slide_h_emu = prs.slide_height
 
-        base_dir = Path(_ensure_result_path(state))
-
         # 辅助几何函数
         def _bbox_area(bbox): return max(0, bbox[2]-bbox[0]) * max(0, bbox[3]-bbox[1])
         def _get_intersection_area(b1, b2):
@@ -683,36 +363,29 @@ def create_pdf2ppt_qwenvl_graph() -> GenericGraphBuilder:
             ia = _bbox_area(inner)
             return (ia > 0) and ((_get_intersection_area(inner, outer) / ia) >= th)
         
-        for pinfo in vlm_pages:
-            page_idx = pinfo.get("page_idx", 0)
-            img_path = pinfo.get("path")
-            vlm_data = pinfo.get("vlm_data", [])
-            # 从 vlm_pages 里获取 clean_bg_path，如果并行步骤成功，这里应该有值
-            clean_bg_path = pinfo.get("clean_bg_path")
 
-            if not img_path or not os.path.exists(img_path): continue
+        def _assemble(ctx: PageContext) -> None:
+            page_idx = ctx.page_idx
+            img_path = ctx.img_path
+            vlm_data = (ctx.get("vlm") or {}).get("vlm_data", [])
+            # Inpainting 阶段生成的纯净背景
+            clean_bg_path = ctx.get("inpaint")
+
+            if not img_path or not os.path.exists(img_path): return
 
             try:
                 pil_img = Image.open(img_path)
                 w0, h0 = pil_img.size
-            except Exception: continue
+            except Exception: return
 
             scale_x = slide_w_emu / w0
             scale_y = slide_h_emu / h0
 
             # 1. MinerU Image Zones
-            mineru_data = mineru_dict.get(page_idx, {})
+            mineru_data = ctx.get("mineru") or {}
             mineru_blocks = mineru_data.get("blocks", [])
             image_zones = []
             
-            sub_images_dir = None
-            if mineru_data.get("mineru_output_dir"):
-                try:
-                    # 简单尝试找 sub_images
-                    possibles = list(Path(mineru_data["mineru_output_dir"]).rglob("sub_images"))
-                    if possibles: sub_images_dir = possibles[0]
-                except Exception: pass
-
             for idx, blk in enumerate(mineru_blocks):
                 btype = (blk.get("type") or "").lower()
                 bbox = blk.get("bbox") # norm
@@ -765,7 +438,7 @@ def create_pdf2ppt_qwenvl_graph() -> GenericGraphBuilder:
                     final_text_lines.append((l_bbox, it.get("text",""), 1.0, l_type, raw_pt))
 
             # 3. SAM Icons Filtering
-            raw_sam = sam_dict.get(page_idx, [])
+            raw_sam = (ctx.get("bg_remove") or ctx.get("sam") or {}).get("layout_items", [])
             final_sam = []
             for item in raw_sam:
                 s_bbox = item.get("bbox_px")
@@ -817,6 +490,51 @@ def create_pdf2ppt_qwenvl_graph() -> GenericGraphBuilder:
                 p.font.bold = (l_type == "title")
                 p.font.color.rgb = RGBColor(0,0,0)
 
+        stages = [
+            PageStage("vlm", lambda ctx: _process_single_image(ctx.page_idx, ctx.img_path), workers=4),
+            PageStage("inpaint", _inpaint_page, workers=3, after=("vlm",)),
+            PageStage(
+                "mineru",
+                lambda ctx: mineru_page(
+                    ctx.img_path, ctx.page_idx, str(base_dir), port, max_depth=3, timeout=120.0, tag="pdf2ppt_qwenvl"
+                ),
+                workers=4,
+            ),
+            PageStage(
+                "sam",
+                lambda ctx: sam_page(
+                    ctx.img_path, ctx.page_idx, str(base_dir), SAM_SERVER_URLS, sam_ckpt, top_k=15, tag="pdf2ppt_qwenvl"
+                ),
+                workers=6,
+                blocking=True,
+            ),
+            PageStage(
+                "bg_remove",
+                lambda ctx: bg_remove_page(ctx.get("sam"), str(base_dir), model_path, tag="pdf2ppt_qwenvl"),
+                workers=4,
+                after=("sam",),
+                blocking=True,
+            ),
+        ]
+        pipeline = PagePipeline(
+            stages,
+            workers=workers_from_env({s.name: s.workers for s in stages}),
+            name="pdf2ppt_qwenvl",
+        )
+        try:
+            contexts = await pipeline.run(pages, on_page=_assemble)
+        finally:
+            release_models(sam_ckpt, tag="pdf2ppt_qwenvl")
+
+        state.slide_images = [ctx.img_path for ctx in contexts]
+        state.vlm_pages = [ctx.get("vlm") for ctx in contexts if ctx.get("vlm")]
+        state.mineru_pages = [ctx.get("mineru") for ctx in contexts if ctx.get("mineru")]
+        state.sam_pages = [ctx.get("bg_remove") or ctx.get("sam") for ctx in contexts if ctx.get("sam")]
+
+        if not contexts:
+            log.error("[pdf2ppt_qwenvl] no slide images, abort PPT generation")
+            return state
+
         out_path = base_dir / "pdf2ppt_qwenvl_output.pptx"
         prs.save(str(out_path))
         state.ppt_path = str(out_path)
@@ -825,18 +543,14 @@ def create_pdf2ppt_qwenvl_graph() -> GenericGraphBuilder:
 
     nodes = {
         "_start_": _init_result_path,
-        "pdf_to_images": pdf_to_images_node,
-        "parallel_processing": parallel_processing_node,
-        "slides_ppt_generation": slides_ppt_generation_node,
+        "page_pipeline": page_pipeline_node,
         "_end_": lambda s: s,
     }
 
     edges = [
-        ("pdf_to_images", "parallel_processing"),
-        ("parallel_processing", "slides_ppt_generation"),
-        ("slides_ppt_generation", "_end_"),
+        ("page_pipeline", "_end_"),
     ]
 
     builder.add_nodes(nodes).add_edges(edges)
-    builder.add_edge("_start_", "pdf_to_images")
+    builder.add_edge("_start_", "page_pipeline")
     return builder
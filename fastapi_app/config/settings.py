@@ -68,6 +68,11 @@ class AppSettings(BaseSettings):
     # Fast Research (web search for 引入)
     SERPER_API_KEY: Optional[str] = None
 
+    # Background Jobs (长耗时生成任务的后台队列)
+    JOB_DB_PATH: str = "outputs/jobs/jobs.db"   # 相对项目根目录
+    JOB_WORKERS: int = 4                         # 每个进程同时运行的任务数
+    JOB_MAX_PER_USER: int = 2                    # 单个用户同时运行的任务上限
+
     # ============================================
     # Layer 3: Role-level Model Configuration
     # ============================================
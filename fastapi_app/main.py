@@ -22,8 +22,10 @@ from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import FileResponse
 
-from fastapi_app.routers import kb, kb_embedding, files, paper2drawio, paper2ppt
+from fastapi_app.routers import kb, kb_embedding, files, paper2drawio, paper2ppt, jobs
+from fastapi_app.services.job_service import get_job_manager
 from fastapi_app.middleware.api_key import APIKeyMiddleware
+from fastapi_app.notebook_index import reconcile_in_background
 from dataflow_agent.utils import get_project_root
 
 # 本地 Embedding 服务端口（Octen-Embedding-0.6B）
@@ -67,7 +69,13 @@ async def _lifespan(app: FastAPI):
                 print("[WARN] 本地 Embedding 启动超时，请检查 sentence-transformers 是否已安装及上方日志")
         except Exception as e:
             print(f"[WARN] 启动本地 Embedding 失败: {e}")
+    # 笔记本索引：后台对账 outputs/（补录停机期间或建索引前写入的文件）
+    reconcile_in_background()
+    # 后台任务队列：恢复中断的任务并启动调度
+    job_manager = get_job_manager()
+    await job_manager.start()
     yield
+    await job_manager.stop()
     if proc is not None and proc.poll() is None:
         proc.terminate()
         try:
@@ -109,6 +117,7 @@ def create_app() -> FastAPI:
     app.include_router(files.router, prefix="/api/v1", tags=["Files"])
     app.include_router(paper2drawio.router, prefix="/api/v1", tags=["Paper2Drawio"])
     app.include_router(paper2ppt.router, prefix="/api/v1", tags=["Paper2PPT"])
+    app.include_router(jobs.router, prefix="/api/v1", tags=["Jobs"])
 
     # 静态文件：/outputs 下的文件（兼容 URL 中 %40 与 磁盘 @ 两种路径）
     project_root = get_project_root()
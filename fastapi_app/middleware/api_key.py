@@ -15,9 +15,13 @@ Usage (as dependency in router):
         ...
 """
 
-from fastapi import HTTPException, Header, Request, status
-from starlette.middleware.base import BaseHTTPMiddleware
+import hmac
+from typing import Iterable, Optional
+from urllib.parse import parse_qsl
+
+from fastapi import HTTPException, Header, status
 from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Receive, Scope, Send
 
 # Hardcoded API key - frontend uses this to call backend
 # This is not meant for security against determined attackers,
@@ -37,45 +41,111 @@ EXCLUDED_PREFIXES = (
     "/outputs/",  # Static files
 )
 
+# Path prefixes that require API key
+PROTECTED_PREFIXES = (
+    "/api/",
+    "/paper2video/",
+)
+
+_HEADER = b"x-api-key"
+_QUERY_KEYS = ("x_api_key", "X-API-Key")
+
+
+class _PathTrie:
+    """Character trie over exact paths and path prefixes, built once at startup."""
+
+    __slots__ = ("_root",)
+
+    # Multi-character keys never collide with the single-character edges.
+    _EXACT = "<exact>"
+    _PREFIX = "<prefix>"
+
+    def __init__(self, exact: Iterable[str] = (), prefixes: Iterable[str] = ()):
+        self._root: dict = {}
+        for path in exact:
+            self._insert(path)[self._EXACT] = True
+        for prefix in prefixes:
+            self._insert(prefix)[self._PREFIX] = True
+
+    def _insert(self, path: str) -> dict:
+        node = self._root
+        for ch in path:
+            node = node.setdefault(ch, {})
+        return node
+
+    def match(self, path: str) -> bool:
+        """True if path is one of the exact paths or starts with one of the prefixes."""
+        node = self._root
+        for ch in path:
+            if self._PREFIX in node:
+                return True
+            node = node.get(ch)
+            if node is None:
+                return False
+        return self._PREFIX in node or self._EXACT in node
+
+
+def _allows_query_key(method: str, path: str) -> bool:
+    # EventSource 无法带自定义头，progress SSE 允许通过 query 传 key
+    return method == "GET" and (
+        "/paper2rebuttal/progress/" in path or (path.startswith("/api/v1/jobs/") and path.endswith("/events"))
+    )
+
+
+def _query_key(query_string: bytes) -> Optional[bytes]:
+    params = dict(parse_qsl(query_string.decode("latin-1"), keep_blank_values=True))
+    for name in _QUERY_KEYS:
+        if params.get(name):
+            return params[name].encode("utf-8")
+    return None
+
 
-class APIKeyMiddleware(BaseHTTPMiddleware):
+class APIKeyMiddleware:
     """
-    Middleware that verifies API key for /api/* routes.
+    Pure ASGI middleware that verifies the API key for /api/* routes.
 
-    Excludes health check, docs, and static file routes.
+    Excludes health check, docs, and static file routes. Only the request
+    headers in the ASGI scope are inspected; receive/send are passed to the
+    app untouched, so uploads, file downloads and streaming responses keep
+    their back-pressure and add no per-request task.
     """
 
-    async def dispatch(self, request: Request, call_next):
-        path = request.url.path
+    def __init__(
+        self,
+        app: ASGIApp,
+        api_key: str = API_KEY,
+        excluded_paths: Iterable[str] = EXCLUDED_PATHS,
+        excluded_prefixes: Iterable[str] = EXCLUDED_PREFIXES,
+        protected_prefixes: Iterable[str] = PROTECTED_PREFIXES,
+    ) -> None:
+        self.app = app
+        self._api_key = api_key.encode("utf-8")
+        self._exempt = _PathTrie(excluded_paths, excluded_prefixes)
+        self._protected = _PathTrie(prefixes=protected_prefixes)
 
-        # Skip excluded paths
-        if path in EXCLUDED_PATHS:
-            return await call_next(request)
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
 
-        # Skip excluded prefixes
-        if path.startswith(EXCLUDED_PREFIXES):
-            return await call_next(request)
+        path = scope["path"]
+        if self._exempt.match(path) or not self._protected.match(path):
+            await self.app(scope, receive, send)
+            return
 
-        # Only check API key for /api/* and /paper2video/* routes
-        if path.startswith("/api/") or path.startswith("/paper2video/"):
-            api_key = request.headers.get("X-API-Key")
-            # EventSource 无法带自定义头，progress SSE 允许通过 query 传 key
-            if not api_key and request.method == "GET" and "/paper2rebuttal/progress/" in path:
-                api_key = request.query_params.get("x_api_key") or request.query_params.get("X-API-Key")
+        api_key = next((value for name, value in scope["headers"] if name == _HEADER), None)
+        if not api_key and _allows_query_key(scope["method"], path):
+            api_key = _query_key(scope.get("query_string", b""))
 
-            if not api_key:
-                return JSONResponse(
-                    status_code=401,
-                    content={"detail": "API key required"},
-                )
+        if not api_key:
+            await JSONResponse(status_code=401, content={"detail": "API key required"})(scope, receive, send)
+            return
 
-            if api_key != API_KEY:
-                return JSONResponse(
-                    status_code=401,
-                    content={"detail": "Invalid API key"},
-                )
+        if not hmac.compare_digest(api_key, self._api_key):
+            await JSONResponse(status_code=401, content={"detail": "Invalid API key"})(scope, receive, send)
+            return
 
-        return await call_next(request)
+        await self.app(scope, receive, send)
 
 
 async def verify_api_key(
@@ -93,7 +163,7 @@ async def verify_api_key(
             detail="API key required",
         )
 
-    if x_api_key != API_KEY:
+    if not hmac.compare_digest(x_api_key.encode("utf-8"), API_KEY.encode("utf-8")):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid API key",
@@ -0,0 +1,375 @@
+"""
+Notebook index — embedded SQLite record of notebooks, their sources and outputs.
+
+Answers the listings that used to walk ``outputs/`` on every request:
+
+    notebooks(notebook_id, root)                                  # outputs/{title}_{id}/
+    sources(path, notebook_id, name, size, mtime_ns)              # sources/{stem}/original/{file}
+    outputs(path, notebook_id, output_type, file_name, download_url, created_at)
+
+Paths are stored relative to the project root (posix).
+
+Writers:
+- SourceManager.import_* record each imported original;
+- kb._save_output_record records every generated output;
+- kb.delete_kb_file forgets deleted files;
+- ``reconcile()`` rescans ``outputs/`` once at startup (background thread) to pick
+  up anything written while the server was down or before the index existed.
+
+Readers call ``ensure_notebook()`` first: a notebook the index has never seen is
+scanned once (the old directory walk) and ingested, so a missing or deleted index
+costs one scan per notebook, never a wrong answer.
+
+Config:
+- DF_NOTEBOOK_INDEX: database path (default outputs/.notebook_index.sqlite3; "off" disables)
+"""
+from __future__ import annotations
+
+import os
+import re
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from dataflow_agent.logger import get_logger
+from dataflow_agent.utils import get_project_root
+
+log = get_logger(__name__)
+
+# Feature directories under a notebook root and the output files listed for them
+FEATURE_OUTPUT_EXTS = {
+    "ppt": {".pdf", ".pptx"},
+    "mindmap": {".mmd", ".mermaid"},
+    "podcast": {".wav", ".mp3", ".m4a"},
+    "drawio": {".drawio"},
+}
+
+# local_<ms>_<hex> (local notebooks) or a UUID (Supabase)
+_NOTEBOOK_ID_RE = re.compile(r"_(local_\d+_[0-9a-f]+|[0-9a-fA-F]{8}-[0-9a-fA-F-]{27})$")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS notebooks (
+    notebook_id TEXT PRIMARY KEY,
+    root        TEXT NOT NULL,
+    scanned_at  REAL
+);
+CREATE TABLE IF NOT EXISTS sources (
+    path        TEXT PRIMARY KEY,
+    notebook_id TEXT NOT NULL,
+    name        TEXT NOT NULL,
+    size        INTEGER NOT NULL,
+    mtime_ns    INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS sources_by_notebook ON sources(notebook_id);
+CREATE TABLE IF NOT EXISTS outputs (
+    path         TEXT PRIMARY KEY,
+    notebook_id  TEXT NOT NULL,
+    output_type  TEXT NOT NULL,
+    file_name    TEXT NOT NULL,
+    download_url TEXT,
+    created_at   REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS outputs_by_notebook ON outputs(notebook_id, created_at);
+"""
+
+
+# ---------------------------------------------------------------------------
+# Directory scans (used for ingestion and when the index is disabled)
+# ---------------------------------------------------------------------------
+
+def scan_sources(root: Path) -> List[Path]:
+    """All files under {root}/sources/*/original/, sorted by source stem."""
+    sources_dir = root / "sources"
+    found: List[Path] = []
+    if not sources_dir.exists():
+        return found
+    for src_dir in sorted(sources_dir.iterdir()):
+        orig_dir = src_dir / "original"
+        if not src_dir.is_dir() or not orig_dir.exists():
+            continue
+        found.extend(f for f in orig_dir.iterdir() if f.is_file())
+    return found
+
+
+def scan_outputs(root: Path) -> List[Dict[str, Any]]:
+    """First matching output file of every {root}/{feature}/{ts}/ directory."""
+    found: List[Dict[str, Any]] = []
+    for feature, exts in FEATURE_OUTPUT_EXTS.items():
+        feature_dir = root / feature
+        if not feature_dir.exists():
+            continue
+        for ts_dir in feature_dir.iterdir():
+            if not ts_dir.is_dir():
+                continue
+            for f in ts_dir.iterdir():
+                if f.suffix.lower() in exts:
+                    found.append({"path": f, "output_type": feature, "created_at": ts_dir.stat().st_mtime})
+                    break
+    return found
+
+
+def notebook_id_from_dir(name: str) -> Optional[str]:
+    """Recover the notebook id from a '{safe_title}_{id}' directory name."""
+    m = _NOTEBOOK_ID_RE.search(name)
+    if m:
+        return m.group(1)
+    if "_" in name:
+        return name.rsplit("_", 1)[1] or None
+    return None
+
+
+# ---------------------------------------------------------------------------
+# Index
+# ---------------------------------------------------------------------------
+
+class NotebookIndex:
+    """Thread-safe wrapper around one SQLite connection."""
+
+    def __init__(self, db_path: Path, project_root: Optional[Path] = None):
+        self.project_root = (project_root or get_project_root()).resolve()
+        db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(db_path), check_same_thread=False, isolation_level=None)
+        self._lock = threading.Lock()
+        self.reconciled = False  # set once reconcile() has covered outputs/
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.executescript(_SCHEMA)
+
+    # -- helpers -------------------------------------------------------------
+
+    def _rel(self, path: Path) -> Optional[str]:
+        try:
+            return Path(path).resolve().relative_to(self.project_root).as_posix()
+        except ValueError:
+            return None
+
+    def _abs(self, rel: str) -> Path:
+        return self.project_root / rel
+
+    def _query(self, sql: str, args: tuple = ()) -> List[tuple]:
+        with self._lock:
+            return self._conn.execute(sql, args).fetchall()
+
+    def _write(self, statements: List[tuple]) -> None:
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                for sql, args in statements:
+                    self._conn.execute(sql, args)
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    # -- notebooks -----------------------------------------------------------
+
+    def notebook_root(self, notebook_id: str) -> Optional[Path]:
+        rows = self._query("SELECT root FROM notebooks WHERE notebook_id = ?", (notebook_id,))
+        if not rows:
+            # Directory ids recovered at reconcile time can be wrong for unusual ids;
+            # match on the '{title}_{id}' directory suffix like the old scan did
+            safe_id = notebook_id.replace("/", "_").replace("\\", "_")[:128]
+            pattern = "%" + re.sub(r"([\\%_])", r"\\\1", "_" + safe_id)
+            rows = self._query("SELECT root FROM notebooks WHERE root LIKE ? ESCAPE '\\' LIMIT 1", (pattern,))
+        return self._abs(rows[0][0]) if rows else None
+
+    def set_notebook_root(self, notebook_id: str, root: Path) -> None:
+        rel = self._rel(root)
+        if rel is None:
+            return
+        self._write([(
+            "INSERT INTO notebooks(notebook_id, root) VALUES (?, ?) "
+            "ON CONFLICT(notebook_id) DO UPDATE SET root = excluded.root",
+            (notebook_id, rel),
+        )])
+
+    def ensure_notebook(self, notebook_id: str, root: Path) -> None:
+        """Ingest the notebook with a directory scan unless it was scanned before."""
+        if not root.exists():
+            return
+        rows = self._query("SELECT root, scanned_at FROM notebooks WHERE notebook_id = ?", (notebook_id,))
+        if rows and rows[0][1] is not None and self._abs(rows[0][0]) == root.resolve():
+            return
+        self.ingest_notebook(notebook_id, root)
+
+    def ingest_notebook(self, notebook_id: str, root: Path) -> None:
+        """Replace everything recorded under root's sources/ and feature dirs with a fresh scan."""
+        rel_root = self._rel(root)
+        if rel_root is None:
+            return
+        statements: List[tuple] = [
+            (
+                "INSERT INTO notebooks(notebook_id, root, scanned_at) VALUES (?, ?, ?) "
+                "ON CONFLICT(notebook_id) DO UPDATE SET root = excluded.root, scanned_at = excluded.scanned_at",
+                (notebook_id, rel_root, time.time()),
+            ),
+            ("DELETE FROM sources WHERE notebook_id = ?", (notebook_id,)),
+        ]
+        for f in scan_sources(root):
+            st = f.stat()
+            statements.append((
+                "INSERT OR REPLACE INTO sources(path, notebook_id, name, size, mtime_ns) VALUES (?, ?, ?, ?, ?)",
+                (self._rel(f), notebook_id, f.name, st.st_size, st.st_mtime_ns),
+            ))
+        run_dirs = set()
+        for (rel,) in self._query("SELECT path FROM outputs WHERE notebook_id = ?", (notebook_id,)):
+            if self._abs(rel).exists():
+                run_dirs.add(Path(rel).parent.as_posix())
+            else:
+                statements.append(("DELETE FROM outputs WHERE path = ?", (rel,)))
+        for out in scan_outputs(root):
+            rel = self._rel(out["path"])
+            # One output per run directory; recorded rows (created_at / download_url) win
+            if Path(rel).parent.as_posix() in run_dirs:
+                continue
+            statements.append((
+                "INSERT OR IGNORE INTO outputs(path, notebook_id, output_type, file_name, download_url, created_at) "
+                "VALUES (?, ?, ?, ?, NULL, ?)",
+                (rel, notebook_id, out["output_type"], out["path"].name, out["created_at"]),
+            ))
+        self._write(statements)
+
+    # -- sources -------------------------------------------------------------
+
+    def add_source(self, notebook_id: str, path: Path) -> None:
+        rel = self._rel(path)
+        if rel is None or not Path(path).is_file():
+            return
+        st = Path(path).stat()
+        self._write([(
+            "INSERT OR REPLACE INTO sources(path, notebook_id, name, size, mtime_ns) VALUES (?, ?, ?, ?, ?)",
+            (rel, notebook_id, Path(path).name, st.st_size, st.st_mtime_ns),
+        )])
+
+    def sources(self, notebook_id: str) -> List[Dict[str, Any]]:
+        rows = self._query(
+            "SELECT path, name, size, mtime_ns FROM sources WHERE notebook_id = ? ORDER BY path",
+            (notebook_id,),
+        )
+        return [{"rel": r[0], "name": r[1], "size": r[2], "mtime_ns": r[3]} for r in rows]
+
+    # -- outputs -------------------------------------------------------------
+
+    def add_output(
+        self,
+        notebook_id: str,
+        output_type: str,
+        path: Path,
+        file_name: Optional[str] = None,
+        download_url: Optional[str] = None,
+        created_at: Optional[float] = None,
+    ) -> None:
+        # Same scope as scan_outputs(): feature outputs that exist on disk
+        rel = self._rel(path)
+        if rel is None or output_type not in FEATURE_OUTPUT_EXTS or not Path(path).is_file():
+            return
+        prefix = Path(rel).parent.as_posix() + "/"
+        self._write([
+            # A scanned row for the same run directory is superseded by the recorded one
+            ("DELETE FROM outputs WHERE substr(path, 1, ?) = ? AND path != ?", (len(prefix), prefix, rel)),
+            (
+                "INSERT OR REPLACE INTO outputs(path, notebook_id, output_type, file_name, download_url, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (rel, notebook_id, output_type, file_name or Path(path).name, download_url, created_at or time.time()),
+            ),
+        ])
+
+    def outputs(self, notebook_id: str, limit: int = 100) -> List[Dict[str, Any]]:
+        rows = self._query(
+            "SELECT path, output_type, file_name, download_url, created_at FROM outputs "
+            "WHERE notebook_id = ? ORDER BY created_at DESC LIMIT ?",
+            (notebook_id, limit),
+        )
+        return [
+            {"rel": r[0], "output_type": r[1], "file_name": r[2], "download_url": r[3], "created_at": r[4]}
+            for r in rows
+        ]
+
+    # -- removal / reconciliation ------------------------------------------
+
+    def forget_path(self, path: Path) -> None:
+        rel = self._rel(path)
+        if rel is None:
+            return
+        self._write([
+            ("DELETE FROM sources WHERE path = ?", (rel,)),
+            ("DELETE FROM outputs WHERE path = ?", (rel,)),
+        ])
+
+    def reconcile(self) -> int:
+        """Rescan every notebook directory under outputs/; returns the number ingested."""
+        outputs_dir = self.project_root / "outputs"
+        if not outputs_dir.exists():
+            self.reconciled = True
+            return 0
+        known = {nid: self._abs(root) for nid, root in self._query("SELECT notebook_id, root FROM notebooks")}
+        by_root = {root: nid for nid, root in known.items()}
+        ingested = 0
+        for d in outputs_dir.iterdir():
+            if not d.is_dir() or d.name.startswith((".", "_")):
+                continue
+            if not ((d / "sources").is_dir() or any((d / f).is_dir() for f in FEATURE_OUTPUT_EXTS)):
+                continue
+            nid = by_root.get(d) or notebook_id_from_dir(d.name)
+            if not nid:
+                continue
+            try:
+                self.ingest_notebook(nid, d)
+                ingested += 1
+            except Exception as e:
+                log.warning("[notebook_index] ingest %s failed: %s", d.name, e)
+        self.reconciled = True
+        # Drop notebooks whose directory is gone, with their rows
+        stale = [nid for nid, root in known.items() if not root.exists()]
+        for nid in stale:
+            self._write([
+                ("DELETE FROM notebooks WHERE notebook_id = ?", (nid,)),
+                ("DELETE FROM sources WHERE notebook_id = ?", (nid,)),
+                ("DELETE FROM outputs WHERE notebook_id = ?", (nid,)),
+            ])
+        return ingested
+
+
+_INDEX: Optional[NotebookIndex] = None
+_INDEX_LOCK = threading.Lock()
+_DISABLED = False
+
+
+def get_notebook_index() -> Optional[NotebookIndex]:
+    """Process-wide index, or None when disabled (DF_NOTEBOOK_INDEX=off) or unavailable."""
+    global _INDEX, _DISABLED
+    if _INDEX is not None or _DISABLED:
+        return _INDEX
+    with _INDEX_LOCK:
+        if _INDEX is None and not _DISABLED:
+            value = os.getenv("DF_NOTEBOOK_INDEX")
+            if value and value.lower() == "off":
+                _DISABLED = True
+                return None
+            db_path = Path(value) if value else get_project_root() / "outputs" / ".notebook_index.sqlite3"
+            try:
+                _INDEX = NotebookIndex(db_path)
+            except Exception as e:
+                log.warning("[notebook_index] disabled, cannot open %s: %s", db_path, e)
+                _DISABLED = True
+        return _INDEX
+
+
+def reconcile_in_background() -> None:
+    """Startup hook: reconcile the index without delaying the server."""
+    index = get_notebook_index()
+    if index is None:
+        return
+
+    def _run() -> None:
+        t0 = time.time()
+        try:
+            n = index.reconcile()
+            log.info("[notebook_index] reconciled %d notebook(s) in %.1fs", n, time.time() - t0)
+        except Exception as e:
+            log.warning("[notebook_index] reconcile failed: %s", e)
+
+    threading.Thread(target=_run, name="notebook-index-reconcile", daemon=True).start()
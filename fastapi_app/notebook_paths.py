@@ -23,6 +23,7 @@ from pathlib import Path
 from typing import Optional
 
 from dataflow_agent.utils import get_project_root
+from fastapi_app.notebook_index import get_notebook_index
 
 
 # ---------------------------------------------------------------------------
@@ -112,6 +113,10 @@ class NotebookPaths:
 
     # -- core names ----------------------------------------------------------
 
+    @property
+    def notebook_id(self) -> str:
+        return self._notebook_id
+
     @property
     def notebook_dir_name(self) -> str:
         """'{safe_title}_{id}' — the top-level directory name."""
@@ -137,7 +142,23 @@ class NotebookPaths:
         return self._resolved_root
 
     def _find_existing_root(self) -> Optional[Path]:
-        """Scan outputs/ for a directory whose name ends with _{notebook_id}."""
+        """Look the notebook up in the index, else scan outputs/ for a directory ending with _{notebook_id}."""
+        index = get_notebook_index()
+        if index is not None and index.project_root != Path(self._project_root).resolve():
+            index = None
+        if index is not None:
+            indexed = index.notebook_root(self._notebook_id)
+            if indexed is not None and indexed.exists():
+                return indexed
+            if index.reconciled:
+                # After the startup reconcile every notebook directory is in the index
+                return None
+        found = self._scan_existing_root()
+        if found is not None and index is not None:
+            index.set_notebook_root(self._notebook_id, found)
+        return found
+
+    def _scan_existing_root(self) -> Optional[Path]:
         safe_id = self._notebook_id.replace("/", "_").replace("\\", "_")[:128]
         suffix = f"_{safe_id}"
         outputs_dir = self._project_root / "outputs"
@@ -0,0 +1,190 @@
+"""
+后台任务 API：提交长耗时生成任务、查询状态、订阅进度（SSE）、取消、获取结果。
+
+可提交的任务类型（kind）：
+- kb.generate-ppt / kb.generate-podcast / kb.generate-drawio / kb.generate-deep-research-report
+  params 与对应 /kb/* 接口的请求体字段相同
+- paper2ppt.generate / paper2ppt.full
+  params 与对应 /paper2ppt/* 接口的表单字段相同（不支持上传文件，full 仅支持 input_type=text）
+"""
+from __future__ import annotations
+
+import asyncio
+import inspect
+from typing import Any, Callable, Dict, Optional
+
+from fastapi import APIRouter, Body, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from pydantic.fields import FieldInfo
+
+from dataflow_agent.logger import get_logger
+from fastapi_app.routers import kb
+from fastapi_app.schemas import FullPipelineRequest, PPTGenerationRequest
+from fastapi_app.services.job_service import (
+    FINISHED_STATUSES,
+    JOB_STATUS_SUCCEEDED,
+    get_job_manager,
+    list_job_kinds,
+    register_job,
+)
+from fastapi_app.utils import SSE_HEADERS, _format_sse
+
+log = get_logger(__name__)
+router = APIRouter(prefix="/jobs", tags=["Jobs"])
+
+# SSE 订阅时轮询 job_events 的间隔（秒）
+EVENT_POLL_INTERVAL = 1.0
+
+
+def _bind_endpoint_params(func: Callable, params: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    按 FastAPI 接口函数签名把 params 绑定成调用参数：
+    未提供的字段取 Body(...) 等声明里的默认值，缺少必填字段或出现未知字段时报 400。
+    """
+    sig = inspect.signature(func)
+    unknown = set(params) - set(sig.parameters)
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown params: {sorted(unknown)}")
+    kwargs: Dict[str, Any] = {}
+    for name, p in sig.parameters.items():
+        if name in params:
+            kwargs[name] = params[name]
+            continue
+        default = p.default
+        if isinstance(default, FieldInfo):
+            if default.is_required():
+                raise HTTPException(status_code=400, detail=f"Missing required param: {name}")
+            kwargs[name] = default.get_default(call_default_factory=True)
+        elif default is not inspect.Parameter.empty:
+            kwargs[name] = default
+        else:
+            raise HTTPException(status_code=400, detail=f"Missing required param: {name}")
+    return kwargs
+
+
+def _endpoint_job(kind: str, endpoint: Callable) -> None:
+    """把一个 KB 生成接口注册为任务类型：任务执行时以 params 直接调用该接口函数。"""
+    async def _handler(params: Dict[str, Any]) -> Any:
+        return await endpoint(**_bind_endpoint_params(endpoint, params))
+
+    register_job(kind, validator=lambda params: _bind_endpoint_params(endpoint, params))(_handler)
+
+
+_endpoint_job("kb.generate-ppt", kb.generate_ppt_from_kb)
+_endpoint_job("kb.generate-podcast", kb.generate_podcast_from_kb)
+_endpoint_job("kb.generate-drawio", kb.generate_drawio_from_kb)
+_endpoint_job("kb.generate-deep-research-report", kb.generate_deep_research_report)
+
+
+@register_job("paper2ppt.generate", validator=lambda params: PPTGenerationRequest(**params))
+async def _paper2ppt_generate_job(params: Dict[str, Any]) -> Dict[str, Any]:
+    from fastapi_app.services.paper2ppt_service import Paper2PPTService
+
+    req = PPTGenerationRequest(**params)
+    return await Paper2PPTService().generate_ppt(req=req, reference_img=None, request=None)
+
+
+def _validate_paper2ppt_full(params: Dict[str, Any]) -> None:
+    req = FullPipelineRequest(**params)
+    if req.input_type != "text":
+        raise HTTPException(status_code=400, detail="paper2ppt.full jobs only support input_type=text")
+
+
+@register_job("paper2ppt.full", validator=_validate_paper2ppt_full)
+async def _paper2ppt_full_job(params: Dict[str, Any]) -> Dict[str, Any]:
+    from fastapi_app.services.paper2ppt_service import Paper2PPTService
+
+    req = FullPipelineRequest(**params)
+    return await Paper2PPTService().run_full_pipeline(req=req, file=None, request=None)
+
+
+def _public_job(job: Dict[str, Any]) -> Dict[str, Any]:
+    """返回给前端的任务信息（不回显 params，避免泄露 api_key）。"""
+    return {
+        "job_id": job["id"],
+        "kind": job["kind"],
+        "user_id": job["user_id"],
+        "status": job["status"],
+        "error": job.get("error"),
+        "created_at": job.get("created_at"),
+        "started_at": job.get("started_at"),
+        "finished_at": job.get("finished_at"),
+    }
+
+
+def _get_job_or_404(job_id: str) -> Dict[str, Any]:
+    job = get_job_manager().store.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+
+@router.get("/kinds")
+async def get_job_kinds() -> Dict[str, Any]:
+    return {"success": True, "kinds": list_job_kinds()}
+
+
+@router.post("")
+async def submit_job(
+    kind: str = Body(..., embed=True),
+    params: Dict[str, Any] = Body(..., embed=True),
+    user_id: Optional[str] = Body(None, embed=True),
+) -> Dict[str, Any]:
+    """提交任务，立即返回 job_id。参数在提交时校验，缺字段直接 400 而不是等到执行时失败。"""
+    owner = user_id or params.get("user_id") or params.get("email") or "default"
+    job_id = get_job_manager().submit(kind, str(owner), params)
+    return {"success": True, "job_id": job_id, "status": "queued"}
+
+
+@router.get("")
+async def list_jobs(user_id: str = Query(...), limit: int = Query(50, ge=1, le=500)) -> Dict[str, Any]:
+    jobs = get_job_manager().store.list_for_user(user_id, limit=limit)
+    return {"success": True, "jobs": [_public_job(j) for j in jobs]}
+
+
+@router.get("/{job_id}")
+async def get_job(job_id: str, since: int = Query(0, ge=0)) -> Dict[str, Any]:
+    """查询任务状态；附带 seq > since 的进度事件，便于轮询。"""
+    job = _get_job_or_404(job_id)
+    events = get_job_manager().store.events_since(job_id, since)
+    return {"success": True, **_public_job(job), "events": events}
+
+
+@router.get("/{job_id}/result")
+async def get_job_result(job_id: str) -> Dict[str, Any]:
+    job = _get_job_or_404(job_id)
+    if job["status"] != JOB_STATUS_SUCCEEDED:
+        raise HTTPException(status_code=409, detail=f"Job is {job['status']}")
+    return {"success": True, "job_id": job_id, "result": job["result"]}
+
+
+@router.post("/{job_id}/cancel")
+async def cancel_job(job_id: str) -> Dict[str, Any]:
+    _get_job_or_404(job_id)
+    status = get_job_manager().cancel(job_id)
+    return {"success": True, "job_id": job_id, "status": status}
+
+
+@router.get("/{job_id}/events")
+async def stream_job_events(job_id: str, since: int = Query(0, ge=0)):
+    """SSE 订阅任务进度；任务结束后推送 done（含最终状态）并关闭连接。"""
+    _get_job_or_404(job_id)
+    store = get_job_manager().store
+
+    async def _events():
+        last_seq = since
+        while True:
+            for event in store.events_since(job_id, last_seq):
+                last_seq = event["seq"]
+                yield _format_sse(event)
+            job = store.get(job_id)
+            if job is None or job["status"] in FINISHED_STATUSES:
+                # 结束前再取一次，避免漏掉最后写入的事件
+                for event in store.events_since(job_id, last_seq):
+                    last_seq = event["seq"]
+                    yield _format_sse(event)
+                yield _format_sse({"type": "done", **(_public_job(job) if job else {"job_id": job_id})})
+                return
+            await asyncio.sleep(EVENT_POLL_INTERVAL)
+
+    return StreamingResponse(_events(), media_type="text/event-stream", headers=SSE_HEADERS)
@@ -8,7 +8,8 @@ import time
 from pathlib import Path
 from urllib.parse import urlparse, unquote
 from fastapi import APIRouter, UploadFile, File, Form, HTTPException, Body
-from typing import Optional, List, Dict, Any
+from fastapi.responses import StreamingResponse
+from typing import Optional, List, Dict, Any, Tuple
 
 import fitz  # PyMuPDF
 
@@ -19,19 +20,21 @@ from dataflow_agent.workflow.wf_kb_mindmap import create_kb_mindmap_graph
 from dataflow_agent.toolkits.ragtool.vector_store_tool import process_knowledge_base_files, VectorStoreManager
 from dataflow_agent.utils import get_project_root
 from dataflow_agent.logger import get_logger
-from dataflow_agent.workflow import run_workflow
+from dataflow_agent.workflow import run_workflow, stream_workflow
 
 log = get_logger(__name__)
 from fastapi_app.config import settings
 from fastapi_app.schemas import Paper2PPTRequest
-from fastapi_app.utils import _from_outputs_url, _to_outputs_url
+from fastapi_app.utils import SSE_HEADERS, _format_sse, _from_outputs_url, _to_outputs_url
 from fastapi_app.workflow_adapters.wa_paper2ppt import _init_state_from_request
 from fastapi_app.dependencies.auth import get_supabase_admin_client
+from fastapi_app.notebook_index import get_notebook_index, scan_outputs, scan_sources
 from fastapi_app.notebook_paths import NotebookPaths, get_notebook_paths
 from fastapi_app.source_manager import SourceManager
 from fastapi_app.services.fast_research_service import fast_research_search
 from fastapi_app.services.deep_research_report_service import generate_report_from_search
-from dataflow_agent.toolkits.research_tools import fetch_page_text
+from dataflow_agent.toolkits.link_crawler import fetch_page_text_async, fetch_pages_text_async
+from dataflow_agent.toolkits.ragtool.text_store import extract_texts_async, warm_text_store
 
 router = APIRouter(prefix="/kb", tags=["Knowledge Base"])
 
@@ -186,6 +189,42 @@ def _find_mineru_stem_dir(
     return None
 
 
+def _mineru_cache_backends() -> List[Optional[str]]:
+    """全局 MinerU 缓存可能使用的 backend：工作流默认（MINERU_BACKEND）与入库用的 pipeline。"""
+    default = os.environ.get("MINERU_BACKEND", "").strip() or None
+    return list(dict.fromkeys([default, "pipeline"]))
+
+
+def _find_global_mineru_stem_dir(pdf_path: Path) -> Optional[Path]:
+    """按 PDF 内容哈希查询全局 MinerU 缓存，命中返回缓存中的 <stem> 目录（只读）。"""
+    from dataflow_agent.toolkits.multimodaltool.mineru_cache import lookup
+
+    for backend in _mineru_cache_backends():
+        try:
+            stem_dir = lookup(str(pdf_path), backend)
+        except Exception as e:
+            log.warning("[mineru_cache] 查询失败 %s: %s", pdf_path, e)
+            return None
+        if stem_dir is not None:
+            return stem_dir
+    return None
+
+
+def _materialize_global_mineru(pdf_path: Path, output_dir: Path) -> bool:
+    """全局缓存命中时把结果物化到 output_dir/<pdf_stem>，返回是否命中。"""
+    from dataflow_agent.toolkits.multimodaltool.mineru_cache import materialize_cached
+
+    for backend in _mineru_cache_backends():
+        try:
+            if materialize_cached(str(pdf_path), str(output_dir), backend) is not None:
+                log.info("[reuse_mineru] 全局缓存命中: %s (backend=%s)", pdf_path.stem, backend or "default")
+                return True
+        except Exception as e:
+            log.warning("[reuse_mineru] 全局缓存物化失败 %s: %s", pdf_path.stem, e)
+            return False
+    return False
+
+
 def _read_mineru_md_if_cached(
     pdf_path: Path,
     email: str,
@@ -197,7 +236,9 @@ def _read_mineru_md_if_cached(
     尝试从已有的 MinerU 缓存中读取 markdown 内容。
     找到则返回 markdown 文本，否则返回 None。
     """
-    stem_dir = _find_mineru_stem_dir(pdf_path.stem, email, notebook_id, notebook_title)
+    stem_dir = _find_global_mineru_stem_dir(pdf_path) or _find_mineru_stem_dir(
+        pdf_path.stem, email, notebook_id, notebook_title
+    )
     if stem_dir is None:
         return None
 
@@ -232,6 +273,10 @@ def _reuse_mineru_cache(
     reused = 0
     for pdf_path in pdf_paths:
         stem = pdf_path.stem
+        # 优先按内容哈希命中全局缓存（硬链接物化，跨笔记本共享；目标标记不一致时会被替换）
+        if _materialize_global_mineru(pdf_path, output_dir):
+            reused += 1
+            continue
         cached_stem_dir = _find_mineru_stem_dir(stem, email, notebook_id, notebook_title)
         if cached_stem_dir is None:
             log.info("[reuse_mineru] 未找到 %s 的 MinerU 缓存", stem)
@@ -387,6 +432,9 @@ async def upload_kb_file(
         if not legacy_path.exists():
             shutil.copy2(str(source_info.original_path), str(legacy_path))
 
+        # 导入时顺带抽取文本写入笔记本文本存储，与 embedding 并行
+        warm_task = asyncio.create_task(warm_text_store([str(source_info.original_path)]))
+
         # Auto-embed using new vector_store path
         embedded = False
         try:
@@ -402,6 +450,10 @@ async def upload_kb_file(
             log.info("[upload] auto-embedding done: %s", filename)
         except Exception as emb_err:
             log.warning("[upload] auto-embedding failed for %s: %s", filename, emb_err)
+        try:
+            await warm_task
+        except Exception as warm_err:
+            log.warning("[upload] text extraction failed for %s: %s", filename, warm_err)
 
         return {
             "success": True,
@@ -513,9 +565,9 @@ async def import_url_as_source(
 
     # Fetch page text
     try:
-        text = await asyncio.to_thread(fetch_page_text, url)
+        text = await fetch_page_text_async(url)
         if not text or text.startswith("[抓取失败"):
-            raise RuntimeError(text or "fetch_page_text returned empty")
+            raise RuntimeError(text or "fetch_page_text_async returned empty")
     except Exception as e:
         log.warning("fetch_page_text failed: %s", e)
         raise HTTPException(status_code=500, detail=f"网页抓取失败: {e}")
@@ -576,6 +628,9 @@ async def delete_kb_file(
 
         if target_path.exists() and target_path.is_file():
             os.remove(target_path)
+            index = get_notebook_index()
+            if index:
+                index.forget_path(target_path)
             return {"success": True, "message": "File deleted"}
         else:
             return {"success": False, "message": "File not found"}
@@ -598,6 +653,67 @@ def _vector_store_base_dir(email: Optional[str], notebook_id: Optional[str]) ->
     return str(base) if base.exists() else None
 
 
+def _build_qa_state(
+    files: List[str],
+    query: str,
+    history: List[Dict[str, str]],
+    email: Optional[str],
+    notebook_id: Optional[str],
+    api_url: Optional[str],
+    api_key: Optional[str],
+    model: str,
+) -> IntelligentQAState:
+    """把 /chat 的请求参数转换为 intelligent_qa 工作流的初始状态。"""
+    # Normalize file paths (web path -> local absolute path)
+    project_root = get_project_root()
+    local_files = []
+    for f in files:
+        # remove leading /outputs/ if present, or just join
+        # Web path: /outputs/kb_data/...
+        clean_path = f.lstrip('/')
+        p = project_root / clean_path
+        if p.exists():
+            local_files.append(str(p))
+        else:
+            # Try raw path
+            p_raw = Path(f)
+            if p_raw.exists():
+                local_files.append(str(p_raw))
+
+    vector_store_base_dir = _vector_store_base_dir(email, notebook_id)
+
+    req = IntelligentQARequest(
+        files=local_files,
+        query=query,
+        history=history,
+        vector_store_base_dir=vector_store_base_dir,
+        chat_api_url=api_url or os.getenv("DF_API_URL"),
+        api_key=api_key or os.getenv("DF_API_KEY"),
+        model=model
+    )
+    return IntelligentQAState(request=req)
+
+
+def _qa_result_fields(result_state: Any) -> Dict[str, Any]:
+    """从 intelligent_qa 的最终状态（dict 或 state 对象）中取出接口返回字段。"""
+    if isinstance(result_state, dict):
+        answer = result_state.get("answer", "")
+        file_analyses = result_state.get("file_analyses", [])
+        source_mapping = result_state.get("source_mapping", {})
+    else:
+        answer = getattr(result_state, "answer", "")
+        file_analyses = getattr(result_state, "file_analyses", [])
+        source_mapping = getattr(result_state, "source_mapping", {})
+
+    # 将 source_mapping 的 int key 转为 str（JSON 要求）
+    source_mapping_str = {str(k): v for k, v in source_mapping.items()} if source_mapping else {}
+    return {
+        "answer": answer,
+        "file_analyses": file_analyses,
+        "source_mapping": source_mapping_str,
+    }
+
+
 @router.post("/chat")
 async def chat_with_kb(
     files: List[str] = Body(..., embed=True),
@@ -613,71 +729,13 @@ async def chat_with_kb(
     Intelligent QA Chat. 若传 email/notebook_id 且该 notebook 已建索引，会优先用 RAG 检索片段作为上下文。
     """
     try:
-        # Normalize file paths (web path -> local absolute path)
-        project_root = get_project_root()
-        local_files = []
-        for f in files:
-            # remove leading /outputs/ if present, or just join
-            # Web path: /outputs/kb_data/...
-            clean_path = f.lstrip('/')
-            p = project_root / clean_path
-            if p.exists():
-                local_files.append(str(p))
-            else:
-                # Try raw path
-                p_raw = Path(f)
-                if p_raw.exists():
-                    local_files.append(str(p_raw))
-        
-        if not local_files:
-             # Just return empty answer or handle logic
-             pass
+        state = _build_qa_state(files, query, history, email, notebook_id, api_url, api_key, model)
 
-        vector_store_base_dir = _vector_store_base_dir(email, notebook_id)
-
-        # Construct Request
-        req = IntelligentQARequest(
-            files=local_files,
-            query=query,
-            history=history,
-            vector_store_base_dir=vector_store_base_dir,
-            chat_api_url=api_url or os.getenv("DF_API_URL"),
-            api_key=api_key or os.getenv("DF_API_KEY"),
-            model=model
-        )
-        
-        state = IntelligentQAState(request=req)
-        
         # Run workflow via registry (统一使用 run_workflow)
+        # LangGraph 返回 dict，GenericGraphBuilder 封装下也可能是 state 对象，_qa_result_fields 两者都兼容
         result_state = await run_workflow("intelligent_qa", state)
-        
-        # graph.ainvoke returns the final state dict or state object depending on implementation.
-        # LangGraph usually returns dict. But our GenericGraphBuilder wrapper might return state.
-        # GenericGraphBuilder compile returns a compiled graph.
-        # Let's check typical usage. usually await graph.ainvoke(state) returns dict.
-        
-        answer = ""
-        file_analyses = []
-        source_mapping = {}
-
-        if isinstance(result_state, dict):
-            answer = result_state.get("answer", "")
-            file_analyses = result_state.get("file_analyses", [])
-            source_mapping = result_state.get("source_mapping", {})
-        else:
-            answer = getattr(result_state, "answer", "")
-            file_analyses = getattr(result_state, "file_analyses", [])
-            source_mapping = getattr(result_state, "source_mapping", {})
-
-        # 将 source_mapping 的 int key 转为 str（JSON 要求）
-        source_mapping_str = {str(k): v for k, v in source_mapping.items()} if source_mapping else {}
 
-        return {
-            "success": True,
-            "answer": answer,
-            "file_analyses": file_analyses,
-            "source_mapping": source_mapping_str
-        }
+        return {"success": True, **_qa_result_fields(result_state)}
 
     except HTTPException:
         raise
@@ -687,6 +745,42 @@ async def chat_with_kb(
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.post("/chat/stream")
+async def chat_with_kb_stream(
+    files: List[str] = Body(..., embed=True),
+    query: str = Body(..., embed=True),
+    history: List[Dict[str, str]] = Body([], embed=True),
+    email: Optional[str] = Body(None, embed=True),
+    notebook_id: Optional[str] = Body(None, embed=True),
+    api_url: Optional[str] = Body(None, embed=True),
+    api_key: Optional[str] = Body(None, embed=True),
+    model: str = Body(settings.KB_CHAT_MODEL, embed=True),
+):
+    """
+    /chat 的 SSE 流式版本。事件依次为：
+    - retrieval：RAG 检索片段、文件分析结果与来源编号映射（生成开始前推送）
+    - token：LLM 回答的文本增量
+    - done：完整回答与 source_mapping
+    出错时推送 error 事件后结束。
+    """
+    state = _build_qa_state(files, query, history, email, notebook_id, api_url, api_key, model)
+
+    async def _events():
+        final_state: Any = None
+        try:
+            async for mode, chunk in stream_workflow("intelligent_qa", state, stream_mode=["custom", "values"]):
+                if mode == "custom":
+                    yield _format_sse(chunk)
+                else:
+                    final_state = chunk
+            yield _format_sse({"type": "done", "success": True, **_qa_result_fields(final_state or {})})
+        except Exception as e:
+            log.exception("[chat/stream] failed")
+            yield _format_sse({"type": "error", "detail": str(e)})
+
+    return StreamingResponse(_events(), media_type="text/event-stream", headers=SSE_HEADERS)
+
+
 # ---------- 1.1 对话记录：入库与读取 ----------
 def _supabase_upsert_conversation(email: str, user_id: Optional[str], notebook_id: Optional[str]) -> Optional[Dict[str, Any]]:
     sb = get_supabase_admin_client()
@@ -830,84 +924,58 @@ async def list_outputs(
                 })
         except Exception as e:
             log.warning("list_outputs from db failed: %s", e)
-    # Disk fallback: scan notebook-centric directory layout
+    # Disk fallback: notebook index (one directory scan per notebook it has not seen yet)
     if not files and notebook_id:
-        _FEATURE_EXT_MAP = {
-            "ppt":     {".pdf", ".pptx"},
-            "mindmap": {".mmd", ".mermaid"},
-            "podcast": {".wav", ".mp3", ".m4a"},
-            "drawio":  {".drawio"},
-        }
         try:
             paths = get_notebook_paths(notebook_id, notebook_title or "", user_id)
             nb_root = paths.root
-            if nb_root.exists():
-                for feature, exts in _FEATURE_EXT_MAP.items():
-                    feature_dir = nb_root / feature
-                    if not feature_dir.exists():
-                        continue
-                    for ts_dir in feature_dir.iterdir():
-                        if not ts_dir.is_dir():
-                            continue
-                        for f in ts_dir.iterdir():
-                            if f.suffix.lower() in exts:
-                                rel = str(f.relative_to(project_root))
-                                files.append({
-                                    "id": f"disk_{ts_dir.name}_{f.name}",
-                                    "output_type": feature,
-                                    "file_name": f.name,
-                                    "download_url": _to_outputs_url(rel),
-                                    "created_at": ts_dir.stat().st_mtime,
-                                })
-                                break
+            index = _indexed_notebook(paths)
+            if index:
+                for row in index.outputs(notebook_id):
+                    files.append({
+                        "id": f"disk_{Path(row['rel']).parent.name}_{row['file_name']}",
+                        "output_type": row["output_type"],
+                        "file_name": row["file_name"],
+                        "download_url": row["download_url"] or _to_outputs_url(row["rel"]),
+                        "created_at": row["created_at"],
+                    })
+            elif nb_root.exists():
+                for out in sorted(scan_outputs(nb_root), key=lambda o: o["created_at"], reverse=True):
+                    f = out["path"]
+                    rel = str(f.relative_to(project_root))
+                    files.append({
+                        "id": f"disk_{f.parent.name}_{f.name}",
+                        "output_type": out["output_type"],
+                        "file_name": f.name,
+                        "download_url": _to_outputs_url(rel),
+                        "created_at": out["created_at"],
+                    })
         except Exception as e:
             log.warning("list_outputs disk scan failed: %s", e)
     return {"success": True, "files": files}
 
 
-def _extract_text_from_files(file_paths: List[str], max_chars: int = 50000) -> str:
-    """从知识库文件列表中提取并合并文本，供 DrawIO 等使用。"""
+def _indexed_notebook(paths: NotebookPaths):
+    """返回已收录该笔记本的索引（首次访问时扫描一次目录入库）；索引关闭或不可用时返回 None。"""
+    index = get_notebook_index()
+    if index is None:
+        return None
+    try:
+        index.ensure_notebook(paths.notebook_id, paths.root)
+    except Exception as e:
+        log.warning("[notebook_index] ensure %s failed: %s", paths.notebook_id, e)
+        return None
+    return index
+
+
+async def _extract_text_from_files(file_paths: List[str], max_chars: int = 50000) -> str:
+    """从知识库文件列表中提取并合并文本，供 DrawIO 等使用（走笔记本文本存储，每个文件只解析一次）。"""
+    texts = await extract_texts_async(file_paths)
     parts = []
     total = 0
-    for f in file_paths:
+    for raw in texts:
         if total >= max_chars:
             break
-        path = Path(f)
-        if not path.exists():
-            parts.append(f"[File not found: {f}]\n")
-            total += len(parts[-1])
-            continue
-        suffix = path.suffix.lower()
-        raw = ""
-        try:
-            if suffix == ".pdf":
-                doc = fitz.open(f)
-                raw = "\n".join(page.get_text() for page in doc)
-                doc.close()
-            elif suffix in [".docx", ".doc"]:
-                try:
-                    from docx import Document
-                    doc = Document(f)
-                    raw = "\n".join(p.text for p in doc.paragraphs)
-                except Exception:
-                    raw = "[Error: unsupported or missing python-docx]"
-            elif suffix in [".pptx", ".ppt"]:
-                try:
-                    from pptx import Presentation
-                    prs = Presentation(f)
-                    raw = ""
-                    for i, slide in enumerate(prs.slides):
-                        raw += f"--- Slide {i+1} ---\n"
-                        for shape in slide.shapes:
-                            if hasattr(shape, "text"):
-                                raw += shape.text + "\n"
-                except Exception:
-                    raw = "[Error: unsupported or missing python-pptx]"
-            else:
-                with open(path, "r", encoding="utf-8", errors="replace") as fp:
-                    raw = fp.read()
-        except Exception as e:
-            raw = f"[Parse Error: {e}]"
         chunk = (raw[: max_chars - total] + ("..." if len(raw) > max_chars - total else "")) if raw else ""
         parts.append(chunk)
         total += len(chunk)
@@ -924,6 +992,12 @@ def _save_output_record(
     result_path: str,
     download_url: str,
 ):
+    index = get_notebook_index()
+    if index and notebook_id and file_path:
+        try:
+            index.add_output(notebook_id, output_type, Path(file_path), file_name, download_url)
+        except Exception as e:
+            log.warning("_save_output_record index update failed: %s", e)
     sb = get_supabase_admin_client()
     if not sb:
         return
@@ -1028,7 +1102,10 @@ async def list_notebooks(
             # New layout count
             try:
                 paths = get_notebook_paths(nb_id, row.get("name", ""), uid)
-                if paths.sources_dir.exists():
+                index = _indexed_notebook(paths)
+                if index:
+                    count += len(index.sources(nb_id))
+                elif paths.sources_dir.exists():
                     count += sum(1 for d in paths.sources_dir.iterdir() if d.is_dir() and (d / "original").exists())
             except Exception:
                 pass
@@ -1064,32 +1141,28 @@ async def list_notebook_files(
     seen_names: set = set()
     project_root = get_project_root()
 
-    # --- 1) Read from new layout: outputs/{title}_{id}/sources/ ---
+    # --- 1) Read from new layout: outputs/{title}_{id}/sources/ (via the notebook index) ---
     try:
         paths = get_notebook_paths(notebook_id, notebook_title or "", uid)
-        sources_dir = paths.sources_dir
-        if sources_dir.exists():
-            for src_dir in sorted(sources_dir.iterdir()):
-                if not src_dir.is_dir():
-                    continue
-                orig_dir = src_dir / "original"
-                if not orig_dir.exists():
-                    continue
-                for f in orig_dir.iterdir():
-                    if not f.is_file():
-                        continue
-                    rel = f.relative_to(project_root)
-                    static_url = "/" + rel.as_posix()
-                    stat = f.stat()
-                    files.append({
-                        "id": f"file-{f.name}-{stat.st_mtime_ns}",
-                        "name": f.name,
-                        "url": static_url,
-                        "static_url": static_url,
-                        "file_size": stat.st_size,
-                        "file_type": (f.suffix or "").lower() or "application/octet-stream",
-                    })
-                    seen_names.add(f.name)
+        index = _indexed_notebook(paths)
+        if index:
+            entries = [(row["rel"], row["name"], row["size"], row["mtime_ns"]) for row in index.sources(notebook_id)]
+        else:
+            entries = []
+            for f in scan_sources(paths.root):
+                stat = f.stat()
+                entries.append((f.relative_to(project_root).as_posix(), f.name, stat.st_size, stat.st_mtime_ns))
+        for rel, name, size, mtime_ns in entries:
+            static_url = "/" + rel
+            files.append({
+                "id": f"file-{name}-{mtime_ns}",
+                "name": name,
+                "url": static_url,
+                "static_url": static_url,
+                "file_size": size,
+                "file_type": (Path(name).suffix or "").lower() or "application/octet-stream",
+            })
+            seen_names.add(name)
     except Exception as e:
         log.warning("[list_notebook_files] new layout read failed: %s", e)
 
@@ -1315,7 +1388,7 @@ async def fetch_page_content(url: str = Body(..., embed=True)) -> Dict[str, Any]
     if not url or not (url.startswith("http://") or url.startswith("https://")):
         raise HTTPException(status_code=400, detail="Invalid url")
     try:
-        content = fetch_page_text(url, max_chars=50000)
+        content = await fetch_page_text_async(url, max_chars=50000)
         return {"success": True, "content": content}
     except Exception as e:
         log.warning("fetch_page_content failed: %s", e)
@@ -1393,16 +1466,22 @@ async def import_link_sources(
     imported = 0
     saved_md_paths: List[str] = []
 
+    # 先并发抓取全部新链接（全局 / 单主机限流 + 条件请求缓存），再按原顺序逐个入库
+    pending: List[Tuple[str, Dict[str, Any]]] = []
     for it in items:
         link = (it.get("link") or "").strip()
         if not link or link in seen_links:
             continue
+        seen_links.add(link)
+        pending.append((link, it))
+    texts = await fetch_pages_text_async([link for link, _ in pending], max_chars=50000)
+
+    for (link, it), text in zip(pending, texts):
         title = (it.get("title") or "").strip() or link
         snippet = (it.get("snippet") or "").strip()
         static_url = ""
         filename = ""
         try:
-            text = await asyncio.to_thread(fetch_page_text, link)
             if not text or text.startswith("[抓取失败"):
                 raise RuntimeError(text or "empty response")
 
@@ -1435,7 +1514,6 @@ async def import_link_sources(
             "static_url": static_url,
             "filename": filename,
         })
-        seen_links.add(link)
         imported += 1
     _save_link_sources(nb_dir, existing)
 
@@ -1489,6 +1567,9 @@ async def create_notebook(
         try:
             paths = get_notebook_paths(nb_data["id"], name, user_id)
             paths.sources_dir.mkdir(parents=True, exist_ok=True)
+            index = get_notebook_index()
+            if index:
+                index.set_notebook_root(nb_data["id"], paths.root)
             log.info("[create_notebook] created dir: %s", paths.root)
         except Exception as e:
             log.warning("[create_notebook] dir creation failed: %s", e)
@@ -1602,7 +1683,7 @@ async def generate_ppt_from_kb(
                             log.warning("[generate-ppt] 读取已存 .md 失败 %s: %s", local_md, e)
                     if not (content or "").strip():
                         try:
-                            content = fetch_page_text(ps, max_chars=100000)
+                            content = await fetch_page_text_async(ps, max_chars=100000)
                             if content:
                                 log.info("[generate-ppt] 网页来源 %s 抓取成功，长度=%s", idx, len(content))
                         except Exception as e:
@@ -1624,9 +1705,9 @@ async def generate_ppt_from_kb(
                         # 优先从 MinerU 缓存读取高质量 markdown
                         content = _read_mineru_md_if_cached(local_path, email, notebook_id, notebook_title=notebook_title)
                         if not content:
-                            content = _extract_text_from_files([str(local_path)])
+                            content = await _extract_text_from_files([str(local_path)])
                     elif ext in pdf_like_exts:
-                        content = _extract_text_from_files([str(local_path)])
+                        content = await _extract_text_from_files([str(local_path)])
                     else:
                         content = ""
                     if (content or "").strip():
@@ -1763,7 +1844,7 @@ async def generate_ppt_from_kb(
                 # 优先从 MinerU 缓存读取高质量 markdown
                 part = _read_mineru_md_if_cached(p, email, notebook_id, notebook_title=notebook_title)
                 if not part:
-                    part = _extract_text_from_files([str(p)])
+                    part = await _extract_text_from_files([str(p)])
                 if part.strip():
                     multi_parts.append(f"来源{i + 1}:\n{part}")
             if multi_parts:
@@ -1803,15 +1884,16 @@ async def generate_ppt_from_kb(
 
         pdf_url = _to_outputs_url(pdf_path) if pdf_path else ""
         pptx_url = _to_outputs_url(pptx_path) if pptx_path else ""
-        # 下载链接优先 PDF（可预览），其次 PPTX
+        # 下载链接优先 PDF（可预览），其次 PPTX；只生成了 PPTX 时也要落记录以便索引
         download_url = pdf_url or pptx_url
+        record_path = pdf_path or pptx_path
         _save_output_record(
             email=email,
             user_id=user_id,
             notebook_id=notebook_id,
             output_type="ppt",
-            file_name="paper2ppt.pdf",
-            file_path=pdf_path or "",
+            file_name=Path(record_path).name if record_path else "paper2ppt.pdf",
+            file_path=record_path or "",
             result_path=str(output_dir),
             download_url=download_url,
         )
@@ -1833,6 +1915,148 @@ async def generate_ppt_from_kb(
         raise HTTPException(status_code=500, detail=str(e))
 
 
+def _prepare_deep_research(
+    topic: str,
+    user_id: str,
+    email: str,
+    notebook_id: Optional[str],
+    notebook_title: Optional[str],
+    page_count: int,
+    search_provider: Optional[str],
+    search_api_key: Optional[str],
+    search_engine: Optional[str],
+    search_top_k: int,
+    model: str,
+    language: str,
+) -> Tuple[int, Path, str]:
+    """Deep Research 前半段：参数校验、输出目录、搜索并拼接上下文。返回 (ts, output_dir, search_context)。"""
+    if not isinstance(page_count, int) or page_count < 1 or page_count > 50:
+        raise HTTPException(status_code=400, detail="page_count must be an integer between 1 and 50")
+    ts = int(time.time())
+    # New layout: outputs/{title}_{id}/deep_research/{ts}/
+    if notebook_id:
+        dr_paths = get_notebook_paths(notebook_id, notebook_title or "", user_id)
+        output_dir = dr_paths.feature_output_dir("deep_research", ts)
+    else:
+        output_dir = _outputs_dir(email, notebook_id, f"{ts}_deep_research")
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    search_top_k = max(1, min(20, search_top_k))
+    log.info(
+        "[generate-deep-research-report] start: topic=%r, search_top_k=%s, provider=%s, model=%s, language=%s",
+        topic[:150], search_top_k, search_provider, model, language,
+    )
+
+    # 1) 搜索：用 topic 做 Fast Research，拿到 top_k 条结果
+    sources = fast_research_search(
+        topic,
+        top_k=search_top_k,
+        search_provider=search_provider or "serper",
+        search_api_key=search_api_key,
+        search_engine=search_engine or "google",
+    )
+    log.info("[generate-deep-research-report] search 完成: 共 %s 条来源", len(sources))
+    search_context = ""
+    if sources:
+        search_context = "\n\n".join(
+            f"[{i+1}] 标题: {s.get('title', '')}\n链接: {s.get('link', '')}\n摘要: {s.get('snippet', '')}"
+            for i, s in enumerate(sources)
+        )
+        log.info("[generate-deep-research-report] search_context 拼接完成: len=%s", len(search_context))
+    else:
+        log.warning("[generate-deep-research-report] no search results, LLM will generate from topic only")
+    return ts, output_dir, search_context
+
+
+def _finalize_deep_research(
+    report_title: str,
+    report: str,
+    ts: int,
+    output_dir: Path,
+    user_id: str,
+    email: str,
+    notebook_id: Optional[str],
+    add_as_source: bool,
+) -> Dict[str, Any]:
+    """Deep Research 后半段：保存 .md、写输出记录、可选引入为来源，返回接口响应。"""
+    if not (report or "").strip():
+        raise HTTPException(status_code=500, detail="LLM did not return report content")
+    log.info("[generate-deep-research-report] LLM 报告生成完成: title=%r, report_len=%s", report_title, len(report))
+    project_root = get_project_root()
+
+    # 3) 来源名：固定前缀 [report] + LLM 给的标题，保存为 .md
+    safe_title = re.sub(r'[/\\:*?"<>|]', "", (report_title or "").strip()) or "report"
+    safe_title = safe_title[:50].strip()
+    file_name = f"[report] {safe_title}_{ts}.md"
+    report_path = output_dir / file_name
+    log.info("[generate-deep-research-report] 开始写入 Markdown: %s", report_path)
+    report_path.write_text(report, encoding="utf-8")
+    if not report_path.exists():
+        raise HTTPException(status_code=500, detail="Deep research report file was not written")
+
+    report_url = _to_outputs_url(str(report_path))
+    log.info("[generate-deep-research-report] 报告已保存: %s, add_as_source=%s, notebook_id=%s", report_path, add_as_source, notebook_id)
+
+    if add_as_source and notebook_id:
+        nb_dir = _notebook_dir(email, notebook_id)
+        nb_dir.mkdir(parents=True, exist_ok=True)
+        dest = nb_dir / file_name
+        shutil.copy2(str(report_path), dest)
+        try:
+            rel = dest.relative_to(project_root)
+            source_static_url = "/" + rel.as_posix().replace("@", "%40")
+        except ValueError:
+            source_static_url = report_url
+        _save_output_record(
+            email=email,
+            user_id=user_id,
+            notebook_id=notebook_id,
+            output_type="report",
+            file_name=file_name,
+            file_path=str(dest),
+            result_path=str(output_dir),
+            download_url=report_url,
+        )
+        stat = dest.stat()
+        added_file = {
+            "id": f"file-{file_name}-{stat.st_mtime_ns}",
+            "name": file_name,
+            "url": source_static_url,
+            "static_url": source_static_url,
+            "file_size": stat.st_size,
+            "file_type": "text/markdown",
+        }
+        log.info("[generate-deep-research-report] 完成: 已加入来源, file_name=%s", file_name)
+        return {
+            "success": True,
+            "pdf_path": report_url,
+            "pdf_url": report_url,
+            "file_name": file_name,
+            "source_static_url": source_static_url,
+            "added_as_source": True,
+            "added_file": added_file,
+        }
+
+    _save_output_record(
+        email=email,
+        user_id=user_id,
+        notebook_id=notebook_id,
+        output_type="report",
+        file_name=file_name,
+        file_path=str(report_path),
+        result_path=str(output_dir),
+        download_url=report_url,
+    )
+    log.info("[generate-deep-research-report] 完成: 未加入来源, file_name=%s", file_name)
+    return {
+        "success": True,
+        "pdf_path": report_url,
+        "pdf_url": report_url,
+        "file_name": file_name,
+        "added_as_source": False,
+    }
+
+
 @router.post("/generate-deep-research-report")
 async def generate_deep_research_report(
     topic: str = Body(..., embed=True),
@@ -1858,43 +2082,11 @@ async def generate_deep_research_report(
     不生成 PDF，.md 可预览、可嵌入。
     """
     try:
-        if not isinstance(page_count, int) or page_count < 1 or page_count > 50:
-            raise HTTPException(status_code=400, detail="page_count must be an integer between 1 and 50")
-        ts = int(time.time())
-        project_root = get_project_root()
-        # New layout: outputs/{title}_{id}/deep_research/{ts}/
-        if notebook_id:
-            dr_paths = get_notebook_paths(notebook_id, notebook_title or "", user_id)
-            output_dir = dr_paths.feature_output_dir("deep_research", ts)
-        else:
-            output_dir = _outputs_dir(email, notebook_id, f"{ts}_deep_research")
-        output_dir.mkdir(parents=True, exist_ok=True)
-
         topic = topic.strip()
-        search_top_k = max(1, min(20, search_top_k))
-        log.info(
-            "[generate-deep-research-report] start: topic=%r, search_top_k=%s, provider=%s, model=%s, language=%s",
-            topic[:150], search_top_k, search_provider, model, language,
-        )
-
-        # 1) 搜索：用 topic 做 Fast Research，拿到 top_k 条结果
-        sources = fast_research_search(
-            topic,
-            top_k=search_top_k,
-            search_provider=search_provider or "serper",
-            search_api_key=search_api_key,
-            search_engine=search_engine or "google",
+        ts, output_dir, search_context = _prepare_deep_research(
+            topic, user_id, email, notebook_id, notebook_title, page_count,
+            search_provider, search_api_key, search_engine, search_top_k, model, language,
         )
-        log.info("[generate-deep-research-report] search 完成: 共 %s 条来源", len(sources))
-        search_context = ""
-        if sources:
-            search_context = "\n\n".join(
-                f"[{i+1}] 标题: {s.get('title', '')}\n链接: {s.get('link', '')}\n摘要: {s.get('snippet', '')}"
-                for i, s in enumerate(sources)
-            )
-            log.info("[generate-deep-research-report] search_context 拼接完成: len=%s", len(search_context))
-        else:
-            log.warning("[generate-deep-research-report] no search results, LLM will generate from topic only")
 
         # 2) LLM：根据 topic + search_context 生成一篇长报告（返回标题 + 正文）
         report_title, report = generate_report_from_search(
@@ -1905,81 +2097,9 @@ async def generate_deep_research_report(
             model=model,
             language=language,
         )
-        if not (report or "").strip():
-            raise HTTPException(status_code=500, detail="LLM did not return report content")
-        log.info("[generate-deep-research-report] LLM 报告生成完成: title=%r, report_len=%s", report_title, len(report))
-
-        # 3) 来源名：固定前缀 [report] + LLM 给的标题，保存为 .md
-        safe_title = re.sub(r'[/\\:*?"<>|]', "", (report_title or "").strip()) or "report"
-        safe_title = safe_title[:50].strip()
-        file_name = f"[report] {safe_title}_{ts}.md"
-        report_path = output_dir / file_name
-        log.info("[generate-deep-research-report] 开始写入 Markdown: %s", report_path)
-        report_path.write_text(report, encoding="utf-8")
-        if not report_path.exists():
-            raise HTTPException(status_code=500, detail="Deep research report file was not written")
-
-        report_url = _to_outputs_url(str(report_path))
-        log.info("[generate-deep-research-report] 报告已保存: %s, add_as_source=%s, notebook_id=%s", report_path, add_as_source, notebook_id)
-
-        if add_as_source and notebook_id:
-            nb_dir = _notebook_dir(email, notebook_id)
-            nb_dir.mkdir(parents=True, exist_ok=True)
-            dest = nb_dir / file_name
-            shutil.copy2(str(report_path), dest)
-            try:
-                rel = dest.relative_to(project_root)
-                source_static_url = "/" + rel.as_posix().replace("@", "%40")
-            except ValueError:
-                source_static_url = report_url
-            _save_output_record(
-                email=email,
-                user_id=user_id,
-                notebook_id=notebook_id,
-                output_type="report",
-                file_name=file_name,
-                file_path=str(dest),
-                result_path=str(output_dir),
-                download_url=report_url,
-            )
-            stat = dest.stat()
-            added_file = {
-                "id": f"file-{file_name}-{stat.st_mtime_ns}",
-                "name": file_name,
-                "url": source_static_url,
-                "static_url": source_static_url,
-                "file_size": stat.st_size,
-                "file_type": "text/markdown",
-            }
-            log.info("[generate-deep-research-report] 完成: 已加入来源, file_name=%s", file_name)
-            return {
-                "success": True,
-                "pdf_path": report_url,
-                "pdf_url": report_url,
-                "file_name": file_name,
-                "source_static_url": source_static_url,
-                "added_as_source": True,
-                "added_file": added_file,
-            }
-
-        _save_output_record(
-            email=email,
-            user_id=user_id,
-            notebook_id=notebook_id,
-            output_type="report",
-            file_name=file_name,
-            file_path=str(report_path),
-            result_path=str(output_dir),
-            download_url=report_url,
+        return _finalize_deep_research(
+            report_title, report, ts, output_dir, user_id, email, notebook_id, add_as_source,
         )
-        log.info("[generate-deep-research-report] 完成: 未加入来源, file_name=%s", file_name)
-        return {
-            "success": True,
-            "pdf_path": report_url,
-            "pdf_url": report_url,
-            "file_name": file_name,
-            "added_as_source": False,
-        }
     except HTTPException:
         raise
     except Exception as e:
@@ -1988,6 +2108,62 @@ async def generate_deep_research_report(
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.post("/generate-deep-research-report/stream")
+async def generate_deep_research_report_stream(
+    topic: str = Body(..., embed=True),
+    user_id: str = Body(..., embed=True),
+    email: str = Body(..., embed=True),
+    notebook_id: Optional[str] = Body(None, embed=True),
+    notebook_title: Optional[str] = Body(None, embed=True),
+    api_url: str = Body(..., embed=True),
+    api_key: str = Body(..., embed=True),
+    language: str = Body("zh", embed=True),
+    page_count: int = Body(10, embed=True),
+    model: str = Body("deepseek-v3.2", embed=True),
+    add_as_source: bool = Body(True, embed=True),
+    search_provider: Optional[str] = Body("serper", embed=True),
+    search_api_key: Optional[str] = Body(None, embed=True),
+    search_engine: Optional[str] = Body("google", embed=True),
+    search_top_k: int = Body(10, embed=True),
+):
+    """
+    /generate-deep-research-report 的 SSE 流式版本。
+    事件：search（搜索上下文就绪）→ token（报告正文增量）→ done（与非流式接口相同的返回体）；出错时推送 error。
+    """
+    topic = topic.strip()
+
+    async def _events():
+        try:
+            ts, output_dir, search_context = await asyncio.to_thread(
+                _prepare_deep_research,
+                topic, user_id, email, notebook_id, notebook_title, page_count,
+                search_provider, search_api_key, search_engine, search_top_k, model, language,
+            )
+            yield _format_sse({"type": "search", "search_context_len": len(search_context)})
+
+            from fastapi_app.services.deep_research_report_service import stream_report_from_search
+
+            report_title, report = "", ""
+            async for event in stream_report_from_search(
+                topic, search_context, api_url=api_url, api_key=api_key, model=model, language=language,
+            ):
+                if event["type"] == "report":
+                    report_title, report = event["title"], event["content"]
+                else:
+                    yield _format_sse(event)
+            result = _finalize_deep_research(
+                report_title, report, ts, output_dir, user_id, email, notebook_id, add_as_source,
+            )
+            yield _format_sse({"type": "done", **result})
+        except HTTPException as e:
+            yield _format_sse({"type": "error", "detail": e.detail})
+        except Exception as e:
+            log.exception("[generate-deep-research-report/stream] failed")
+            yield _format_sse({"type": "error", "detail": str(e)})
+
+    return StreamingResponse(_events(), media_type="text/event-stream", headers=SSE_HEADERS)
+
+
 @router.post("/generate-podcast")
 async def generate_podcast_from_kb(
     file_paths: List[str] = Body(..., embed=True),
@@ -2035,7 +2211,7 @@ async def generate_podcast_from_kb(
                         log.warning("[generate-podcast] 读取已存 .md 失败: %s", e)
                 if not (content or "").strip():
                     try:
-                        content = fetch_page_text(ps, max_chars=100000)
+                        content = await fetch_page_text_async(ps, max_chars=100000)
                     except Exception as e:
                         log.warning("[generate-podcast] 抓取 URL 失败 %s: %s", ps[:60], e)
                         content = ""
@@ -2220,7 +2396,7 @@ async def generate_mindmap_from_kb(
                         log.warning("[generate-mindmap] 读取已存 .md 失败: %s", e)
                 if not (content or "").strip():
                     try:
-                        content = fetch_page_text(ps, max_chars=100000)
+                        content = await fetch_page_text_async(ps, max_chars=100000)
                     except Exception as e:
                         log.warning("[generate-mindmap] 抓取 URL 失败 %s: %s", ps[:60], e)
                         content = ""
@@ -2448,7 +2624,7 @@ async def generate_drawio_from_kb(
                 except Exception as e:
                     log.warning("[generate-drawio] 读取已存 .md 失败 %s: %s", local_md, e)
             try:
-                content = fetch_page_text(url, max_chars=100000)
+                content = await fetch_page_text_async(url, max_chars=100000)
                 if content and not content.startswith("["):
                     parts.append(f"来源{i + 1}:\n{content}")
                 else:
@@ -2457,7 +2633,7 @@ async def generate_drawio_from_kb(
                 log.warning("[generate-drawio] 抓取 URL 失败 %s: %s", url[:60], e)
                 parts.append(f"来源{i + 1}:\n[抓取失败: {e}]")
         if local_file_paths:
-            local_text = _extract_text_from_files(local_file_paths)
+            local_text = await _extract_text_from_files(local_file_paths)
             if local_text.strip():
                 parts.append(local_text)
         text_content = "\n\n".join(parts) if parts else ""
@@ -2577,6 +2753,72 @@ async def save_mindmap_to_file(
 
 # ===================== Flashcard 闪卡 =====================
 
+async def _load_kb_text_content(file_paths: List[str], email: str, notebook_id: Optional[str]) -> Tuple[List[str], str]:
+    """解析闪卡/Quiz 的来源文件（含链接来源对应的本地 md）并抽取文本。返回 (local_paths, text_content)。"""
+    local_paths = []
+    for f in file_paths:
+        ps = (f or "").strip()
+        if ps.startswith("http://") or ps.startswith("https://"):
+            local_md = _resolve_link_to_local_md(email, notebook_id, ps)
+            if local_md and local_md.exists():
+                local_paths.append(str(local_md))
+        else:
+            local_path = _resolve_local_path(f)
+            if local_path.exists():
+                local_paths.append(str(local_path))
+
+    if not local_paths:
+        raise HTTPException(status_code=400, detail="No valid files provided")
+
+    text_content = await _extract_text_from_files(local_paths, max_chars=50000)
+    if not text_content.strip():
+        raise HTTPException(status_code=400, detail="No text content extracted")
+    return local_paths, text_content
+
+
+def _save_flashcard_set(
+    flashcards: List[Any],
+    file_paths: List[str],
+    email: str,
+    user_id: str,
+    notebook_id: Optional[str],
+    notebook_title: Optional[str],
+) -> Dict[str, Any]:
+    """保存闪卡集合到 flashcards.json，返回接口响应。"""
+    if not flashcards:
+        raise HTTPException(status_code=500, detail="Failed to generate flashcards")
+
+    ts = int(time.time())
+    flashcard_set_id = f"flashcard_{ts}"
+    if notebook_id:
+        paths = get_notebook_paths(notebook_id, notebook_title or "", user_id)
+        output_dir = paths.feature_output_dir("flashcard", ts)
+    else:
+        output_dir = _outputs_dir(email, notebook_id, flashcard_set_id)
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    flashcard_data = {
+        "id": flashcard_set_id,
+        "notebook_id": notebook_id,
+        "flashcards": [fc.dict() for fc in flashcards],
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "source_files": file_paths,
+        "total_count": len(flashcards),
+    }
+    (output_dir / "flashcards.json").write_text(
+        json.dumps(flashcard_data, ensure_ascii=False, indent=2), encoding="utf-8"
+    )
+    log.info("[generate-flashcards] 成功生成 %d 张闪卡", len(flashcards))
+
+    return {
+        "success": True,
+        "flashcards": [fc.dict() for fc in flashcards],
+        "flashcard_set_id": flashcard_set_id,
+        "total_count": len(flashcards),
+        "result_path": _to_outputs_url(str(output_dir)),
+    }
+
+
 @router.post("/generate-flashcards")
 async def generate_flashcards(
     file_paths: List[str] = Body(..., embed=True),
@@ -2594,25 +2836,7 @@ async def generate_flashcards(
     try:
         from fastapi_app.services.flashcard_service import generate_flashcards_with_llm
 
-        local_paths = []
-        for f in file_paths:
-            ps = (f or "").strip()
-            if ps.startswith("http://") or ps.startswith("https://"):
-                local_md = _resolve_link_to_local_md(email, notebook_id, ps)
-                if local_md and local_md.exists():
-                    local_paths.append(str(local_md))
-            else:
-                local_path = _resolve_local_path(f)
-                if local_path.exists():
-                    local_paths.append(str(local_path))
-
-        if not local_paths:
-            raise HTTPException(status_code=400, detail="No valid files provided")
-
-        text_content = _extract_text_from_files(local_paths, max_chars=50000)
-        if not text_content.strip():
-            raise HTTPException(status_code=400, detail="No text content extracted")
-
+        local_paths, text_content = await _load_kb_text_content(file_paths, email, notebook_id)
         log.info("[generate-flashcards] text_len=%d, files=%d", len(text_content), len(local_paths))
 
         flashcards = await generate_flashcards_with_llm(
@@ -2623,38 +2847,7 @@ async def generate_flashcards(
             language=language,
             card_count=card_count,
         )
-        if not flashcards:
-            raise HTTPException(status_code=500, detail="Failed to generate flashcards")
-
-        ts = int(time.time())
-        flashcard_set_id = f"flashcard_{ts}"
-        if notebook_id:
-            paths = get_notebook_paths(notebook_id, notebook_title or "", user_id)
-            output_dir = paths.feature_output_dir("flashcard", ts)
-        else:
-            output_dir = _outputs_dir(email, notebook_id, flashcard_set_id)
-        output_dir.mkdir(parents=True, exist_ok=True)
-
-        flashcard_data = {
-            "id": flashcard_set_id,
-            "notebook_id": notebook_id,
-            "flashcards": [fc.dict() for fc in flashcards],
-            "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
-            "source_files": file_paths,
-            "total_count": len(flashcards),
-        }
-        (output_dir / "flashcards.json").write_text(
-            json.dumps(flashcard_data, ensure_ascii=False, indent=2), encoding="utf-8"
-        )
-        log.info("[generate-flashcards] 成功生成 %d 张闪卡", len(flashcards))
-
-        return {
-            "success": True,
-            "flashcards": [fc.dict() for fc in flashcards],
-            "flashcard_set_id": flashcard_set_id,
-            "total_count": len(flashcards),
-            "result_path": _to_outputs_url(str(output_dir)),
-        }
+        return _save_flashcard_set(flashcards, file_paths, email, user_id, notebook_id, notebook_title)
     except HTTPException:
         raise
     except Exception as e:
@@ -2662,8 +2855,96 @@ async def generate_flashcards(
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.post("/generate-flashcards/stream")
+async def generate_flashcards_stream(
+    file_paths: List[str] = Body(..., embed=True),
+    email: str = Body(..., embed=True),
+    user_id: str = Body(..., embed=True),
+    notebook_id: Optional[str] = Body(None, embed=True),
+    notebook_title: Optional[str] = Body(None, embed=True),
+    api_url: str = Body(..., embed=True),
+    api_key: str = Body(..., embed=True),
+    model: str = Body("deepseek-v3.2", embed=True),
+    language: str = Body("zh", embed=True),
+    card_count: int = Body(20, embed=True),
+):
+    """/generate-flashcards 的 SSE 流式版本：token 事件推送 LLM 输出，done 事件返回与非流式接口相同的结果。"""
+    from fastapi_app.services.flashcard_service import stream_flashcards_with_llm
+
+    local_paths, text_content = await _load_kb_text_content(file_paths, email, notebook_id)
+    log.info("[generate-flashcards/stream] text_len=%d, files=%d", len(text_content), len(local_paths))
+
+    async def _events():
+        try:
+            flashcards: List[Any] = []
+            async for event in stream_flashcards_with_llm(
+                text_content=text_content,
+                api_url=api_url,
+                api_key=api_key,
+                model=model,
+                language=language,
+                card_count=card_count,
+            ):
+                if event["type"] == "flashcards":
+                    flashcards = event["flashcards"]
+                else:
+                    yield _format_sse(event)
+            result = _save_flashcard_set(flashcards, file_paths, email, user_id, notebook_id, notebook_title)
+            yield _format_sse({"type": "done", **result})
+        except HTTPException as e:
+            yield _format_sse({"type": "error", "detail": e.detail})
+        except Exception as e:
+            log.exception("[generate-flashcards/stream] failed")
+            yield _format_sse({"type": "error", "detail": str(e)})
+
+    return StreamingResponse(_events(), media_type="text/event-stream", headers=SSE_HEADERS)
+
+
 # ===================== Quiz 测验 =====================
 
+def _save_quiz_set(
+    questions: List[Any],
+    file_paths: List[str],
+    email: str,
+    user_id: str,
+    notebook_id: Optional[str],
+    notebook_title: Optional[str],
+) -> Dict[str, Any]:
+    """保存 Quiz 到 quiz.json，返回接口响应。"""
+    if not questions:
+        raise HTTPException(status_code=500, detail="Failed to generate quiz")
+
+    ts = int(time.time())
+    quiz_id = f"quiz_{ts}"
+    if notebook_id:
+        paths = get_notebook_paths(notebook_id, notebook_title or "", user_id)
+        output_dir = paths.feature_output_dir("quiz", ts)
+    else:
+        output_dir = _outputs_dir(email, notebook_id, quiz_id)
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    quiz_data = {
+        "id": quiz_id,
+        "notebook_id": notebook_id,
+        "questions": [q.dict() for q in questions],
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "source_files": file_paths,
+        "total_count": len(questions),
+    }
+    (output_dir / "quiz.json").write_text(
+        json.dumps(quiz_data, ensure_ascii=False, indent=2), encoding="utf-8"
+    )
+    log.info("[generate-quiz] 成功生成 %d 道题目", len(questions))
+
+    return {
+        "success": True,
+        "questions": [q.dict() for q in questions],
+        "quiz_id": quiz_id,
+        "total_count": len(questions),
+        "result_path": _to_outputs_url(str(output_dir)),
+    }
+
+
 @router.post("/generate-quiz")
 async def generate_quiz(
     file_paths: List[str] = Body(..., embed=True),
@@ -2681,25 +2962,7 @@ async def generate_quiz(
     try:
         from fastapi_app.services.quiz_service import generate_quiz_with_llm
 
-        local_paths = []
-        for f in file_paths:
-            ps = (f or "").strip()
-            if ps.startswith("http://") or ps.startswith("https://"):
-                local_md = _resolve_link_to_local_md(email, notebook_id, ps)
-                if local_md and local_md.exists():
-                    local_paths.append(str(local_md))
-            else:
-                local_path = _resolve_local_path(f)
-                if local_path.exists():
-                    local_paths.append(str(local_path))
-
-        if not local_paths:
-            raise HTTPException(status_code=400, detail="No valid files provided")
-
-        text_content = _extract_text_from_files(local_paths, max_chars=50000)
-        if not text_content.strip():
-            raise HTTPException(status_code=400, detail="No text content extracted")
-
+        local_paths, text_content = await _load_kb_text_content(file_paths, email, notebook_id)
         log.info("[generate-quiz] text_len=%d, files=%d", len(text_content), len(local_paths))
 
         questions = await generate_quiz_with_llm(
@@ -2710,38 +2973,7 @@ async def generate_quiz(
             language=language,
             question_count=question_count,
         )
-        if not questions:
-            raise HTTPException(status_code=500, detail="Failed to generate quiz")
-
-        ts = int(time.time())
-        quiz_id = f"quiz_{ts}"
-        if notebook_id:
-            paths = get_notebook_paths(notebook_id, notebook_title or "", user_id)
-            output_dir = paths.feature_output_dir("quiz", ts)
-        else:
-            output_dir = _outputs_dir(email, notebook_id, quiz_id)
-        output_dir.mkdir(parents=True, exist_ok=True)
-
-        quiz_data = {
-            "id": quiz_id,
-            "notebook_id": notebook_id,
-            "questions": [q.dict() for q in questions],
-            "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
-            "source_files": file_paths,
-            "total_count": len(questions),
-        }
-        (output_dir / "quiz.json").write_text(
-            json.dumps(quiz_data, ensure_ascii=False, indent=2), encoding="utf-8"
-        )
-        log.info("[generate-quiz] 成功生成 %d 道题目", len(questions))
-
-        return {
-            "success": True,
-            "questions": [q.dict() for q in questions],
-            "quiz_id": quiz_id,
-            "total_count": len(questions),
-            "result_path": _to_outputs_url(str(output_dir)),
-        }
+        return _save_quiz_set(questions, file_paths, email, user_id, notebook_id, notebook_title)
     except HTTPException:
         raise
     except Exception as e:
@@ -2749,6 +2981,51 @@ async def generate_quiz(
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.post("/generate-quiz/stream")
+async def generate_quiz_stream(
+    file_paths: List[str] = Body(..., embed=True),
+    email: str = Body(..., embed=True),
+    user_id: str = Body(..., embed=True),
+    notebook_id: Optional[str] = Body(None, embed=True),
+    notebook_title: Optional[str] = Body(None, embed=True),
+    api_url: str = Body(..., embed=True),
+    api_key: str = Body(..., embed=True),
+    model: str = Body("deepseek-v3.2", embed=True),
+    language: str = Body("en", embed=True),
+    question_count: int = Body(10, embed=True),
+):
+    """/generate-quiz 的 SSE 流式版本：token 事件推送 LLM 输出，done 事件返回与非流式接口相同的结果。"""
+    from fastapi_app.services.quiz_service import stream_quiz_with_llm
+
+    local_paths, text_content = await _load_kb_text_content(file_paths, email, notebook_id)
+    log.info("[generate-quiz/stream] text_len=%d, files=%d", len(text_content), len(local_paths))
+
+    async def _events():
+        try:
+            questions: List[Any] = []
+            async for event in stream_quiz_with_llm(
+                text_content=text_content,
+                api_url=api_url,
+                api_key=api_key,
+                model=model,
+                language=language,
+                question_count=question_count,
+            ):
+                if event["type"] == "questions":
+                    questions = event["questions"]
+                else:
+                    yield _format_sse(event)
+            result = _save_quiz_set(questions, file_paths, email, user_id, notebook_id, notebook_title)
+            yield _format_sse({"type": "done", **result})
+        except HTTPException as e:
+            yield _format_sse({"type": "error", "detail": e.detail})
+        except Exception as e:
+            log.exception("[generate-quiz/stream] failed")
+            yield _format_sse({"type": "error", "detail": str(e)})
+
+    return StreamingResponse(_events(), media_type="text/event-stream", headers=SSE_HEADERS)
+
+
 # ===================== Flashcard / Quiz 读取端点 =====================
 
 @router.get("/list-flashcard-sets")
@@ -5,7 +5,7 @@ LLM 需在首行输出标题，用于来源命名（前缀 [report] 由调用方
 from __future__ import annotations
 
 import re
-from typing import Tuple
+from typing import Any, AsyncIterator, Dict, List, Tuple
 
 import httpx
 
@@ -110,3 +110,46 @@ def generate_report_from_search(
         (content[:400] + "..." if len(content) > 400 else content),
     )
     return (title, content)
+
+
+async def stream_report_from_search(
+    topic: str,
+    search_context: str,
+    *,
+    api_url: str,
+    api_key: str,
+    model: str = "deepseek-v3.2",
+    language: str = "zh",
+) -> AsyncIterator[Dict[str, Any]]:
+    """
+    流式版本的 generate_report_from_search。
+    先逐段产出 {"type": "token", "content": ...}，结束后产出
+    {"type": "report", "title": ..., "content": ...}。
+    """
+    from fastapi_app.services.llm_stream_service import stream_prompt
+
+    user_content = USER_PROMPT_TEMPLATE.format(
+        topic=topic,
+        language=language,
+        search_context=search_context or "(无搜索结果，请基于主题发挥)",
+    )
+    log.info(
+        "[deep_research_report] LLM 流式输入: model=%s, topic=%r, search_context_len=%s",
+        model,
+        topic[:100],
+        len(search_context or ""),
+    )
+    chunks: List[str] = []
+    async for delta in stream_prompt(
+        f"{SYSTEM_PROMPT}\n\n{user_content}",
+        api_url=api_url,
+        api_key=api_key,
+        model=model,
+        temperature=0.7,
+        language=language,
+    ):
+        chunks.append(delta)
+        yield {"type": "token", "content": delta}
+    title, content = _parse_title_and_content("".join(chunks).strip(), topic)
+    log.info("[deep_research_report] LLM 流式输出: title=%r, report_len=%s", title, len(content))
+    yield {"type": "report", "title": title, "content": content}
@@ -0,0 +1,498 @@
+"""
+后台任务队列服务
+把长耗时的生成接口（PPT / 播客 / DrawIO / Deep Research / paper2ppt）从 HTTP 请求中剥离：
+提交后立即返回 job_id，由进程内的 worker 池执行，客户端轮询或订阅进度事件、取消、获取结果。
+
+- 持久化：本地 SQLite（jobs 表 + job_events 表，WAL 模式），进程重启后未完成的任务重新入队
+- 并发：每个进程 JOB_WORKERS 个并发任务，单用户同时运行的任务数不超过 JOB_MAX_PER_USER
+  （按数据库中 running 状态统计，多个 uvicorn worker 共用同一个库时同样生效）
+- 进度：任务执行时通过 dataflow_agent.graphbuilder.progress 安装回调，
+  工作流节点的 node_start / node_end 及节点自定义进度都会写入 job_events
+- 取消：queued 任务直接标记 cancelled；running 任务置 cancel_requested，
+  由持有该任务的进程在下一次调度时 cancel 对应的 asyncio.Task
+- 密钥：params 中的 api_key 等敏感字段不落库，只保存在提交进程的内存里；
+  带密钥的任务只由提交进程领取。进程重启后这类任务无法恢复密钥，会以失败结束并提示重新提交
+"""
+from __future__ import annotations
+
+import asyncio
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from fastapi import HTTPException
+
+from dataflow_agent.graphbuilder.progress import progress_sink
+from dataflow_agent.logger import get_logger
+from dataflow_agent.utils import get_project_root
+
+log = get_logger(__name__)
+
+JobHandler = Callable[[Dict[str, Any]], Awaitable[Any]]
+
+JOB_STATUS_QUEUED = "queued"
+JOB_STATUS_RUNNING = "running"
+JOB_STATUS_SUCCEEDED = "succeeded"
+JOB_STATUS_FAILED = "failed"
+JOB_STATUS_CANCELLED = "cancelled"
+FINISHED_STATUSES = {JOB_STATUS_SUCCEEDED, JOB_STATUS_FAILED, JOB_STATUS_CANCELLED}
+
+# 调度循环的兜底轮询间隔（秒）：用于发现其他进程提交的任务和跨进程取消请求
+DISPATCH_POLL_INTERVAL = 2.0
+
+# params 中视为密钥的字段（按名称后缀匹配，如 api_key / search_api_key / chat_api_key）
+SECRET_PARAM_SUFFIXES = ("api_key", "apikey", "secret", "password", "token")
+# 落库的 params 里记录被剥离的密钥字段名，执行时据此判断密钥是否仍在内存中
+SECRET_PARAMS_MARKER = "_secret_params"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    user_id TEXT NOT NULL,
+    status TEXT NOT NULL,
+    params TEXT NOT NULL,
+    result TEXT,
+    error TEXT,
+    owner TEXT,
+    cancel_requested INTEGER NOT NULL DEFAULT 0,
+    created_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs(status, created_at);
+CREATE INDEX IF NOT EXISTS idx_jobs_user ON jobs(user_id, created_at);
+CREATE TABLE IF NOT EXISTS job_events (
+    job_id TEXT NOT NULL,
+    seq INTEGER NOT NULL,
+    event TEXT NOT NULL,
+    PRIMARY KEY (job_id, seq)
+);
+"""
+
+
+# ===================== 任务类型注册 =====================
+
+_JOB_HANDLERS: Dict[str, JobHandler] = {}
+_JOB_VALIDATORS: Dict[str, Callable[[Dict[str, Any]], Any]] = {}
+
+
+def register_job(kind: str, validator: Optional[Callable[[Dict[str, Any]], Any]] = None):
+    """
+    装饰器：@register_job("kb.generate-ppt")，handler 接收 params 字典并返回可 JSON 序列化的结果。
+    validator 在提交时对 params 做校验（抛异常即拒绝提交），避免缺字段的任务排队后才失败。
+    """
+    def _decorator(func: JobHandler) -> JobHandler:
+        if kind in _JOB_HANDLERS and _JOB_HANDLERS[kind] is not func:
+            raise ValueError(f"Job kind '{kind}' already registered by {_JOB_HANDLERS[kind]}")
+        _JOB_HANDLERS[kind] = func
+        if validator is not None:
+            _JOB_VALIDATORS[kind] = validator
+        return func
+    return _decorator
+
+
+def list_job_kinds() -> List[str]:
+    return sorted(_JOB_HANDLERS)
+
+
+def validate_job_params(kind: str, params: Dict[str, Any]) -> None:
+    """校验任务类型与参数，不合法时抛 HTTPException(400)。"""
+    if kind not in _JOB_HANDLERS:
+        raise HTTPException(status_code=400, detail=f"Unknown job kind '{kind}', available: {list_job_kinds()}")
+    validator = _JOB_VALIDATORS.get(kind)
+    if validator is None:
+        return
+    try:
+        validator(params)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+# ===================== 密钥剥离 =====================
+
+def _is_secret_param(name: str) -> bool:
+    return name.lower().endswith(SECRET_PARAM_SUFFIXES)
+
+
+def split_secret_params(params: Dict[str, Any]) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    """把 params 拆成（可落库部分, 密钥部分）；只看顶层字段，空值不算密钥。"""
+    public: Dict[str, Any] = {}
+    secrets: Dict[str, Any] = {}
+    for name, value in params.items():
+        if _is_secret_param(name) and value not in (None, ""):
+            secrets[name] = value
+        else:
+            public[name] = value
+    if secrets:
+        public[SECRET_PARAMS_MARKER] = sorted(secrets)
+    return public, secrets
+
+
+# ===================== SQLite 存储 =====================
+
+def _process_owner() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def _owner_alive(owner: Optional[str]) -> bool:
+    """判断 owner（host:pid）所在进程是否仍存活；非本机的 owner 无法判断，视为存活。"""
+    if not owner or ":" not in owner:
+        return False
+    host, _, pid = owner.rpartition(":")
+    if host != socket.gethostname():
+        return True
+    try:
+        os.kill(int(pid), 0)
+    except (ValueError, ProcessLookupError):
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class JobStore:
+    """jobs / job_events 两张表的读写封装，所有操作串行化在一把锁上（事件可能来自线程池）。"""
+
+    def __init__(self, db_path: Path):
+        db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(db_path), timeout=30, check_same_thread=False, isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    @staticmethod
+    def _row_to_job(row: sqlite3.Row) -> Dict[str, Any]:
+        job = dict(row)
+        job["params"] = json.loads(job["params"]) if job.get("params") else {}
+        job["result"] = json.loads(job["result"]) if job.get("result") else None
+        job["cancel_requested"] = bool(job.get("cancel_requested"))
+        return job
+
+    def create(self, kind: str, user_id: str, params: Dict[str, Any], owner: Optional[str] = None) -> str:
+        """params 应已剥离密钥；owner 非空时该 queued 任务只能由 owner 进程领取（密钥只在它的内存里）。"""
+        job_id = uuid.uuid4().hex
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO jobs (id, kind, user_id, status, params, owner, created_at) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (job_id, kind, user_id, JOB_STATUS_QUEUED,
+                 json.dumps(params, ensure_ascii=False, default=str), owner, time.time()),
+            )
+        return job_id
+
+    def scrub_secrets(self) -> int:
+        """清除旧版本写入库中的明文密钥（只保留字段名标记），返回处理的行数。"""
+        with self._lock:
+            rows = self._conn.execute("SELECT id, params FROM jobs").fetchall()
+        updates = []
+        for row in rows:
+            try:
+                params = json.loads(row["params"]) if row["params"] else {}
+            except ValueError:
+                continue
+            if not isinstance(params, dict):
+                continue
+            public, secrets = split_secret_params(params)
+            if secrets:
+                public[SECRET_PARAMS_MARKER] = sorted(set(secrets) | set(params.get(SECRET_PARAMS_MARKER) or []))
+                updates.append((json.dumps(public, ensure_ascii=False, default=str), row["id"]))
+        if updates:
+            with self._lock:
+                self._conn.executemany("UPDATE jobs SET params = ? WHERE id = ?", updates)
+        return len(updates)
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._row_to_job(row) if row else None
+
+    def list_for_user(self, user_id: str, limit: int = 50) -> List[Dict[str, Any]]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT * FROM jobs WHERE user_id = ? ORDER BY created_at DESC LIMIT ?", (user_id, limit)
+            ).fetchall()
+        return [self._row_to_job(r) for r in rows]
+
+    def claim_next(self, owner: str, max_per_user: int) -> Optional[Dict[str, Any]]:
+        """原子地取出最早的、用户未达并发上限的 queued 任务并标记为 running。"""
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                busy_users = [
+                    r[0] for r in self._conn.execute(
+                        "SELECT user_id FROM jobs WHERE status = ? GROUP BY user_id HAVING COUNT(*) >= ?",
+                        (JOB_STATUS_RUNNING, max_per_user),
+                    )
+                ]
+                placeholders = ",".join("?" for _ in busy_users)
+                # queued 任务的 owner 非空表示密钥只在该进程内存里，其他进程不领取
+                query = "SELECT * FROM jobs WHERE status = ? AND (owner IS NULL OR owner = ?)"
+                if busy_users:
+                    query += f" AND user_id NOT IN ({placeholders})"
+                query += " ORDER BY created_at LIMIT 1"
+                row = self._conn.execute(query, (JOB_STATUS_QUEUED, owner, *busy_users)).fetchone()
+                if row is None:
+                    self._conn.execute("COMMIT")
+                    return None
+                self._conn.execute(
+                    "UPDATE jobs SET status = ?, owner = ?, started_at = ? WHERE id = ?",
+                    (JOB_STATUS_RUNNING, owner, time.time(), row["id"]),
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        job = self._row_to_job(row)
+        job["status"] = JOB_STATUS_RUNNING
+        return job
+
+    def finish(self, job_id: str, status: str, result: Any = None, error: Optional[str] = None) -> None:
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET status = ?, result = ?, error = ?, finished_at = ? WHERE id = ?",
+                (status,
+                 json.dumps(result, ensure_ascii=False, default=str) if result is not None else None,
+                 error, time.time(), job_id),
+            )
+
+    def request_cancel(self, job_id: str) -> Optional[str]:
+        """queued → cancelled；running → 置 cancel_requested。返回操作后的状态。"""
+        with self._lock:
+            row = self._conn.execute("SELECT status FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            if row is None:
+                return None
+            status = row["status"]
+            if status == JOB_STATUS_QUEUED:
+                self._conn.execute(
+                    "UPDATE jobs SET status = ?, finished_at = ? WHERE id = ? AND status = ?",
+                    (JOB_STATUS_CANCELLED, time.time(), job_id, JOB_STATUS_QUEUED),
+                )
+                return JOB_STATUS_CANCELLED
+            if status == JOB_STATUS_RUNNING:
+                self._conn.execute("UPDATE jobs SET cancel_requested = 1 WHERE id = ?", (job_id,))
+            return status
+
+    def cancel_requested_ids(self, job_ids: List[str]) -> List[str]:
+        if not job_ids:
+            return []
+        placeholders = ",".join("?" for _ in job_ids)
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT id FROM jobs WHERE cancel_requested = 1 AND id IN ({placeholders})", job_ids
+            ).fetchall()
+        return [r[0] for r in rows]
+
+    def requeue(self, job_ids: List[str]) -> None:
+        """把 running 任务交还队列（停机或恢复时使用）。"""
+        with self._lock:
+            for job_id in job_ids:
+                self._conn.execute(
+                    "UPDATE jobs SET status = ?, owner = NULL, started_at = NULL WHERE id = ? AND status = ?",
+                    (JOB_STATUS_QUEUED, job_id, JOB_STATUS_RUNNING),
+                )
+
+    def requeue_orphans(self) -> int:
+        """
+        把 owner 进程已不存在的 running 任务重新入队（进程崩溃/重启后的恢复），
+        并释放这类进程提交的 queued 任务，使其可被领取（密钥已丢失，执行时会提示重新提交）。
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id, owner FROM jobs WHERE status = ?", (JOB_STATUS_RUNNING,)
+            ).fetchall()
+            queued = self._conn.execute(
+                "SELECT id, owner FROM jobs WHERE status = ? AND owner IS NOT NULL", (JOB_STATUS_QUEUED,)
+            ).fetchall()
+            for r in queued:
+                if not _owner_alive(r["owner"]):
+                    self._conn.execute("UPDATE jobs SET owner = NULL WHERE id = ? AND status = ?",
+                                       (r["id"], JOB_STATUS_QUEUED))
+        orphans = [r["id"] for r in rows if not _owner_alive(r["owner"])]
+        self.requeue(orphans)
+        return len(orphans)
+
+    def add_event(self, job_id: str, event: Dict[str, Any]) -> None:
+        payload = json.dumps(event, ensure_ascii=False, default=str)
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO job_events (job_id, seq, event) "
+                "VALUES (?, (SELECT COALESCE(MAX(seq), 0) + 1 FROM job_events WHERE job_id = ?), ?)",
+                (job_id, job_id, payload),
+            )
+
+    def events_since(self, job_id: str, since: int = 0) -> List[Dict[str, Any]]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT seq, event FROM job_events WHERE job_id = ? AND seq > ? ORDER BY seq", (job_id, since)
+            ).fetchall()
+        return [{"seq": r["seq"], **json.loads(r["event"])} for r in rows]
+
+
+# ===================== 调度与执行 =====================
+
+class JobManager:
+    """进程内的任务调度器：一个调度协程 + 最多 max_workers 个并发任务协程。"""
+
+    def __init__(self, store: JobStore, max_workers: int = 4, max_per_user: int = 2):
+        self.store = store
+        self.max_workers = max(1, max_workers)
+        self.max_per_user = max(1, max_per_user)
+        self.owner = _process_owner()
+        self._running: Dict[str, asyncio.Task] = {}
+        # job_id -> 提交时剥离的密钥，只存在于本进程内存
+        self._secrets: Dict[str, Dict[str, Any]] = {}
+        self._wakeup: Optional[asyncio.Event] = None
+        self._dispatcher: Optional[asyncio.Task] = None
+
+    # ---------- 生命周期 ----------
+
+    async def start(self) -> None:
+        scrubbed = self.store.scrub_secrets()
+        if scrubbed:
+            log.info(f"[job_service] 已清除 {scrubbed} 个任务中落库的明文密钥")
+        requeued = self.store.requeue_orphans()
+        if requeued:
+            log.info(f"[job_service] 重新入队 {requeued} 个中断的任务")
+        self._wakeup = asyncio.Event()
+        self._dispatcher = asyncio.create_task(self._dispatch_loop())
+        log.info(f"[job_service] 任务队列已启动: workers={self.max_workers}, max_per_user={self.max_per_user}")
+
+    async def stop(self) -> None:
+        if self._dispatcher is not None:
+            self._dispatcher.cancel()
+        job_ids = list(self._running)
+        tasks = list(self._running.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        # 停机被打断的任务交还队列，下次启动时继续
+        self.store.requeue(job_ids)
+        self._running.clear()
+
+    # ---------- 对外接口 ----------
+
+    def submit(self, kind: str, user_id: str, params: Dict[str, Any]) -> str:
+        validate_job_params(kind, params)
+        public, secrets = split_secret_params(params)
+        job_id = self.store.create(kind, user_id, public, owner=self.owner if secrets else None)
+        if secrets:
+            self._secrets[job_id] = secrets
+        self.store.add_event(job_id, {"type": "queued", "ts": time.time()})
+        self._notify()
+        return job_id
+
+    def cancel(self, job_id: str) -> Optional[str]:
+        status = self.store.request_cancel(job_id)
+        if status == JOB_STATUS_CANCELLED:
+            self.store.add_event(job_id, {"type": JOB_STATUS_CANCELLED, "ts": time.time()})
+            self._secrets.pop(job_id, None)
+        task = self._running.get(job_id)
+        if task is not None:
+            task.cancel()
+        return status
+
+    # ---------- 内部 ----------
+
+    def _notify(self) -> None:
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    async def _dispatch_loop(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=DISPATCH_POLL_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                for job_id in self.store.cancel_requested_ids(list(self._running)):
+                    self._running[job_id].cancel()
+                while len(self._running) < self.max_workers:
+                    job = self.store.claim_next(self.owner, self.max_per_user)
+                    if job is None:
+                        break
+                    self._running[job["id"]] = asyncio.create_task(self._run(job))
+            except Exception as e:
+                log.exception(f"[job_service] 调度失败: {e}")
+
+    async def _run(self, job: Dict[str, Any]) -> None:
+        job_id = job["id"]
+        handler = _JOB_HANDLERS.get(job["kind"])
+        self.store.add_event(job_id, {"type": "started", "ts": time.time()})
+        log.info(f"[job_service] 开始执行任务 {job_id} ({job['kind']}, user={job['user_id']})")
+        try:
+            if handler is None:
+                raise RuntimeError(f"Unknown job kind '{job['kind']}'")
+            params = self._restore_secrets(job_id, job["params"])
+            with progress_sink(lambda event: self.store.add_event(job_id, event)):
+                result = await handler(params)
+            self.store.finish(job_id, JOB_STATUS_SUCCEEDED, result=result)
+            self.store.add_event(job_id, {"type": JOB_STATUS_SUCCEEDED, "ts": time.time()})
+            log.info(f"[job_service] 任务完成 {job_id}")
+        except asyncio.CancelledError:
+            current = self.store.get(job_id) or {}
+            if current.get("cancel_requested"):
+                self.store.finish(job_id, JOB_STATUS_CANCELLED)
+                self.store.add_event(job_id, {"type": JOB_STATUS_CANCELLED, "ts": time.time()})
+                log.info(f"[job_service] 任务已取消 {job_id}")
+            else:
+                # 进程停机：保留 running 状态由 stop() 交还队列
+                raise
+        except Exception as e:
+            detail = e.detail if isinstance(e, HTTPException) else str(e)
+            log.exception(f"[job_service] 任务失败 {job_id}: {detail}")
+            self.store.finish(job_id, JOB_STATUS_FAILED, error=str(detail))
+            self.store.add_event(job_id, {"type": JOB_STATUS_FAILED, "ts": time.time(), "error": str(detail)})
+        finally:
+            self._running.pop(job_id, None)
+            if (self.store.get(job_id) or {}).get("status") in FINISHED_STATUSES:
+                self._secrets.pop(job_id, None)
+            self._notify()
+
+    def _restore_secrets(self, job_id: str, params: Dict[str, Any]) -> Dict[str, Any]:
+        """合并内存中的密钥；密钥已丢失（提交进程重启过）时报错，提示用户重新提交。"""
+        params = dict(params)
+        names = params.pop(SECRET_PARAMS_MARKER, None) or []
+        secrets = self._secrets.get(job_id, {})
+        missing = [n for n in names if n not in secrets]
+        if missing:
+            raise RuntimeError(
+                f"Job was interrupted and its credentials ({', '.join(missing)}) are not persisted; "
+                "please resubmit the job"
+            )
+        params.update(secrets)
+        return params
+
+
+_manager: Optional[JobManager] = None
+
+
+def get_job_manager() -> JobManager:
+    """进程级单例；首次调用时按 settings 创建（任务的调度由 lifespan 中的 start() 启动）。"""
+    global _manager
+    if _manager is None:
+        from fastapi_app.config import settings
+
+        db_path = Path(settings.JOB_DB_PATH)
+        if not db_path.is_absolute():
+            db_path = get_project_root() / db_path
+        _manager = JobManager(
+            JobStore(db_path),
+            max_workers=settings.JOB_WORKERS,
+            max_per_user=settings.JOB_MAX_PER_USER,
+        )
+    return _manager
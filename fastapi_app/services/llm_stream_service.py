@@ -0,0 +1,64 @@
+"""
+流式 LLM 调用服务
+基于 BaseAgent.astream，把一个 prompt 的输出按 token 增量产出，
+供 KB 生成类接口（Deep Research 报告、闪卡、Quiz）的 SSE 变体复用。
+"""
+from __future__ import annotations
+
+from typing import AsyncIterator
+
+from dataflow_agent.agentroles import create_agent
+from dataflow_agent.logger import get_logger
+from dataflow_agent.state import MainRequest, MainState
+
+log = get_logger(__name__)
+
+
+async def stream_prompt(
+    prompt: str,
+    *,
+    api_url: str,
+    api_key: str,
+    model: str,
+    temperature: float = 0.7,
+    language: str = "en",
+) -> AsyncIterator[str]:
+    """
+    用 kb_prompt_agent 流式执行一个 prompt，逐段产出文本增量。
+
+    Args:
+        prompt: 完整的用户 prompt
+        api_url: LLM API 地址（OpenAI 兼容，形如 http://host/v1）
+        api_key: API 密钥
+        model: 模型名称
+        temperature: 采样温度
+        language: 提示词模板语言
+
+    Yields:
+        LLM 输出的文本增量
+
+    Raises:
+        RuntimeError: LLM 调用失败
+    """
+    state = MainState(
+        request=MainRequest(
+            language=language,
+            chat_api_url=api_url,
+            api_key=api_key,
+            model=model,
+        )
+    )
+    agent = create_agent(
+        name="kb_prompt_agent",
+        model_name=model,
+        chat_api_url=api_url,
+        temperature=temperature,
+        parser_type="text",
+    )
+    async for delta in agent.astream(state, prompt=prompt):
+        yield delta
+
+    result = state.agent_results.get("kb_prompt_agent", {}).get("results", {})
+    if isinstance(result, dict) and result.get("error"):
+        log.error(f"[llm_stream_service] LLM 流式调用失败: {result['error']}")
+        raise RuntimeError(result["error"])
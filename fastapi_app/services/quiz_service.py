@@ -6,7 +6,7 @@ import json
 import re
 import time
 import httpx
-from typing import List, Dict, Any
+from typing import AsyncIterator, List, Dict, Any
 from pathlib import Path
 
 from dataflow_agent.logger import get_logger
@@ -83,6 +83,46 @@ async def generate_quiz_with_llm(
         raise Exception(f"生成 Quiz 失败: {str(e)}")
 
 
+async def stream_quiz_with_llm(
+    text_content: str,
+    api_url: str,
+    api_key: str,
+    model: str,
+    language: str,
+    question_count: int,
+) -> AsyncIterator[Dict[str, Any]]:
+    """
+    流式版本的 generate_quiz_with_llm
+
+    先逐段产出 {"type": "token", "content": ...}，生成结束后产出
+    {"type": "questions", "questions": List[QuizQuestion]}。
+    """
+    from fastapi_app.services.llm_stream_service import stream_prompt
+
+    max_chars = 10000
+    if len(text_content) > max_chars:
+        text_content = text_content[:max_chars] + "..."
+
+    prompt = _build_quiz_prompt(text_content, language, question_count)
+
+    log.info(f"[quiz_service] 开始流式调用 LLM 生成 Quiz，模型: {model}, 数量: {question_count}")
+
+    chunks: List[str] = []
+    try:
+        async for delta in stream_prompt(
+            prompt, api_url=api_url, api_key=api_key, model=model, temperature=0.7, language=language
+        ):
+            chunks.append(delta)
+            yield {"type": "token", "content": delta}
+    except Exception as e:
+        log.error(f"[quiz_service] LLM 调用失败: {e}")
+        raise Exception(f"生成 Quiz 失败: {str(e)}")
+
+    questions = _parse_quiz_from_llm_response("".join(chunks), question_count)
+    log.info(f"[quiz_service] 成功生成 {len(questions)} 道题目")
+    yield {"type": "questions", "questions": questions}
+
+
 def _build_quiz_prompt(text_content: str, language: str, question_count: int) -> str:
     """
     构建生成 Quiz 的 Prompt
@@ -21,6 +21,7 @@ from typing import List, Optional, Tuple
 from dataflow_agent.logger import get_logger
 from dataflow_agent.utils import get_project_root
 
+from fastapi_app.notebook_index import get_notebook_index
 from fastapi_app.notebook_paths import NotebookPaths
 
 log = get_logger(__name__)
@@ -61,6 +62,7 @@ class SourceManager:
         dest = orig_dir / filename
         if file_path.resolve() != dest.resolve():
             shutil.copy2(str(file_path), str(dest))
+        self._record(dest)
 
         info = SourceInfo(
             stem=stem,
@@ -100,6 +102,7 @@ class SourceManager:
         orig_dir.mkdir(parents=True, exist_ok=True)
         dest = orig_dir / filename
         dest.write_text((content or "").strip(), encoding="utf-8")
+        self._record(dest)
 
         md_dir = self.paths.source_markdown_dir(filename)
         md_dir.mkdir(parents=True, exist_ok=True)
@@ -128,6 +131,7 @@ class SourceManager:
         orig_dir.mkdir(parents=True, exist_ok=True)
         dest = orig_dir / filename
         dest.write_text(fetched_text.strip(), encoding="utf-8")
+        self._record(dest)
 
         md_dir = self.paths.source_markdown_dir(filename)
         md_dir.mkdir(parents=True, exist_ok=True)
@@ -296,6 +300,17 @@ class SourceManager:
     # Internal
     # ------------------------------------------------------------------
 
+    def _record(self, original: Path) -> None:
+        """Record an imported original in the notebook index (no-op when disabled)."""
+        index = get_notebook_index()
+        if index is None:
+            return
+        try:
+            index.set_notebook_root(self.paths.notebook_id, self.paths.root)
+            index.add_source(self.paths.notebook_id, original)
+        except Exception as e:
+            log.warning("[SourceManager] notebook index update failed for %s: %s", original.name, e)
+
     async def _run_mineru(self, pdf_path: Path, output_dir: Path) -> None:
         """Run MinerU on a PDF file."""
         from dataflow_agent.toolkits.multimodaltool.mineru_tool import run_mineru_pdf_extract
@@ -1,8 +1,9 @@
 from __future__ import annotations
 
+import json
 import os
 from pathlib import Path
-from typing import Set
+from typing import Any, Dict, Set
 from urllib.parse import urlparse, unquote
 
 from fastapi import HTTPException, Request
@@ -98,3 +99,18 @@ def _from_outputs_url(url_or_path: str) -> str:
         log.warning(f"[WARN] Failed to convert URL to path: {e}")
 
     return url_or_path
+
+
+# SSE 响应头：禁止代理缓冲（nginx 默认会缓冲整段响应，导致 token 无法逐条到达前端）
+SSE_HEADERS = {
+    "Cache-Control": "no-cache",
+    "X-Accel-Buffering": "no",
+}
+
+
+def _format_sse(event: Dict[str, Any]) -> str:
+    """
+    将事件字典编码为一条 SSE 消息（data: <json>\n\n）。
+    事件类型放在 payload 的 "type" 字段中，前端按 type 分发。
+    """
+    return f"data: {json.dumps(event, ensure_ascii=False, default=str)}\n\n"
@@ -0,0 +1,278 @@
+#!/usr/bin/env python3
+"""
+Benchmark + equivalence check for the API key middleware (fastapi_app.middleware.api_key).
+
+Drives a FastAPI app directly over ASGI (no network, no server) with the
+original BaseHTTPMiddleware implementation (kept below as
+``LegacyAPIKeyMiddleware``), the
+pure-ASGI APIKeyMiddleware, and no middleware as a baseline:
+
+- every status / body in a matrix of paths, methods, headers and query keys
+  is identical between legacy and new;
+- large-file downloads (FileResponse under /outputs/ and under /api/ with a
+  key) and a large streamed upload are timed; bytes must arrive intact;
+- with a slow client, a streaming response must not run ahead of the
+  consumer (back-pressure): the largest number of chunks produced but not yet
+  sent is reported for both implementations.
+
+Usage:
+    python script/bench_api_key_middleware.py
+    python script/bench_api_key_middleware.py --size-mb 512 --rounds 5
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+
+from fastapi import FastAPI, Request  # noqa: E402
+from fastapi.responses import FileResponse, StreamingResponse  # noqa: E402
+from starlette.middleware.base import BaseHTTPMiddleware  # noqa: E402
+from starlette.responses import JSONResponse  # noqa: E402
+
+from fastapi_app.middleware import api_key as mw  # noqa: E402
+
+KEY = mw.API_KEY
+
+
+# ----------------------------------------------------------------------
+# Reference implementation (BaseHTTPMiddleware before the ASGI rewrite)
+# ----------------------------------------------------------------------
+class LegacyAPIKeyMiddleware(BaseHTTPMiddleware):
+    async def dispatch(self, request: Request, call_next):
+        path = request.url.path
+        if path in mw.EXCLUDED_PATHS:
+            return await call_next(request)
+        if path.startswith(mw.EXCLUDED_PREFIXES):
+            return await call_next(request)
+        if path.startswith("/api/") or path.startswith("/paper2video/"):
+            api_key = request.headers.get("X-API-Key")
+            if not api_key and request.method == "GET" and (
+                "/paper2rebuttal/progress/" in path or (path.startswith("/api/v1/jobs/") and path.endswith("/events"))
+            ):
+                api_key = request.query_params.get("x_api_key") or request.query_params.get("X-API-Key")
+            if not api_key:
+                return JSONResponse(status_code=401, content={"detail": "API key required"})
+            if api_key != mw.API_KEY:
+                return JSONResponse(status_code=401, content={"detail": "Invalid API key"})
+        return await call_next(request)
+
+
+def build_app(middleware, big_file: Path, stream_chunks: int, progress: dict):
+    app = FastAPI()
+
+    @app.get("/outputs/{path:path}")
+    async def outputs(path: str):
+        return FileResponse(big_file)
+
+    @app.get("/api/v1/files/big")
+    async def protected_file():
+        return FileResponse(big_file)
+
+    @app.post("/api/v1/upload")
+    async def upload(request: Request):
+        h, n = hashlib.sha256(), 0
+        async for chunk in request.stream():
+            h.update(chunk)
+            n += len(chunk)
+        return {"bytes": n, "sha256": h.hexdigest()}
+
+    @app.get("/api/v1/stream")
+    async def stream():
+        async def gen():
+            for i in range(stream_chunks):
+                progress["produced"] = i + 1
+                yield b"x" * 65536
+        return StreamingResponse(gen())
+
+    @app.get("/{path:path}")
+    async def anything(path: str, request: Request):
+        return {"path": "/" + path, "query": str(request.query_params)}
+
+    if middleware is not None:
+        app.add_middleware(middleware)
+    return app
+
+
+async def call(app, method, path, headers=(), query=b"", body_chunks=(), on_chunk=None):
+    """Minimal ASGI client: returns status, body size and the first 4 KB of the body."""
+    done = asyncio.Event()
+    pending = list(body_chunks)
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1",
+        "method": method, "scheme": "http", "path": path, "raw_path": path.encode(),
+        "root_path": "", "query_string": query,
+        "headers": [(k.lower().encode("latin-1"), v.encode("latin-1")) for k, v in headers],
+        "server": ("testserver", 80), "client": ("127.0.0.1", 50000),
+    }
+
+    async def receive():
+        if pending:
+            chunk = pending.pop(0)
+            return {"type": "http.request", "body": chunk, "more_body": bool(pending)}
+        await done.wait()
+        return {"type": "http.disconnect"}
+
+    result = {"status": None, "size": 0, "body": bytearray()}
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            result["status"] = message["status"]
+        elif message["type"] == "http.response.body":
+            data = message.get("body", b"")
+            result["size"] += len(data)
+            if len(result["body"]) < 4096:
+                result["body"] += data[:4096]
+            if on_chunk is not None and data:
+                await on_chunk()
+            if not message.get("more_body", False):
+                done.set()
+
+    await app(scope, receive, send)
+    done.set()
+    return result
+
+
+CASES = [
+    ("GET", "/health", [], b""),
+    ("GET", "/docs", [], b""),
+    ("GET", "/outputs/a/b.png", [], b""),
+    ("GET", "/outputsx", [], b""),
+    ("GET", "/", [], b""),
+    ("GET", "/frontend/index.html", [], b""),
+    ("GET", "/api/v1/kb/list", [], b""),
+    ("GET", "/api/v1/kb/list", [("X-API-Key", "wrong")], b""),
+    ("GET", "/api/v1/kb/list", [("X-API-Key", "")], b""),
+    ("GET", "/api/v1/kb/list", [("X-API-Key", KEY)], b""),
+    ("GET", "/api/v1/kb/list", [("X-API-Key", KEY + "x")], b""),
+    ("GET", "/api/v1/kb/list", [("x-api-key", KEY), ("X-API-Key", "wrong")], b""),
+    ("GET", "/api/v1/kb/list", [("X-API-Key", "d\xe9f")], b""),
+    ("GET", "/api", [], b""),
+    ("POST", "/paper2video/run", [], b""),
+    ("POST", "/paper2video/run", [("X-API-Key", KEY)], b""),
+    ("GET", "/api/v1/jobs/j1/events", [], b"x_api_key=" + KEY.encode()),
+    ("GET", "/api/v1/jobs/j1/events", [], b"X-API-Key=" + KEY.encode()),
+    ("GET", "/api/v1/jobs/j1/events", [], b"x_api_key=&X-API-Key=" + KEY.encode()),
+    ("GET", "/api/v1/jobs/j1/events", [], b"x_api_key=bad"),
+    ("GET", "/api/v1/jobs/j1/events", [], b"x_api_key=%E4%BD%A0"),
+    ("POST", "/api/v1/jobs/j1/events", [], b"x_api_key=" + KEY.encode()),
+    ("GET", "/api/v1/paper2rebuttal/progress/t1", [], b"x_api_key=" + KEY.encode()),
+    ("GET", "/api/v1/kb/list", [], b"x_api_key=" + KEY.encode()),
+]
+
+
+async def run_matrix(legacy_app, new_app):
+    mismatches = []
+    for method, path, headers, query in CASES:
+        a = await call(legacy_app, method, path, headers, query)
+        b = await call(new_app, method, path, headers, query)
+        if (a["status"], bytes(a["body"])) != (b["status"], bytes(b["body"])):
+            mismatches.append(f"{method} {path}?{query.decode()} {headers}: {a['status']} vs {b['status']}")
+    return mismatches
+
+
+async def timed(app, rounds, *args, **kwargs):
+    best, res = float("inf"), None
+    for _ in range(rounds):
+        t0 = time.perf_counter()
+        res = await call(app, *args, **kwargs)
+        best = min(best, time.perf_counter() - t0)
+    return best, res
+
+
+async def max_lead(app, progress, chunks):
+    sent = {"n": 0, "lead": 0}
+
+    async def on_chunk():
+        sent["n"] += 1
+        sent["lead"] = max(sent["lead"], progress["produced"] - sent["n"])
+        await asyncio.sleep(0.001)
+
+    progress["produced"] = 0
+    res = await call(app, "GET", "/api/v1/stream", [("X-API-Key", KEY)], on_chunk=on_chunk)
+    return sent["lead"], res["size"] == chunks * 65536
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark the pure-ASGI API key middleware against BaseHTTPMiddleware")
+    parser.add_argument("--size-mb", type=int, default=256, help="Size of the downloaded / uploaded file")
+    parser.add_argument("--rounds", type=int, default=3, help="Timed rounds (best of)")
+    parser.add_argument("--stream-chunks", type=int, default=200, help="Chunks in the slow-client stream")
+    return parser.parse_args()
+
+
+async def amain(args):
+    results = []
+
+    def check(name, ok, detail=""):
+        results.append(ok)
+        print(f"[{'OK' if ok else 'FAIL'}] {name}{': ' + detail if detail else ''}")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        big = Path(tmp) / "big.bin"
+        with open(big, "wb") as f:
+            for _ in range(args.size_mb):
+                f.write(os.urandom(1 << 20))
+        mb = args.size_mb
+
+        progress = {"produced": 0}
+        apps = {
+            "none": build_app(None, big, args.stream_chunks, progress),
+            "legacy": build_app(LegacyAPIKeyMiddleware, big, args.stream_chunks, progress),
+            "asgi": build_app(mw.APIKeyMiddleware, big, args.stream_chunks, progress),
+        }
+
+        mismatches = await run_matrix(apps["legacy"], apps["asgi"])
+        check("responses identical to BaseHTTPMiddleware", not mismatches,
+              f"{len(CASES)} cases" if not mismatches else "; ".join(mismatches))
+
+        upload_chunks = [os.urandom(1 << 16) for _ in range(16)] * mb
+        upload_sha = hashlib.sha256(b"".join(upload_chunks)).hexdigest()
+
+        for label, path, headers in (
+            ("/outputs download", "/outputs/big.bin", []),
+            ("/api download", "/api/v1/files/big", [("X-API-Key", KEY)]),
+        ):
+            times, sizes = {}, {}
+            for name, app in apps.items():
+                times[name], res = await timed(app, args.rounds, "GET", path, headers)
+                sizes[name] = res["size"]
+            check(f"{label} ({mb} MB)", all(size == mb << 20 for size in sizes.values()),
+                  f"none {mb / times['none']:.0f} MB/s, legacy {mb / times['legacy']:.0f} MB/s "
+                  f"-> asgi {mb / times['asgi']:.0f} MB/s (x{times['legacy'] / times['asgi']:.2f})")
+
+        times = {}
+        for name in ("legacy", "asgi"):
+            t0 = time.perf_counter()
+            res = await call(apps[name], "POST", "/api/v1/upload", [("X-API-Key", KEY)], body_chunks=upload_chunks)
+            times[name] = time.perf_counter() - t0
+            payload = json.loads(bytes(res["body"]))
+            check(f"upload body passed through ({name})",
+                  payload == {"bytes": len(upload_chunks) << 16, "sha256": upload_sha}, f"{times[name]:.2f}s for {mb} MB")
+
+        lead_legacy, ok_legacy = await max_lead(apps["legacy"], progress, args.stream_chunks)
+        lead_asgi, ok_asgi = await max_lead(apps["asgi"], progress, args.stream_chunks)
+        check("slow client: stream never runs ahead of send", ok_asgi and ok_legacy and lead_asgi <= 1,
+              f"max chunks produced but unsent: legacy {lead_legacy}, asgi {lead_asgi}")
+
+    if not all(results):
+        print("\n[FAIL] middleware behaviour differs from expectations")
+        return 1
+    print("\n[OK] all checks passed")
+    return 0
+
+
+def main():
+    return asyncio.run(amain(parse_args()))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
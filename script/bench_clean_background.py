@@ -0,0 +1,251 @@
+#!/usr/bin/env python3
+"""
+Benchmark + equivalence check for the ppt_tool clean-background path.
+
+Compares the vectorized ``build_adaptive_mask`` / ``fill_with_neighbor`` /
+``make_clean_background`` in ppt_tool against the original per-line / per-row
+implementations (kept below as ``legacy_*``) on a set of slide images:
+
+- outputs at ``inpaint_scale=1.0`` must be pixel-identical to the legacy path;
+- ``--scale`` (e.g. 0.5) additionally times the downscaled inpaint and reports the
+  mean absolute difference inside the inpainted region.
+
+Text-line boxes come from ``--lines-json`` ({"<image name>": [[x1, y1, x2, y2], ...]})
+when given, otherwise from a cheap morphological text detector.
+
+Usage:
+    python script/bench_clean_background.py outputs/xxx/slides_png
+    python script/bench_clean_background.py slide1.png slide2.png --long-side 2200 --repeat 3 --scale 0.5
+    python script/bench_clean_background.py --synthetic 5
+"""
+
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+
+import cv2  # noqa: E402
+import numpy as np  # noqa: E402
+
+from dataflow_agent.toolkits.multimodaltool import ppt_tool  # noqa: E402
+
+
+# ----------------------------------------------------------------------
+# Reference implementations (behaviour before vectorization)
+# ----------------------------------------------------------------------
+def legacy_build_adaptive_mask(bgr, lines):
+    h, w = bgr.shape[:2]
+    mask = np.zeros((h, w), dtype=np.uint8)
+    gray = cv2.cvtColor(bgr, cv2.COLOR_BGR2GRAY)
+    for bbox, text, conf in lines:
+        x1, y1, x2, y2 = [int(round(v)) for v in bbox]
+        x1 = max(0, min(w - 1, x1))
+        x2 = max(0, min(w, x2))
+        y1 = max(0, min(h - 1, y1))
+        y2 = max(0, min(h, y2))
+        if x2 <= x1 or y2 <= y1:
+            continue
+        region = gray[y1:y2, x1:x2]
+        try:
+            if np.var(region) < 100:
+                edges = cv2.Canny(region, 50, 150)
+                binary = cv2.dilate(edges, np.ones((2, 2), np.uint8), iterations=1)
+            else:
+                if region.shape[0] < 20 or region.shape[1] < 20:
+                    _, binary = cv2.threshold(region, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+                    binary = 255 - binary
+                else:
+                    binary = cv2.adaptiveThreshold(
+                        region, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, cv2.THRESH_BINARY_INV, 11, 2
+                    )
+                binary = cv2.morphologyEx(binary, cv2.MORPH_CLOSE, np.ones((2, 2), np.uint8))
+            mask[y1:y2, x1:x2] = cv2.bitwise_or(mask[y1:y2, x1:x2], binary)
+        except Exception:
+            mask[y1:y2, x1:x2] = 255
+    if ppt_tool.MASK_DILATE_ITER > 0:
+        mask = cv2.dilate(mask, np.ones((3, 3), np.uint8), iterations=ppt_tool.MASK_DILATE_ITER)
+    return mask
+
+
+def legacy_fill_with_neighbor(bgr, mask):
+    result = bgr.copy()
+    h, w = mask.shape
+    for y in range(h):
+        xs = np.where(mask[y] > 0)[0]
+        if len(xs) == 0:
+            continue
+        x_min, x_max = xs[0], xs[-1]
+        left_src = max(0, x_min - 3)
+        right_src = min(w - 1, x_max + 3)
+        fill_color = ((bgr[y, left_src].astype(np.int32) + bgr[y, right_src].astype(np.int32)) // 2).astype(np.uint8)
+        result[y, x_min : x_max + 1] = fill_color
+    return result
+
+
+def legacy_make_clean_background(bgr, lines):
+    if not lines:
+        return bgr
+    main_mask = legacy_build_adaptive_mask(bgr, lines)
+    shadow_mask = cv2.dilate(main_mask, np.ones((7, 7), np.uint8), iterations=2)
+    if ppt_tool.is_simple_background_region(bgr, shadow_mask):
+        clean = cv2.inpaint(bgr, shadow_mask, ppt_tool.INPAINT_RADIUS, cv2.INPAINT_TELEA)
+    else:
+        prefilled = legacy_fill_with_neighbor(bgr, shadow_mask)
+        clean = cv2.inpaint(prefilled, shadow_mask, max(3, ppt_tool.INPAINT_RADIUS // 2), cv2.INPAINT_NS)
+    clean = cv2.GaussianBlur(clean, (3, 3), 0.5)
+    mask_3ch = cv2.cvtColor(shadow_mask, cv2.COLOR_GRAY2BGR) / 255.0
+    return (clean * mask_3ch + bgr * (1 - mask_3ch)).astype(np.uint8)
+
+
+# ----------------------------------------------------------------------
+# Inputs
+# ----------------------------------------------------------------------
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark ppt_tool clean-background against the legacy path")
+    parser.add_argument("inputs", nargs="*", help="Slide images or directories of images")
+    parser.add_argument("--lines-json", default=None, help="JSON file mapping image name -> list of [x1,y1,x2,y2]")
+    parser.add_argument("--long-side", type=int, default=2200, help="Upscale pages to this long side (0 = keep)")
+    parser.add_argument("--repeat", type=int, default=3, help="Timing repetitions per image")
+    parser.add_argument("--scale", type=float, default=0.0, help="Also time inpaint_scale=<scale> (e.g. 0.5)")
+    parser.add_argument("--synthetic", type=int, default=0, help="Generate N synthetic slides instead of reading images")
+    return parser.parse_args()
+
+
+def synthetic_slide(seed: int):
+    rng = np.random.default_rng(seed)
+    h, w = 1238, 2200
+    yy, xx = np.mgrid[0:h, 0:w]
+    bgr = np.stack(
+        [(xx * 255 // w), (yy * 255 // h), np.full((h, w), 200)], axis=-1
+    ).astype(np.uint8)
+    if seed % 2:
+        bgr = cv2.add(bgr, rng.integers(0, 40, size=bgr.shape, dtype=np.uint8))
+    boxes = []
+    y = 80
+    while y < h - 80:
+        size = float(rng.uniform(1.0, 3.0))
+        text = "Slide text line %d 中文" % len(boxes)
+        (tw, th), base = cv2.getTextSize(text, cv2.FONT_HERSHEY_SIMPLEX, size, 2)
+        x = int(rng.integers(40, 300))
+        cv2.putText(bgr, text, (x, y + th), cv2.FONT_HERSHEY_SIMPLEX, size, (20, 20, 20), 2, cv2.LINE_AA)
+        boxes.append([x - 4, y - 4, x + tw + 4, y + th + base + 4])
+        y += th + base + int(rng.integers(30, 90))
+    return bgr, boxes
+
+
+def detect_text_boxes(bgr):
+    """Cheap text-line detector: morphological gradient -> Otsu -> horizontal close -> contours."""
+    gray = cv2.cvtColor(bgr, cv2.COLOR_BGR2GRAY)
+    grad = cv2.morphologyEx(gray, cv2.MORPH_GRADIENT, np.ones((3, 3), np.uint8))
+    _, bw = cv2.threshold(grad, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+    bw = cv2.morphologyEx(bw, cv2.MORPH_CLOSE, cv2.getStructuringElement(cv2.MORPH_RECT, (25, 3)))
+    contours, _ = cv2.findContours(bw, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+    h, w = gray.shape
+    boxes = []
+    for c in contours:
+        x, y, bw_, bh = cv2.boundingRect(c)
+        if bh < 8 or bw_ < 12 or bh > h * 0.2 or bw_ > w * 0.95:
+            continue
+        boxes.append([x, y, x + bw_, y + bh])
+    return boxes
+
+
+def load_inputs(args):
+    if args.synthetic:
+        for i in range(args.synthetic):
+            bgr, boxes = synthetic_slide(i)
+            yield f"synthetic_{i}", bgr, boxes
+        return
+
+    lines_map = {}
+    if args.lines_json:
+        lines_map = json.loads(Path(args.lines_json).read_text(encoding="utf-8"))
+
+    paths = []
+    for p in map(Path, args.inputs):
+        paths.extend(ppt_tool.list_images_in_dir(str(p)) if p.is_dir() else [str(p)])
+    for path in paths:
+        bgr = ppt_tool.read_bgr(path)
+        scale = 1.0
+        if args.long_side and max(bgr.shape[:2]) < args.long_side:
+            scale = args.long_side / max(bgr.shape[:2])
+            bgr = cv2.resize(bgr, None, fx=scale, fy=scale, interpolation=cv2.INTER_CUBIC)
+        name = Path(path).name
+        if name in lines_map:
+            boxes = [[v * scale for v in b] for b in lines_map[name]]
+        else:
+            boxes = detect_text_boxes(bgr)
+        yield name, bgr, boxes
+
+
+def timed(fn, repeat):
+    best, out = float("inf"), None
+    for _ in range(max(1, repeat)):
+        t0 = time.perf_counter()
+        out = fn()
+        best = min(best, time.perf_counter() - t0)
+    return out, best * 1000
+
+
+def main():
+    args = parse_args()
+    if not args.inputs and not args.synthetic:
+        print("Give slide images / directories, or --synthetic N")
+        return 2
+
+    failed = False
+    totals = {"legacy": 0.0, "new": 0.0, "scaled": 0.0}
+    n = 0
+    for name, bgr, boxes in load_inputs(args):
+        lines = [(b, "", 100.0) for b in boxes]
+        n += 1
+
+        mask_old, t_mask_old = timed(lambda: legacy_build_adaptive_mask(bgr, lines), args.repeat)
+        mask_new, t_mask_new = timed(lambda: ppt_tool.build_adaptive_mask(bgr, lines), args.repeat)
+        shadow = cv2.dilate(mask_new, np.ones((7, 7), np.uint8), iterations=2)
+        fill_old, t_fill_old = timed(lambda: legacy_fill_with_neighbor(bgr, shadow), args.repeat)
+        fill_new, t_fill_new = timed(lambda: ppt_tool.fill_with_neighbor(bgr, shadow), args.repeat)
+        clean_old, t_old = timed(lambda: legacy_make_clean_background(bgr, lines), args.repeat)
+        clean_new, t_new = timed(lambda: ppt_tool.make_clean_background(bgr, lines, inpaint_scale=1.0), args.repeat)
+
+        same = (
+            np.array_equal(mask_old, mask_new)
+            and np.array_equal(fill_old, fill_new)
+            and np.array_equal(clean_old, clean_new)
+        )
+        failed |= not same
+        totals["legacy"] += t_old
+        totals["new"] += t_new
+        line = (
+            f"{name}: {bgr.shape[1]}x{bgr.shape[0]}, {len(lines)} lines | "
+            f"mask {t_mask_old:.0f}->{t_mask_new:.0f} ms, fill {t_fill_old:.0f}->{t_fill_new:.0f} ms, "
+            f"total {t_old:.0f}->{t_new:.0f} ms | identical={same}"
+        )
+        if args.scale and 0 < args.scale < 1:
+            clean_s, t_s = timed(lambda: ppt_tool.make_clean_background(bgr, lines, inpaint_scale=args.scale), args.repeat)
+            totals["scaled"] += t_s
+            region = shadow > 0
+            mad = float(np.abs(clean_s.astype(np.int16) - clean_old.astype(np.int16))[region].mean()) if region.any() else 0.0
+            line += f" | scale={args.scale}: {t_s:.0f} ms, mean|diff| in mask={mad:.2f}"
+        print(line)
+
+    if not n:
+        print("No images found.")
+        return 2
+    print(f"\nImages: {n}")
+    print(f"make_clean_background: legacy {totals['legacy'] / n:.0f} ms/page, vectorized {totals['new'] / n:.0f} ms/page")
+    if totals["scaled"]:
+        print(f"make_clean_background(inpaint_scale={args.scale}): {totals['scaled'] / n:.0f} ms/page")
+    if failed:
+        print("\n[FAIL] vectorized output differs from the legacy implementation")
+        return 1
+    print("\n[OK] outputs identical")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+"""
+Benchmark + equivalence check for drawio_tools.resolve_overlaps.
+
+Builds synthetic draw.io diagrams (random box sizes, some vertices nested in
+containers, edges between random vertices) and runs them through:
+
+- ``legacy_resolve_overlaps``: the original final pass, probing every placed
+  box with ``any(_overlaps(...))`` and shifting by gap/2 per attempt;
+- ``resolve_overlaps``: grid-indexed placed boxes + per-row interval jumps.
+
+Each size is also run with 20% of the vertices given a negative width or height.
+
+The two outputs must be identical for every diagram type, and repeated runs
+of the new pass must be byte-identical (deterministic).
+
+Usage:
+    python script/bench_drawio_overlaps.py
+    python script/bench_drawio_overlaps.py --sizes 500 2000 --seed 7
+"""
+
+import argparse
+import random
+import sys
+import time
+import xml.etree.ElementTree as ET
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+
+from dataflow_agent.toolkits import drawio_tools as dt  # noqa: E402
+
+DIAGRAM_TYPES = ["auto", "flowchart", "sequence", "mindmap", "er"]
+
+
+def synthetic_cells(n: int, seed: int, negative: float = 0.0) -> str:
+    """``negative``: share of vertices whose width / height is flipped negative (malformed LLM output)."""
+    rng = random.Random(seed)
+    cells = []
+    n_containers = max(1, n // 50)
+    for c in range(n_containers):
+        cells.append(
+            f'<mxCell id="g{c}" value="Group {c}" style="swimlane;" vertex="1" parent="1">'
+            f'<mxGeometry x="{rng.randint(0, 600)}" y="{rng.randint(0, 400)}" width="300" height="200" as="geometry"/></mxCell>'
+        )
+    for i in range(n):
+        parent = f"g{rng.randrange(n_containers)}" if rng.random() < 0.2 else "1"
+        w = rng.choice([80, 120, 160, 200, 260]) + rng.random() * 10
+        h = rng.choice([40, 60, 80, 120]) + rng.random() * 5
+        if rng.random() < negative:
+            w = -w
+        if rng.random() < negative:
+            h = -h
+        cells.append(
+            f'<mxCell id="v{i}" value="Node {i}" style="rounded=1;" vertex="1" parent="{parent}">'
+            f'<mxGeometry x="{rng.uniform(0, 700):.1f}" y="{rng.uniform(0, 500):.1f}" width="{w:.1f}" height="{h:.1f}" as="geometry"/></mxCell>'
+        )
+    for e in range(n // 2):
+        a, b = rng.randrange(n), rng.randrange(n)
+        cells.append(
+            f'<mxCell id="e{e}" style="edgeStyle=orthogonalEdgeStyle;" edge="1" parent="1" source="v{a}" target="v{b}">'
+            f'<mxGeometry relative="1" as="geometry"/></mxCell>'
+        )
+    return "\n".join(cells)
+
+
+# ----------------------------------------------------------------------
+# Reference implementation (final pass before the spatial index)
+# ----------------------------------------------------------------------
+def legacy_resolve_overlaps(
+    cells_xml: str,
+    diagram_type: str = "auto",
+    canvas_width: float = 800,
+    canvas_height: float = 600,
+    margin: float = 40,
+    gap: float = 60,
+    max_attempts: int = 200,
+) -> str:
+    root = ET.fromstring(f"<root>{cells_xml}</root>")
+    vertices = list(dt._iter_vertices(root))
+    cell_by_id: Dict[str, ET.Element] = {c.get("id"): c for c in root.findall(".//mxCell") if c.get("id")}
+    children_by_parent: Dict[str, List[ET.Element]] = {}
+    for cell in vertices:
+        children_by_parent.setdefault(cell.get("parent") or "1", []).append(cell)
+    for parent_id, children in list(children_by_parent.items()):
+        if parent_id == "1":
+            continue
+        container = cell_by_id.get(parent_id)
+        if container is None:
+            continue
+        if container.get("vertex") == "1" or dt._style_has(container, "swimlane"):
+            dt._layout_children_in_container(container, children, padding=20, gap=gap)
+    top_level = [c for c in vertices if (c.get("parent") or "1") == "1"]
+    dt._layout_top_level(diagram_type, top_level, margin, canvas_width, canvas_height, gap)
+
+    placed: List[Tuple[float, float, float, float]] = []
+    for cell in vertices:
+        geom, x, y, w, h = dt._get_geometry(cell)
+        attempts = 0
+        while any(dt._overlaps((x, y, w, h), other, gap / 2) for other in placed):
+            attempts += 1
+            x += gap / 2
+            if x + w > canvas_width - margin:
+                x = margin
+                y += gap / 2
+            if attempts >= max_attempts:
+                break
+        dt._set_geometry(geom, x, y, w, h)
+        placed.append((x, y, w, h))
+
+    dt._add_edge_waypoints(root, cell_by_id)
+    return "\n".join(ET.tostring(cell, encoding="unicode") for cell in root.findall("mxCell"))
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark resolve_overlaps against the fixed-step probing pass")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[500, 2000], help="Vertex counts")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--legacy-max", type=int, default=2000, help="Skip the legacy pass above this many vertices")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    ok_all = True
+    for n, negative in [(n, neg) for n in args.sizes for neg in (0.0, 0.2)]:
+        cells = synthetic_cells(n, args.seed + n, negative)
+        label = f"n={n:5d}{' neg' if negative else '    '}"
+        for kind in DIAGRAM_TYPES:
+            for canvas_width, max_attempts in ((800, 200), (1600, 1000)):
+                kwargs = dict(diagram_type=kind, canvas_width=canvas_width, max_attempts=max_attempts)
+                t0 = time.perf_counter()
+                new = dt.resolve_overlaps(cells, **kwargs)
+                t_new = time.perf_counter() - t0
+                again = dt.resolve_overlaps(cells, **kwargs)
+                if n <= args.legacy_max:
+                    t0 = time.perf_counter()
+                    old = legacy_resolve_overlaps(cells, **kwargs)
+                    t_old = time.perf_counter() - t0
+                    same = new == old
+                    timing = f"legacy {t_old:7.2f}s -> {t_new:6.3f}s (x{t_old / max(t_new, 1e-9):.0f})"
+                else:
+                    same = True
+                    timing = f"new {t_new:6.3f}s"
+                ok = same and new == again
+                ok_all &= ok
+                print(
+                    f"[{'OK' if ok else 'FAIL'}] {label} {kind:9s} width={canvas_width:4d} attempts={max_attempts:4d}: "
+                    f"{timing}{'' if same else '  (output differs from legacy)'}"
+                )
+    if not ok_all:
+        print("\n[FAIL] resolve_overlaps differs from the legacy pass")
+        return 1
+    print("\n[OK] identical to the legacy pass and deterministic")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+"""
+Benchmark + behaviour check for the draw.io renderer service (dataflow_agent.toolkits.drawio_renderer).
+
+Renders synthetic diagrams (rounded boxes, ellipses, rhombi, a swimlane with
+children, labelled orthogonal edges, HTML labels) and checks:
+
+- the pure-Python fallback produces valid, deterministic PNGs, with shapes at
+  the expected places (a red-filled box is red at its centre);
+- a compressed <diagram> renders identically to the plain one;
+- a second call is served from the XML-hash cache, also when the mxfile
+  ``modified`` timestamp differs; duplicates inside one batch render once;
+- export_drawio_png writes the PNG to the requested path.
+
+When a draw.io CLI is installed, the original "one subprocess per diagram"
+export (kept below as ``legacy_*``) is timed against a batched CLI call; when
+Playwright + Chromium are available, the persistent browser backend is timed
+as well. Backends that are not installed are reported and skipped.
+
+Usage:
+    python script/bench_drawio_renderer.py
+    python script/bench_drawio_renderer.py --diagrams 20 --nodes 40
+"""
+
+import argparse
+import base64
+import io
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import zlib
+from pathlib import Path
+from urllib.parse import quote
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+
+from PIL import Image  # noqa: E402
+
+from dataflow_agent.toolkits import drawio_renderer as dr  # noqa: E402
+from dataflow_agent.toolkits.drawio_tools import export_drawio_png, wrap_xml  # noqa: E402
+
+SHAPES = ["rounded=1;whiteSpace=wrap;html=1;", "ellipse;whiteSpace=wrap;html=1;", "rhombus;whiteSpace=wrap;html=1;",
+          "whiteSpace=wrap;html=1;fillColor=#dae8fc;strokeColor=#6c8ebf;"]
+
+
+def synthetic_cells(n: int, seed: int) -> str:
+    rng = random.Random(seed)
+    cells = [
+        '<mxCell id="lane" value="Stage &lt;b&gt;A&lt;/b&gt;" style="swimlane;html=1;startSize=30;" vertex="1" parent="1">'
+        '<mxGeometry x="20" y="20" width="260" height="200" as="geometry"/></mxCell>',
+        '<mxCell id="red" value="hot" style="fillColor=#ff0000;strokeColor=#000000;" vertex="1" parent="lane">'
+        '<mxGeometry x="40" y="60" width="120" height="80" as="geometry"/></mxCell>',
+    ]
+    for i in range(n):
+        cells.append(
+            f'<mxCell id="v{i}" value="Step {i}&lt;br&gt;detail" style="{rng.choice(SHAPES)}" vertex="1" parent="1">'
+            f'<mxGeometry x="{320 + (i % 6) * 170}" y="{20 + (i // 6) * 120}" width="140" height="70" as="geometry"/></mxCell>'
+        )
+    for e in range(n):
+        a, b = rng.randrange(n), rng.randrange(n)
+        cells.append(
+            f'<mxCell id="e{e}" value="{"yes" if e % 3 == 0 else ""}" style="edgeStyle=orthogonalEdgeStyle;html=1;endArrow=classic;" '
+            f'edge="1" parent="1" source="v{a}" target="v{b}"><mxGeometry relative="1" as="geometry"/></mxCell>'
+        )
+    return "\n".join(cells)
+
+
+def compressed(full_xml: str) -> str:
+    start = full_xml.index("<mxGraphModel")
+    end = full_xml.index("</mxGraphModel>") + len("</mxGraphModel>")
+    model = full_xml[start:end]
+    co = zlib.compressobj(9, zlib.DEFLATED, -15)
+    payload = base64.b64encode(co.compress(quote(model, safe="").encode("utf-8")) + co.flush()).decode("ascii")
+    return ('<mxfile host="app.diagrams.net"><diagram name="Page-1" id="p">' + payload + "</diagram></mxfile>")
+
+
+# ----------------------------------------------------------------------
+# Reference implementation (one CLI process per diagram)
+# ----------------------------------------------------------------------
+def legacy_export_drawio_png(cli: str, full_xml: str, output_file: Path, timeout: int = 60) -> bool:
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        tmp_path = Path(tmp_dir) / "diagram.drawio"
+        tmp_path.write_text(full_xml, encoding="utf-8")
+        proc = subprocess.run(
+            [cli, "--export", "--format", "png", "--output", str(output_file), str(tmp_path)],
+            stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, timeout=timeout,
+        )
+    return proc.returncode == 0 and output_file.exists()
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Check the draw.io renderer service and its fallback rasterizer")
+    parser.add_argument("--diagrams", type=int, default=12, help="Number of diagrams per batch")
+    parser.add_argument("--nodes", type=int, default=30, help="Vertices per diagram")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    results = []
+
+    def check(name, ok, detail=""):
+        results.append(ok)
+        print(f"[{'OK' if ok else 'FAIL'}] {name}{': ' + detail if detail else ''}")
+
+    cells = [synthetic_cells(args.nodes, seed) for seed in range(args.diagrams)]
+    full = [wrap_xml(c, modified="2024-01-01T00:00:00") for c in cells]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        renderer = dr.DrawioRenderer(backend="python", cache_dir=Path(tmp) / "cache")
+
+        t0 = time.perf_counter()
+        cold = renderer.render_many(full)
+        t_cold = time.perf_counter() - t0
+        images = [Image.open(io.BytesIO(r.png)) if r.ok else None for r in cold]
+        check("fallback rasterizer renders every diagram", all(images) and all(im.size[0] > 100 for im in images),
+              f"{len(images)} PNGs, first {images[0].size if images[0] else None}")
+        check("fallback output deterministic", dr.rasterize_drawio(full[0]) == cold[0].png)
+
+        im = images[0].convert("RGB")
+        # red 的绝对坐标: lane(20,20) + (40,60) + 中心 (60,40) = (120,120); 画布原点 = 最小坐标 - border
+        probe = (int(120 - 20 + 10), int(120 - 20 + 10))
+        check("child vertex drawn inside its container", im.getpixel(probe)[0] > 200 and im.getpixel(probe)[1] < 60,
+              f"pixel {probe} = {im.getpixel(probe)}")
+
+        check("compressed <diagram> renders like the plain one", dr.rasterize_drawio(compressed(full[0])) == cold[0].png)
+
+        t0 = time.perf_counter()
+        warm = renderer.render_many([wrap_xml(c, modified=f"2025-{i}") for i, c in enumerate(cells)])
+        t_warm = time.perf_counter() - t0
+        check("second batch served from cache (timestamps ignored)",
+              all(r.cached for r in warm) and [r.png for r in warm] == [r.png for r in cold],
+              f"{t_cold * 1000:.0f} ms cold -> {t_warm * 1000:.1f} ms cached")
+
+        dup_renderer = dr.DrawioRenderer(backend="python", cache_dir=None)
+        calls = []
+        original = dup_renderer._run_backend
+        dup_renderer._run_backend = lambda b, xs, *a: calls.append(len(xs)) or original(b, xs, *a)
+        dup = dup_renderer.render_many([full[0], full[1], full[0]])
+        check("duplicates in one batch rendered once", calls == [2] and dup[0].png == dup[2].png, f"backend calls {calls}")
+
+        os.environ["DF_DRAWIO_RENDER_CACHE"] = str(Path(tmp) / "cache")
+        os.environ.setdefault("DF_DRAWIO_RENDERER", "auto")
+        out = Path(tmp) / "out" / "diagram.png"
+        ok, msg = export_drawio_png(cells[0], str(out))
+        check("export_drawio_png writes the PNG", ok and out.exists() and out.stat().st_size > 0,
+              msg or f"{dr.get_drawio_renderer().render(cells[0]).backend} backend")
+
+        cli = dr.find_drawio_cli()
+        if cli:
+            t0 = time.perf_counter()
+            legacy_ok = [legacy_export_drawio_png(cli, x, Path(tmp) / f"legacy_{i}.png") for i, x in enumerate(full)]
+            t_legacy = time.perf_counter() - t0
+            t0 = time.perf_counter()
+            batch = dr._render_cli(cli, full, 1.0, 60)
+            t_batch = time.perf_counter() - t0
+            check("batched CLI export", all(legacy_ok) and all(r.ok for r in batch),
+                  f"per-diagram {t_legacy:.2f}s -> batched {t_batch:.2f}s")
+        else:
+            print("[SKIP] draw.io CLI not installed")
+
+        browser = dr.DrawioRenderer(backend="browser", cache_dir=None)
+        if browser._browser.available():
+            t0 = time.perf_counter()
+            first = browser.render(full[0])
+            t_first = time.perf_counter() - t0
+            t0 = time.perf_counter()
+            rest = browser.render_many(full[1:])
+            t_rest = time.perf_counter() - t0
+            check("persistent browser backend", first.ok and all(r.ok for r in rest),
+                  f"first incl. startup {t_first:.2f}s, then {t_rest / max(len(rest), 1) * 1000:.0f} ms/diagram")
+        else:
+            print(f"[SKIP] browser backend unavailable: {browser._browser.failed}")
+        browser.close()
+        dr.shutdown_drawio_renderer()
+
+    print(f"\nDiagrams: {args.diagrams} x {args.nodes} nodes; fallback {t_cold / args.diagrams * 1000:.0f} ms/diagram")
+    if not all(results):
+        print("\n[FAIL] renderer behaviour differs from expectations")
+        return 1
+    print("\n[OK] all checks passed")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
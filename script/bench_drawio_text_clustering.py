@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+Benchmark + equivalence check for the text-block clustering in wf_paper2drawio_sam3.
+
+Builds synthetic OCR-like text blocks (lines of words in columns, some
+overlapping duplicates, zero-sized and page-wide blocks) and runs the three
+``unify_by_clustering`` passes (font size, font family, font color) through:
+
+- ``legacy_cluster_blocks``: the original all-pairs loop with a naive union-find;
+- the processors' ``unify_by_clustering``: grid-bucketed candidate pairs +
+  union-find with path compression and union by rank.
+
+The resulting blocks must be identical for every processor and threshold.
+
+Usage:
+    python script/bench_drawio_text_clustering.py
+    python script/bench_drawio_text_clustering.py --sizes 500 3000 --seed 7
+"""
+
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, List
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+
+from dataflow_agent.workflow import wf_paper2drawio_sam3 as sam3  # noqa: E402
+from dataflow_agent.workflow.wf_paper2drawio_sam3 import (  # noqa: E402
+    FontFamilyProcessor,
+    FontSizeProcessor,
+    StyleProcessor,
+)
+
+FONTS = ["Arial", "Times New Roman", "Courier New", "Helvetica"]
+COLORS = ["#000000", "#333333", "#1F4E79", "#C00000"]
+
+
+def synthetic_blocks(n: int, seed: int) -> List[Dict[str, Any]]:
+    rng = random.Random(seed)
+    blocks = []
+    cols = max(1, int((n / 40) ** 0.5))
+    for i in range(n):
+        col, line = i % cols, i // cols
+        h = rng.choice([10, 12, 14, 18, 24]) + rng.random() * 2
+        x = col * 260 + rng.uniform(-20, 20)
+        y = line * (h * rng.uniform(0.9, 1.6)) + rng.uniform(-3, 3)
+        w = rng.uniform(30, 240)
+        if rng.random() < 0.02:
+            w, h = rng.choice([(0, h), (w, 0), (-5, h)])
+        if rng.random() < 0.01:
+            x, w = 0, cols * 260
+        blocks.append({
+            "text": f"word {i}",
+            "geometry": {"x": round(x, 2), "y": round(y, 2), "width": round(w, 2), "height": round(h, 2)},
+            "font_size": round(h * rng.uniform(0.6, 0.9), 1),
+            "font_family": rng.choice(FONTS),
+            "font_color": rng.choice(COLORS + [None]),
+        })
+    return blocks
+
+
+# ----------------------------------------------------------------------
+# Reference implementation (all-pairs loop before the grid buckets)
+# ----------------------------------------------------------------------
+def legacy_groups(text_blocks, should_merge) -> List[List[int]]:
+    n = len(text_blocks)
+    parent = list(range(n))
+
+    def find(x):
+        if parent[x] != x:
+            parent[x] = find(parent[x])
+        return parent[x]
+
+    def union(x, y):
+        px, py = find(x), find(y)
+        if px != py:
+            parent[px] = py
+
+    for i in range(n):
+        for j in range(i + 1, n):
+            if should_merge(text_blocks[i], text_blocks[j]):
+                union(i, j)
+
+    groups: Dict[int, List[int]] = {}
+    for i in range(n):
+        groups.setdefault(find(i), []).append(i)
+    return list(groups.values())
+
+
+def legacy_cluster_blocks(text_blocks, should_merge, **_):
+    """Drop-in for ``_cluster_blocks`` that runs the original all-pairs loop."""
+    return legacy_groups(text_blocks, should_merge)
+
+
+CASES = [
+    ("font size", FontSizeProcessor, [(0.5, 5.0), (1.2, 2.0), (0.0, 5.0)]),
+    ("font family", FontFamilyProcessor, [()]),
+    ("font color", StyleProcessor, [(0.8, 0.5), (0.2, 0.1)]),
+]
+
+
+def run(proc, blocks, args, legacy: bool):
+    saved = sam3._cluster_blocks
+    if legacy:
+        sam3._cluster_blocks = legacy_cluster_blocks
+    try:
+        t0 = time.perf_counter()
+        out = proc.unify_by_clustering(blocks, *args)
+        return out, time.perf_counter() - t0
+    finally:
+        sam3._cluster_blocks = saved
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark grid-bucketed text clustering against the all-pairs loop")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[300, 3000], help="Text block counts")
+    parser.add_argument("--seed", type=int, default=0)
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    ok_all = True
+    for n in args.sizes:
+        blocks = synthetic_blocks(n, args.seed + n)
+        for name, cls, arg_sets in CASES:
+            proc = cls()
+            for case_args in arg_sets:
+                old, t_old = run(proc, blocks, case_args, legacy=True)
+                new, t_new = run(proc, blocks, case_args, legacy=False)
+                ok = new == old
+                ok_all &= ok
+                print(
+                    f"[{'OK' if ok else 'FAIL'}] n={n:5d} {name:11s} args={case_args!s:12s}: "
+                    f"legacy {t_old:7.3f}s -> {t_new:6.3f}s (x{t_old / max(t_new, 1e-9):.0f})"
+                    f"{'' if ok else '  (output differs from legacy)'}"
+                )
+    if not ok_all:
+        print("\n[FAIL] clustering differs from the all-pairs loop")
+        return 1
+    print("\n[OK] identical to the all-pairs loop")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
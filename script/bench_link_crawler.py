@@ -0,0 +1,233 @@
+#!/usr/bin/env python3
+"""
+Benchmark + behaviour check for the async link crawler (dataflow_agent.toolkits.link_crawler).
+
+Starts a local HTTP fixture server (stdlib http.server) serving HTML pages with
+ETag / Last-Modified validators and configurable latency, then compares the
+sequential ``fetch_page_text`` loop that link import used before (kept below as
+``legacy_*``) with ``fetch_pages_text_async``:
+
+- extracted texts must be identical to the legacy path;
+- in-flight requests per host never exceed DF_CRAWL_PER_HOST;
+- a re-run revalidates with conditional requests and gets 304s;
+- an oversized page is only read up to DF_CRAWL_MAX_BYTES;
+- non-HTML responses are reported without reading the body.
+
+The fixture is reachable as both 127.0.0.1 and localhost, which the crawler
+treats as two hosts.
+
+Usage:
+    python script/bench_link_crawler.py
+    python script/bench_link_crawler.py --pages 30 --latency 0.2 --per-host 2
+"""
+
+import argparse
+import asyncio
+import hashlib
+import os
+import sys
+import tempfile
+import threading
+import time
+from email.utils import formatdate
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+
+from dataflow_agent.toolkits.research_tools import fetch_page_text  # noqa: E402
+
+BIG_PAGE_BYTES = 3 << 20
+MAX_BYTES = 1 << 20
+
+
+# ----------------------------------------------------------------------
+# Fixture server
+# ----------------------------------------------------------------------
+class Fixture:
+    def __init__(self, latency: float):
+        self.latency = latency
+        self.lock = threading.Lock()
+        self.in_flight = {}
+        self.max_in_flight = {}
+        self.status_counts = {}
+        self.bytes_sent = 0
+        self.modified = formatdate(time.time() - 3600, usegmt=True)
+
+    @staticmethod
+    def page(n: int) -> bytes:
+        body = "".join(f"<p>Paragraph {i} of page {n}: lorem ipsum dolor sit amet.</p>" for i in range(50))
+        return (
+            f"<html><head><title>Page {n}</title><style>p {{color: red}}</style>"
+            f"<script>var x = {n};</script></head><body><h1>Page {n}</h1>{body}</body></html>"
+        ).encode("utf-8")
+
+    def count(self, status: int):
+        with self.lock:
+            self.status_counts[status] = self.status_counts.get(status, 0) + 1
+
+
+def make_handler(fx: Fixture):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self):
+            host = self.headers.get("Host", "").split(":")[0]
+            with fx.lock:
+                fx.in_flight[host] = fx.in_flight.get(host, 0) + 1
+                fx.max_in_flight[host] = max(fx.max_in_flight.get(host, 0), fx.in_flight[host])
+            try:
+                time.sleep(fx.latency)
+                self._serve()
+            finally:
+                with fx.lock:
+                    fx.in_flight[host] -= 1
+
+        def _serve(self):
+            path = self.path.split("?")[0]
+            if path == "/file.pdf":
+                self._send(200, b"%PDF-1.4 not html" * 1000, "application/pdf")
+                return
+            if path == "/big":
+                chunk = b"<p>" + b"x" * 1020 + b"</p>"
+                self.send_response(200)
+                self.send_header("Content-Type", "text/html; charset=utf-8")
+                self.send_header("Content-Length", str(BIG_PAGE_BYTES))
+                self.end_headers()
+                fx.count(200)
+                try:
+                    for _ in range(BIG_PAGE_BYTES // len(chunk)):
+                        self.wfile.write(chunk)
+                        fx.bytes_sent += len(chunk)
+                except (BrokenPipeError, ConnectionResetError):
+                    pass
+                return
+            if not path.startswith("/page/"):
+                self._send(404, b"not found", "text/plain")
+                return
+            n = int(path.rsplit("/", 1)[-1])
+            body = fx.page(n)
+            etag = '"%s"' % hashlib.sha1(body).hexdigest()
+            if self.headers.get("If-None-Match") == etag:
+                self.send_response(304)
+                self.send_header("ETag", etag)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                fx.count(304)
+                return
+            self._send(200, body, "text/html; charset=utf-8", {"ETag": etag, "Last-Modified": fx.modified})
+
+        def _send(self, status, body, content_type, extra=None):
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            for k, v in (extra or {}).items():
+                self.send_header(k, v)
+            self.end_headers()
+            self.wfile.write(body)
+            fx.count(status)
+
+        def log_message(self, *args):
+            pass
+
+    return Handler
+
+
+# ----------------------------------------------------------------------
+# Reference implementation (link import before the crawler)
+# ----------------------------------------------------------------------
+def legacy_fetch_all(urls):
+    return [fetch_page_text(u) for u in urls]
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark the async link crawler against sequential fetches")
+    parser.add_argument("--pages", type=int, default=20, help="Number of pages (split across two host names)")
+    parser.add_argument("--latency", type=float, default=0.1, help="Server latency per request (s)")
+    parser.add_argument("--concurrency", type=int, default=8, help="DF_CRAWL_CONCURRENCY")
+    parser.add_argument("--per-host", type=int, default=2, help="DF_CRAWL_PER_HOST")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    fx = Fixture(args.latency)
+    server = ThreadingHTTPServer(("127.0.0.1", 0), make_handler(fx))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    port = server.server_address[1]
+    hosts = ["127.0.0.1", "localhost"]
+    urls = [f"http://{hosts[i % 2]}:{port}/page/{i}" for i in range(args.pages)]
+
+    results = []
+
+    def check(name, ok, detail=""):
+        results.append(ok)
+        print(f"[{'OK' if ok else 'FAIL'}] {name}{': ' + detail if detail else ''}")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ.update({
+            "DF_CRAWL_CACHE": tmp,
+            "DF_CRAWL_CONCURRENCY": str(args.concurrency),
+            "DF_CRAWL_PER_HOST": str(args.per_host),
+            "DF_CRAWL_MAX_BYTES": str(MAX_BYTES),
+            "DF_CRAWL_FRESH_SECONDS": "0",
+        })
+        from dataflow_agent.toolkits.link_crawler import fetch_page_text_async, fetch_pages_text_async
+
+        t0 = time.perf_counter()
+        legacy = legacy_fetch_all(urls)
+        t_legacy = time.perf_counter() - t0
+
+        async def run():
+            fx.max_in_flight.clear()
+            fx.status_counts.clear()
+            t0 = time.perf_counter()
+            cold = await fetch_pages_text_async(urls)
+            t_cold = time.perf_counter() - t0
+            peak = dict(fx.max_in_flight)
+            cold_counts = dict(fx.status_counts)
+
+            fx.status_counts.clear()
+            t0 = time.perf_counter()
+            warm = await fetch_pages_text_async(urls)
+            t_warm = time.perf_counter() - t0
+            warm_counts = dict(fx.status_counts)
+
+            fx.bytes_sent = 0
+            big = await fetch_page_text_async(f"http://127.0.0.1:{port}/big", max_chars=0)
+            non_html = await fetch_page_text_async(f"http://127.0.0.1:{port}/file.pdf")
+            missing = await fetch_page_text_async(f"http://127.0.0.1:{port}/nope")
+            return cold, t_cold, peak, cold_counts, warm, t_warm, warm_counts, big, non_html, missing
+
+        cold, t_cold, peak, cold_counts, warm, t_warm, warm_counts, big, non_html, missing = asyncio.run(run())
+
+    check("texts identical to sequential fetch_page_text", cold == legacy and warm == legacy)
+    check(
+        f"per-host limit {args.per_host} respected",
+        max(peak.values()) <= args.per_host,
+        ", ".join(f"{h}: peak {n}" for h, n in sorted(peak.items())),
+    )
+    check("cold run fetched every page", cold_counts.get(200) == args.pages, str(cold_counts))
+    check("re-run revalidated with 304s", warm_counts.get(304) == args.pages and not warm_counts.get(200), str(warm_counts))
+    check(
+        "oversized page read up to the cap",
+        0 < len(big) <= MAX_BYTES and not big.startswith("["),
+        f"{len(big)} chars extracted from a {BIG_PAGE_BYTES >> 20} MB page",
+    )
+    check("non-HTML reported", non_html == fetch_page_text(f"http://127.0.0.1:{port}/file.pdf"), non_html)
+    check("HTTP errors reported", missing.startswith("[抓取失败"), missing[:60])
+    server.shutdown()
+
+    print(f"\nPages: {args.pages} on 2 hosts, latency {args.latency}s, concurrency {args.concurrency}, per-host {args.per_host}")
+    print(f"sequential {t_legacy:.2f}s -> concurrent {t_cold:.2f}s (x{t_legacy / max(t_cold, 1e-9):.1f}), revalidated {t_warm:.2f}s")
+    if not all(results):
+        print("\n[FAIL] crawler behaviour differs from expectations")
+        return 1
+    print("\n[OK] all checks passed")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+"""
+Benchmark + behaviour check for the matplotlib sandbox pool (dataflow_agent.toolkits.plot_sandbox).
+
+Runs the same generated-style chart scripts through the original
+"temp file + subprocess.run" path (kept below as ``legacy_*``) and through
+``execute_matplotlib_code`` backed by the warm worker pool:
+
+- PNGs written by the pool must be byte-identical to the subprocess ones;
+- rcParams / open figures set by one job must not leak into the next;
+- a runaway loop is stopped by the wall-clock timeout and the pool keeps working;
+- a 1 GB allocation fails with MemoryError under a 512 MB budget;
+- a hard crash of the worker is reported and the worker replaced;
+- workers are recycled after max_jobs jobs.
+
+Usage:
+    python script/bench_plot_sandbox.py
+    python script/bench_plot_sandbox.py --charts 30 --workers 4
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+
+CHART_TEMPLATE = """
+output_path = {path!r}
+import matplotlib
+matplotlib.use('Agg')
+import matplotlib.pyplot as plt
+import numpy as np
+
+x = np.arange({n})
+fig, ax = plt.subplots(figsize=(6, 4))
+ax.bar(x, (x * 7919) % 13 + 1, color='#4C72B0')
+ax.plot(x, np.sqrt(x + 1) * 3, color='#DD8452', marker='o')
+ax.set_title('Chart {i}')
+ax.set_xlabel('Setting')
+ax.set_ylabel('Score')
+plt.tight_layout()
+plt.savefig(output_path, dpi=100, metadata={{'Software': None}})
+plt.close('all')
+"""
+
+
+def chart_code(i: int, path: Path) -> str:
+    return CHART_TEMPLATE.format(path=str(path), n=5 + i % 7, i=i)
+
+
+# ----------------------------------------------------------------------
+# Reference implementation (subprocess per chart)
+# ----------------------------------------------------------------------
+def legacy_execute(code: str, output_path: Path, timeout: int = 30) -> bool:
+    with tempfile.NamedTemporaryFile(mode="w", suffix=".py", delete=False, encoding="utf-8") as f:
+        f.write(code)
+        script = f.name
+    try:
+        result = subprocess.run(
+            [sys.executable, script], capture_output=True, text=True, timeout=timeout, cwd=str(output_path.parent)
+        )
+    finally:
+        os.unlink(script)
+    return result.returncode == 0 and output_path.exists()
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark the matplotlib sandbox pool against subprocess execution")
+    parser.add_argument("--charts", type=int, default=16, help="Number of charts")
+    parser.add_argument("--workers", type=int, default=2, help="DF_PLOT_SANDBOX_WORKERS")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    os.environ.update({
+        "DF_PLOT_SANDBOX_WORKERS": str(args.workers),
+        "DF_PLOT_SANDBOX_MEM_MB": "512",
+    })
+    from dataflow_agent.toolkits import plot_sandbox
+    from dataflow_agent.utils_common import execute_matplotlib_code
+
+    results = []
+
+    def check(name, ok, detail=""):
+        results.append(ok)
+        print(f"[{'OK' if ok else 'FAIL'}] {name}{': ' + detail if detail else ''}")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        work = Path(tmp)
+        (work / "legacy").mkdir()
+        (work / "pool").mkdir()
+
+        t0 = time.perf_counter()
+        legacy_ok = [legacy_execute(chart_code(i, work / "legacy" / f"{i}.png"), work / "legacy" / f"{i}.png") for i in range(args.charts)]
+        t_legacy = time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        plot_sandbox.get_plot_sandbox().warm()
+        first = execute_matplotlib_code(chart_code(0, work / "pool" / "0.png"), work / "pool" / "0.png")
+        t_first = time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        with ThreadPoolExecutor(args.workers) as ex:
+            pool_results = list(ex.map(
+                lambda i: execute_matplotlib_code(chart_code(i, work / "pool" / f"{i}.png"), work / "pool" / f"{i}.png"),
+                range(1, args.charts),
+            ))
+        t_pool = time.perf_counter() - t0
+        pool_results.insert(0, first)
+
+        same = all(
+            ok and r["success"] and (work / "legacy" / f"{i}.png").read_bytes() == (work / "pool" / f"{i}.png").read_bytes()
+            for i, (ok, r) in enumerate(zip(legacy_ok, pool_results))
+        )
+        check("PNGs identical to subprocess execution", same, f"{args.charts} charts")
+
+        leak_probe = work / "leak.png"
+        execute_matplotlib_code(
+            "import matplotlib.pyplot as plt\nplt.rcParams['lines.linewidth'] = 9\nplt.figure()\n", leak_probe
+        )
+        probe = execute_matplotlib_code(
+            "import matplotlib.pyplot as plt\n"
+            "assert plt.rcParams['lines.linewidth'] != 9, 'rcParams leaked'\n"
+            "assert not plt.get_fignums(), 'figure leaked'\n"
+            f"plt.figure(); plt.savefig({str(leak_probe)!r})\n",
+            leak_probe,
+        )
+        check("no rcParams / figure leakage between jobs", probe["success"], probe["error"][:80])
+
+        t0 = time.perf_counter()
+        hang = execute_matplotlib_code("while True:\n    pass\n", work / "hang.png", timeout=2)
+        t_hang = time.perf_counter() - t0
+        check("runaway loop stopped", not hang["success"] and t_hang < 5, f"{t_hang:.1f}s: {hang['error']}")
+
+        oom = execute_matplotlib_code("import numpy as np\nx = np.ones((1 << 27,), dtype=np.float64)\n", work / "oom.png")
+        check("memory budget enforced", not oom["success"] and "MemoryError" in oom["error"], oom["error"].strip().splitlines()[-1][:80])
+
+        crash = execute_matplotlib_code("import ctypes\nctypes.string_at(0)\n", work / "crash.png")
+        after = execute_matplotlib_code(chart_code(0, work / "after.png"), work / "after.png")
+        check("worker crash reported and replaced", not crash["success"] and after["success"], crash["error"][:80])
+
+        small = plot_sandbox.PlotSandboxPool(size=1, max_jobs=3, mem_mb=512)
+        worker_pids = []
+        for i in range(7):
+            r = small.run("import multiprocessing\nprint(multiprocessing.current_process().pid)\n", work / "noop.png")
+            worker_pids.append(r["stdout"].strip())
+        small.close()
+        check("workers recycled after max jobs", len(set(worker_pids)) == 3, f"{len(set(worker_pids))} pids over {len(worker_pids)} jobs (max 3 each)")
+
+        plot_sandbox.shutdown_plot_sandbox()
+
+    print(f"\nCharts: {args.charts}, workers {args.workers}")
+    print(f"subprocess {t_legacy:.2f}s ({t_legacy / args.charts * 1000:.0f} ms/chart) -> "
+          f"pool {t_pool:.2f}s for {args.charts - 1} charts ({t_pool / max(args.charts - 1, 1) * 1000:.0f} ms/chart), "
+          f"first chart incl. worker start {t_first:.2f}s")
+    if not all(results):
+        print("\n[FAIL] sandbox behaviour differs from expectations")
+        return 1
+    print("\n[OK] all checks passed")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,229 @@
+#!/usr/bin/env python3
+"""
+Microbenchmark + equivalence check for SAM post-processing in sam_tool.
+
+Runs ``postprocess_sam_items`` (area/score filter, bbox or mask NMS, top-k) on
+pages with 100+ SAM proposals and compares it against the original per-pair
+implementations kept below as ``legacy_*``. The kept instances (identity and
+order) must match exactly.
+
+Proposals come from ``--npz`` files (``masks``: (N, H, W) bool, optional
+``scores``: (N,)), e.g. dumped from ``run_sam_auto``, or are synthesized as
+overlapping multi-scale ellipses/rectangles like SAM's auto mode produces.
+
+Usage:
+    python script/bench_sam_postprocess.py --pages 5 --proposals 150
+    python script/bench_sam_postprocess.py --npz page1.npz page2.npz --iou 0.6
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+
+import numpy as np  # noqa: E402
+
+from dataflow_agent.toolkits.multimodaltool import sam_tool  # noqa: E402
+
+
+# ----------------------------------------------------------------------
+# Reference implementations (behaviour before vectorization)
+# ----------------------------------------------------------------------
+def _legacy_score(it, key):
+    if key == "score":
+        v = it.get("score")
+        if v is not None:
+            try:
+                return float(v)
+            except Exception:
+                pass
+    return float(it.get("area", 0))
+
+
+def legacy_filter(items, min_area=0, min_score=0.0):
+    out = []
+    for it in items:
+        if int(it.get("area", 0)) < min_area:
+            continue
+        score = it.get("score", None)
+        if score is not None and float(score) < float(min_score):
+            continue
+        out.append(it)
+    return out
+
+
+def legacy_bbox_iou(box1, box2):
+    x1, y1 = max(box1[0], box2[0]), max(box1[1], box2[1])
+    x2, y2 = min(box1[2], box2[2]), min(box1[3], box2[3])
+    inter = max(0.0, x2 - x1) * max(0.0, y2 - y1)
+    if inter <= 0.0:
+        return 0.0
+    area1 = max(0.0, box1[2] - box1[0]) * max(0.0, box1[3] - box1[1])
+    area2 = max(0.0, box2[2] - box2[0]) * max(0.0, box2[3] - box2[1])
+    union = area1 + area2 - inter
+    return 0.0 if union <= 0.0 else inter / union
+
+
+def legacy_nms_bbox(items, thr, key):
+    kept = []
+    for it in sorted(items, key=lambda x: _legacy_score(x, key), reverse=True):
+        bbox = it.get("bbox")
+        if not bbox or len(bbox) != 4:
+            continue
+        if all(legacy_bbox_iou(bbox, k["bbox"]) < thr for k in kept):
+            kept.append(it)
+    return kept
+
+
+def legacy_nms_mask(items, thr, key):
+    kept = []
+    for it in sorted(items, key=lambda x: _legacy_score(x, key), reverse=True):
+        if it.get("mask") is None:
+            continue
+        m = np.array(it["mask"]) > 0
+        keep = True
+        for k in kept:
+            m2 = np.array(k["mask"]) > 0
+            if m.shape != m2.shape:
+                continue
+            inter = np.logical_and(m, m2).sum()
+            union = np.logical_or(m, m2).sum()
+            iou = float(inter) / float(union) if inter and union else 0.0
+            if iou >= thr:
+                keep = False
+                break
+        if keep:
+            kept.append(it)
+    return kept
+
+
+def legacy_postprocess(items, min_area, min_score, iou, top_k, nms_by, nms_key, topk_key):
+    out = legacy_filter(items, min_area, min_score)
+    if iou > 0:
+        out = (legacy_nms_mask if nms_by == "mask" else legacy_nms_bbox)(out, iou, nms_key)
+    if top_k:
+        out = sorted(out, key=lambda x: _legacy_score(x, topk_key), reverse=True)[:top_k]
+    return out
+
+
+# ----------------------------------------------------------------------
+# Inputs
+# ----------------------------------------------------------------------
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark sam_tool.postprocess_sam_items against the legacy path")
+    parser.add_argument("--npz", nargs="*", default=[], help="NPZ files with masks (N,H,W) and optional scores")
+    parser.add_argument("--pages", type=int, default=3, help="Synthetic pages when no --npz is given")
+    parser.add_argument("--proposals", type=int, default=150, help="Synthetic proposals per page")
+    parser.add_argument("--size", type=int, default=1024, help="Synthetic page side length in pixels")
+    parser.add_argument("--min-area", type=int, default=200)
+    parser.add_argument("--min-score", type=float, default=0.0)
+    parser.add_argument("--iou", type=float, default=0.6)
+    parser.add_argument("--top-k", type=int, default=40)
+    parser.add_argument("--repeat", type=int, default=3)
+    return parser.parse_args()
+
+
+def items_from_masks(masks, scores=None):
+    n, h, w = masks.shape
+    items = []
+    for i in range(n):
+        m = masks[i].astype(bool)
+        ys, xs = np.nonzero(m)
+        bbox = [xs.min() / w, ys.min() / h, (xs.max() + 1) / w, (ys.max() + 1) / h] if xs.size else [0, 0, 0, 0]
+        items.append({"mask": m, "bbox": bbox, "score": None if scores is None else float(scores[i]), "area": int(m.sum())})
+    return items
+
+
+def synthetic_page(seed, n, size):
+    """Overlapping multi-scale blobs: every object yields several near-duplicate masks, as SAM does."""
+    rng = np.random.default_rng(seed)
+    yy, xx = np.mgrid[0:size, 0:size]
+    masks, scores = [], []
+    while len(masks) < n:
+        cx, cy = rng.integers(0, size, 2)
+        rx, ry = rng.integers(10, size // 5, 2)
+        ellipse = rng.random() < 0.5
+        for _ in range(int(rng.integers(1, 5))):
+            jx, jy = rng.integers(-4, 5, 2)
+            sx, sy = rng.uniform(0.85, 1.15, 2)
+            if ellipse:
+                m = ((xx - cx - jx) / (rx * sx)) ** 2 + ((yy - cy - jy) / (ry * sy)) ** 2 <= 1
+            else:
+                m = (np.abs(xx - cx - jx) <= rx * sx) & (np.abs(yy - cy - jy) <= ry * sy)
+            masks.append(m)
+            scores.append(float(rng.uniform(0.3, 1.0)))
+    return np.stack(masks[:n]), np.asarray(scores[:n])
+
+
+def load_pages(args):
+    if args.npz:
+        for path in args.npz:
+            data = np.load(path)
+            yield Path(path).name, items_from_masks(data["masks"], data["scores"] if "scores" in data else None)
+        return
+    for i in range(args.pages):
+        masks, scores = synthetic_page(i, args.proposals, args.size)
+        yield f"synthetic_{i}", items_from_masks(masks, scores)
+
+
+def timed(fn, repeat):
+    best, out = float("inf"), None
+    for _ in range(max(1, repeat)):
+        t0 = time.perf_counter()
+        out = fn()
+        best = min(best, time.perf_counter() - t0)
+    return out, best * 1000
+
+
+def main():
+    args = parse_args()
+    failed = False
+    totals = {}
+    n_pages = 0
+    for name, items in load_pages(args):
+        n_pages += 1
+        line = f"{name}: {len(items)} proposals"
+        for nms_by in ("bbox", "mask"):
+            kw = dict(min_area=args.min_area, min_score=args.min_score, iou=args.iou, top_k=args.top_k,
+                      nms_by=nms_by, nms_key="score", topk_key="area")
+            old, t_old = timed(lambda: legacy_postprocess(items, **kw), args.repeat)
+            new, t_new = timed(
+                lambda: sam_tool.postprocess_sam_items(
+                    items,
+                    min_area=args.min_area,
+                    min_score=args.min_score,
+                    iou_threshold=args.iou,
+                    top_k=args.top_k,
+                    nms_by=nms_by,
+                    score_key_for_nms="score",
+                    sort_key_for_topk="area",
+                ),
+                args.repeat,
+            )
+            same = [id(x) for x in old] == [id(x) for x in new]
+            failed |= not same
+            totals.setdefault(nms_by, [0.0, 0.0])
+            totals[nms_by][0] += t_old
+            totals[nms_by][1] += t_new
+            line += f" | {nms_by}: {t_old:.1f}->{t_new:.1f} ms, kept {len(new)}, identical={same}"
+        print(line)
+
+    if not n_pages:
+        print("No pages.")
+        return 2
+    print(f"\nPages: {n_pages}")
+    for nms_by, (t_old, t_new) in totals.items():
+        print(f"postprocess_sam_items(nms_by={nms_by!r}): legacy {t_old / n_pages:.1f} ms/page, "
+              f"vectorized {t_new / n_pages:.1f} ms/page ({t_old / max(t_new, 1e-9):.1f}x)")
+    if failed:
+        print("\n[FAIL] vectorized post-processing differs from the legacy implementation")
+        return 1
+    print("\n[OK] kept instances identical")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
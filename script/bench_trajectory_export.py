@@ -0,0 +1,243 @@
+#!/usr/bin/env python3
+"""
+Benchmark + equivalence check for streaming trajectory export (dataflow_agent.trajectory.streaming).
+
+Generates synthetic ReAct trajectories (user query, thoughts, tool calls with
+observations, LLM call records) and compares the original exporter methods
+(kept below as ``legacy_*``) with TrajectoryExporter backed by the batched
+stream writer:
+
+- raw / sft / dpo JSONL and the DPO pair dataset are byte-identical;
+- .jsonl.gz decompresses to the same bytes;
+- append mode writes only new trace_ids (also after the .ids sidecar is lost);
+- iter_records(where=...) yields exactly the legacy load-then-filter result;
+- exporting from a generator keeps peak memory flat while the legacy path
+  needs the whole list (tracemalloc peak);
+- Parquet (when pyarrow is installed) round-trips every record and keeps the
+  same schema across appends.
+
+Usage:
+    python script/bench_trajectory_export.py
+    python script/bench_trajectory_export.py --trajectories 20000 --steps 12
+"""
+
+import argparse
+import gzip
+import json
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+
+from dataflow_agent.trajectory.exporter import TrajectoryExporter  # noqa: E402
+from dataflow_agent.trajectory.models import (  # noqa: E402
+    LLMCallRecord,
+    ToolCallRecord,
+    Trajectory,
+    TrajectoryStep,
+)
+from dataflow_agent.trajectory.streaming import iter_trajectory_records, list_parquet_parts  # noqa: E402
+
+
+def make_trajectory(i: int, steps: int) -> Trajectory:
+    rng = random.Random(i)
+    trj = Trajectory(
+        trace_id=f"trj_{i:08d}",
+        workflow_name=rng.choice(["paper2ppt", "kb_chat", "paper2drawio"]),
+        timestamp="2024-01-01T00:00:00",
+        status=rng.choice(["success", "success", "failed"]),
+        mode="react",
+        inputs={"query": f"问题 {i % 50}: summarize the method section"},
+        final_output={"answer": "结论 " * rng.randint(5, 40)},
+    )
+    trj.add_step(TrajectoryStep(step_index=0, node_name="user", role="user", timestamp="t",
+                                input_context={"query": trj.inputs["query"]}))
+    for s in range(1, steps):
+        if s % 2:
+            trj.add_step(TrajectoryStep(
+                step_index=s, node_name="agent", role="agent", timestamp="t",
+                thought="思考 " * rng.randint(10, 60), action_type="tool_call",
+                action_payload={"tool_name": "search", "tool_args": {"q": f"term {s}"}},
+                llm_calls=[LLMCallRecord(model="m", messages_in=[{"role": "user", "content": "x" * 200}],
+                                         response="y" * rng.randint(50, 400), timestamp="t",
+                                         token_usage={"prompt": 100, "completion": 50})],
+            ))
+        else:
+            trj.add_step(TrajectoryStep(
+                step_index=s, node_name="tool", role="tool", timestamp="t",
+                observation="结果 " * rng.randint(20, 120),
+                tool_calls=[ToolCallRecord(tool_name="search", tool_args={"q": s}, tool_result="ok", timestamp="t")],
+            ))
+    if i % 4 == 0:
+        trj.set_feedback(score=rng.randint(1, 5))
+        trj.feedback.timestamp = "t"
+    return trj
+
+
+def trajectories(n: int, steps: int, start: int = 0):
+    for i in range(start, start + n):
+        yield make_trajectory(i, steps)
+
+
+# ----------------------------------------------------------------------
+# Reference implementation (exporter before the stream writer)
+# ----------------------------------------------------------------------
+def legacy_export_to_jsonl(trajectories, filepath, mode="raw"):
+    with open(filepath, "w", encoding="utf-8") as f:
+        for trj in trajectories:
+            if mode == "raw":
+                data = trj.to_dict()
+            elif mode == "sft":
+                data = {"trace_id": trj.trace_id, "messages": trj.to_sft_format(),
+                        "metadata": {"workflow": trj.workflow_name, "status": trj.status}}
+            else:
+                data = trj.to_dpo_format()
+            f.write(json.dumps(data, ensure_ascii=False) + "\n")
+
+
+def legacy_export_dpo_dataset(chosen_trajectories, rejected_trajectories, filepath):
+    prompt_groups = {}
+    for trj in chosen_trajectories:
+        prompt_groups.setdefault(trj.inputs.get("query", ""), {"chosen": [], "rejected": []})["chosen"].append(trj)
+    for trj in rejected_trajectories:
+        prompt_groups.setdefault(trj.inputs.get("query", ""), {"chosen": [], "rejected": []})["rejected"].append(trj)
+    with open(filepath, "w", encoding="utf-8") as f:
+        for prompt, group in prompt_groups.items():
+            for chosen in group["chosen"]:
+                for rejected in group["rejected"]:
+                    pair = {
+                        "prompt": prompt,
+                        "chosen": chosen.to_sft_format(),
+                        "rejected": rejected.to_sft_format(),
+                        "metadata": {
+                            "chosen_trace_id": chosen.trace_id,
+                            "rejected_trace_id": rejected.trace_id,
+                            "chosen_score": chosen.feedback.score if chosen.feedback else None,
+                            "rejected_score": rejected.feedback.score if rejected.feedback else None,
+                        },
+                    }
+                    f.write(json.dumps(pair, ensure_ascii=False) + "\n")
+
+
+def legacy_load_from_jsonl(filepath):
+    with open(filepath, "r", encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def peak_mb(fn) -> float:
+    tracemalloc.start()
+    try:
+        fn()
+        return tracemalloc.get_traced_memory()[1] / 2 ** 20
+    finally:
+        tracemalloc.stop()
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark streaming trajectory export against the original exporter")
+    parser.add_argument("--trajectories", type=int, default=3000)
+    parser.add_argument("--steps", type=int, default=10)
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    n, steps = args.trajectories, args.steps
+    results = []
+
+    def check(name, ok, detail=""):
+        results.append(ok)
+        print(f"[{'OK' if ok else 'FAIL'}] {name}{': ' + detail if detail else ''}")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        exporter = TrajectoryExporter(tmp)
+        items = list(trajectories(n, steps))
+
+        for mode in ("raw", "sft", "dpo"):
+            t0 = time.perf_counter()
+            legacy_export_to_jsonl(items, tmp / f"legacy_{mode}.jsonl", mode)
+            t_legacy = time.perf_counter() - t0
+            t0 = time.perf_counter()
+            exporter.export_to_jsonl(items, tmp / f"new_{mode}.jsonl", mode=mode)
+            t_new = time.perf_counter() - t0
+            same = (tmp / f"legacy_{mode}.jsonl").read_bytes() == (tmp / f"new_{mode}.jsonl").read_bytes()
+            check(f"{mode} JSONL identical", same, f"legacy {t_legacy:.2f}s -> {t_new:.2f}s")
+
+        chosen = [t for t in items[:400] if t.status == "success"]
+        rejected = [t for t in items[:400] if t.status != "success"]
+        t0 = time.perf_counter()
+        legacy_export_dpo_dataset(chosen, rejected, tmp / "legacy_dpo_pairs.jsonl")
+        t_legacy = time.perf_counter() - t0
+        t0 = time.perf_counter()
+        exporter.export_dpo_dataset(chosen, rejected, tmp / "new_dpo_pairs.jsonl")
+        t_new = time.perf_counter() - t0
+        check("DPO pair dataset identical",
+              (tmp / "legacy_dpo_pairs.jsonl").read_bytes() == (tmp / "new_dpo_pairs.jsonl").read_bytes(),
+              f"legacy {t_legacy:.2f}s -> {t_new:.2f}s")
+
+        t0 = time.perf_counter()
+        gz = exporter.export_stream(trajectories(n, steps), tmp / "raw.jsonl.gz", mode="raw")
+        t_gz = time.perf_counter() - t0
+        raw_size = (tmp / "legacy_raw.jsonl").stat().st_size
+        check("gzip JSONL decompresses to the same bytes",
+              gzip.open(gz).read() == (tmp / "legacy_raw.jsonl").read_bytes(),
+              f"{raw_size / 2 ** 20:.1f} MB -> {Path(gz).stat().st_size / 2 ** 20:.1f} MB in {t_gz:.2f}s")
+
+        path = tmp / "append.jsonl.gz"
+        exporter.export_sft_dataset(trajectories(n // 2, steps), path, append=True)
+        exporter.export_sft_dataset(trajectories(n, steps), path, append=True)
+        Path(str(path) + ".ids").unlink()
+        exporter.export_sft_dataset(trajectories(n + 10, steps), path, append=True)
+        ids = [r["trace_id"] for r in iter_trajectory_records(path)]
+        expected = [t.trace_id for t in items if t.status == "success"] + \
+                   [t.trace_id for t in trajectories(10, steps, start=n) if t.status == "success"]
+        check("append writes only new trace_ids", ids == expected, f"{len(ids)} records after 3 appends")
+
+        where = lambda r: r.get("status") == "success" and r["workflow_name"] == "kb_chat"  # noqa: E731
+        legacy = [r for r in legacy_load_from_jsonl(tmp / "legacy_raw.jsonl") if where(r)]
+        streamed = list(exporter.iter_records(gz, where=where))
+        check("iter_records(where=...) matches load-then-filter", streamed == legacy, f"{len(streamed)} records")
+
+        del items
+        small = max(n // 10, 1)
+        legacy_peak = peak_mb(lambda: legacy_export_to_jsonl(list(trajectories(n, steps)), tmp / "m1.jsonl"))
+        stream_peak = peak_mb(lambda: exporter.export_stream(trajectories(n, steps), tmp / "m2.jsonl.gz"))
+        stream_small = peak_mb(lambda: exporter.export_stream(trajectories(small, steps), tmp / "m3.jsonl.gz"))
+        check("streaming export memory does not grow with the input",
+              stream_peak < legacy_peak and stream_peak < stream_small * 1.5,
+              f"peak legacy {legacy_peak:.1f} MB, stream {stream_peak:.1f} MB ({n}) / {stream_small:.1f} MB ({small})")
+
+        try:
+            import pyarrow.parquet as pq
+        except ImportError:
+            pq = None
+            print("[SKIP] pyarrow not installed, Parquet export not checked")
+        if pq is not None:
+            pdir = tmp / "raw.parquet"
+            t0 = time.perf_counter()
+            exporter.export_stream(trajectories(n // 2, steps), pdir, format="parquet", append=True)
+            exporter.export_stream(trajectories(n, steps), pdir, format="parquet", append=True)
+            t_pq = time.perf_counter() - t0
+            parts = list_parquet_parts(pdir)
+            schemas = {str(pq.read_schema(p)) for p in parts}
+            records = list(iter_trajectory_records(pdir))
+            check("Parquet round-trips every record", records == legacy_load_from_jsonl(tmp / "legacy_raw.jsonl"),
+                  f"{len(parts)} parts, {sum(p.stat().st_size for p in parts) / 2 ** 20:.1f} MB in {t_pq:.2f}s")
+            check("Parquet schema stable across appends", len(schemas) == 1,
+                  ", ".join(pq.read_schema(parts[0]).names))
+
+    if not all(results):
+        print("\n[FAIL] streaming export differs from expectations")
+        return 1
+    print("\n[OK] all checks passed")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
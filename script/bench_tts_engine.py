@@ -0,0 +1,240 @@
+#!/usr/bin/env python3
+"""
+Benchmark + behaviour check for the concurrent TTS engine in req_tts.
+
+Starts a local fake TTS endpoint (stdlib http.server) that returns deterministic
+16-bit PCM for each request after a configurable latency, then compares the
+original sequential path (kept below as ``legacy_*``) with
+``synthesize_segments_to_wav_async``:
+
+- the WAV written by the engine must be byte-identical to the legacy WAV;
+- a re-run with a warm cache must not hit the endpoint at all;
+- editing one line must re-synthesize exactly that line;
+- when a chunk keeps failing, the call raises, no WAV is left behind, the other
+  chunks are cached, and the next run only requests the failed chunk.
+
+Usage:
+    python script/bench_tts_engine.py
+    python script/bench_tts_engine.py --chunks 40 --latency 0.2 --concurrency 8
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+import wave
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+
+from dataflow_agent.toolkits.multimodaltool import req_tts  # noqa: E402
+
+
+# ----------------------------------------------------------------------
+# Fake TTS endpoint
+# ----------------------------------------------------------------------
+class FakeTTS:
+    """Deterministic PCM per (text, voice); counts requests, can fail on demand."""
+
+    def __init__(self, latency: float, jitter: float):
+        self.latency = latency
+        self.jitter = jitter
+        self.requests = 0
+        self.fail_texts = set()
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def pcm(text: str, voice: str) -> bytes:
+        seed = hashlib.sha256(f"{voice}|{text}".encode("utf-8")).digest()
+        n_frames = 2400 + 40 * len(text)  # ~0.1 s + text length
+        return (seed * (2 * n_frames // len(seed) + 1))[: 2 * n_frames]
+
+
+def make_handler(fake: FakeTTS):
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+            with fake.lock:
+                fake.requests += 1
+            time.sleep(fake.latency + random.uniform(0, fake.jitter))
+            if body["text"] in fake.fail_texts:
+                self.send_response(503)
+                self.end_headers()
+                return
+            data = fake.pcm(body["text"], body["voice"])
+            self.send_response(200)
+            self.send_header("Content-Type", "audio/L16; rate=24000; channels=1")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, *args):
+            pass
+
+    return Handler
+
+
+def start_server(fake: FakeTTS):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), make_handler(fake))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}/tts"
+
+
+def make_synthesize(url: str):
+    def _post(text: str, voice: str) -> bytes:
+        req = urllib.request.Request(
+            url,
+            data=json.dumps({"text": text, "voice": voice}).encode("utf-8"),
+            headers={"Content-Type": "application/json"},
+        )
+        with urllib.request.urlopen(req, timeout=60) as resp:
+            return resp.read()
+
+    async def synthesize(text: str, voice: str) -> bytes:
+        return await asyncio.to_thread(_post, text, voice)
+
+    return synthesize
+
+
+# ----------------------------------------------------------------------
+# Reference implementation (behaviour before the engine)
+# ----------------------------------------------------------------------
+async def legacy_synthesize_to_wav(segments, save_path, synthesize, voice_name):
+    chunks = []
+    for text, voice in segments:
+        chunks.append(await synthesize(text, voice or voice_name))
+    with wave.open(save_path, "wb") as wav_file:
+        wav_file.setnchannels(1)
+        wav_file.setsampwidth(2)
+        wav_file.setframerate(24000)
+        wav_file.writeframes(b"".join(chunks))
+    return save_path
+
+
+# ----------------------------------------------------------------------
+# Checks
+# ----------------------------------------------------------------------
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark the concurrent TTS engine against the sequential path")
+    parser.add_argument("--chunks", type=int, default=24, help="Number of script lines")
+    parser.add_argument("--latency", type=float, default=0.1, help="Fake endpoint latency per request (s)")
+    parser.add_argument("--jitter", type=float, default=0.1, help="Extra random latency per request (s)")
+    parser.add_argument("--concurrency", type=int, default=4, help="Engine concurrency")
+    return parser.parse_args()
+
+
+def script_lines(n: int):
+    voices = ["Kore", "Puck"]
+    return [(f"Line {i}: speaker {voices[i % 2]} says something about chunk {i}.", voices[i % 2]) for i in range(n)]
+
+
+async def run_engine(segments, save_path, synthesize, concurrency):
+    return await req_tts.synthesize_segments_to_wav_async(
+        [req_tts.TTSSegment(text, voice) for text, voice in segments],
+        save_path,
+        api_url="",
+        api_key="",
+        model="fake-tts",
+        voice_name="Kore",
+        concurrency=concurrency,
+        retry_delay=0.01,
+        synthesize=synthesize,
+    )
+
+
+async def run_checks(args, fake, synthesize, work: Path):
+    results = []
+
+    def check(name, ok, detail=""):
+        results.append(ok)
+        print(f"[{'OK' if ok else 'FAIL'}] {name}{': ' + detail if detail else ''}")
+
+    segments = script_lines(args.chunks)
+    legacy_wav = str(work / "legacy.wav")
+    engine_wav = str(work / "engine.wav")
+
+    fake.requests = 0
+    t0 = time.perf_counter()
+    await legacy_synthesize_to_wav(segments, legacy_wav, synthesize, "Kore")
+    t_legacy = time.perf_counter() - t0
+
+    fake.requests = 0
+    t0 = time.perf_counter()
+    await run_engine(segments, engine_wav, synthesize, args.concurrency)
+    t_cold = time.perf_counter() - t0
+    same = Path(legacy_wav).read_bytes() == Path(engine_wav).read_bytes()
+    check("cold run matches legacy WAV", same, f"legacy {t_legacy:.2f}s, engine {t_cold:.2f}s ({fake.requests} requests)")
+
+    fake.requests = 0
+    t0 = time.perf_counter()
+    await run_engine(segments, engine_wav, synthesize, args.concurrency)
+    t_warm = time.perf_counter() - t0
+    same = Path(legacy_wav).read_bytes() == Path(engine_wav).read_bytes()
+    check("warm re-run served from cache", same and fake.requests == 0, f"{t_warm:.3f}s, {fake.requests} requests")
+
+    edited = list(segments)
+    edited[len(edited) // 2] = ("An edited line in the middle.", edited[len(edited) // 2][1])
+    fake.requests = 0
+    await run_engine(edited, str(work / "edited.wav"), synthesize, args.concurrency)
+    await legacy_synthesize_to_wav(edited, str(work / "edited_legacy.wav"), synthesize, "Kore")
+    same = Path(work / "edited.wav").read_bytes() == Path(work / "edited_legacy.wav").read_bytes()
+    # legacy adds len(edited) requests on top of the engine's
+    engine_requests = fake.requests - len(edited)
+    check("edited script only re-synthesizes changed lines", same and engine_requests == 1, f"{engine_requests} request(s)")
+
+    fresh = [(f"Fresh line {i} for the resume check.", voice) for i, (_, voice) in enumerate(segments)]
+    bad = fresh[len(fresh) // 3][0]
+    fake.fail_texts = {bad}
+    fake.requests = 0
+    resume_wav = work / "resume.wav"
+    try:
+        await run_engine(fresh, str(resume_wav), synthesize, args.concurrency)
+        raised = False
+    except Exception:
+        raised = True
+    leftovers = [p for p in work.iterdir() if p.name.startswith("resume.wav")]
+    check("failing chunk raises and leaves no WAV", raised and not leftovers, f"{fake.requests} requests incl. retries")
+
+    fake.fail_texts = set()
+    fake.requests = 0
+    await run_engine(fresh, str(resume_wav), synthesize, args.concurrency)
+    await legacy_synthesize_to_wav(fresh, str(work / "resume_legacy.wav"), synthesize, "Kore")
+    same = resume_wav.read_bytes() == (work / "resume_legacy.wav").read_bytes()
+    engine_requests = fake.requests - len(fresh)
+    check("resume only requests the failed chunk", same and engine_requests == 1, f"{engine_requests} request(s)")
+
+    print(f"\nChunks: {args.chunks}, latency {args.latency}+{args.jitter}s, concurrency {args.concurrency}")
+    print(f"sequential {t_legacy:.2f}s -> concurrent {t_cold:.2f}s (x{t_legacy / max(t_cold, 1e-9):.1f}), cached {t_warm:.3f}s")
+    return all(results)
+
+
+def main():
+    args = parse_args()
+    fake = FakeTTS(args.latency, args.jitter)
+    server, url = start_server(fake)
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            work = Path(tmp) / "out"
+            work.mkdir()
+            os.environ["DF_TTS_CACHE"] = str(Path(tmp) / "cache")
+            ok = asyncio.run(run_checks(args, fake, make_synthesize(url), work))
+    finally:
+        server.shutdown()
+    if not ok:
+        print("\n[FAIL] engine behaviour differs from expectations")
+        return 1
+    print("\n[OK] all checks passed")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
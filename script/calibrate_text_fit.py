@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+"""
+Calibrate the font-metric text fitter against the LibreOffice render fitter.
+
+Extracts every non-empty text box from a corpus of real .pptx decks, fits a font
+size for each box with both ``MetricTextFitter`` and ``PptTextFitter`` (soffice
+render loop), and reports the per-box difference and the time spent by each.
+Exits non-zero when the mean absolute difference exceeds ``--max-mean-diff``.
+
+Usage:
+    python script/calibrate_text_fit.py outputs/some_deck.pptx
+    python script/calibrate_text_fit.py decks/ --max-boxes 100 --csv calib.csv
+    python script/calibrate_text_fit.py decks/ --metric-only      # timing only, no soffice needed
+"""
+
+import argparse
+import csv
+import statistics
+import sys
+import time
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+
+from pptx import Presentation  # noqa: E402
+
+from dataflow_agent.toolkits.multimodaltool.ppt_text_fit import (  # noqa: E402
+    MetricTextFitter,
+    PptTextFitter,
+    TextFitStyle,
+)
+
+EMU_PER_INCH = 914400
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Compare metric vs render text fitting on real slides")
+    parser.add_argument("corpus", nargs="+", help=".pptx files or directories containing them")
+    parser.add_argument("--dpi", type=int, default=96, help="Pixel DPI used to express boxes (default: 96)")
+    parser.add_argument("--max-boxes", type=int, default=200, help="Stop after this many text boxes")
+    parser.add_argument("--lower-pt", type=int, default=8)
+    parser.add_argument("--margin-px", type=int, default=2)
+    parser.add_argument("--max-mean-diff", type=float, default=1.5, help="Fail above this mean |diff| in pt")
+    parser.add_argument("--metric-only", action="store_true", help="Skip the soffice render fitter")
+    parser.add_argument("--csv", default=None, help="Write per-box results to this CSV file")
+    return parser.parse_args()
+
+
+def iter_decks(paths):
+    for p in map(Path, paths):
+        if p.is_dir():
+            yield from sorted(p.rglob("*.pptx"))
+        elif p.suffix.lower() == ".pptx":
+            yield p
+
+
+def iter_boxes(deck: Path, dpi: int):
+    """Yield (slide_no, text, bbox_px, bold, slide_w_px, slide_h_px) for each text box."""
+    prs = Presentation(str(deck))
+    to_px = lambda emu: int(round(emu / EMU_PER_INCH * dpi))  # noqa: E731
+    slide_w_px, slide_h_px = to_px(prs.slide_width), to_px(prs.slide_height)
+    for slide_no, slide in enumerate(prs.slides, start=1):
+        for shape in slide.shapes:
+            if not getattr(shape, "has_text_frame", False) or shape.width is None:
+                continue
+            text = shape.text_frame.text.strip()
+            if not text:
+                continue
+            bold = False
+            for para in shape.text_frame.paragraphs:
+                if para.runs:
+                    bold = bool(para.runs[0].font.bold)
+                    break
+            x1, y1 = to_px(shape.left or 0), to_px(shape.top or 0)
+            bbox = (x1, y1, x1 + to_px(shape.width), y1 + to_px(shape.height))
+            yield slide_no, text, bbox, bold, slide_w_px, slide_h_px
+
+
+def main():
+    args = parse_args()
+    metric = MetricTextFitter(dpi=args.dpi, cache_path="off")
+    render = None if args.metric_only else PptTextFitter(dpi=args.dpi)
+
+    rows = []
+    for deck in iter_decks(args.corpus):
+        for slide_no, text, bbox, bold, sw, sh in iter_boxes(deck, args.dpi):
+            if len(rows) >= args.max_boxes:
+                break
+            style = TextFitStyle(font_name="Arial", bold=bold, line_spacing=1.0, margin_px=args.margin_px)
+            box_h_in = max(1, bbox[3] - bbox[1]) / args.dpi
+            kwargs = dict(
+                text=text,
+                bbox_px=bbox,
+                slide_w_px=sw,
+                slide_h_px=sh,
+                style=style,
+                lower_pt=args.lower_pt,
+                upper_pt=max(args.lower_pt, int(box_h_in * 72.0 * 0.95)),
+                tolerance_px=2,
+                max_iter=15,
+            )
+            t0 = time.perf_counter()
+            m_pt = metric.fit_font_size_pt(**kwargs)
+            m_ms = (time.perf_counter() - t0) * 1000
+            r_pt, r_ms = None, None
+            if render is not None:
+                t0 = time.perf_counter()
+                r_pt = render.fit_font_size_pt(**kwargs)
+                r_ms = (time.perf_counter() - t0) * 1000
+            rows.append(
+                {
+                    "deck": deck.name,
+                    "slide": slide_no,
+                    "text": text[:40].replace("\n", " "),
+                    "bbox": bbox,
+                    "metric_pt": m_pt,
+                    "render_pt": r_pt,
+                    "diff": None if r_pt is None else m_pt - r_pt,
+                    "metric_ms": round(m_ms, 2),
+                    "render_ms": None if r_ms is None else round(r_ms, 1),
+                }
+            )
+            print(
+                f"{deck.name}#{slide_no:<3} metric={m_pt:>3}pt"
+                + ("" if r_pt is None else f" render={r_pt:>3}pt diff={m_pt - r_pt:+d}")
+                + f"  {rows[-1]['text']!r}"
+            )
+
+    if not rows:
+        print("No text boxes found in corpus.")
+        return 1
+
+    if args.csv:
+        with open(args.csv, "w", newline="", encoding="utf-8") as f:
+            writer = csv.DictWriter(f, fieldnames=list(rows[0].keys()))
+            writer.writeheader()
+            writer.writerows(rows)
+
+    print(f"\nBoxes: {len(rows)}")
+    print(f"Metric fitter: {statistics.mean(r['metric_ms'] for r in rows):.2f} ms/box")
+    if render is None:
+        return 0
+
+    diffs = [abs(r["diff"]) for r in rows]
+    mean_diff = statistics.mean(diffs)
+    print(f"Render fitter: {statistics.mean(r['render_ms'] for r in rows):.0f} ms/box")
+    print(f"Mean |diff|: {mean_diff:.2f} pt, max |diff|: {max(diffs)} pt")
+    print(f"Within ±1pt: {sum(d <= 1 for d in diffs) / len(diffs):.0%}, exact: {sum(d == 0 for d in diffs) / len(diffs):.0%}")
+    if mean_diff > args.max_mean_diff:
+        print(f"\n[FAIL] mean |diff| {mean_diff:.2f} pt exceeds {args.max_mean_diff} pt")
+        return 1
+    print("\n[OK] metric fitter within calibration tolerance")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Import-time budget check for the API cold start.
+
+Runs ``python -X importtime -c "import <module>"`` in a fresh interpreter, reports the
+cumulative import time and the slowest top-level imports, and exits non-zero when the
+budget is exceeded or when a heavy dependency (OCR / SAM / torch ...) is imported eagerly.
+
+Usage:
+    python script/check_import_time.py
+    python script/check_import_time.py --module fastapi_app.main --budget-ms 3000
+    python script/check_import_time.py --module dataflow_agent.workflow --budget-ms 1500 --top 20
+"""
+
+import argparse
+import re
+import subprocess
+import sys
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+
+# Modules that must only be imported on first use of the workflows that need them
+DEFAULT_FORBIDDEN = ["paddleocr", "paddle", "torch", "ultralytics", "transformers"]
+
+# import time: self [us] | cumulative | imported package
+_LINE_RE = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Enforce an import-time budget with python -X importtime")
+    parser.add_argument("--module", default="fastapi_app.main", help="Module to import (default: fastapi_app.main)")
+    parser.add_argument("--budget-ms", type=float, default=5000.0, help="Cumulative import-time budget in ms")
+    parser.add_argument("--top", type=int, default=15, help="Number of slowest imports to print")
+    parser.add_argument(
+        "--forbid",
+        nargs="*",
+        default=DEFAULT_FORBIDDEN,
+        help="Top-level packages that must not be imported (default: %(default)s)",
+    )
+    return parser.parse_args()
+
+
+def measure(module: str):
+    """Return (entries, returncode, stderr); entries are (name, self_us, cumulative_us, depth)."""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=str(PROJECT_ROOT),
+        capture_output=True,
+        text=True,
+    )
+    entries = []
+    for line in proc.stderr.splitlines():
+        m = _LINE_RE.match(line)
+        if m:
+            self_us, cum_us, indent, name = m.groups()
+            entries.append((name, int(self_us), int(cum_us), len(indent) // 2))
+    return entries, proc.returncode, proc.stderr
+
+
+def main():
+    args = parse_args()
+    entries, returncode, stderr = measure(args.module)
+    if returncode != 0:
+        print(f"[FAIL] import {args.module} raised:")
+        print("\n".join(l for l in stderr.splitlines() if not l.startswith("import time:")))
+        return 1
+
+    target = next((e for e in reversed(entries) if e[0] == args.module), None)
+    total_ms = (target[2] if target else sum(e[1] for e in entries)) / 1000.0
+
+    print(f"Module: {args.module}")
+    print(f"Cumulative import time: {total_ms:.1f} ms (budget {args.budget_ms:.0f} ms)")
+    print(f"\nSlowest imports (cumulative):")
+    for name, _, cum_us, depth in sorted(entries, key=lambda e: e[2], reverse=True)[: args.top]:
+        print(f"  {cum_us / 1000.0:9.1f} ms  {'  ' * depth}{name}")
+
+    failed = False
+    loaded = {e[0].split(".")[0] for e in entries}
+    eager = sorted(set(args.forbid) & loaded)
+    if eager:
+        print(f"\n[FAIL] heavy packages imported eagerly: {', '.join(eager)}")
+        failed = True
+    if total_ms > args.budget_ms:
+        print(f"\n[FAIL] import time {total_ms:.1f} ms exceeds budget {args.budget_ms:.0f} ms")
+        failed = True
+
+    if not failed:
+        print("\n[OK] within budget")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())